@@ -0,0 +1,96 @@
+"""
+Benchmarks for running flows with ``prefect_ds.checkpoint_handler.checkpoint_handler``, in the format
+used by airspeed velocity (https://asv.readthedocs.io). Each benchmark is run both cold (every task is
+computed and checkpointed) and warm (every checkpoint already exists), and warm flows are also run
+with ``prune_cached``.
+"""
+import pathlib
+import shutil
+import tempfile
+
+from prefect_ds.checkpoint_handler import checkpoint_handler
+from prefect_ds.flow_runner import DSFlowRunner
+from prefect_ds.pandas_result_handler import PandasResultHandler
+from prefect_ds.task_runner import DSTaskRunner
+
+from .synthetic import make_layered_flow, make_mapped_flow
+
+
+def run_flow(flow, **runner_kwargs):
+    state = DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner, **runner_kwargs).run(
+        task_runner_state_handlers=[checkpoint_handler]
+    )
+    assert state.is_successful()
+    return state
+
+
+class CheckpointedFlow:
+    """
+    Flows of different width and depth, with every task checkpointed to its own parquet file.
+    """
+    params = [[1, 10, 50], [1, 10], [1000, 100000]]
+    param_names = ["width", "depth", "num_rows"]
+    number = 1
+    repeat = 5
+    # Each cold run needs an empty directory, so there's no warmup run before timing
+    warmup_time = 0
+    timeout = 300
+
+    def setup(self, width, depth, num_rows):
+        self.directory = pathlib.Path(tempfile.mkdtemp())
+        self.flow = make_layered_flow(
+            width, depth, num_rows,
+            make_result_handler=lambda name: PandasResultHandler(self.directory / f"{name}.parquet", "parquet")
+        )
+        self.warm_directory = pathlib.Path(tempfile.mkdtemp())
+        self.warm_flow = make_layered_flow(
+            width, depth, num_rows,
+            make_result_handler=lambda name: PandasResultHandler(self.warm_directory / f"{name}.parquet", "parquet")
+        )
+        run_flow(self.warm_flow)
+
+    def teardown(self, width, depth, num_rows):
+        shutil.rmtree(self.directory)
+        shutil.rmtree(self.warm_directory)
+
+    def time_cold_run(self, width, depth, num_rows):
+        run_flow(self.flow)
+
+    def time_warm_run(self, width, depth, num_rows):
+        run_flow(self.warm_flow)
+
+    def time_warm_run_pruned(self, width, depth, num_rows):
+        run_flow(self.warm_flow, prune_cached=True)
+
+
+class MappedCheckpoints:
+    """
+    A task mapped over thousands of children, each checkpointed to its own file.
+    """
+    params = [[100, 1000, 5000]]
+    param_names = ["num_children"]
+    number = 1
+    repeat = 3
+    warmup_time = 0
+    timeout = 600
+
+    def setup(self, num_children):
+        self.directory = pathlib.Path(tempfile.mkdtemp())
+        self.flow, _ = make_mapped_flow(
+            num_children, result_handler=PandasResultHandler(self.directory / "{item}.csv", "csv")
+        )
+        self.warm_directory = pathlib.Path(tempfile.mkdtemp())
+        self.warm_flow, _ = make_mapped_flow(
+            num_children, result_handler=PandasResultHandler(self.warm_directory / "{item}.csv", "csv")
+        )
+        run_flow(self.warm_flow)
+
+    def teardown(self, num_children):
+        shutil.rmtree(self.directory)
+        shutil.rmtree(self.warm_directory)
+
+    def time_cold_run(self, num_children):
+        run_flow(self.flow)
+
+    def time_warm_run(self, num_children):
+        run_flow(self.warm_flow)
@@ -0,0 +1,64 @@
+"""
+Benchmarks for ``prefect_ds.flow_runner.DSFlowRunner``, in the format used by airspeed velocity
+(https://asv.readthedocs.io). Run them with ``asv run`` from the root of the repository.
+"""
+import collections
+
+from prefect import Flow
+from prefect.core.task import Task
+from prefect.engine.state import Success
+
+from prefect_ds.flow_runner import DSFlowRunner
+
+
+def make_fan_in_flow(num_tasks):
+    """
+    Make a flow where every task depends on the previous one, and also on a single root task.
+    This is the worst case for purging, since the root task has an edge to every other task.
+
+    Prefect's own topological sort scales badly with the number of edges, so the (known) run order
+    is attached to the flow instead of being computed.
+    """
+    flow = Flow("benchmark")
+    root_task = Task(name="root")
+    flow.add_task(root_task)
+    sorted_tasks = [root_task]
+    for task_number in range(num_tasks - 1):
+        task = Task(name=f"task_{task_number}")
+        flow.add_edge(root_task, task, key="root", validate=False)
+        flow.add_edge(sorted_tasks[-1], task, key="previous", validate=False)
+        sorted_tasks.append(task)
+    flow.sorted_tasks = lambda: sorted_tasks
+    return flow
+
+
+def get_upstream_edges(flow):
+    upstream_edges = collections.defaultdict(set)
+    for edge in flow.edges:
+        upstream_edges[edge.downstream_task].add(edge)
+    return upstream_edges
+
+
+class PurgeEligibility:
+    """
+    The bookkeeping cost of purging results over a whole flow run, without running any tasks.
+    """
+    params = [100, 1000, 10000]
+    param_names = ["num_tasks"]
+    number = 1
+    repeat = 5
+    timeout = 300
+
+    def setup(self, num_tasks):
+        self.flow = make_fan_in_flow(num_tasks)
+        self.sorted_tasks = self.flow.sorted_tasks()
+        self.upstream_edges = get_upstream_edges(self.flow)
+
+    def time_purge_all_tasks(self, num_tasks):
+        runner = DSFlowRunner(flow=self.flow)
+        runner.task_states = {}
+        runner._build_dependency_index(runner.task_states)
+        for task in self.sorted_tasks:
+            state = Success(result=None)
+            runner.task_states[task] = state
+            runner._purge_unnecessary_tasks(task, self.upstream_edges[task], state)
@@ -0,0 +1,21 @@
+"""
+Import-time benchmarks, in the format used by airspeed velocity (https://asv.readthedocs.io).
+Each benchmark runs in a fresh interpreter, with prefect itself already imported so that only
+the cost of importing prefect_ds is measured.
+"""
+
+
+class ImportTime:
+    """
+    The time taken to import the modules that every flow using prefect_ds needs.
+    """
+    repeat = 10
+
+    def timeraw_import_pandas_result_handler(self):
+        return "import prefect_ds.pandas_result_handler", "import prefect"
+
+    def timeraw_import_checkpoint_handler(self):
+        return "import prefect_ds.checkpoint_handler", "import prefect"
+
+    def timeraw_import_flow_runner(self):
+        return "import prefect_ds.flow_runner", "import prefect"
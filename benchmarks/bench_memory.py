@@ -0,0 +1,57 @@
+"""
+Memory benchmarks for ``prefect_ds.flow_runner.DSFlowRunner``, in the format used by airspeed velocity
+(https://asv.readthedocs.io), comparing the peak memory of flow runs with and without purging.
+"""
+import shutil
+import tempfile
+
+from prefect.engine.flow_runner import FlowRunner
+
+from prefect_ds.flow_runner import DSFlowRunner
+
+from .synthetic import make_layered_flow
+
+NUM_ROWS = 200000
+
+
+class PeakMemory:
+    """
+    The peak memory of running a flow of ``width`` chains of ``depth`` tasks, each of which creates or
+    transforms a DataFrame. ``peakmem_`` benchmarks measure the peak memory of the whole process, which
+    is noisy; ``track_`` benchmarks measure the size of the task results held in memory, which isn't.
+    """
+    params = [[1, 10], [2, 10]]
+    param_names = ["width", "depth"]
+    timeout = 300
+
+    def setup(self, width, depth):
+        self.flow = make_layered_flow(width, depth, NUM_ROWS)
+        self.spill_dir = tempfile.mkdtemp()
+
+    def teardown(self, width, depth):
+        shutil.rmtree(self.spill_dir)
+
+    def peakmem_run_without_purging(self, width, depth):
+        FlowRunner(flow=self.flow).run()
+
+    def peakmem_run_with_purging(self, width, depth):
+        DSFlowRunner(flow=self.flow).run()
+
+    def peakmem_run_with_memory_limit(self, width, depth):
+        DSFlowRunner(flow=self.flow, memory_limit=1, spill_dir=self.spill_dir).run()
+
+    def track_result_bytes_without_purging(self, width, depth):
+        report = DSFlowRunner(flow=self.flow, track_memory=True).run().memory_report
+        # Without purging, every result is held until the end of the run
+        return sum(report.result_sizes.values())
+    track_result_bytes_without_purging.unit = "bytes"
+
+    def track_peak_result_bytes_with_purging(self, width, depth):
+        return DSFlowRunner(flow=self.flow, track_memory=True).run().memory_report.peak_resident_bytes
+    track_peak_result_bytes_with_purging.unit = "bytes"
+
+    def track_peak_result_bytes_with_memory_limit(self, width, depth):
+        return DSFlowRunner(
+            flow=self.flow, memory_limit=1, spill_dir=self.spill_dir
+        ).run().memory_report.peak_resident_bytes
+    track_peak_result_bytes_with_memory_limit.unit = "bytes"
@@ -0,0 +1,96 @@
+"""
+Benchmarks for reading and writing results with ``prefect_ds.pandas_result_handler.PandasResultHandler``,
+in the format used by airspeed velocity (https://asv.readthedocs.io). File types whose optional
+dependencies aren't installed are skipped.
+"""
+import pathlib
+import shutil
+import tempfile
+
+from prefect_ds.pandas_result_handler import PandasResultHandler
+
+from .synthetic import make_data
+
+# The extra keyword arguments each file type needs to write (and read back) a DataFrame
+WRITE_KWARGS = {
+    "csv": {"index": False},
+    "feather": {},
+    "hdf": {"key": "data"},
+    "json": {},
+    "parquet": {},
+    "pickle": {},
+}
+READ_KWARGS = {
+    "hdf": {"key": "data"},
+}
+
+
+class ResultHandlerIO:
+    """
+    Writing and reading a DataFrame in every supported file format.
+    """
+    params = [sorted(WRITE_KWARGS), [1000, 100000, 1000000]]
+    param_names = ["file_type", "num_rows"]
+    number = 1
+    repeat = 5
+    timeout = 300
+
+    def setup(self, file_type, num_rows):
+        self.directory = pathlib.Path(tempfile.mkdtemp())
+        self.handler = PandasResultHandler(
+            self.directory / f"data.{file_type}", file_type,
+            read_kwargs=READ_KWARGS.get(file_type), write_kwargs=WRITE_KWARGS[file_type]
+        )
+        self.data = make_data(num_rows)
+        try:
+            self.handler.write(self.data)
+        except ImportError:
+            shutil.rmtree(self.directory)
+            # Skips the benchmark
+            raise NotImplementedError(f"The optional dependencies of {file_type} files aren't installed")
+
+    def teardown(self, file_type, num_rows):
+        shutil.rmtree(self.directory)
+
+    def time_write(self, file_type, num_rows):
+        self.handler.write(self.data)
+
+    def time_read(self, file_type, num_rows):
+        self.handler.read()
+
+    def peakmem_read(self, file_type, num_rows):
+        self.handler.read()
+
+    def track_size_on_disk(self, file_type, num_rows):
+        return self.handler.checkpoint_size()
+    track_size_on_disk.unit = "bytes"
+
+
+class PartitionedIO:
+    """
+    Writing and reading a DataFrame split into partitions, compared to a single file
+    (``num_partitions`` of 1).
+    """
+    params = [[1, 4, 16]]
+    param_names = ["num_partitions"]
+    number = 1
+    repeat = 5
+    timeout = 300
+
+    def setup(self, num_partitions):
+        self.directory = pathlib.Path(tempfile.mkdtemp())
+        self.handler = PandasResultHandler(
+            self.directory / "data.parquet", "parquet",
+            num_partitions=num_partitions if num_partitions > 1 else None
+        )
+        self.data = make_data(1000000)
+        self.handler.write(self.data)
+
+    def teardown(self, num_partitions):
+        shutil.rmtree(self.directory)
+
+    def time_write(self, num_partitions):
+        self.handler.write(self.data)
+
+    def time_read(self, num_partitions):
+        self.handler.read()
@@ -0,0 +1,80 @@
+"""
+Synthetic data and flows shared by the benchmarks.
+"""
+import numpy as np
+import pandas as pd
+from prefect import Flow
+from prefect.core.task import Task
+
+
+def make_data(num_rows, seed=0):
+    """
+    Make a DataFrame with an integer, a float and a string column, as a stand-in for typical task results.
+    """
+    random_state = np.random.RandomState(seed)
+    return pd.DataFrame({
+        "key": np.arange(num_rows),
+        "value": random_state.normal(size=num_rows),
+        "category": random_state.choice(["alpha", "beta", "gamma", "delta"], size=num_rows)
+    })
+
+
+class MakeData(Task):
+    def __init__(self, num_rows, seed, **kwargs):
+        self.num_rows = num_rows
+        self.seed = seed
+        super().__init__(**kwargs)
+
+    def run(self):
+        return make_data(self.num_rows, self.seed)
+
+
+class Combine(Task):
+    def run(self, left, right):
+        return left.assign(value=left["value"].values + right["value"].values)
+
+
+class Scale(Task):
+    def run(self, item):
+        return pd.DataFrame({"item": [item], "value": [item * 2.0]})
+
+
+def make_layered_flow(width, depth, num_rows, make_result_handler=None):
+    """
+    Make a flow of ``depth`` layers of ``width`` tasks each. The first layer creates DataFrames
+    of ``num_rows`` rows, and every task after that combines two tasks of the layer before it
+    (the one in the same position and its neighbour), so every result is needed by two
+    downstream tasks.
+
+    ``make_result_handler``, if given, is called with the name of each task to get its result
+    handler (e.g. to checkpoint it to its own file).
+    """
+    flow = Flow("benchmark")
+
+    def add_task(task):
+        if make_result_handler is not None:
+            task.result_handler = make_result_handler(task.name)
+        flow.add_task(task)
+        return task
+
+    layer = [add_task(MakeData(num_rows, seed, name=f"data_0_{seed}")) for seed in range(width)]
+    for layer_number in range(1, depth):
+        next_layer = []
+        for position in range(width):
+            task = add_task(Combine(name=f"data_{layer_number}_{position}"))
+            flow.set_dependencies(task, keyword_tasks={
+                "left": layer[position], "right": layer[(position + 1) % width]
+            })
+            next_layer.append(task)
+        layer = next_layer
+    return flow
+
+
+def make_mapped_flow(num_children, result_handler=None):
+    """
+    Make a flow with a single task mapped over ``num_children`` integers (named ``item``).
+    """
+    flow = Flow("benchmark")
+    scale = Scale(name="scale", result_handler=result_handler)
+    flow.set_dependencies(scale, keyword_tasks={"item": list(range(num_children))}, mapped=True)
+    return flow, scale
@@ -0,0 +1,190 @@
+import concurrent.futures
+import logging
+import threading
+import typing
+
+import prefect
+
+logger = logging.getLogger(__name__)
+
+# The key in prefect.context under which a flow run (see DSFlowRunner) keeps a WriteBatch of the
+# writes its tasks submit, so it can wait for its own writes rather than those of every flow run
+RUN_WRITES_KEY = "prefect_ds_background_writes"
+
+
+class WriteBatch:
+    """
+    A group of background writes (e.g. those of one flow run) that can be waited for together.
+    Writes are forgotten as soon as they finish, apart from the errors of those that failed, so
+    a long run doesn't hold on to every write it has submitted.
+    """
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._pending = set()  # type: typing.Set[concurrent.futures.Future]
+        # The errors of failed writes, in the order the writes failed
+        self._errors = []  # type: typing.List[BaseException]
+
+    def add(self, future: concurrent.futures.Future):
+        """
+        Add a write to the batch.
+
+        Parameters
+        ----------
+        future : concurrent.futures.Future
+            The future of the write.
+        """
+        with self._condition:
+            self._pending.add(future)
+        future.add_done_callback(self._finish)
+
+    def wait(self) -> typing.List[BaseException]:
+        """
+        Wait for every write in the batch to finish.
+
+        Returns
+        -------
+        errors : list of Exception
+            The exceptions raised by writes that failed since the last wait.
+        """
+        with self._condition:
+            # Waits for the writes' callbacks, which run after the futures are marked as done
+            self._condition.wait_for(lambda: not self._pending)
+            errors, self._errors = self._errors, []
+        return errors
+
+    def forget(self, errors: typing.Iterable[BaseException]):
+        """
+        Drop errors that have already been reported (e.g. by another batch).
+
+        Parameters
+        ----------
+        errors : iterable of Exception
+            The errors.
+        """
+        reported = {id(error) for error in errors}
+        with self._condition:
+            self._errors = [error for error in self._errors if id(error) not in reported]
+
+    def _finish(self, future: concurrent.futures.Future):
+        error = None if future.cancelled() else future.exception()
+        with self._condition:
+            self._pending.discard(future)
+            if error is not None:
+                self._errors.append(error)
+            self._condition.notify_all()
+
+
+class BackgroundWriter:
+    """
+    Runs checkpoint writes in a pool of background threads, so that tasks don't have to wait
+    for their results to be written to disk before downstream tasks can start.
+
+    The number of writes in flight is bounded: once ``max_pending`` writes are queued or running,
+    ``submit`` blocks until one of them finishes. This keeps results that are waiting to be
+    written from piling up in memory when tasks produce them faster than they can be written.
+
+    Parameters
+    ----------
+    max_workers : int
+        The number of threads used for writing.
+    max_pending : int or None
+        The maximum number of writes queued or running at once. Defaults to twice ``max_workers``.
+    """
+    def __init__(self, max_workers: int = 2, max_pending: int = None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending if max_pending is not None else 2 * max_workers
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        # Every write since the last flush
+        self._writes = WriteBatch()
+
+    def submit(self, function: typing.Callable, *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Schedule a write, blocking if ``max_pending`` writes are already in flight. If
+        ``prefect.context`` has a ``WriteBatch`` of the current flow run's writes (under
+        ``RUN_WRITES_KEY``), the write is added to it.
+
+        Parameters
+        ----------
+        function : callable
+            The function that does the write, e.g. a result handler's ``write`` method.
+        *args, **kwargs
+            Passed to ``function``.
+
+        Returns
+        -------
+        future : concurrent.futures.Future
+            The future of the write.
+        """
+        self._slots.acquire()
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="prefect_ds_writer"
+                )
+            future = self._executor.submit(function, *args, **kwargs)
+        future.add_done_callback(lambda _: self._slots.release())
+        # Added to the writer's batch first, as callbacks run in order: by the time a run's batch
+        # has seen a write fail, so has the writer's, so flushing the run's batch can forget it
+        self._writes.add(future)
+        run_writes = prefect.context.get(RUN_WRITES_KEY)
+        if run_writes is not None:
+            run_writes.add(future)
+        return future
+
+    def flush(self, batch: WriteBatch = None) -> typing.List[BaseException]:
+        """
+        Wait for scheduled writes to finish.
+
+        Parameters
+        ----------
+        batch : WriteBatch or None
+            If present, only wait for the writes in this batch (e.g. those of one flow run),
+            rather than all of the writes scheduled since the last flush.
+
+        Returns
+        -------
+        errors : list of Exception
+            The exceptions raised by the writes waited for that failed.
+        """
+        if batch is None:
+            errors = self._writes.wait()
+        else:
+            errors = batch.wait()
+            # Already reported, so they aren't reported again by the next full flush
+            self._writes.forget(errors)
+        for error in errors:
+            logger.error("Background checkpoint write failed: %r", error)
+        return errors
+
+
+_BACKGROUND_WRITER = BackgroundWriter()
+
+
+def get_background_writer() -> BackgroundWriter:
+    """
+    Get the writer used by ``prefect_ds.checkpoint_handler.checkpoint_handler`` for result
+    handlers with ``async_write`` set.
+
+    Returns
+    -------
+    writer : BackgroundWriter
+        The shared background writer.
+    """
+    return _BACKGROUND_WRITER
+
+
+def flush_background_writes():
+    """
+    Wait for all background checkpoint writes to finish. ``DSFlowRunner`` does this at the end
+    of every flow run; call it yourself when running flows with a plain ``FlowRunner``.
+
+    Raises
+    ------
+    Exception
+        The error raised by the first failed write, if any writes failed.
+    """
+    errors = _BACKGROUND_WRITER.flush()
+    if errors:
+        raise errors[0]
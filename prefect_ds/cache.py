@@ -0,0 +1,388 @@
+import argparse
+import json
+import os
+import pathlib
+import shutil
+import sys
+import time
+import typing
+
+import prefect
+
+from prefect_ds.locking import CheckpointLock
+from prefect_ds.manifest import manifest_path
+
+INDEX_FILE_NAME = ".prefect_ds_cache.jsonl"
+
+_EVICTION_POLICIES = ("lru", "lfu")
+
+
+class CacheEntry(typing.NamedTuple):
+    """
+    What the cache index knows about one checkpoint.
+
+    Attributes
+    ----------
+    path : str
+        The (fully formatted) path of the checkpoint.
+    size : int
+        The size of the checkpoint on disk in bytes, including any partitions and its manifest.
+    task : str or None
+        The name of the task that produced the checkpoint.
+    flow : str or None
+        The name of the flow that produced the checkpoint.
+    created : float
+        When the checkpoint was written, as a Unix timestamp.
+    last_access : float
+        When the checkpoint was last written or reused, as a Unix timestamp.
+    access_count : int
+        How many times the checkpoint has been reused.
+    """
+    path: str
+    size: int
+    task: typing.Optional[str]
+    flow: typing.Optional[str]
+    created: float
+    last_access: float
+    access_count: int = 0
+
+
+class CheckpointCache:
+    """
+    An index of the checkpoints written by result handlers that share it, used to keep their
+    total size under a quota and to remove old checkpoints.
+
+    The index is an append-only log (``[directory]/.prefect_ds_cache.jsonl``) with one line per
+    write or reuse of a checkpoint, so recording a reuse costs a single small append, and any
+    number of processes can share the same index. The log is compacted (rewritten with one line
+    per checkpoint) whenever checkpoints are evicted or pruned.
+
+    Parameters
+    ----------
+    directory : str or pathlib.Path
+        The directory the index is kept in (usually the directory the checkpoints are in).
+    max_bytes : int or None
+        If present, whenever a checkpoint is written, the checkpoints used least recently (or
+        least often; see ``policy``) are removed until the total size of all of the checkpoints
+        in the index is at most this many bytes. The checkpoint just written is never removed,
+        and neither are the checkpoints written or reused since the current flow run started, since
+        the run may still have to read them; until a later run, the quota may then be exceeded.
+    policy : str
+        Which checkpoints to remove first: ``"lru"`` (the ones reused least recently) or
+        ``"lfu"`` (the ones reused least often, then the ones reused least recently).
+    """
+    def __init__(self, directory: typing.Union[str, pathlib.Path], max_bytes: int = None, policy: str = "lru"):
+        if policy not in _EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy {policy}. Known policies are {list(_EVICTION_POLICIES)}")
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError(f"max_bytes must not be negative, got {max_bytes}")
+        self.directory = pathlib.Path(directory)
+        self.max_bytes = max_bytes
+        self.policy = policy
+
+    @property
+    def index_path(self) -> pathlib.Path:
+        """
+        The location of the index.
+        """
+        return self.directory / INDEX_FILE_NAME
+
+    def record_write(self, path_string: str, task: str = None, flow: str = None):
+        """
+        Add a checkpoint that has just been written to the index (replacing any previous entry),
+        then enforce the quota, if there is one.
+
+        Parameters
+        ----------
+        path_string : str
+            The (fully formatted) path of the checkpoint.
+        task : str or None
+            The name of the task that produced the checkpoint.
+        flow : str or None
+            The name of the flow that produced the checkpoint.
+        """
+        path_string = os.path.abspath(path_string)
+        self._append([{
+            "event": "write", "path": path_string, "size": get_checkpoint_size(path_string),
+            "task": task, "flow": flow, "time": time.time()
+        }])
+        if self.max_bytes is not None:
+            self.enforce_quota(keep=[path_string])
+
+    def record_access(self, path_strings: typing.Iterable[str]):
+        """
+        Record that checkpoints have been reused.
+
+        Parameters
+        ----------
+        path_strings : iterable of str
+            The (fully formatted) paths of the checkpoints.
+        """
+        now = time.time()
+        self._append([
+            {"event": "access", "path": os.path.abspath(path_string), "time": now} for path_string in path_strings
+        ])
+
+    def entries(self) -> typing.List[CacheEntry]:
+        """
+        Get the checkpoints in the index.
+
+        Returns
+        -------
+        entries : list of CacheEntry
+            The checkpoints, in the order they were written.
+        """
+        return list(self._read_index().values())
+
+    def total_size(self) -> int:
+        """
+        Get the total size of the checkpoints in the index.
+
+        Returns
+        -------
+        size : int
+            The size in bytes.
+        """
+        return sum(entry.size for entry in self.entries())
+
+    def enforce_quota(
+            self, max_bytes: int = None, keep: typing.Iterable[str] = (), dry_run: bool = False
+    ) -> typing.List[CacheEntry]:
+        """
+        Remove checkpoints, in the order given by ``policy``, until the checkpoints in the index
+        take up at most ``max_bytes``. When called during a flow run (e.g. by ``record_write``), the
+        checkpoints written or reused since the run started are kept, because tasks of the run may
+        not have read them yet.
+
+        Parameters
+        ----------
+        max_bytes : int or None
+            The quota. Defaults to the cache's ``max_bytes``.
+        keep : iterable of str
+            The paths of checkpoints that must not be removed.
+        dry_run : bool
+            If ``True``, don't remove anything, just return what would be removed.
+
+        Returns
+        -------
+        removed : list of CacheEntry
+            The (would-be) removed checkpoints.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        if max_bytes is None:
+            return []
+        keep = {os.path.abspath(path_string) for path_string in keep}
+        run_started = _get_run_start_time()
+        with self._lock():
+            entries = self._read_live_index()
+            total_size = sum(entry.size for entry in entries.values())
+            removed = []
+            for entry in sorted(entries.values(), key=self._eviction_order):
+                if total_size <= max_bytes:
+                    break
+                if entry.path in keep or (run_started is not None and entry.last_access >= run_started):
+                    continue
+                removed.append(entry)
+                total_size -= entry.size
+            if not dry_run:
+                self._remove(entries, removed)
+        return removed
+
+    def prune(
+            self, older_than: float = None, flow: str = None, dry_run: bool = False
+    ) -> typing.List[CacheEntry]:
+        """
+        Remove checkpoints that haven't been used for a while, and/or were produced by a flow.
+
+        Parameters
+        ----------
+        older_than : float or None
+            If present, only remove checkpoints that haven't been written or reused for this many seconds.
+        flow : str or None
+            If present, only remove checkpoints produced by the flow with this name.
+        dry_run : bool
+            If ``True``, don't remove anything, just return what would be removed.
+
+        Returns
+        -------
+        removed : list of CacheEntry
+            The (would-be) removed checkpoints.
+        """
+        now = time.time()
+        with self._lock():
+            entries = self._read_live_index()
+            removed = [
+                entry for entry in entries.values()
+                if (older_than is None or now - entry.last_access > older_than)
+                and (flow is None or entry.flow == flow)
+            ]
+            if not dry_run:
+                self._remove(entries, removed)
+        return removed
+
+    def _eviction_order(self, entry: CacheEntry) -> typing.Tuple:
+        if self.policy == "lfu":
+            return entry.access_count, entry.last_access
+        return (entry.last_access,)
+
+    def _remove(self, entries: typing.Dict[str, CacheEntry], removed: typing.List[CacheEntry]):
+        # Remove checkpoints and compact the index; must hold the lock
+        for entry in removed:
+            _remove_checkpoint(entry.path)
+            del entries[entry.path]
+        self._write_index(entries)
+
+    def _lock(self) -> CheckpointLock:
+        return CheckpointLock(self.index_path)
+
+    def _append(self, events: typing.List[typing.Dict[str, typing.Any]]):
+        if not events:
+            return
+        lines = "".join(json.dumps(event) + "\n" for event in events).encode()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # One write with O_APPEND, under the lock so it can't land in a log that's being compacted
+        with self._lock():
+            file_descriptor = os.open(str(self.index_path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+            try:
+                os.write(file_descriptor, lines)
+            finally:
+                os.close(file_descriptor)
+
+    def _read_index(self) -> typing.Dict[str, CacheEntry]:
+        entries = {}  # type: typing.Dict[str, CacheEntry]
+        try:
+            with open(self.index_path, "r") as index_file:
+                lines = index_file.readlines()
+        except FileNotFoundError:
+            return entries
+        for line in lines:
+            try:
+                event = json.loads(line)
+            except ValueError:  # e.g. a line cut short by a crash
+                continue
+            path_string = event["path"]
+            if event["event"] == "write":
+                # Written either for a new checkpoint, or by compaction (with the access history)
+                entries.pop(path_string, None)  # keep entries in the order they were last written
+                entries[path_string] = CacheEntry(
+                    path=path_string, size=event["size"], task=event["task"], flow=event["flow"],
+                    created=event["time"], last_access=event.get("last_access", event["time"]),
+                    access_count=event.get("access_count", 0)
+                )
+            elif event["event"] == "access" and path_string in entries:
+                entry = entries[path_string]
+                entries[path_string] = entry._replace(
+                    last_access=max(entry.last_access, event["time"]), access_count=entry.access_count + 1
+                )
+        return entries
+
+    def _read_live_index(self) -> typing.Dict[str, CacheEntry]:
+        # The index without the checkpoints that have been removed by something else
+        return {
+            path_string: entry for path_string, entry in self._read_index().items() if os.path.exists(path_string)
+        }
+
+    def _write_index(self, entries: typing.Dict[str, CacheEntry]):
+        # Rewrite the log with one line per checkpoint that's still on disk; must hold the lock
+        lines = [
+            json.dumps({
+                "event": "write", "path": entry.path, "size": entry.size, "task": entry.task,
+                "flow": entry.flow, "time": entry.created, "last_access": entry.last_access,
+                "access_count": entry.access_count
+            }) + "\n"
+            for entry in entries.values()
+        ]
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.index_path.with_name(f".{INDEX_FILE_NAME}.{os.getpid()}.tmp")
+        with open(temporary_path, "w") as index_file:
+            index_file.writelines(lines)
+        os.replace(temporary_path, self.index_path)
+
+
+def get_checkpoint_size(path_string: str) -> int:
+    """
+    Get the size of a checkpoint on disk.
+
+    Parameters
+    ----------
+    path_string : str
+        The (fully formatted) path of the checkpoint.
+
+    Returns
+    -------
+    size : int
+        The size in bytes of the checkpoint (every file in it, if it's a directory of partitions)
+        and its manifest, or 0 if it doesn't exist.
+    """
+    size = 0
+    path = pathlib.Path(path_string)
+    if path.is_dir():
+        size += sum(child.stat().st_size for child in path.rglob("*") if child.is_file())
+    elif path.exists():
+        size += path.stat().st_size
+    if manifest_path(path).exists():
+        size += manifest_path(path).stat().st_size
+    return size
+
+
+def _get_run_start_time() -> typing.Optional[float]:
+    # When the current flow run started (as a Unix timestamp), or None outside of flow runs.
+    # Set by FlowRunner, and passed on to every task, including those run in other processes.
+    scheduled_start_time = prefect.context.get("scheduled_start_time")
+    return scheduled_start_time.timestamp() if scheduled_start_time is not None else None
+
+
+def _remove_checkpoint(path_string: str):
+    # The manifest goes first, so a half-removed checkpoint is never mistaken for a complete one.
+    # The lock file is left in place, as CheckpointLock requires.
+    for path in [manifest_path(path_string), pathlib.Path(path_string)]:
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def main(argv: typing.List[str] = None):
+    """
+    Command-line interface for ``CheckpointCache``: ``python -m prefect_ds.cache DIRECTORY ...``.
+    Lists the checkpoints in the index, and/or removes them by age, flow, or to meet a quota.
+
+    Parameters
+    ----------
+    argv : list of str or None
+        The arguments. Defaults to ``sys.argv[1:]``.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m prefect_ds.cache", description="Manage the checkpoints in a prefect_ds cache index."
+    )
+    parser.add_argument("directory", help="The directory the index is kept in.")
+    parser.add_argument("--list", action="store_true", help="List the checkpoints in the index.")
+    parser.add_argument("--older-than", type=float, help="Remove checkpoints unused for this many days.")
+    parser.add_argument("--flow", help="Remove checkpoints produced by this flow.")
+    parser.add_argument("--max-bytes", type=int, help="Remove checkpoints until they take up at most this many bytes.")
+    parser.add_argument("--policy", choices=_EVICTION_POLICIES, default="lru", help="The order to remove checkpoints in.")
+    parser.add_argument("--dry-run", action="store_true", help="Only print what would be removed.")
+    args = parser.parse_args(argv)
+
+    cache = CheckpointCache(args.directory, policy=args.policy)
+    if args.list:
+        for entry in cache.entries():
+            print(
+                f"{entry.path}\t{entry.size}\t{entry.task}\t{entry.flow}\t"
+                f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry.last_access))}\t{entry.access_count}"
+            )
+    removed = []
+    if args.older_than is not None or args.flow is not None:
+        older_than = None if args.older_than is None else args.older_than * 24 * 60 * 60
+        removed.extend(cache.prune(older_than=older_than, flow=args.flow, dry_run=args.dry_run))
+    if args.max_bytes is not None:
+        removed.extend(cache.enforce_quota(max_bytes=args.max_bytes, dry_run=args.dry_run))
+    for entry in removed:
+        print(f"{'Would remove' if args.dry_run else 'Removed'} {entry.path} ({entry.size} bytes)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
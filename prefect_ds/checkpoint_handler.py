@@ -1,21 +1,67 @@
+import collections.abc
+import copy
+import functools
 import os
+import time
 import typing
 
-from prefect.engine.state import State, Success
+import prefect
+from prefect.engine.state import Mapped, Pending, State, Success
 from prefect.engine.result import Result
+from prefect.engine.result_handlers import ResultHandler
 from prefect.core.edge import Edge
+from prefect.core.task import Task
 
+from prefect_ds.profiling import current_span, record_cache_lookup, record_write
+from prefect_ds.background_writer import get_background_writer
+from prefect_ds.chunks import Chunks
+from prefect_ds.incremental import (
+    PartitionedResult, PartitionPlan, get_partition_values, get_partitioned_inputs, partition_mapping, split_partitions
+)
+from prefect_ds.result import LazyResult
 from prefect_ds.task_runner import DSTaskRunner
 
 
 def checkpoint_handler(task_runner: DSTaskRunner, old_state: State, new_state: State) -> State:
     """
-    A handler designed to implement result caching by filename. If the result handler's ``read``
-    method can be successfully run, this handler loads the result of that method as the task result
-    and sets the task state to ``Success``. Similarly, on successful
+    A handler designed to implement result caching by filename. If the result handler's ``exists``
+    method finds a checkpoint, this handler sets the task state to ``Success`` with a ``LazyResult``
+    as the task result, so the checkpoint is only read from disk (via the result handler's ``read``
+    method) if a downstream task actually uses it. Similarly, on successful
     completion of the task, if the task was actually run and not loaded from cache, this handler
     will apply the result handler's ``write`` method to the task.
 
+    For mapped tasks, if the result handler has an ``exists_many`` method, the checkpoints of all
+    of the children are looked up at once when the task is mapped, and children with a checkpoint
+    are set to ``Success`` (with a ``LazyResult``) without being run.
+
+    If the result handler has ``async_write`` set, the write is done in a background thread (see
+    ``prefect_ds.background_writer``) and the ``Success`` state is returned immediately.
+
+    If the result handler has ``chunked`` set, the result (e.g. the chunks yielded by the task)
+    is written a chunk at a time, always in the task's thread, and the task's result is then
+    replaced by a ``LazyResult`` that reads the chunks back from the checkpoint, so downstream
+    tasks get a stream of chunks that they can iterate over as many times as they need.
+
+    If the result handler has a ``partition_key``, results are checkpointed a partition at a time
+    (see ``prefect_ds.incremental``): only the partitions of the task's inputs without a checkpoint
+    are passed to the task (by ``DSTaskRunner``), each partition of its result is written
+    separately, and the task's result is replaced by a ``PartitionedResult``, which lazily reads
+    and concatenates the checkpoints of every partition.
+
+    If the result handler has ``locking`` set, a missing checkpoint is locked (with the result
+    handler's ``lock`` method) before the task runs, and unlocked once the result has been written
+    (or the task has failed). Other flow runs that need the same checkpoint wait for the lock, and
+    then load the checkpoint rather than running the task again.
+
+    If the result handler has ``record_write`` and ``record_access`` methods (e.g. to keep a
+    ``prefect_ds.cache.CheckpointCache`` index up to date), they are called after every write
+    and every reused checkpoint, respectively.
+
+    If the result handler has ``content_addressed`` set, a hash of the task's source code and
+    inputs is passed to ``read`` and ``write`` as ``checkpoint_key``, so that checkpoints
+    written for different code or inputs are not reused.
+
     Parameters
     ----------
     task_runner : instance of DSTaskRunner
@@ -33,37 +79,450 @@ def checkpoint_handler(task_runner: DSTaskRunner, old_state: State, new_state: S
     if "PREFECT__FLOWS__CHECKPOINTING" in os.environ and os.environ["PREFECT__FLOWS__CHECKPOINTING"] == "true":
         raise AttributeError("Cannot use standard prefect checkpointing with this handler")
 
-    if task_runner.result_handler is not None and old_state.is_pending() and new_state.is_running():
+    if task_runner.result_handler is not None and old_state.is_pending() and (
+            new_state.is_running() or new_state.is_mapped()
+    ):
         if not hasattr(task_runner, "upstream_states"):
             raise TypeError(
                 "upstream_states not found in task runner. Make sure to use "
                 "prefect_ds.task_runner.DSTaskRunner."
             )
+
+    if task_runner.result_handler is not None and old_state.is_pending() and new_state.is_mapped():
+        _find_mapped_checkpoints(task_runner, new_state)
+        return new_state
+
+    if task_runner.result_handler is not None and old_state.is_pending() and new_state.is_running():
+        result_handler = task_runner.task.result_handler
+        locking = getattr(result_handler, "locking", False)
+        if getattr(result_handler, "partition_key", None) is not None:
+            return _plan_partitions(task_runner, new_state)
+        if hasattr(old_state, "checkpoint_key"):
+            # Already computed by the parent mapped task
+            checkpoint_key = old_state.checkpoint_key
+        else:
+            checkpoint_key = _get_checkpoint_key(task_runner.task, task_runner.upstream_states)
+        # Kept for writing the result, so the inputs aren't hashed again
+        task_runner.checkpoint_key = checkpoint_key
+        if getattr(old_state, "checkpoint_missing", False) and not locking:
+            # Already looked for by the parent mapped task
+            return new_state
         input_mapping = _create_input_mapping(task_runner.upstream_states)
-        try:
-            data = task_runner.task.result_handler.read(input_mapping=input_mapping)
-        except FileNotFoundError:
+        checkpoint_exists = False
+        if not getattr(old_state, "checkpoint_missing", False):
+            checkpoint_exists = _checkpoint_exists(result_handler, input_mapping, checkpoint_key)
+        if not checkpoint_exists and locking:
+            checkpoint_exists = _lock_checkpoint(task_runner, input_mapping, checkpoint_key)
+        record_cache_lookup(hits=int(checkpoint_exists), misses=int(not checkpoint_exists))
+        if not checkpoint_exists:
             return new_state
-        except TypeError: # unexpected argument input_mapping
-            raise TypeError(
-                "Result handler could not accept input_mapping argument. "
-                "Please ensure that you are using a handler from prefect_ds."
-            )
-        result = Result(value=data, result_handler=task_runner.task.result_handler)
+        _record_access(result_handler, [input_mapping])
+        result = LazyResult(
+            result_handler=result_handler,
+            input_mapping=_get_template_inputs(result_handler, input_mapping),
+            checkpoint_key=checkpoint_key
+        )
         state = Success(result=result, message="Task loaded from disk.")
         return state
 
+    if (
+            task_runner.result_handler is not None
+            and old_state.is_running()
+            and new_state.is_successful()
+            and getattr(task_runner.task.result_handler, "partition_key", None) is not None
+    ):
+        _write_partitions(task_runner, new_state)
+        return new_state
+
     if task_runner.result_handler is not None and old_state.is_running() and new_state.is_successful():
         input_mapping = _create_input_mapping(task_runner.upstream_states)
-        task_runner.task.result_handler.write(new_state.result, input_mapping=input_mapping)
+        checkpoint_key = task_runner.checkpoint_key
+        if checkpoint_key is None:
+            # Not computed before the task ran (or the result handler isn't content addressed)
+            checkpoint_key = _get_checkpoint_key(task_runner.task, task_runner.upstream_states)
+        result_handler = task_runner.task.result_handler
+        chunked = getattr(result_handler, "chunked", False)
+        if isinstance(new_state.result, Chunks) and not chunked:
+            if getattr(task_runner, "checkpoint_lock", None):
+                task_runner.checkpoint_lock.release()
+                task_runner.checkpoint_lock = None
+            raise TypeError(
+                f"Task {task_runner.task.name} produced chunks, which can only be checkpointed by "
+                "a result handler created with chunked=True"
+            )
+        # The lock is handed over to the write, and released once the result has been written
+        checkpoint_lock, task_runner.checkpoint_lock = getattr(task_runner, "checkpoint_lock", None), None
+        # Looked up now, as the write may not run in the task's context (or thread)
+        producer = {
+            "task": prefect.context.get("task_full_name", task_runner.task.name),
+            "flow": prefect.context.get("flow_name")
+        }
+        span = current_span()
+        if getattr(result_handler, "async_write", False) and not chunked:
+            # The writer may run after upstream results have been purged, so it only gets
+            # the inputs it needs to fill in the path
+            get_background_writer().submit(
+                _write_checkpoint,
+                result_handler,
+                checkpoint_lock,
+                producer,
+                new_state.result,
+                input_mapping=_get_template_inputs(result_handler, input_mapping),
+                checkpoint_key=checkpoint_key,
+                span=span
+            )
+        else:
+            _write_checkpoint(
+                result_handler, checkpoint_lock, producer, new_state.result,
+                input_mapping=input_mapping, checkpoint_key=checkpoint_key, span=span
+            )
+        if chunked:
+            # Chunks yielded by the task have been used up by the write
+            new_state._result = LazyResult(
+                result_handler=result_handler,
+                input_mapping=_get_template_inputs(result_handler, input_mapping),
+                checkpoint_key=checkpoint_key
+            )
+        if checkpoint_key is not None:
+            # Record the key on the result, so downstream tasks can use it in place of the
+            # value when computing their own keys, just like when this result is loaded from disk
+            new_state._result.checkpoint_key = checkpoint_key
+
+    if old_state.is_running() and not new_state.is_running() and getattr(task_runner, "checkpoint_lock", None):
+        # The task failed (or is being retried), so there's nothing to write
+        task_runner.checkpoint_lock.release()
+        task_runner.checkpoint_lock = None
+    if old_state.is_running() and not new_state.is_running():
+        task_runner.partition_plan = None
+        task_runner.checkpoint_key = None
 
     return new_state
 
 
-def _create_input_mapping(upstream_states: typing.Dict[Edge, State]) -> typing.Dict[str, typing.Any]:
-    mapping = {}
-    for edge, state in upstream_states.items():
-        input_variable_name = edge.key
-        input_task_result = state.result
-        mapping[input_variable_name] = input_task_result
-    return mapping
\ No newline at end of file
+def _checkpoint_exists(
+        result_handler: ResultHandler,
+        input_mapping: typing.Mapping[str, typing.Any],
+        checkpoint_key: typing.Optional[str]
+) -> bool:
+    try:
+        return result_handler.exists(input_mapping=input_mapping, checkpoint_key=checkpoint_key)
+    except (AttributeError, TypeError): # no exists method, or unexpected argument input_mapping
+        raise TypeError(
+            "Result handler could not accept input_mapping argument. "
+            "Please ensure that you are using a handler from prefect_ds."
+        )
+
+
+def _lock_checkpoint(
+        task_runner: DSTaskRunner,
+        input_mapping: typing.Mapping[str, typing.Any],
+        checkpoint_key: typing.Optional[str]
+) -> bool:
+    # Lock a missing checkpoint, waiting for any other run that's computing it. Returns whether
+    # the checkpoint exists once the lock is acquired (i.e. whether another run has written it),
+    # in which case the lock is released again; otherwise it's kept by the task runner.
+    result_handler = task_runner.task.result_handler
+    checkpoint_lock = result_handler.lock(input_mapping=input_mapping)
+    if not checkpoint_lock.acquire(timeout=getattr(result_handler, "lock_timeout", None)):
+        task_runner.logger.warning(
+            f"Timed out waiting for {checkpoint_lock.path}; running the task without the lock."
+        )
+        return False
+    if _checkpoint_exists(result_handler, input_mapping, checkpoint_key):
+        checkpoint_lock.release()
+        return True
+    task_runner.checkpoint_lock = checkpoint_lock
+    return False
+
+
+def _write_checkpoint(
+        result_handler: ResultHandler,
+        checkpoint_lock,
+        producer: typing.Dict[str, typing.Optional[str]],
+        result: typing.Any,
+        input_mapping: typing.Mapping[str, typing.Any],
+        checkpoint_key: typing.Optional[str],
+        span=None
+):
+    # span is the current_span() of the task, looked up before any background write
+    try:
+        start = time.perf_counter()
+        result_handler.write(result, input_mapping=input_mapping, checkpoint_key=checkpoint_key)
+        record_write(span, start, functools.partial(_get_checkpoint_size, result_handler, input_mapping))
+        if hasattr(result_handler, "record_write"):
+            result_handler.record_write(input_mapping=input_mapping, **producer)
+    finally:
+        if checkpoint_lock is not None:
+            checkpoint_lock.release()
+
+
+def _get_checkpoint_size(
+        result_handler: ResultHandler, input_mapping: typing.Mapping[str, typing.Any]
+) -> typing.Optional[int]:
+    if not hasattr(result_handler, "checkpoint_size"):
+        return None
+    return result_handler.checkpoint_size(input_mapping=input_mapping)
+
+
+def _plan_partitions(task_runner: DSTaskRunner, new_state: State) -> State:
+    # Work out which partitions of an incremental task's result have checkpoints. If they all
+    # do, the task is loaded from disk; otherwise the plan is kept by the task runner, which
+    # only passes the rows of the missing partitions to the task.
+    result_handler = task_runner.task.result_handler
+    partition_key = result_handler.partition_key
+    input_mapping = _create_input_mapping(task_runner.upstream_states)
+    partitioned_inputs = get_partitioned_inputs(input_mapping, partition_key)
+    if not partitioned_inputs:
+        raise ValueError(
+            f"Task {task_runner.task.name} is partitioned by {partition_key}, "
+            f"but none of its inputs are DataFrames with a {partition_key} column"
+        )
+    partitions = sorted(set().union(*(
+        get_partition_values(input_mapping[input_variable_name], partition_key)
+        for input_variable_name in partitioned_inputs
+    )))
+    if not partitions:
+        # The inputs are empty, so the task is run as usual and nothing is checkpointed
+        return new_state
+    checkpoint_keys = _get_partition_checkpoint_keys(task_runner.task, input_mapping, partitioned_inputs, partitions)
+    partition_mappings = [partition_mapping(input_mapping, partition_key, partition) for partition in partitions]
+    checkpoints_exist = result_handler.exists_many(partition_mappings, checkpoint_keys)
+    record_cache_lookup(hits=sum(checkpoints_exist), misses=len(checkpoints_exist) - sum(checkpoints_exist))
+    _record_access(result_handler, [
+        mapping for mapping, checkpoint_exists in zip(partition_mappings, checkpoints_exist) if checkpoint_exists
+    ])
+    plan = PartitionPlan(
+        partition_key=partition_key,
+        inputs=partitioned_inputs,
+        partitions=partitions,
+        checkpoint_keys=checkpoint_keys,
+        missing=[partition for partition, exists in zip(partitions, checkpoints_exist) if not exists]
+    )
+    if plan.missing:
+        task_runner.partition_plan = plan
+        return new_state
+    return Success(result=_get_partitioned_result(result_handler, plan, input_mapping), message="Task loaded from disk.")
+
+
+def _write_partitions(task_runner: DSTaskRunner, new_state: State):
+    # Write each partition of an incremental task's result that was missing, and replace the
+    # result with the union of all of the partitions
+    plan, task_runner.partition_plan = task_runner.partition_plan, None
+    if plan is None:
+        # There were no partitions in the inputs, so there is nothing to checkpoint
+        return
+    import pandas as pd
+
+    result = new_state.result
+    if not isinstance(result, pd.DataFrame) or plan.partition_key not in result.columns:
+        raise TypeError(
+            f"The result of task {task_runner.task.name} must be a DataFrame with a {plan.partition_key} column"
+        )
+    result_handler = task_runner.task.result_handler
+    input_mapping = _create_input_mapping(task_runner.upstream_states)
+    producer = {
+        "task": prefect.context.get("task_full_name", task_runner.task.name),
+        "flow": prefect.context.get("flow_name")
+    }
+    result_partitions = dict(split_partitions(result, plan.partition_key))
+    checkpoint_keys = dict(zip(plan.partitions, plan.checkpoint_keys))
+    span = current_span()
+    for partition in plan.missing:
+        # Partitions the task produced no rows for are written empty, so they aren't computed again
+        _write_checkpoint(
+            result_handler, None, producer, result_partitions.get(partition, result.iloc[:0]),
+            input_mapping=partition_mapping(input_mapping, plan.partition_key, partition),
+            checkpoint_key=checkpoint_keys[partition],
+            span=span
+        )
+    new_state._result = _get_partitioned_result(result_handler, plan, input_mapping)
+
+
+def _get_partitioned_result(
+        result_handler: ResultHandler, plan: PartitionPlan, input_mapping: typing.Mapping[str, typing.Any]
+) -> PartitionedResult:
+    return PartitionedResult(
+        result_handler=result_handler,
+        partition_key=plan.partition_key,
+        partitions=plan.partitions,
+        checkpoint_keys=plan.checkpoint_keys,
+        input_mapping=_get_template_inputs(result_handler, input_mapping)
+    )
+
+
+def _record_access(result_handler: ResultHandler, input_mappings: typing.List[typing.Mapping[str, typing.Any]]):
+    if input_mappings and hasattr(result_handler, "record_access"):
+        result_handler.record_access(input_mappings=input_mappings)
+
+
+def _create_input_mapping(upstream_states: typing.Dict[Edge, State]) -> typing.Mapping[str, typing.Any]:
+    return _InputMapping(upstream_states)
+
+
+class _InputMapping(collections.abc.Mapping):
+    """
+    A read-only mapping of task input names to their values, which only accesses the results of
+    the upstream states when a value is looked up. This keeps lazily-loaded results
+    from being read unless they're actually needed (e.g. to fill in a templated path).
+    """
+    def __init__(self, upstream_states: typing.Dict[Edge, State]):
+        self._states = {edge.key: state for edge, state in upstream_states.items()}
+
+    def __getitem__(self, input_variable_name: str) -> typing.Any:
+        return self._states[input_variable_name].result
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self._states)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def get_state(self, input_variable_name: str) -> State:
+        return self._states[input_variable_name]
+
+
+def _get_template_inputs(
+        result_handler: ResultHandler, input_mapping: typing.Mapping[str, typing.Any]
+) -> typing.Dict[str, typing.Any]:
+    # Only keep the inputs needed to rebuild the path, so a lazily-loaded result doesn't hold
+    # references to (potentially large) upstream results
+    template_fields = getattr(result_handler, "template_fields", input_mapping.keys())
+    return {
+        input_variable_name: input_mapping[input_variable_name]
+        for input_variable_name in template_fields
+        if input_variable_name in input_mapping
+    }
+
+
+def _find_mapped_checkpoints(task_runner: DSTaskRunner, mapped_state: Mapped):
+    # Look for the checkpoints of all of the children of a mapped task at once, before they're
+    # run. Children with a checkpoint are set to Success up front, and the rest are marked so they
+    # don't look for their checkpoint again when they run.
+    result_handler = task_runner.task.result_handler
+    if not hasattr(result_handler, "exists_many") or getattr(result_handler, "partition_key", None) is not None:
+        # Incremental children look for the checkpoints of their partitions when they run
+        return
+    map_indices = [
+        map_index for map_index, child_state in enumerate(mapped_state.map_states) if child_state is None
+    ]
+    child_upstream_states = []
+    for map_index in map_indices:
+        upstream_states = _get_mapped_upstream_states(task_runner.upstream_states, map_index)
+        if upstream_states is None:
+            return
+        child_upstream_states.append(upstream_states)
+
+    input_mappings = [_create_input_mapping(upstream_states) for upstream_states in child_upstream_states]
+    checkpoint_keys = [
+        _get_checkpoint_key(task_runner.task, upstream_states) for upstream_states in child_upstream_states
+    ]
+    checkpoints_exist = result_handler.exists_many(input_mappings, checkpoint_keys)
+    record_cache_lookup(hits=sum(checkpoints_exist), misses=len(checkpoints_exist) - sum(checkpoints_exist))
+    _record_access(result_handler, [
+        input_mapping for input_mapping, checkpoint_exists in zip(input_mappings, checkpoints_exist)
+        if checkpoint_exists
+    ])
+    for map_index, input_mapping, checkpoint_key, checkpoint_exists in zip(
+            map_indices, input_mappings, checkpoint_keys, checkpoints_exist
+    ):
+        if checkpoint_exists:
+            result = LazyResult(
+                result_handler=result_handler,
+                input_mapping=_get_template_inputs(result_handler, input_mapping),
+                checkpoint_key=checkpoint_key
+            )
+            # The task runner runs the children from this same list, and leaves finished states as-is
+            mapped_state.map_states[map_index] = Success(result=result, message="Task loaded from disk.")
+        else:
+            child_state = Pending(message="No checkpoint found.")
+            child_state.checkpoint_missing = True
+            child_state.checkpoint_key = checkpoint_key
+            mapped_state.map_states[map_index] = child_state
+
+
+def _get_mapped_upstream_states(
+        upstream_states: typing.Dict[Edge, State], map_index: int
+) -> typing.Optional[typing.Dict[Edge, State]]:
+    # The upstream states of a single child of a mapped task, built the same way as in
+    # prefect.engine.task_runner.TaskRunner.run_mapped_task. Returns None if any of them
+    # aren't available yet (e.g. they're futures from a distributed executor).
+    child_upstream_states = {}
+    for edge, upstream_state in upstream_states.items():
+        if not isinstance(upstream_state, State):
+            return None
+        if not edge.mapped:
+            child_upstream_states[edge] = upstream_state
+        elif upstream_state.is_mapped():
+            child_upstream_states[edge] = upstream_state.map_states[map_index]
+            if not isinstance(child_upstream_states[edge], State):
+                return None
+        else:
+            child_upstream_states[edge] = copy.copy(upstream_state)
+            child_upstream_states[edge].result = Result(
+                upstream_state.result[map_index], result_handler=upstream_state._result.result_handler
+            )
+    return child_upstream_states
+
+
+def _get_checkpoint_key(task: Task, upstream_states: typing.Dict[Edge, State]) -> typing.Optional[str]:
+    if not getattr(task.result_handler, "content_addressed", False):
+        return None
+    # Imported here so that flows that don't use content addressing don't pay for importing pandas
+    from prefect_ds.hashing import compute_checkpoint_key
+
+    return compute_checkpoint_key(task, _get_input_fingerprints(_create_input_mapping(upstream_states)))
+
+
+def _get_partition_checkpoint_keys(
+        task: Task,
+        input_mapping: _InputMapping,
+        partitioned_inputs: typing.List[str],
+        partitions: typing.List[typing.Any]
+) -> typing.List[typing.Optional[str]]:
+    # The key of each partition covers the task's source, its other inputs, and the partition's
+    # rows of each partitioned input, so a partition is recomputed only when its own rows change
+    if not getattr(task.result_handler, "content_addressed", False):
+        return [None] * len(partitions)
+    from prefect_ds.hashing import compute_checkpoint_key, hash_object
+
+    partition_key = task.result_handler.partition_key
+    input_fingerprints = {
+        # Hashed once here, rather than again for every partition
+        input_variable_name: hash_object(fingerprint)
+        for input_variable_name, fingerprint in _get_input_fingerprints(input_mapping).items()
+        if input_variable_name not in partitioned_inputs
+    }
+    partition_hashes = {
+        input_variable_name: {
+            partition: hash_object(rows)
+            for partition, rows in split_partitions(input_mapping[input_variable_name], partition_key)
+        }
+        for input_variable_name in partitioned_inputs
+    }
+    return [
+        compute_checkpoint_key(task, dict(input_fingerprints, **{
+            input_variable_name: {"partition": partition, "rows": partition_hashes[input_variable_name].get(partition)}
+            for input_variable_name in partitioned_inputs
+        }))
+        for partition in partitions
+    ]
+
+
+def _get_input_fingerprints(input_mapping: _InputMapping) -> typing.Dict[str, typing.Any]:
+    input_fingerprints = {}
+    for input_variable_name in input_mapping:
+        upstream_checkpoint_key = _get_upstream_checkpoint_key(input_mapping.get_state(input_variable_name))
+        # Upstream results that were checkpointed with a key are represented by that key, so
+        # results that are loaded lazily don't have to be read (or hashed) to compute this key
+        input_fingerprints[input_variable_name] = (
+            input_mapping[input_variable_name] if upstream_checkpoint_key is None
+            else {"checkpoint_key": upstream_checkpoint_key}
+        )
+    return input_fingerprints
+
+
+def _get_upstream_checkpoint_key(state: State) -> typing.Optional[typing.Union[str, typing.List[str]]]:
+    if state.is_mapped():
+        mapped_keys = [_get_upstream_checkpoint_key(mapped_state) for mapped_state in state.map_states]
+        return None if None in mapped_keys else mapped_keys
+    return getattr(state._result, "checkpoint_key", None)
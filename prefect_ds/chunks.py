@@ -0,0 +1,230 @@
+import os
+import typing
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+# File types that can be written a chunk at a time, and read back a chunk at a time
+_CHUNKED_FILE_TYPES = {"parquet", "feather", "csv"}
+
+# The number of rows read at a time from a csv file, which doesn't record where each chunk ended
+DEFAULT_CSV_CHUNK_ROWS = 100_000
+
+
+class Chunks:
+    """
+    A task result made up of a stream of DataFrame chunks, so that it never has to be held in
+    memory all at once. ``DSTaskRunner`` wraps the generator returned by a task that yields
+    chunks in ``Chunks``, and downstream tasks simply iterate over it; a downstream task that is
+    itself a generator (``for chunk in chunks: yield ...``) only ever holds one chunk at a time.
+
+    Parameters
+    ----------
+    source : iterable or callable
+        Either an iterable of chunks (e.g. the generator returned by a task), which can only be
+        iterated over once, or a function returning a new iterator over the chunks each time it
+        is called (e.g. one reading them from a file), which can be iterated over any number of
+        times.
+    """
+    def __init__(self, source: typing.Union[typing.Iterable["pd.DataFrame"], typing.Callable[[], typing.Iterator]]):
+        if callable(source):
+            self._factory = source  # type: typing.Optional[typing.Callable[[], typing.Iterator]]
+            self._iterator = None  # type: typing.Optional[typing.Iterator]
+        else:
+            self._factory = None
+            self._iterator = iter(source)
+        self._consumed = False
+
+    @property
+    def reiterable(self) -> bool:
+        """
+        Whether the chunks can be iterated over more than once.
+        """
+        return self._factory is not None
+
+    def __iter__(self) -> typing.Iterator["pd.DataFrame"]:
+        if self._factory is not None:
+            return iter(self._factory())
+        if self._consumed:
+            raise RuntimeError(
+                "These chunks have already been iterated over. To use the chunks a task yields in more than "
+                "one place, checkpoint them with a result handler created with chunked=True."
+            )
+        self._consumed = True
+        return self._iterator
+
+    def map(self, function: typing.Callable[["pd.DataFrame"], "pd.DataFrame"]) -> "Chunks":
+        """
+        Lazily apply a function to every chunk.
+
+        Parameters
+        ----------
+        function : callable
+            The function, taking a chunk and returning a new one.
+
+        Returns
+        -------
+        chunks : Chunks
+            The new chunks, which can be iterated over more than once if these chunks can.
+            Otherwise these chunks are consumed by iterating over the new ones.
+        """
+        if self._factory is not None:
+            factory = self._factory
+            return Chunks(lambda: (function(chunk) for chunk in factory()))
+        return Chunks(function(chunk) for chunk in self)
+
+    def concat(self, **concat_kwargs) -> "pd.DataFrame":
+        """
+        Read all of the chunks into a single DataFrame.
+
+        Parameters
+        ----------
+        **concat_kwargs
+            Passed to ``pandas.concat``.
+
+        Returns
+        -------
+        data : pandas.DataFrame
+            The concatenated chunks.
+        """
+        import pandas as pd
+
+        return pd.concat(list(self), **concat_kwargs)
+
+    def __repr__(self) -> str:
+        return f"<Chunks: {'reiterable' if self.reiterable else 'single pass'}>"
+
+
+def supports_chunks(file_type: str) -> bool:
+    """
+    Whether a file type can be written and read a chunk at a time.
+
+    Parameters
+    ----------
+    file_type : str
+        The name of the file type.
+
+    Returns
+    -------
+    supported : bool
+        ``True`` for parquet, feather and csv files.
+    """
+    return file_type.lower() in _CHUNKED_FILE_TYPES
+
+
+def write_chunks(chunks: typing.Iterable["pd.DataFrame"], path_string: str, file_type: str, **write_kwargs):
+    """
+    Write chunks to a single file as they arrive, so only one chunk is in memory at a time:
+    as a row group each for parquet files, a record batch each for feather files, and appended
+    rows for csv files. For parquet and feather files the index of each chunk is kept (stored as
+    a column), and every chunk must have the same columns and column types.
+
+    Parameters
+    ----------
+    chunks : iterable of pandas.DataFrame
+        The chunks.
+    path_string : str
+        The path of the file.
+    file_type : str
+        The type of file, one of ``"parquet"``, ``"feather"`` or ``"csv"``.
+    **write_kwargs
+        Passed to ``pyarrow.parquet.ParquetWriter``, ``pyarrow.ipc.new_file`` or
+        ``DataFrame.to_csv``, respectively.
+    """
+    file_type = file_type.lower()
+    if file_type == "csv":
+        with open(path_string, "w", newline="") as csv_file:
+            for chunk_number, chunk in enumerate(chunks):
+                chunk.to_csv(csv_file, header=chunk_number == 0, **write_kwargs)
+        return
+    if file_type not in _CHUNKED_FILE_TYPES:
+        raise ValueError(f"Chunks can't be written to {file_type} files")
+
+    import pyarrow as pa
+    from pyarrow import parquet
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=True)
+            if writer is None:
+                if file_type == "parquet":
+                    writer = parquet.ParquetWriter(path_string, table.schema, **write_kwargs)
+                else:
+                    writer = pa.ipc.new_file(path_string, table.schema, **write_kwargs)
+                schema = table.schema
+            else:
+                # The pandas metadata describes a single chunk (e.g. the number of categories),
+                # so every chunk is written with that of the first
+                table = table.replace_schema_metadata(schema.metadata)
+            writer.write_table(table)
+        if writer is None:  # no chunks at all
+            if file_type == "parquet":
+                writer = parquet.ParquetWriter(path_string, pa.schema([]), **write_kwargs)
+            else:
+                writer = pa.ipc.new_file(path_string, pa.schema([]), **write_kwargs)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def read_chunks(
+        path_string: str, file_type: str, columns: typing.List[str] = None, **read_kwargs
+) -> typing.Iterator["pd.DataFrame"]:
+    """
+    Read chunks from a file, one at a time. Parquet and feather files are read back in the
+    chunks they were written in; csv files in chunks of ``chunksize`` rows.
+
+    Parameters
+    ----------
+    path_string : str
+        The path of the file.
+    file_type : str
+        The type of file, one of ``"parquet"``, ``"feather"`` or ``"csv"``.
+    columns : list of str or None
+        If present, only these columns are read (for csv files, they are selected after reading).
+    **read_kwargs
+        Passed to ``pyarrow.parquet.ParquetFile.read_row_group`` or ``pandas.read_csv``
+        (which reads ``DEFAULT_CSV_CHUNK_ROWS`` rows at a time unless given a ``chunksize``).
+        Not supported for feather files.
+
+    Yields
+    ------
+    chunk : pandas.DataFrame
+        The chunks, in the order they were written.
+    """
+    file_type = file_type.lower()
+    if file_type == "parquet":
+        from pyarrow import parquet
+
+        parquet_file = parquet.ParquetFile(path_string)
+        for row_group in range(parquet_file.num_row_groups):
+            yield parquet_file.read_row_group(
+                row_group, columns=columns, use_pandas_metadata=True, **read_kwargs
+            ).to_pandas()
+    elif file_type == "feather":
+        import pyarrow as pa
+
+        if read_kwargs:
+            raise TypeError(f"Unexpected arguments for reading feather chunks: {list(read_kwargs)}")
+        with pa.memory_map(path_string) as source:
+            reader = pa.ipc.open_file(source)
+            index_columns = [
+                index_column for index_column in (reader.schema.pandas_metadata or {}).get("index_columns", [])
+                if isinstance(index_column, str)
+            ]
+            for batch_number in range(reader.num_record_batches):
+                table = pa.Table.from_batches([reader.get_batch(batch_number)])
+                if columns is not None:
+                    table = table.select(list(columns) + index_columns)
+                yield table.to_pandas()
+    elif file_type == "csv":
+        import pandas as pd
+
+        if os.path.getsize(path_string) == 0:  # no chunks were written
+            return
+        read_kwargs.setdefault("chunksize", DEFAULT_CSV_CHUNK_ROWS)
+        for chunk in pd.read_csv(path_string, **read_kwargs):
+            yield chunk if columns is None else chunk[columns]
+    else:
+        raise ValueError(f"Chunks can't be read from {file_type} files")
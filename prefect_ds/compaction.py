@@ -0,0 +1,125 @@
+import typing
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+# String columns with at most this many distinct values per row are stored as categoricals
+_MAX_CATEGORY_FRACTION = 0.5
+
+
+class DtypeChanges(typing.NamedTuple):
+    """
+    The columns whose dtypes were changed by ``compact_dtypes``.
+
+    Attributes
+    ----------
+    original : list of (column, dtype) pairs
+        The name of each changed column's dtype before it was compacted.
+    compacted : list of (column, dtype) pairs
+        The name of each changed column's compacted dtype.
+    """
+    original: typing.List[typing.Tuple[typing.Any, str]]
+    compacted: typing.List[typing.Tuple[typing.Any, str]]
+
+
+def compact_dtypes(data: "pd.DataFrame", categories: bool = True) -> typing.Tuple["pd.DataFrame", DtypeChanges]:
+    """
+    Store the columns of a DataFrame in the smallest dtypes that can hold their values exactly:
+
+    - integer columns are downcast to the smallest integer dtype (of the same signedness) that
+      holds their minimum and maximum,
+    - float columns are downcast to float32 if every value survives the round trip unchanged,
+    - string columns with few distinct values (at most one for every two rows) become categoricals,
+      which file formats like parquet and feather store dictionary-encoded.
+
+    Other columns, columns whose names are neither strings nor integers (which couldn't be stored
+    in a manifest), and frames with duplicate column names are left as they are.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        The data, which isn't modified.
+    categories : bool
+        Whether to turn string columns into categoricals, e.g. ``False`` for file types that
+        can't store them.
+
+    Returns
+    -------
+    compacted : pandas.DataFrame
+        The compacted data (``data`` itself if no column was changed).
+    changes : DtypeChanges
+        The columns that were changed, with their original and compacted dtypes.
+    """
+    changes = DtypeChanges(original=[], compacted=[])
+    if not data.columns.is_unique:
+        return data, changes
+    compacted_columns = {}
+    for column in data.columns:
+        if not isinstance(column, (str, int)):
+            continue
+        compacted = _compact_column(data[column], categories)
+        if compacted is not None:
+            compacted_columns[column] = compacted
+            changes.original.append((column, str(data[column].dtype)))
+            changes.compacted.append((column, str(compacted.dtype)))
+    if not compacted_columns:
+        return data, changes
+    data = data.copy()
+    for column, compacted in compacted_columns.items():
+        data[column] = compacted
+    return data, changes
+
+
+def cast_columns(data: "pd.DataFrame", dtypes: typing.Iterable[typing.Sequence]) -> "pd.DataFrame":
+    """
+    Cast the columns of a DataFrame to the given dtypes, e.g. to restore the dtypes recorded by
+    ``compact_dtypes`` after reading a result, or to reapply compacted dtypes to a result read from
+    a file type that doesn't store dtypes (like csv). Columns that aren't in ``data`` (e.g. because
+    only some columns were read) and columns that already have the right dtype are skipped.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        The data, which isn't modified.
+    dtypes : iterable of (column, dtype) pairs
+        The dtypes, e.g. ``DtypeChanges.original`` (or the lists it's stored as in a manifest).
+
+    Returns
+    -------
+    data : pandas.DataFrame
+        The data with its columns cast.
+    """
+    to_cast = {
+        column: dtype for column, dtype in dtypes
+        if column in data.columns and str(data[column].dtype) != dtype
+    }
+    if not to_cast:
+        return data
+    return data.astype(to_cast)
+
+
+def _compact_column(column: "pd.Series", categories: bool) -> typing.Optional["pd.Series"]:
+    # The column in a smaller dtype, or None if it can't be compacted without losing information
+    import numpy as np
+    import pandas as pd
+
+    kind = column.dtype.kind
+    if kind in "iu" and column.dtype.itemsize > 1:
+        compacted = pd.to_numeric(column, downcast="unsigned" if kind == "u" else "integer")
+    elif kind == "f" and column.dtype.itemsize > 4:
+        with np.errstate(over="ignore"):
+            compacted = column.astype("float32")
+        if not ((compacted.astype(column.dtype) == column) | column.isna()).all():
+            return None
+    elif (
+            categories
+            and kind == "O"
+            and len(column) > 0
+            and pd.api.types.infer_dtype(column, skipna=True) == "string"
+            and column.nunique(dropna=False) <= _MAX_CATEGORY_FRACTION * len(column)
+    ):
+        compacted = column.astype("category")
+    else:
+        return None
+    return compacted if compacted.dtype != column.dtype else None
+
@@ -0,0 +1,246 @@
+import io
+import time
+import typing
+
+from prefect_ds.formats import get_format
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+UNCOMPRESSED = "uncompressed"
+
+# Codecs applied by the file format itself (so readers detect them on their own), by file type
+_NATIVE_CODECS = {
+    "parquet": ("snappy", "gzip", "brotli", "lz4", "zstd"),
+    "feather": ("lz4", "zstd"),
+}
+
+# File types that have no compression of their own (or only slow, single-threaded codecs),
+# which are instead written through a compressed (framed) stream
+_STREAM_FILE_TYPES = {"csv", "json"}
+_STREAM_CODECS = ("gzip", "bz2", "brotli", "lz4", "zstd")
+
+# Codecs whose level can be set natively, by file type. Arrow's compressed streams
+# always use the codec's default level.
+_LEVEL_CODECS = {
+    "parquet": {"gzip", "brotli", "zstd"},
+    "feather": {"zstd"},
+}
+
+# The levels tried by ``choose_compression`` for codecs with a level (``None`` is the codec's default)
+_CANDIDATE_LEVELS = {
+    "gzip": (1, None),
+    "brotli": (1, None),
+    "zstd": (1, None, 9),
+}
+
+# The first this many rows of a result are used to choose its compression
+_SAMPLE_ROWS = 10_000
+
+# The rate (in bytes per second) at which compressed data is assumed to be written
+# to disk when choosing a compression, i.e. how much a byte saved is worth
+DEFAULT_DISK_BANDWIDTH = 200e6
+
+
+class Compression(typing.NamedTuple):
+    """
+    How a result is compressed.
+
+    Attributes
+    ----------
+    codec : str
+        The name of the codec (as used by ``pyarrow``), or ``"uncompressed"``.
+    level : int or None
+        The compression level, or ``None`` for the codec's default.
+    """
+    codec: str
+    level: typing.Optional[int] = None
+
+
+def get_codecs(file_type: str) -> typing.List[str]:
+    """
+    Get the codecs that results of a file type can be compressed with.
+
+    Parameters
+    ----------
+    file_type : str
+        The name of the file type (case-insensitive).
+
+    Returns
+    -------
+    codecs : list of str
+        The codecs, not including ``"uncompressed"``; empty if the file type can't be compressed.
+    """
+    file_type = file_type.lower()
+    if file_type in _NATIVE_CODECS:
+        return list(_NATIVE_CODECS[file_type])
+    if file_type in _STREAM_FILE_TYPES:
+        return list(_STREAM_CODECS)
+    return []
+
+
+def check_compression(file_type: str, compression: Compression):
+    """
+    Check that results of a file type can be compressed in the given way.
+
+    Parameters
+    ----------
+    file_type : str
+        The name of the file type (case-insensitive).
+    compression : Compression
+        The compression.
+
+    Raises
+    ------
+    ValueError
+        If the codec isn't available for the file type, or its level can't be set.
+    """
+    codecs = get_codecs(file_type)
+    if not codecs:
+        raise ValueError(f"Compression is not supported for {file_type} files")
+    if compression.codec != UNCOMPRESSED and compression.codec not in codecs:
+        raise ValueError(f"{compression.codec} not available for {file_type} files. Known codecs are {codecs}")
+    if compression.level is not None and compression.codec not in _LEVEL_CODECS.get(file_type.lower(), set()):
+        raise ValueError(f"The level of {compression.codec} can't be set for {file_type} files")
+
+
+def write_compressed(
+        data: "pd.DataFrame",
+        destination: typing.Union[str, "pa.NativeFile"],
+        file_type: str,
+        compression: Compression,
+        **write_kwargs
+):
+    """
+    Write a result with compression.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        The result.
+    destination : str or pyarrow.NativeFile
+        The path to write to, or an open stream.
+    file_type : str
+        The name of the file type (case-insensitive).
+    compression : Compression
+        The compression.
+    **write_kwargs
+        Passed to the writer of the file type.
+    """
+    file_type = file_type.lower()
+    codec = None if compression.codec == UNCOMPRESSED else compression.codec
+    if file_type == "feather":
+        import pyarrow as pa
+        from pyarrow import feather
+
+        # Through pyarrow, as DataFrame.to_feather can't be told to compress
+        feather.write_feather(
+            pa.Table.from_pandas(data, preserve_index=None), destination,
+            compression=codec or UNCOMPRESSED, compression_level=compression.level, **write_kwargs
+        )
+    elif file_type in _NATIVE_CODECS:
+        if compression.level is not None:
+            write_kwargs["compression_level"] = compression.level
+        get_format(file_type).write(data, destination, compression=codec, **write_kwargs)
+    else:
+        import pyarrow as pa
+
+        if isinstance(destination, str):
+            stream = pa.output_stream(destination, compression=codec)
+        else:
+            stream = pa.CompressedOutputStream(destination, codec) if codec is not None else destination
+        with stream:
+            text_stream = io.TextIOWrapper(stream, encoding="utf-8", write_through=True)
+            get_format(file_type).write(data, text_stream, **write_kwargs)
+            text_stream.flush()
+            text_stream.detach()
+
+
+def read_compressed(
+        path_string: str,
+        file_type: str,
+        compression: Compression,
+        **read_kwargs
+) -> "pd.DataFrame":
+    """
+    Read a result written by ``write_compressed``.
+
+    Parameters
+    ----------
+    path_string : str
+        The path to read from.
+    file_type : str
+        The name of the file type (case-insensitive).
+    compression : Compression
+        The compression the result was written with.
+    **read_kwargs
+        Passed to the reader of the file type.
+
+    Returns
+    -------
+    data : pandas.DataFrame
+        The result.
+    """
+    file_type = file_type.lower()
+    if file_type not in _STREAM_FILE_TYPES or compression.codec == UNCOMPRESSED:
+        # Native codecs are detected by the reader
+        return get_format(file_type).read(path_string, **read_kwargs)
+    import pyarrow as pa
+
+    with pa.input_stream(path_string, compression=compression.codec) as stream:
+        return get_format(file_type).read(stream, **read_kwargs)
+
+
+def choose_compression(
+        data: "pd.DataFrame",
+        file_type: str,
+        disk_bandwidth: float = DEFAULT_DISK_BANDWIDTH,
+        **write_kwargs
+) -> Compression:
+    """
+    Choose how to compress a result by writing its first rows to memory with every available
+    codec (and a few levels of each codec with a level), and picking the one with the lowest
+    estimated cost of writing the whole result: the time spent compressing plus the time spent
+    writing the compressed bytes to disk.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        The result.
+    file_type : str
+        The name of the file type (case-insensitive).
+    disk_bandwidth : float
+        The rate, in bytes per second, at which compressed data is written. Lower values favor
+        smaller files; higher values favor faster codecs.
+    **write_kwargs
+        Passed to the writer of the file type.
+
+    Returns
+    -------
+    compression : Compression
+        The chosen compression.
+    """
+    import pyarrow as pa
+
+    sample = data.iloc[:_SAMPLE_ROWS]
+    if file_type.lower() == "feather":
+        # Like DataFrame.to_feather, which only writes frames with a default index
+        sample = sample.reset_index(drop=True)
+    candidates = [Compression(UNCOMPRESSED)]
+    for codec in get_codecs(file_type):
+        if codec in _LEVEL_CODECS.get(file_type.lower(), set()):
+            candidates.extend(Compression(codec, level) for level in _CANDIDATE_LEVELS[codec])
+        else:
+            candidates.append(Compression(codec))
+
+    best_compression, best_cost = None, float("inf")
+    for compression in candidates:
+        sink = pa.BufferOutputStream()
+        start = time.perf_counter()
+        write_compressed(sample, sink, file_type, compression, **write_kwargs)
+        elapsed = time.perf_counter() - start
+        cost = elapsed + len(sink.getvalue()) / disk_bandwidth
+        if cost < best_cost:
+            best_compression, best_cost = compression, cost
+    return best_compression
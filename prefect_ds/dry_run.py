@@ -0,0 +1,448 @@
+import collections
+import copy
+import os
+import typing
+
+import prefect
+from prefect.core.edge import Edge
+from prefect.core.flow import Flow
+from prefect.core.task import Task
+from prefect.engine.executors import LocalExecutor
+from prefect.engine.result import Result
+from prefect.engine.result_handlers import ConstantResultHandler
+from prefect.engine.state import Mapped, Pending, State, Success
+from prefect.tasks.core.constants import Constant
+
+from prefect_ds.checkpoint_handler import (
+    _checkpoint_exists, _create_input_mapping, _get_checkpoint_key, _get_mapped_upstream_states,
+    _get_template_inputs, checkpoint_handler
+)
+from prefect_ds.result import LazyResult
+
+# The statuses of a CheckpointCheck
+HIT = "hit"
+MISS = "miss"
+UNKNOWN = "unknown"
+INVALID = "invalid"
+NO_CHECKPOINT = "no checkpoint"
+
+
+class CheckpointCheck(typing.NamedTuple):
+    """
+    Whether a task (or a child of a mapped task) would be loaded from its checkpoint or computed.
+
+    Attributes
+    ----------
+    task : instance of prefect.core.task.Task
+        The task.
+    map_index : int or None
+        The index of the child, for mapped tasks.
+    status : str
+        ``"hit"`` if the checkpoint would be reused, ``"miss"`` if there is no (valid) checkpoint,
+        ``"unknown"`` if whether there is one can't be known before the task's upstream tasks are
+        computed, ``"invalid"`` if the checkpoint's path can't be filled in from the task's inputs,
+        and ``"no checkpoint"`` for tasks that aren't checkpointed, which are always computed.
+    path : str or None
+        The path of the checkpoint, if it could be filled in.
+    size : int or None
+        The size in bytes of the checkpoint, for hits.
+    reason : str or None
+        More detail about the status, e.g. why a task's path couldn't be filled in.
+    """
+    task: Task
+    map_index: typing.Optional[int]
+    status: str
+    path: typing.Optional[str] = None
+    size: typing.Optional[int] = None
+    reason: typing.Optional[str] = None
+
+
+class TaskPlan(typing.NamedTuple):
+    """
+    What a flow run would do for one task, summed over the children of mapped tasks.
+
+    Attributes
+    ----------
+    task : instance of prefect.core.task.Task
+        The task.
+    status_counts : dict
+        The number of ``CheckpointCheck`` of the task with each status.
+    read_bytes : int
+        The size in bytes of the task's checkpoints that would be read by the tasks that are
+        computed.
+    expected_runtime : float or None
+        How long computing the task would take, in seconds: the time it took to compute in full
+        in previous runs, in proportion to how many of its checkpoints are missing. ``None`` if
+        it would be computed but its runtime isn't known.
+    reasons : list of str
+        The distinct reasons given by the task's checks.
+    """
+    task: Task
+    status_counts: typing.Dict[str, int]
+    read_bytes: int
+    expected_runtime: typing.Optional[float]
+    reasons: typing.List[str]
+
+    @property
+    def status(self) -> str:
+        """
+        The status of all of the task's checks, if they're the same, or else the count of each.
+        """
+        if len(self.status_counts) == 1:
+            return next(iter(self.status_counts))
+        return ", ".join(f"{count} {status}" for status, count in self.status_counts.items())
+
+
+class DryRunReport:
+    """
+    What running a flow would compute and read, without running it, as attached to the final
+    state of a flow run by ``DSFlowRunner`` (as ``state.dry_run_report``) when run with
+    ``dry_run=True``.
+
+    Parameters
+    ----------
+    checks : list of CheckpointCheck
+        Every checkpoint looked for (and every task that isn't checkpointed), in the order the
+        tasks would run.
+    read_tasks : set of Task
+        The tasks whose checkpoints would be read, because a task that is computed uses them.
+    runtimes : dict or None
+        How long each task took to compute in previous runs, in seconds, by task name (see
+        ``prefect_ds.profiling.read_task_runtimes``).
+    """
+    def __init__(
+            self,
+            checks: typing.List[CheckpointCheck],
+            read_tasks: typing.Set[Task],
+            runtimes: typing.Mapping[str, float] = None
+    ):
+        self.checks = checks
+        self.read_tasks = read_tasks
+        self.runtimes = runtimes or {}
+
+    @property
+    def hits(self) -> typing.List[CheckpointCheck]:
+        """
+        The checkpoints that would be reused.
+        """
+        return [check for check in self.checks if check.status == HIT]
+
+    @property
+    def misses(self) -> typing.List[CheckpointCheck]:
+        """
+        The checkpoints that are missing (or stale), which would be computed.
+        """
+        return [check for check in self.checks if check.status == MISS]
+
+    @property
+    def invalid(self) -> typing.List[CheckpointCheck]:
+        """
+        The checkpoints whose paths couldn't be filled in, e.g. because of a typo in a template.
+        """
+        return [check for check in self.checks if check.status == INVALID]
+
+    def task_plans(self) -> typing.List[TaskPlan]:
+        """
+        Sum up the checks of each task.
+
+        Returns
+        -------
+        plans : list of TaskPlan
+            The plan of each task, in the order they would run.
+        """
+        checks_by_task = collections.OrderedDict()  # type: typing.Dict[Task, typing.List[CheckpointCheck]]
+        for check in self.checks:
+            checks_by_task.setdefault(check.task, []).append(check)
+        plans = []
+        for task, checks in checks_by_task.items():
+            status_counts = collections.Counter(check.status for check in checks)
+            read_bytes = sum(check.size or 0 for check in checks) if task in self.read_tasks else 0
+            computed = len(checks) - status_counts[HIT]
+            expected_runtime = None
+            if not computed:
+                expected_runtime = 0.0
+            elif task.name in self.runtimes:
+                expected_runtime = self.runtimes[task.name] * computed / len(checks)
+            reasons = list(collections.OrderedDict.fromkeys(check.reason for check in checks if check.reason))
+            plans.append(TaskPlan(task, dict(status_counts), read_bytes, expected_runtime, reasons))
+        return plans
+
+    @property
+    def read_bytes(self) -> int:
+        """
+        The total size in bytes of the checkpoints that would be read.
+        """
+        return sum(plan.read_bytes for plan in self.task_plans())
+
+    @property
+    def expected_runtime(self) -> float:
+        """
+        The total time in seconds the tasks that would be computed took in previous runs. Tasks
+        whose runtimes aren't known count as 0.
+        """
+        return sum(plan.expected_runtime or 0.0 for plan in self.task_plans())
+
+    def format(self) -> str:
+        """
+        Describe the plan as text: a tab-separated line for each task (with its status, the bytes
+        of its checkpoints that would be read, its expected runtime, and any reasons), followed by
+        the totals.
+
+        Returns
+        -------
+        text : str
+            The description.
+        """
+        lines = ["task\tstatus\tread bytes\texpected runtime (s)\tnotes"]
+        for plan in self.task_plans():
+            expected_runtime = "?" if plan.expected_runtime is None else f"{plan.expected_runtime:.3f}"
+            lines.append(
+                f"{plan.task.name}\t{plan.status}\t{plan.read_bytes}\t{expected_runtime}\t{'; '.join(plan.reasons)}"
+            )
+        status_counts = collections.Counter(check.status for check in self.checks)
+        lines.append(
+            f"{status_counts[HIT]} checkpoints reused ({self.read_bytes} bytes read), "
+            f"{status_counts[MISS]} missing, {status_counts[UNKNOWN]} unknown and {status_counts[INVALID]} invalid; "
+            f"{status_counts[NO_CHECKPOINT]} tasks without checkpoints. "
+            f"Expected runtime: {self.expected_runtime:.3f} s"
+        )
+        return "\n".join(lines)
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+        Convert the report into JSON-serializable form, with tasks represented by their names.
+
+        Returns
+        -------
+        report : dict
+            The report.
+        """
+        return {
+            "checks": [dict(check._asdict(), task=check.task.name) for check in self.checks],
+            "tasks": [dict(plan._asdict(), task=plan.task.name) for plan in self.task_plans()],
+            "read_bytes": self.read_bytes,
+            "expected_runtime": self.expected_runtime,
+        }
+
+
+class _Unresolved(Pending):
+    """
+    The state of a task (or mapped child) that would be computed, so its result isn't known.
+    """
+
+
+class _ChildResults(Result):
+    """
+    The results of the children of a mapped task as a list, as passed to downstream tasks that
+    aren't mapped over it, but only read if they're used (e.g. to fill in a path).
+    """
+    def __init__(self, map_states: typing.List[State]):
+        self.map_states = map_states
+        super().__init__(value=None)
+
+    @property
+    def value(self) -> typing.List[typing.Any]:
+        return [state.result for state in self.map_states]
+
+    @value.setter
+    def value(self, value: typing.Any) -> None:
+        # Always computed from map_states
+        pass
+
+
+def dry_run(
+        flow: Flow,
+        task_runner_cls: type,
+        state_handlers: typing.Iterable[typing.Callable] = (),
+        runtimes: typing.Mapping[str, float] = None
+) -> DryRunReport:
+    """
+    Work out which tasks of a flow would be loaded from their checkpoints and which would be
+    computed, without computing any of them.
+
+    Every checkpoint's path is filled in from the task's inputs, with the same input mapping
+    ``checkpoint_handler`` uses (including for each child of mapped tasks), and looked for with
+    the result handler's ``exists`` method, so stale content-addressed checkpoints count as
+    missing. Checkpoints aren't read, except those of tasks whose results are needed to fill in
+    a path or to map over, as they would be in a real run. Tasks without checkpoints are only run
+    if their results are needed to fill in a path or to map over (e.g. a task listing the dates to
+    process), and tasks whose paths depend on tasks that would be computed are reported as
+    unknown. Incremental tasks (with a ``partition_key``) are also reported as unknown, as their
+    partitions depend on the rows of their inputs.
+
+    Parameters
+    ----------
+    flow : instance of prefect.core.flow.Flow
+        The flow.
+    task_runner_cls : type
+        The class of task runner used to run the tasks needed to fill in paths.
+    state_handlers : iterable of callables
+        The state handlers the flow's task runners are created with. Without
+        ``prefect_ds.checkpoint_handler.checkpoint_handler``, no checkpoints are looked for.
+    runtimes : dict or None
+        How long each task took to compute in previous runs, in seconds, by task name.
+
+    Returns
+    -------
+    report : DryRunReport
+        The checkpoints that would be reused and the tasks that would be computed.
+    """
+    sorted_tasks = flow.sorted_tasks()
+    edges_to = collections.defaultdict(list)
+    downstream_tasks = collections.defaultdict(set)
+    for edge in flow.edges:
+        edges_to[edge.downstream_task].append(edge)
+        downstream_tasks[edge.upstream_task].add(edge.downstream_task)
+    uses_checkpoint_handler = checkpoint_handler in state_handlers
+    checkpointed = {
+        task for task in sorted_tasks if uses_checkpoint_handler and hasattr(task.result_handler, "exists")
+    }
+    needed_edges = {task: _get_needed_edges(task, edges_to[task]) for task in checkpointed}
+    # The tasks without checkpoints whose results are needed to fill in paths, and so are run
+    to_resolve = set()
+    for task in reversed(sorted_tasks):
+        if task in checkpointed:
+            to_resolve.update(edge.upstream_task for edge in needed_edges[task])
+        elif task in to_resolve:
+            to_resolve.update(edge.upstream_task for edge in edges_to[task])
+
+    states = {}  # type: typing.Dict[Task, State]
+    checks = []
+    for task in sorted_tasks:
+        upstream_states = _get_upstream_states(flow, task, edges_to[task], states)
+        if task in checkpointed:
+            task_checks, states[task] = _check_checkpoints(task, upstream_states, needed_edges[task])
+            checks.extend(task_checks)
+        elif task in to_resolve:
+            check, states[task] = _resolve(task, task_runner_cls, upstream_states)
+            checks.append(check)
+        else:
+            checks.append(CheckpointCheck(task, None, NO_CHECKPOINT))
+            states[task] = _Unresolved()
+
+    computed_tasks = {check.task for check in checks if check.status != HIT}
+    read_tasks = {
+        check.task for check in checks
+        if check.status == HIT and not downstream_tasks[check.task].isdisjoint(computed_tasks)
+    }
+    return DryRunReport(checks, read_tasks, runtimes)
+
+
+def _get_needed_edges(task: Task, edges: typing.List[Edge]) -> typing.List[Edge]:
+    # The edges to a checkpointed task whose values are needed to look for its checkpoint(s)
+    result_handler = task.result_handler
+    template_fields = getattr(result_handler, "template_fields", set())
+    content_addressed = getattr(result_handler, "content_addressed", False)
+    return [
+        edge for edge in edges
+        if edge.mapped or edge.key in template_fields or (content_addressed and edge.key is not None)
+    ]
+
+
+def _get_upstream_states(
+        flow: Flow, task: Task, edges: typing.List[Edge], states: typing.Dict[Task, State]
+) -> typing.Dict[Edge, State]:
+    # The upstream states of a task, built the same way as in FlowRunner.get_flow_run_state
+    upstream_states = {}
+    for edge in edges:
+        upstream_state = states[edge.upstream_task]
+        if upstream_state.is_mapped() and not edge.mapped:
+            # Passed on as a list of the children's results, as by TaskRunner.run
+            if any(isinstance(child_state, _Unresolved) for child_state in upstream_state.map_states):
+                upstream_state = _Unresolved()
+            else:
+                upstream_state = copy.copy(upstream_state)
+                upstream_state._result = _ChildResults(upstream_state.map_states)
+        upstream_states[edge] = upstream_state
+    for key, value in flow.constants[task].items():
+        edge = Edge(upstream_task=Constant(value), downstream_task=task, key=key)
+        upstream_states[edge] = Success(
+            "Auto-generated constant value", result=Result(value, result_handler=ConstantResultHandler(value))
+        )
+    return upstream_states
+
+
+def _get_unresolved_names(upstream_states: typing.Dict[Edge, State], edges: typing.Iterable[Edge]) -> typing.List[str]:
+    edges = set(edges)
+    return sorted({
+        edge.upstream_task.name for edge, state in upstream_states.items()
+        if edge in edges and isinstance(state, _Unresolved)
+    })
+
+
+def _check_checkpoints(
+        task: Task, upstream_states: typing.Dict[Edge, State], needed_edges: typing.List[Edge]
+) -> typing.Tuple[typing.List[CheckpointCheck], State]:
+    # Look for the checkpoint of a task, or those of each of its children if it's mapped
+    if getattr(task.result_handler, "partition_key", None) is not None:
+        return [
+            CheckpointCheck(task, None, UNKNOWN, reason="Its partitions depend on the rows of its inputs")
+        ], _Unresolved()
+    unresolved = _get_unresolved_names(upstream_states, needed_edges)
+    if unresolved:
+        return [
+            CheckpointCheck(task, None, UNKNOWN, reason=f"Depends on {', '.join(unresolved)}, which would be computed")
+        ], _Unresolved()
+    mapped_states = [state for edge, state in upstream_states.items() if edge.mapped]
+    if not mapped_states:
+        check, state = _check_checkpoint(task, None, upstream_states, needed_edges)
+        return [check], state
+
+    num_children = min(len(state.map_states) if state.is_mapped() else len(state.result) for state in mapped_states)
+    checks = []
+    child_states = []
+    for map_index in range(num_children):
+        check, child_state = _check_checkpoint(
+            task, map_index, _get_mapped_upstream_states(upstream_states, map_index), needed_edges
+        )
+        checks.append(check)
+        child_states.append(child_state)
+    return checks, Mapped(message="Dry run.", map_states=child_states)
+
+
+def _check_checkpoint(
+        task: Task,
+        map_index: typing.Optional[int],
+        upstream_states: typing.Dict[Edge, State],
+        needed_edges: typing.List[Edge]
+) -> typing.Tuple[CheckpointCheck, State]:
+    result_handler = task.result_handler
+    unresolved = _get_unresolved_names(upstream_states, needed_edges)
+    if unresolved:
+        return CheckpointCheck(
+            task, map_index, UNKNOWN, reason=f"Depends on {', '.join(unresolved)}, which would be computed"
+        ), _Unresolved()
+    input_mapping = _create_input_mapping(upstream_states)
+    try:
+        path_string = result_handler.checkpoint_path(input_mapping=input_mapping)
+    except (KeyError, AttributeError, IndexError, ValueError) as error:
+        return CheckpointCheck(
+            task, map_index, INVALID, reason=f"Can't fill in {result_handler.path}: {error!r}"
+        ), _Unresolved()
+    checkpoint_key = _get_checkpoint_key(task, upstream_states)
+    if not _checkpoint_exists(result_handler, input_mapping, checkpoint_key):
+        reason = "The checkpoint is stale or incomplete" if os.path.exists(path_string) else None
+        return CheckpointCheck(task, map_index, MISS, path_string, reason=reason), _Unresolved()
+    result = LazyResult(
+        result_handler=result_handler,
+        input_mapping=_get_template_inputs(result_handler, input_mapping),
+        checkpoint_key=checkpoint_key
+    )
+    size = result_handler.checkpoint_size(input_mapping=input_mapping)
+    return CheckpointCheck(task, map_index, HIT, path_string, size), Success(result=result, message="Dry run.")
+
+
+def _resolve(
+        task: Task, task_runner_cls: type, upstream_states: typing.Dict[Edge, State]
+) -> typing.Tuple[CheckpointCheck, State]:
+    # Run a task without a checkpoint whose result is needed to fill in paths
+    unresolved = _get_unresolved_names(upstream_states, upstream_states)
+    if unresolved:
+        return CheckpointCheck(task, None, NO_CHECKPOINT), _Unresolved()
+    state = task_runner_cls(task=task).run(
+        upstream_states=upstream_states, context=dict(prefect.context), executor=LocalExecutor()
+    )
+    if not state.is_successful():
+        check = CheckpointCheck(task, None, NO_CHECKPOINT, reason=f"Failed in the dry run: {state.message}")
+        return check, _Unresolved()
+    return CheckpointCheck(task, None, NO_CHECKPOINT, reason="Run to fill in paths"), state
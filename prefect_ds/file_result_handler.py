@@ -0,0 +1,408 @@
+import concurrent.futures
+import contextlib
+import os
+import pathlib
+import string
+import threading
+import typing
+
+from prefect.engine.result_handlers.result_handler import ResultHandler
+
+from prefect_ds.cache import CheckpointCache, get_checkpoint_size
+from prefect_ds.locking import CheckpointLock
+from prefect_ds.manifest import manifest_path, read_manifest
+from prefect_ds.remote import (
+    DEFAULT_LOCAL_CACHE_DIR, Storage, fetch, get_remote_size, get_storage, publish, remove_version, split_url
+)
+
+
+class StaleCheckpointError(FileNotFoundError):
+    """
+    Raised when a checkpoint exists on disk but was written for a different checkpoint key
+    (i.e. the task's source code or inputs have changed since it was written). Subclasses
+    ``FileNotFoundError`` so that a stale checkpoint is treated the same way as a missing one.
+    """
+
+
+class FileResultHandler(ResultHandler):
+    """
+    Base class for prefect_ds result handlers that store each result at a fully-specified
+    (and optionally templated) path, with an optional sidecar manifest (``[path].manifest.json``).
+    Implements everything ``prefect_ds.checkpoint_handler.checkpoint_handler`` needs except
+    for ``read`` and ``write``.
+
+    Results can also be stored remotely, at a URL like ``"s3://bucket/output_{sample_name}.parquet"``
+    (see ``prefect_ds.remote``), so workers on different machines share checkpoints. They are then
+    read and written through a local copy under ``local_cache_dir``: ``read`` downloads a result
+    (and its manifest) only if its local copy is missing or the remote file has been replaced since
+    it was fetched (going by its ETag or modification time), and ``write`` writes the local copy and
+    then uploads it, manifest last. Checking for checkpoints only looks at remote storage. Locks (see
+    ``locking``) and ``cache`` only apply to the local copies.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        Filepath (or URL) to be read from or written to, including file name and extension. May contain
+        ``str.format`` templates with the names of task arguments, e.g. ``"output_{sample_name}.csv"``.
+    content_addressed : bool
+        If ``True``, ``checkpoint_handler`` computes a hash of the task's source code and inputs
+        for every run and stores it in the manifest, and a checkpoint is only reused when the
+        stored hash matches.
+    async_write : bool
+        If ``True``, ``checkpoint_handler`` writes results in a pool of background threads
+        (see ``prefect_ds.background_writer``).
+    max_workers : int or None
+        The maximum number of threads used to check for many checkpoints at once. Defaults to
+        the ``concurrent.futures.ThreadPoolExecutor`` default.
+    locking : bool
+        If ``True``, ``checkpoint_handler`` locks a missing checkpoint (see ``lock``) before
+        computing it, and keeps it locked until the result has been written, so concurrent flow
+        runs that need the same checkpoint compute it only once: the others wait for the lock,
+        and then read the checkpoint.
+    lock_timeout : float or None
+        The maximum time, in seconds, to wait for a checkpoint that another run is computing.
+        Once it has passed, the task is run anyway. If ``None``, waits for as long as it takes.
+    cache : prefect_ds.cache.CheckpointCache or None
+        If present, ``checkpoint_handler`` records every checkpoint it writes or reuses in this
+        cache's index, which removes old checkpoints when its quota is exceeded.
+    local_cache_dir : str or pathlib.Path or None
+        If ``path`` is a URL, the directory the local copies of results are kept in (under the URL's
+        protocol and path). Defaults to ``prefect_ds.remote.DEFAULT_LOCAL_CACHE_DIR``.
+    storage_options : dict or None
+        If ``path`` is a URL, passed to ``prefect_ds.remote.get_storage`` (e.g. credentials).
+    """
+    def __init__(
+            self,
+            path: typing.Union[str, pathlib.Path],
+            content_addressed: bool = False,
+            async_write: bool = False,
+            max_workers: int = None,
+            locking: bool = False,
+            lock_timeout: float = None,
+            cache: CheckpointCache = None,
+            local_cache_dir: typing.Union[str, pathlib.Path] = None,
+            storage_options: dict = None
+    ):
+        protocol, remote_path = split_url(str(path))
+        if protocol is None:
+            if local_cache_dir is not None or storage_options is not None:
+                raise ValueError("local_cache_dir and storage_options can only be used with a URL path")
+            self.url = None
+            self.path = pathlib.Path(path)
+        else:
+            self.url = str(path)
+            local_cache_dir = DEFAULT_LOCAL_CACHE_DIR if local_cache_dir is None else local_cache_dir
+            self.path = pathlib.Path(local_cache_dir) / protocol / remote_path
+        self.local_cache_dir = local_cache_dir
+        self.storage_options = storage_options
+        self.content_addressed = content_addressed
+        self.async_write = async_write
+        self.max_workers = max_workers
+        self.locking = locking
+        self.lock_timeout = lock_timeout
+        self.cache = cache
+        super().__init__()
+
+    @property
+    def template_fields(self) -> typing.Set[str]:
+        """
+        The names of the task inputs referenced by templates in ``path``.
+        """
+        fields = set()
+        for _, field_name, _, _ in string.Formatter().parse(str(self.path)):
+            if field_name:
+                fields.add(field_name.split(".")[0].split("[")[0])
+        return fields
+
+    def exists(self, *, input_mapping=None, checkpoint_key: str = None) -> bool:
+        """
+        Cheaply check whether a result can be read, without reading it: the file only has to
+        exist and, if ``checkpoint_key`` is given, its manifest has to match the key.
+
+        Parameters
+        ----------
+        input_mapping : dict
+            If present, used to fill in the templates in ``path``, as in ``read``.
+        checkpoint_key : str or None
+            If present, the key the manifest next to the result must have been written with.
+
+        Returns
+        -------
+        exists : bool
+            Whether ``read`` would find a valid result.
+        """
+        path_string = self._format_path(input_mapping)
+        if self.url is not None:
+            storage = self._get_storage()
+            remote_path = self._get_remote_path(path_string)
+            if storage.info(remote_path) is None and not storage.listdir(remote_path):
+                return False
+        elif not pathlib.Path(path_string).exists():
+            return False
+        return self._manifest_matches(path_string, checkpoint_key)
+
+    def exists_many(
+            self,
+            input_mappings: typing.Sequence[typing.Mapping[str, typing.Any]],
+            checkpoint_keys: typing.Sequence[typing.Optional[str]] = None
+    ) -> typing.List[bool]:
+        """
+        Check whether many results can be read, e.g. for all of the children of a mapped task.
+        Rather than checking each path separately, each directory the results would be in is
+        listed once, and the paths are looked up in the listing. Manifests (if needed) are only
+        read for results whose files exist, in parallel.
+
+        Parameters
+        ----------
+        input_mappings : sequence of dicts
+            The inputs used to fill in the templates in ``path``, one for each result.
+        checkpoint_keys : sequence of str or None
+            If present, the key each result's manifest must have been written with, as in ``exists``.
+
+        Returns
+        -------
+        exists : list of bool
+            Whether ``read`` would find a valid result, for each result.
+        """
+        checkpoint_keys = [None] * len(input_mappings) if checkpoint_keys is None else checkpoint_keys
+        path_strings = [self._format_path(input_mapping) for input_mapping in input_mappings]
+        storage = self._get_storage() if self.url is not None else None
+        listings = {}  # type: typing.Dict[str, typing.Set[str]]
+        found = []
+        for path_string in path_strings:
+            directory, file_name = os.path.split(path_string)
+            if directory not in listings and storage is not None:
+                listings[directory] = storage.listdir(self._get_remote_path(directory))
+            elif directory not in listings:
+                try:
+                    listings[directory] = set(os.listdir(directory or "."))
+                except (FileNotFoundError, NotADirectoryError):
+                    listings[directory] = set()
+            found.append(file_name in listings[directory])
+
+        to_check = [
+            index for index, (path_string, checkpoint_key) in enumerate(zip(path_strings, checkpoint_keys))
+            if found[index] and (checkpoint_key is not None or self._requires_manifest)
+        ]
+        if to_check:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                matches = executor.map(
+                    lambda index: self._manifest_matches(path_strings[index], checkpoint_keys[index]), to_check
+                )
+                for index, manifest_matches in zip(to_check, matches):
+                    found[index] = manifest_matches
+        return found
+
+    def lock(self, *, input_mapping=None) -> CheckpointLock:
+        """
+        Get a lock on a result, shared by all threads and processes on the machine.
+
+        Parameters
+        ----------
+        input_mapping : dict
+            If present, used to fill in the templates in ``path``, as in ``read``.
+
+        Returns
+        -------
+        lock : prefect_ds.locking.CheckpointLock
+            The (not yet acquired) lock.
+        """
+        return CheckpointLock(self._format_path(input_mapping))
+
+    def record_write(self, *, input_mapping=None, task: str = None, flow: str = None):
+        """
+        Add a result that has just been written to the index of ``cache``, if there is one.
+
+        Parameters
+        ----------
+        input_mapping : dict
+            If present, used to fill in the templates in ``path``, as in ``write``.
+        task : str or None
+            The name of the task that produced the result.
+        flow : str or None
+            The name of the flow that produced the result.
+        """
+        if self.cache is not None:
+            self.cache.record_write(self._format_path(input_mapping), task=task, flow=flow)
+
+    def record_access(self, *, input_mappings: typing.Sequence[typing.Mapping[str, typing.Any]]):
+        """
+        Record that results have been reused in the index of ``cache``, if there is one.
+
+        Parameters
+        ----------
+        input_mappings : sequence of dicts
+            The inputs used to fill in the templates in ``path``, one for each result.
+        """
+        if self.cache is not None:
+            self.cache.record_access([self._format_path(input_mapping) for input_mapping in input_mappings])
+
+    def checkpoint_size(self, *, input_mapping=None) -> int:
+        """
+        Get the size of a result on disk, e.g. to measure how much is read and written.
+
+        Parameters
+        ----------
+        input_mapping : dict
+            If present, used to fill in the templates in ``path``, as in ``write``.
+
+        Returns
+        -------
+        size : int
+            The size in bytes of the result and its manifest (in remote storage, if ``path`` is a
+            URL), or 0 if there is no result.
+        """
+        path_string = self._format_path(input_mapping)
+        if self.url is not None:
+            storage = self._get_storage()
+            return sum(
+                get_remote_size(storage, self._get_remote_path(checkpoint_path_string))
+                for checkpoint_path_string in [path_string, str(manifest_path(path_string))]
+            )
+        return get_checkpoint_size(path_string)
+
+    def checkpoint_path(self, *, input_mapping=None) -> str:
+        """
+        Get the path (or URL) a result is read from and written to, with its templates filled in.
+
+        Parameters
+        ----------
+        input_mapping : dict
+            If present, used to fill in the templates in ``path``, as in ``write``.
+
+        Returns
+        -------
+        path : str
+            The path.
+
+        Raises
+        ------
+        KeyError, AttributeError or IndexError
+            If the templates in ``path`` can't be filled in from ``input_mapping``.
+        """
+        path_string = self._format_path(input_mapping)
+        if self.url is not None:
+            protocol, _ = split_url(self.url)
+            return f"{protocol}://{self._get_remote_path(path_string)}"
+        return path_string
+
+    @property
+    def _requires_manifest(self) -> bool:
+        # Whether results are only complete once their manifest has been written
+        return False
+
+    def _is_complete(self, manifest: typing.Dict[str, typing.Any]) -> bool:
+        # Whether a manifest shows that the result was completely written; only called
+        # when _requires_manifest is set
+        return True
+
+    def _manifest_matches(self, path_string: str, checkpoint_key: typing.Optional[str]) -> bool:
+        if checkpoint_key is None and not self._requires_manifest:
+            return True
+        manifest = self._read_manifest(path_string)
+        if checkpoint_key is not None and manifest.get("checkpoint_key") != checkpoint_key:
+            return False
+        if self._requires_manifest and not self._is_complete(manifest):
+            return False
+        return True
+
+    def _read_checked_manifest(self, path_string: str, checkpoint_key: typing.Optional[str]) -> typing.Dict[str, typing.Any]:
+        # Read the manifest of a result about to be read, making sure it was written with the right key
+        if checkpoint_key is None and not self._requires_manifest:
+            return {}
+        manifest = self._read_manifest(path_string)
+        if checkpoint_key is not None and manifest.get("checkpoint_key") != checkpoint_key:
+            raise StaleCheckpointError(f"No checkpoint with key {checkpoint_key} found at {path_string}")
+        if self._requires_manifest and not self._is_complete(manifest):
+            raise FileNotFoundError(f"No complete result found at {path_string}")
+        return manifest
+
+    def _read_manifest(self, path_string: str) -> typing.Dict[str, typing.Any]:
+        if self.url is not None:
+            local_manifest_path = str(manifest_path(path_string))
+            fetch(self._get_storage(), self._get_remote_path(local_manifest_path), local_manifest_path, self.max_workers)
+        return read_manifest(path_string)
+
+    def _start_write(self, path_string: str):
+        # Called before a result is written, to remove the manifest of the result it replaces (see
+        # remove_manifest). Remotely, the result is then no longer valid until its new manifest has
+        # been uploaded, and the local copies are no longer taken for copies of the remote files
+        # until they have been uploaded.
+        remove_manifest(path_string)
+        if self.url is not None:
+            os.makedirs(os.path.dirname(path_string), exist_ok=True)
+            local_manifest_path = str(manifest_path(path_string))
+            self._get_storage().delete(self._get_remote_path(local_manifest_path))
+            remove_version(local_manifest_path)
+            remove_version(path_string)
+
+    def _fetch_result(self, path_string: str):
+        # Make sure the local copy of a remote result is up to date before it's read
+        if self.url is None:
+            return
+        if not fetch(self._get_storage(), self._get_remote_path(path_string), path_string, self.max_workers):
+            raise FileNotFoundError(f"No result found at {self._get_remote_path(path_string)}")
+
+    def _publish_result(self, path_string: str):
+        # Upload a result that has just been written to its local copy, with its manifest last
+        if self.url is None:
+            return
+        storage = self._get_storage()
+        publish(storage, path_string, self._get_remote_path(path_string), self.max_workers)
+        local_manifest_path = str(manifest_path(path_string))
+        if os.path.exists(local_manifest_path):
+            publish(storage, local_manifest_path, self._get_remote_path(local_manifest_path))
+
+    def _get_storage(self) -> Storage:
+        protocol, _ = split_url(self.url)
+        return get_storage(protocol, self.storage_options)
+
+    def _get_remote_path(self, path_string: str) -> str:
+        # The remote path of a local copy
+        protocol, _ = split_url(self.url)
+        return pathlib.Path(path_string).relative_to(pathlib.Path(self.local_cache_dir) / protocol).as_posix()
+
+    def _format_path(self, input_mapping: typing.Optional[typing.Mapping[str, typing.Any]]) -> str:
+        # format_map only looks up the inputs referenced in the template, so inputs
+        # that are lazily loaded don't get read unless they are actually needed
+        input_mapping = {} if input_mapping is None else input_mapping
+        return str(self.path).format_map(input_mapping)
+
+
+def remove_manifest(path_string: str):
+    """
+    Remove the manifest of a result, if there is one. Done before a result is replaced, so the
+    new result is never paired with a manifest written for the old one.
+
+    Parameters
+    ----------
+    path_string : str
+        The (fully formatted) path of the result.
+    """
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(manifest_path(path_string))
+
+
+def write_atomically(path_string: str, write_function: typing.Callable[[str], typing.Any]):
+    """
+    Write a file to a temporary path next to its destination and move it into place, so a crash
+    mid-write never leaves a truncated file where a result is expected. The original file name is
+    kept at the end of the temporary one, so writers can still infer things like compression
+    from the extension.
+
+    Parameters
+    ----------
+    path_string : str
+        The destination.
+    write_function : callable
+        A function taking the path to write to.
+    """
+    path = pathlib.Path(path_string)
+    temporary_path = path.with_name(f".tmp.{os.getpid()}.{threading.get_ident()}.{path.name}")
+    try:
+        write_function(str(temporary_path))
+        os.replace(temporary_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temporary_path)
+        raise
@@ -1,13 +1,139 @@
+import bisect
+import collections
+import contextlib
+import datetime
+import functools
+import math
+import os
+import pathlib
+import threading
+
+import prefect
 from prefect.engine.flow_runner import FlowRunner
-from prefect.engine.state import State
+from prefect.engine.state import Failed, Skipped, State, Success
 from prefect.core.edge import Edge
+from prefect.core.flow import Flow
 from prefect.core.task import Task
-from typing import Any, Callable, Dict, Iterable, Set
+from typing import Any, Callable, Dict, Iterable, Mapping, Sequence, Set, Union
 
+from prefect_ds.background_writer import RUN_WRITES_KEY, WriteBatch, get_background_writer
+from prefect_ds.dry_run import dry_run
+from prefect_ds.memory_report import MemoryReport
+from prefect_ds.profiling import ProfileReport, read_task_runtimes
+from prefect_ds.pruning import plan_checkpoints
 from prefect_ds.result import PurgedResult
+from prefect_ds.result_store import SpillingResultStore
+from prefect_ds.scheduling import estimate_result_sizes, get_peak_result_size, memory_aware_order
 
 
 class DSFlowRunner(FlowRunner):
+    """
+    A ``FlowRunner`` that purges the results of upstream tasks once all of their downstream tasks
+    have been run, and can optionally keep the results it holds in memory under a fixed budget by
+    spilling them to disk. At the end of the run, it waits for the background checkpoint writes
+    (see ``prefect_ds.background_writer``) of its tasks to finish, and fails the run if any of them
+    failed.
+
+    Parameters
+    ----------
+    flow : instance of prefect.core.flow.Flow
+        The flow to run.
+    task_runner_cls : type or None
+        The class of task runner to use, as in ``prefect.engine.flow_runner.FlowRunner``.
+    state_handlers : iterable of callables or None
+        Flow state handlers, as in ``prefect.engine.flow_runner.FlowRunner``.
+    memory_limit : int or None
+        If present, the maximum number of bytes of task results to hold in memory. When the
+        results exceed this limit, the ones that are needed furthest in the future (based on the
+        flow's remaining downstream edges) are spilled to a scratch directory, and
+        read back in when a downstream task needs them.
+    spill_dir : str, pathlib.Path, or None
+        The directory in which to create the scratch directory for spilled results. If not
+        present, the system default temporary directory is used.
+    track_memory : bool
+        If ``True``, measure the size of every task result (see ``prefect_ds.sizing.get_size``)
+        and record when results are loaded, purged and spilled. The record is attached to the
+        final state of the flow run as ``state.memory_report``, an instance of
+        ``prefect_ds.memory_report.MemoryReport``. Always on if ``memory_limit`` is set.
+    profile : bool
+        If ``True``, measure the wall and CPU time, checkpoint reads and writes, peak memory
+        growth and checkpoint cache hits and misses of every task. The record is attached to the
+        final state of the flow run as ``state.profile_report``, an instance of
+        ``prefect_ds.profiling.ProfileReport``.
+    profile_dir : str, pathlib.Path, or None
+        If present, the directory in which to write the profile of each flow run as a Chrome
+        trace, named ``[flow name]-[start time]-[process id].trace.json``. Implies ``profile``.
+    profile_tasks : iterable of str
+        The names of tasks to additionally run under ``cProfile`` and ``tracemalloc``. Implies
+        ``profile``.
+    memory_aware_order : bool
+        If ``True``, run the tasks in the topological order that keeps the fewest (estimated) bytes
+        of results in memory at once, rather than the flow's default order (see
+        ``prefect_ds.scheduling.memory_aware_order``).
+    result_sizes : dict or None
+        The sizes in bytes of task results, by task or task name, used to choose the order when
+        ``memory_aware_order`` is set: for instance the ``result_sizes`` of the ``memory_report``
+        of a previous run. If this runner has a ``memory_report`` from a previous run, its sizes
+        are used as well. Tasks whose sizes aren't known are estimated from the size of their
+        checkpoints (see ``prefect_ds.scheduling.estimate_result_sizes``).
+    prune_cached : bool
+        If ``True``, look for the checkpoints of the flow's tasks before running it (see
+        ``prefect_ds.pruning.plan_checkpoints``). Tasks whose checkpoints are found aren't run
+        at all (their results are read lazily if a task that runs needs them), and tasks without a
+        checkpoint whose results are only used by those tasks are skipped. Tasks whose checkpoints
+        can't be looked for up front are left to ``checkpoint_handler`` as usual.
+    dry_run : bool
+        If ``True``, don't compute anything: only work out which checkpoints would be reused and
+        which tasks would be computed (see ``prefect_ds.dry_run.dry_run``), with how long they
+        took to compute in the runs profiled to ``profile_dir``, if set. The plan is logged, and
+        attached to the final state of the flow run as ``state.dry_run_report``, an instance of
+        ``prefect_ds.dry_run.DryRunReport``. The final state is ``Failed`` if the paths of any
+        checkpoints can't be filled in.
+    """
+
+    def __init__(
+        self,
+        flow: Flow,
+        task_runner_cls: type = None,
+        state_handlers: Iterable[Callable] = None,
+        memory_limit: int = None,
+        spill_dir: Union[str, pathlib.Path] = None,
+        track_memory: bool = False,
+        profile: bool = False,
+        profile_dir: Union[str, pathlib.Path] = None,
+        profile_tasks: Iterable[str] = (),
+        memory_aware_order: bool = False,
+        result_sizes: Mapping[Union[Task, str], int] = None,
+        prune_cached: bool = False,
+        dry_run: bool = False
+    ):
+        self.memory_limit = memory_limit
+        self.spill_dir = spill_dir
+        self.track_memory = track_memory
+        self.memory_report = None
+        self.profile_dir = profile_dir
+        self.profile_tasks = set(profile_tasks)
+        self.profile = profile or profile_dir is not None or bool(self.profile_tasks)
+        self.profile_report = None
+        self.memory_aware_order = memory_aware_order
+        self.result_sizes = result_sizes
+        self.prune_cached = prune_cached
+        self.dry_run = dry_run
+        self._result_store = None
+        # Executors like ProcessExecutor run tasks in several threads at once
+        self._bookkeeping_lock = threading.Lock()
+        # What a flow run in the current thread sees as self.flow (see _run_in_order)
+        self._run_flows = threading.local()
+        super().__init__(flow=flow, task_runner_cls=task_runner_cls, state_handlers=state_handlers)
+
+    @property
+    def flow(self) -> Flow:
+        run_flow = getattr(self._run_flows, "flow", None)
+        return self._flow if run_flow is None else run_flow
+
+    @flow.setter
+    def flow(self, flow: Flow):
+        self._flow = flow
 
     def get_flow_run_state(
         self,
@@ -21,15 +147,58 @@ class DSFlowRunner(FlowRunner):
         """
         See the documentation for ``prefect.engine.flow_runner.FlowRunner.get_flow_run_state()``.
         """
+        if self.dry_run:
+            return self._get_dry_run_state(task_runner_state_handlers)
         self.task_states = task_states
-        return super().get_flow_run_state(
-            state=state,
-            task_states=task_states,
-            task_contexts=task_contexts,
-            return_tasks=return_tasks,
-            task_runner_state_handlers=task_runner_state_handlers,
-            executor=executor
-        )
+        loaded_checkpoints = set()
+        if self.prune_cached:
+            loaded_checkpoints = self._prune_cached_tasks(task_states, return_tasks, task_runner_state_handlers)
+        run_order = contextlib.ExitStack()
+        if self.memory_aware_order:
+            run_order.enter_context(self._run_in_order(self._get_memory_aware_order()))
+        self._build_dependency_index(task_states)
+        if self.memory_limit is not None or self.track_memory:
+            self._result_store = SpillingResultStore(self.memory_limit, spill_dir=self.spill_dir)
+            self.memory_report = MemoryReport()
+            for task in loaded_checkpoints:
+                # Not read yet, but tracked so that they're counted once a downstream task reads them
+                self._result_store.add(task, task_states[task])
+        if self.profile:
+            self.profile_report = ProfileReport(profile_tasks=self.profile_tasks)
+            run_started = datetime.datetime.now()
+        run_writes = WriteBatch()
+        try:
+            with prefect.context(**{RUN_WRITES_KEY: run_writes}):
+                final_state = super().get_flow_run_state(
+                    state=state,
+                    task_states=task_states,
+                    task_contexts=task_contexts,
+                    return_tasks=return_tasks,
+                    task_runner_state_handlers=task_runner_state_handlers,
+                    executor=executor
+                )
+        finally:
+            run_order.close()
+            # Make sure every checkpoint of the run is on disk before the run is considered finished
+            write_errors = get_background_writer().flush(run_writes)
+            if self._result_store is not None:
+                # Returned results need to stay readable after the scratch directory is gone
+                for task in return_tasks or []:
+                    self._result_store.materialize(task)
+                self._result_store.cleanup()
+                self._result_store = None
+        if write_errors:
+            raise write_errors[0]
+        if self.memory_report is not None:
+            final_state.memory_report = self.memory_report
+        if self.profile_report is not None:
+            # Written after the background writes have finished, so they're included
+            if self.profile_dir is not None:
+                self.profile_report.write_trace(pathlib.Path(self.profile_dir) / (
+                    f"{self.flow.name}-{run_started:%Y%m%dT%H%M%S%f}-{os.getpid()}.trace.json"
+                ))
+            final_state.profile_report = self.profile_report
+        return final_state
 
     def run_task(
         self,
@@ -42,48 +211,178 @@ class DSFlowRunner(FlowRunner):
     ) -> State:
         """
         Same as ``prefect.engine.flow_runner.FlowRunner.run_task()``, but checks
-        to see if upstream tasks can be purged after the current task is run.
+        to see if upstream tasks can be purged after the current task is run, and
+        spills results to disk if they exceed ``memory_limit``. If ``profile`` is set,
+        the task is profiled while it runs.
         """
-        task_output = super().run_task(
-            task=task,
-            state=state,
-            upstream_states=upstream_states,
-            context=context,
-            task_runner_state_handlers=task_runner_state_handlers,
-            executor=executor
-        )
-        self._purge_unnecessary_tasks(task, upstream_states)
+        if self.profile_report is not None:
+            profiler = self.profile_report.profile_task(task, [edge.upstream_task for edge in upstream_states])
+        else:
+            profiler = contextlib.ExitStack()  # does nothing
+        with profiler:
+            task_output = super().run_task(
+                task=task,
+                state=state,
+                upstream_states=upstream_states,
+                context=context,
+                task_runner_state_handlers=task_runner_state_handlers,
+                executor=executor
+            )
+        with self._bookkeeping_lock:
+            self._release_cached_inputs(task_output)
+            if self._result_store is not None:
+                self._track_results(task, task_output, upstream_states)
+            self._purge_unnecessary_tasks(task, upstream_states, task_output)
+            if self._result_store is not None:
+                evicted = self._result_store.enforce_limit(functools.partial(self._get_next_use, current_task=task))
+                self.memory_report.record("spill", evicted, self._result_store.resident_bytes)
         return task_output
 
-    def _purge_unnecessary_tasks(self, task, upstream_state_edges):
-        for state_edge in upstream_state_edges:
-            upstream_task = state_edge.upstream_task
-            #breakpoint()
-            try:
-                edges_from_upstream_task = self.flow.edges_from(upstream_task)
-            except ValueError:
-                # When a non-task (e.g. an int) is used as a task input,
-                # it doesn't show up in the task list. In these cases, we
-                # don't need to worry about purging anything.
+    def _get_dry_run_state(self, task_runner_state_handlers):
+        runtimes = {}
+        if self.profile_dir is not None:
+            runtimes = read_task_runtimes(self.profile_dir, self.flow.name)
+        report = dry_run(self.flow, self.task_runner_cls, task_runner_state_handlers or (), runtimes)
+        self.logger.info(f"Dry run of {self.flow.name}:\n{report.format()}")
+        if report.invalid:
+            final_state = Failed(message="Dry run: the paths of some checkpoints can't be filled in.")
+        else:
+            final_state = Success(message="Dry run: nothing was computed.")
+        final_state.dry_run_report = report
+        return final_state
+
+    def _prune_cached_tasks(self, task_states, return_tasks, task_runner_state_handlers):
+        # Set the states of the tasks that don't need to run, so FlowRunner doesn't run them.
+        # Returns the tasks whose checkpoints may be read by tasks that do run.
+        plan = plan_checkpoints(
+            self.flow,
+            targets=self.flow.terminal_tasks() | self.flow.reference_tasks() | set(return_tasks or ()),
+            state_handlers=task_runner_state_handlers or ()
+        )
+        for task, result in plan.cached.items():
+            if task not in task_states:
+                task_states[task] = Success(result=result, message="Checkpoint found before the run.")
+        for task in plan.skipped:
+            if task not in task_states:
+                task_states[task] = Skipped(message="Only needed by tasks whose checkpoints were found.")
+        self.logger.info(
+            f"Found the checkpoints of {len(plan.cached)} tasks before the run, of which {len(plan.loaded)} "
+            f"may be read; skipping {len(plan.skipped)} tasks that only they need, and running {len(plan.to_run)}."
+        )
+        return plan.loaded
+
+    def _get_memory_aware_order(self):
+        known_sizes = {}
+        if self.memory_report is not None:
+            known_sizes.update(self.memory_report.result_sizes)
+        known_sizes.update(self.result_sizes or {})
+        sizes = estimate_result_sizes(self.flow, known_sizes)
+        order = memory_aware_order(self.flow, sizes)
+        self.logger.debug(
+            f"Running tasks in memory-aware order, with an estimated peak of "
+            f"{get_peak_result_size(self.flow, order, sizes):.0f} bytes of results "
+            f"({get_peak_result_size(self.flow, self.flow.sorted_tasks(), sizes):.0f} in the default order)"
+        )
+        return order
+
+    def _track_results(self, task, task_state, upstream_state_edges):
+        # Running the task may have loaded lazily-loaded (or spilled) upstream results
+        loaded = [
+            result_event
+            for upstream_task in {state_edge.upstream_task for state_edge in upstream_state_edges}
+            for result_event in self._result_store.refresh(upstream_task)
+        ]
+        self.memory_report.record("load", loaded, self._result_store.resident_bytes)
+        added = self._result_store.add(task, task_state)
+        self.memory_report.record("result", added, self._result_store.resident_bytes)
+        self.memory_report.update_peak(self._result_store.get_resident_sizes)
+
+    def _release_cached_inputs(self, state):
+        # Successful task states keep references to the results of their upstream tasks,
+        # which would keep those results in memory even after they are purged or spilled.
+        # They're only needed to re-run a task, so they can be dropped.
+        if state.is_successful() and not state.is_cached():
+            state.cached_inputs = None
+            if state.is_mapped():
+                for mapped_state in state.map_states:
+                    self._release_cached_inputs(mapped_state)
+
+    @contextlib.contextmanager
+    def _run_in_order(self, order: Sequence[Task]):
+        # FlowRunner runs tasks in the order of self.flow.sorted_tasks(), so for the length of the
+        # run, this thread sees a view of the flow in the given order. The flow itself is left alone,
+        # as other runs (of this or another runner) may be using it at the same time.
+        self._run_flows.flow = _OrderedFlow(self._flow, order)
+        try:
+            yield
+        finally:
+            self._run_flows.flow = None
+
+    def _build_dependency_index(self, task_states):
+        # Index the flow's edges once per run, so that checking whether a result can be purged
+        # (or when it's next needed) doesn't require walking the downstream edges of a task
+        # after every task run.
+        self._task_positions = {task: position for position, task in enumerate(self.flow.sorted_tasks())}
+        self._downstream_positions = collections.defaultdict(list)
+        # The number of edges from each task whose downstream task has not yet succeeded
+        self._pending_consumers = collections.Counter()
+        for edge in self.flow.edges:
+            self._downstream_positions[edge.upstream_task].append(self._task_positions[edge.downstream_task])
+            downstream_state = task_states.get(edge.downstream_task)
+            if not (isinstance(downstream_state, State) and downstream_state.is_successful()):
+                self._pending_consumers[edge.upstream_task] += 1
+        for positions in self._downstream_positions.values():
+            positions.sort()
+
+    def _get_next_use(self, task, current_task):
+        downstream_positions = self._downstream_positions.get(task, [])
+        next_index = bisect.bisect_right(downstream_positions, self._task_positions[current_task])
+        return downstream_positions[next_index] if next_index < len(downstream_positions) else math.inf
+
+    def _purge_unnecessary_tasks(self, task, upstream_state_edges, task_state):
+        # When a non-task (e.g. an int) is used as a task input, it doesn't show up in the
+        # task list, and so isn't in the index. In these cases, we don't need to worry
+        # about purging anything.
+        edges_from_upstream_tasks = collections.Counter(
+            state_edge.upstream_task for state_edge in upstream_state_edges
+            if state_edge.upstream_task in self._task_positions
+        )
+        for upstream_task, num_edges in edges_from_upstream_tasks.items():
+            if task_state.is_successful():
+                self._pending_consumers[upstream_task] -= num_edges
+                num_pending_consumers = self._pending_consumers[upstream_task]
+            else:
+                # The current task doesn't need its inputs anymore even if it failed,
+                # so its own edges don't block the purge
+                num_pending_consumers = self._pending_consumers[upstream_task] - num_edges
+            if num_pending_consumers > 0:
                 continue
+            upstream_state = self.task_states[upstream_task]
+            if not isinstance(upstream_state, State):
+                # A future, from an executor that runs tasks concurrently; the task has finished
+                upstream_state = upstream_state.result()
+            if upstream_state.is_mapped():
+                for mapped_state in upstream_state.map_states:
+                    mapped_state._result = PurgedResult
+            upstream_state._result = PurgedResult
+            if self._result_store is not None:
+                purged = self._result_store.discard(upstream_task)
+                self.memory_report.record("purge", purged, self._result_store.resident_bytes)
+
+
+class _OrderedFlow:
+    """
+    A view of a flow whose ``sorted_tasks()`` are in a given order (unless asked to sort only the
+    tasks downstream of some root tasks), and which is otherwise the same as the flow.
+    """
+    def __init__(self, flow: Flow, order: Sequence[Task]):
+        self._flow = flow
+        self._order = tuple(order)
+
+    def sorted_tasks(self, root_tasks: Iterable[Task] = None) -> tuple:
+        if root_tasks:
+            return self._flow.sorted_tasks(root_tasks)
+        return self._order
 
-            is_safely_purgeable = True
-            for edge in edges_from_upstream_task:
-                if edge.downstream_task == task:
-                    # Downstream task is the current task
-                    continue
-                if (
-                        edge.downstream_task in self.task_states and
-                        self.task_states[edge.downstream_task].is_successful() == True
-                ):
-                    # Downstream edge has been successfully completed
-                    continue
-                # If we're still in this iteration of the loop, it means that this
-                # downstream task hasn't successfully completed yet
-                is_safely_purgeable = False
-                break
-            if is_safely_purgeable:
-                if self.task_states[upstream_task].is_mapped():
-                    for mapped_state in self.task_states[upstream_task].map_states:
-                        mapped_state._result = PurgedResult
-                self.task_states[upstream_task]._result = PurgedResult
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._flow, name)
@@ -0,0 +1,106 @@
+import typing
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+
+class FileFormat(typing.NamedTuple):
+    """
+    How to read and write one type of file.
+
+    Attributes
+    ----------
+    read : callable
+        ``read(path, **read_kwargs)``, returning the data stored at ``path``.
+    write : callable
+        ``write(data, path, **write_kwargs)``, writing ``data`` to ``path``.
+    """
+    read: typing.Callable[..., "pd.DataFrame"]
+    write: typing.Callable[..., None]
+
+
+# The pandas ``read_[FILETYPE]`` function and ``DataFrame.to_[FILETYPE]`` method for each file type,
+# by name, so that pandas doesn't have to be imported to know which file types are available.
+# Each entry is replaced by a FileFormat the first time it's used.
+_FORMATS = {
+    "clipboard": ("read_clipboard", "to_clipboard"),
+    "csv": ("read_csv", "to_csv"),
+    "excel": ("read_excel", "to_excel"),
+    "feather": ("read_feather", "to_feather"),
+    "gbq": ("read_gbq", "to_gbq"),
+    "hdf": ("read_hdf", "to_hdf"),
+    "html": ("read_html", "to_html"),
+    "json": ("read_json", "to_json"),
+    "msgpack": ("read_msgpack", "to_msgpack"),
+    "parquet": ("read_parquet", "to_parquet"),
+    "pickle": ("read_pickle", "to_pickle"),
+    "sql": ("read_sql_table", "to_sql"),
+    "stata": ("read_stata", "to_stata"),
+}  # type: typing.Dict[str, typing.Union[typing.Tuple[str, str], FileFormat]]
+
+
+def register_format(
+        file_type: str,
+        read: typing.Callable[..., "pd.DataFrame"],
+        write: typing.Callable[..., None]
+):
+    """
+    Add a file type that ``PandasResultHandler`` can read and write, or replace an existing one.
+
+    Parameters
+    ----------
+    file_type : str
+        The name of the file type, as passed to ``PandasResultHandler`` (case-insensitive).
+    read : callable
+        ``read(path, **read_kwargs)``, returning the data stored at ``path``.
+    write : callable
+        ``write(data, path, **write_kwargs)``, writing ``data`` to ``path``.
+    """
+    _FORMATS[file_type.lower()] = FileFormat(read=read, write=write)
+
+
+def get_file_types() -> typing.List[str]:
+    """
+    Get the names of all of the available file types.
+
+    Returns
+    -------
+    file_types : list of str
+        The file types.
+    """
+    return list(_FORMATS.keys())
+
+
+def get_format(file_type: str) -> FileFormat:
+    """
+    Get the functions used to read and write a file type.
+
+    Parameters
+    ----------
+    file_type : str
+        The name of the file type (case-insensitive).
+
+    Returns
+    -------
+    file_format : FileFormat
+        The functions.
+
+    Raises
+    ------
+    ValueError
+        If the file type isn't available.
+    """
+    file_type = file_type.lower()
+    if file_type not in _FORMATS:
+        raise ValueError(f"{file_type} not available. Known file extensions are {get_file_types()}")
+    file_format = _FORMATS[file_type]
+    if not isinstance(file_format, FileFormat):
+        import pandas as pd
+
+        read_name, write_name = file_format
+        file_format = FileFormat(
+            read=getattr(pd, read_name),
+            write=lambda data, path, **write_kwargs: getattr(data, write_name)(path, **write_kwargs)
+        )
+        _FORMATS[file_type] = file_format
+    return file_format
@@ -0,0 +1,152 @@
+import hashlib
+import inspect
+import pickle
+import typing
+
+import numpy as np
+import pandas as pd
+
+from prefect.core.task import Task
+
+from prefect_ds.chunks import Chunks
+
+# Number of rows hashed at a time for columns that can't be fed to the hash directly.
+# This bounds the size of the temporary per-row hashes pandas creates.
+_HASH_CHUNK_ROWS = 1_000_000
+
+# numpy dtype kinds whose memory can be fed to the hash as-is
+_RAW_BYTES_KINDS = "biufcmM"
+
+
+def hash_object(obj: typing.Any) -> str:
+    """
+    Compute a content hash of an object.
+
+    Pandas and numpy objects are hashed by streaming their underlying memory
+    column-by-column into the hash (falling back to pandas' vectorized per-row hashing for
+    object and extension dtypes), so no serialized copy of the data is ever made. Containers
+    are hashed recursively, and anything else is hashed via its pickle.
+
+    Parameters
+    ----------
+    obj : object
+        The object to hash.
+
+    Returns
+    -------
+    digest : str
+        The hex digest of the hash.
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    _update_hash(hasher, obj)
+    return hasher.hexdigest()
+
+
+def compute_checkpoint_key(task: Task, input_mapping: typing.Mapping[str, typing.Any]) -> str:
+    """
+    Compute a content-addressed checkpoint key for a task run: a hash of the task's source code
+    and of all of its inputs.
+
+    Parameters
+    ----------
+    task : instance of prefect.core.task.Task
+        The task being run.
+    input_mapping : dict
+        The inputs of the task, as created by ``prefect_ds.checkpoint_handler._create_input_mapping``.
+
+    Returns
+    -------
+    checkpoint_key : str
+        The hex digest of the hash.
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    _update_hash(hasher, _get_task_source(task))
+    for input_name in sorted(name for name in input_mapping if name is not None):
+        _update_hash(hasher, input_name)
+        _update_hash(hasher, input_mapping[input_name])
+    return hasher.hexdigest()
+
+
+def _get_task_source(task: Task) -> str:
+    run_function = getattr(task.run, "__func__", task.run)
+    try:
+        return inspect.getsource(run_function)
+    except (OSError, TypeError):
+        # Source isn't available (e.g. the task was defined in an interactive session),
+        # so fall back to the compiled bytecode.
+        code = getattr(run_function, "__code__", None)
+        if code is None:
+            return type(task).__qualname__
+        return repr((code.co_code, code.co_consts, code.co_names))
+
+
+def _update_hash(hasher, obj: typing.Any):
+    if isinstance(obj, pd.DataFrame):
+        hasher.update(b"DataFrame")
+        _update_hash(hasher, list(obj.columns))
+        _update_hash(hasher, [str(dtype) for dtype in obj.dtypes])
+        _update_index_hash(hasher, obj.index)
+        for column_number in range(obj.shape[1]):
+            _update_series_hash(hasher, obj.iloc[:, column_number])
+    elif isinstance(obj, pd.Series):
+        hasher.update(b"Series")
+        _update_hash(hasher, obj.name)
+        hasher.update(str(obj.dtype).encode())
+        _update_index_hash(hasher, obj.index)
+        _update_series_hash(hasher, obj)
+    elif isinstance(obj, pd.Index):
+        hasher.update(b"Index")
+        _update_index_hash(hasher, obj)
+    elif isinstance(obj, np.ndarray):
+        hasher.update(b"ndarray")
+        hasher.update(f"{obj.dtype.str}{obj.shape}".encode())
+        if obj.dtype.kind in _RAW_BYTES_KINDS:
+            hasher.update(np.ascontiguousarray(obj).view(np.uint8))
+        else:
+            _update_series_hash(hasher, pd.Series(obj.ravel()))
+    elif isinstance(obj, (list, tuple)):
+        hasher.update(f"{type(obj).__name__}{len(obj)}".encode())
+        for item in obj:
+            _update_hash(hasher, item)
+    elif isinstance(obj, dict):
+        hasher.update(f"dict{len(obj)}".encode())
+        for key in sorted(obj, key=repr):
+            _update_hash(hasher, key)
+            _update_hash(hasher, obj[key])
+    elif isinstance(obj, Chunks):
+        if not obj.reiterable:
+            # Hashing the chunks would use them up before the task gets them
+            raise TypeError(
+                "Can't compute a checkpoint key from chunks that can only be iterated over once. "
+                "Checkpoint the task that produces them with a result handler created with chunked=True."
+            )
+        hasher.update(b"Chunks")
+        for chunk in obj:
+            _update_hash(hasher, chunk)
+    elif obj is None or isinstance(obj, (str, bytes, bool, int, float)):
+        hasher.update(f"{type(obj).__name__}:{obj!r}".encode())
+    else:
+        hasher.update(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _update_index_hash(hasher, index: pd.Index):
+    if isinstance(index, pd.RangeIndex):
+        hasher.update(f"RangeIndex{index.start},{index.stop},{index.step}".encode())
+        return
+    hasher.update(str(index.dtype).encode())
+    values = index.values
+    if index.nlevels == 1 and isinstance(values, np.ndarray) and values.dtype.kind in _RAW_BYTES_KINDS:
+        hasher.update(np.ascontiguousarray(values).view(np.uint8))
+    else:
+        hasher.update(pd.util.hash_pandas_object(index).values.view(np.uint8))
+
+
+def _update_series_hash(hasher, series: pd.Series):
+    values = series.values
+    if isinstance(values, np.ndarray) and values.dtype.kind in _RAW_BYTES_KINDS:
+        # Column data in a DataFrame block is contiguous, so this is normally zero-copy
+        hasher.update(np.ascontiguousarray(values).view(np.uint8))
+        return
+    for start in range(0, len(series), _HASH_CHUNK_ROWS):
+        chunk = series.iloc[start:start + _HASH_CHUNK_ROWS]
+        hasher.update(pd.util.hash_pandas_object(chunk, index=False).values.view(np.uint8))
@@ -0,0 +1,238 @@
+import collections
+import typing
+
+from prefect.engine.result import Result
+from prefect.engine.result_handlers import ResultHandler
+
+from prefect_ds.result import LazyResult
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+
+class PartitionPlan(typing.NamedTuple):
+    """
+    Which partitions of the result of an incremental task (one whose result handler has a
+    ``partition_key``) already have checkpoints, and which have to be computed.
+
+    Attributes
+    ----------
+    partition_key : str
+        The column the task's inputs and result are partitioned by.
+    inputs : list of str
+        The names of the task's inputs that are partitioned (DataFrames with a ``partition_key``
+        column). Other inputs are passed to the task whole.
+    partitions : list
+        Every value of ``partition_key`` found in the partitioned inputs, in sorted order.
+    checkpoint_keys : list of str or None
+        The checkpoint key of each partition (all ``None`` unless the result handler is
+        content-addressed).
+    missing : list
+        The partitions that have no checkpoint (or whose checkpoint is stale), in sorted order.
+    """
+    partition_key: str
+    inputs: typing.List[str]
+    partitions: typing.List[typing.Any]
+    checkpoint_keys: typing.List[typing.Optional[str]]
+    missing: typing.List[typing.Any]
+
+
+def get_partitioned_inputs(inputs: typing.Mapping[str, typing.Any], partition_key: str) -> typing.List[str]:
+    """
+    Find the inputs of a task that are partitioned by a column.
+
+    Parameters
+    ----------
+    inputs : dict
+        The task's inputs, by name.
+    partition_key : str
+        The column.
+
+    Returns
+    -------
+    names : list of str
+        The names of the inputs that are DataFrames with the column.
+    """
+    import pandas as pd
+
+    return [
+        name for name in inputs
+        if name is not None and isinstance(inputs[name], pd.DataFrame) and partition_key in inputs[name].columns
+    ]
+
+
+def get_partition_values(data: "pd.DataFrame", partition_key: str) -> typing.List[typing.Any]:
+    """
+    Get the partitions of a DataFrame.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        The data.
+    partition_key : str
+        The column the data is partitioned by.
+
+    Returns
+    -------
+    partitions : list
+        The distinct values of the column, in sorted order.
+
+    Raises
+    ------
+    ValueError
+        If the column has null values, whose rows wouldn't belong to any partition.
+    """
+    _check_partition_values(data, partition_key)
+    # Series.tolist gives Timestamps for datetime columns, matching the keys of DataFrame.groupby
+    return sorted(data[partition_key].drop_duplicates().tolist())
+
+
+def split_partitions(data: "pd.DataFrame", partition_key: str) -> typing.Iterator[typing.Tuple[typing.Any, "pd.DataFrame"]]:
+    """
+    Split a DataFrame into its partitions, one at a time.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        The data.
+    partition_key : str
+        The column the data is partitioned by.
+
+    Yields
+    ------
+    partition, rows : tuple
+        Each value of the column (in sorted order), with the rows that have it.
+
+    Raises
+    ------
+    ValueError
+        If the column has null values, whose rows wouldn't belong to any partition.
+    """
+    _check_partition_values(data, partition_key)
+    for partition, rows in data.groupby(partition_key, sort=True):
+        yield partition, rows
+
+
+def _check_partition_values(data: "pd.DataFrame", partition_key: str):
+    # Rows with a null partition would otherwise be silently dropped by DataFrame.groupby and isin
+    num_nulls = data[partition_key].isna().sum()
+    if num_nulls:
+        raise ValueError(
+            f"{num_nulls} rows have a null {partition_key}, so they don't belong to any partition; "
+            f"fill in or drop the nulls before partitioning by {partition_key}"
+        )
+
+
+def restrict_inputs(inputs: typing.Dict[str, Result], plan: PartitionPlan) -> typing.Dict[str, Result]:
+    """
+    Cut the partitioned inputs of an incremental task down to the partitions that have to be
+    computed.
+
+    Parameters
+    ----------
+    inputs : dict
+        The task's inputs, as ``Result`` objects by name.
+    plan : PartitionPlan
+        The plan for the task run.
+
+    Returns
+    -------
+    inputs : dict
+        A new dict of inputs, in which the partitioned inputs only have the rows of ``plan.missing``.
+    """
+    restricted_inputs = dict(inputs)
+    for name in plan.inputs:
+        data = inputs[name].value
+        restricted_inputs[name] = Result(
+            data[data[plan.partition_key].isin(plan.missing)], result_handler=inputs[name].result_handler
+        )
+    return restricted_inputs
+
+
+def partition_mapping(
+        input_mapping: typing.Mapping[str, typing.Any], partition_key: str, partition: typing.Any
+) -> typing.Mapping[str, typing.Any]:
+    """
+    Add the value of a partition to the inputs used to fill in a result handler's templated path,
+    without looking up any of the other inputs.
+
+    Parameters
+    ----------
+    input_mapping : dict
+        The task's inputs.
+    partition_key : str
+        The name of the template field holding the partition.
+    partition : object
+        The value of the partition.
+
+    Returns
+    -------
+    input_mapping : mapping
+        The inputs, plus ``partition_key``.
+    """
+    return collections.ChainMap({partition_key: partition}, input_mapping)
+
+
+class PartitionedResult(LazyResult):
+    """
+    The result of an incremental task: the union of the checkpoints of its partitions. Like a
+    ``LazyResult``, nothing is read from disk until the value is accessed, at which point every
+    partition is read (with the result handler's ``read`` method) and they are concatenated.
+
+    Args:
+        - result_handler (ResultHandler): the task's result handler, whose templated path
+            includes ``partition_key``
+        - partition_key (str): the column the result is partitioned by
+        - partitions (list): the values of ``partition_key`` of the partitions, in order
+        - checkpoint_keys (list): the checkpoint key of each partition
+        - input_mapping (dict, optional): the other inputs used to fill in the templated path
+        - read_kwargs (dict, optional): additional keyword arguments for ``read``
+    """
+
+    def __init__(
+        self,
+        result_handler: ResultHandler,
+        partition_key: str,
+        partitions: typing.List[typing.Any],
+        checkpoint_keys: typing.List[typing.Optional[str]],
+        input_mapping: typing.Dict[str, typing.Any] = None,
+        read_kwargs: typing.Dict[str, typing.Any] = None
+    ) -> None:
+        # Downstream tasks fingerprint this result by the keys of all of its partitions
+        checkpoint_key = None if None in checkpoint_keys else list(checkpoint_keys)
+        super().__init__(
+            result_handler=result_handler,
+            input_mapping=input_mapping,
+            checkpoint_key=checkpoint_key,
+            read_kwargs=read_kwargs
+        )
+        self.partition_key = partition_key
+        self.partitions = list(partitions)
+        self.checkpoint_keys = list(checkpoint_keys)
+
+    def _read(self) -> "pd.DataFrame":
+        import pandas as pd
+
+        return pd.concat([
+            self.result_handler.read(
+                input_mapping=partition_mapping(self.input_mapping, self.partition_key, partition),
+                checkpoint_key=checkpoint_key,
+                **self.read_kwargs
+            )
+            for partition, checkpoint_key in zip(self.partitions, self.checkpoint_keys)
+        ])
+
+    def _get_size(self) -> typing.Optional[int]:
+        if not hasattr(self.result_handler, "checkpoint_size"):
+            return None
+        return sum(
+            self.result_handler.checkpoint_size(
+                input_mapping=partition_mapping(self.input_mapping, self.partition_key, partition)
+            )
+            for partition in self.partitions
+        )
+
+    def __repr__(self) -> str:
+        if not self._is_loaded:
+            return f"<PartitionedResult: {len(self.partitions)} partitions, not loaded>"
+        return super().__repr__()
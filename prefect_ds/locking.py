@@ -0,0 +1,132 @@
+import os
+import pathlib
+import time
+import typing
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+LOCK_SUFFIX = ".lock"
+
+# How often (in seconds) to retry a lock that is held by someone else
+_POLL_INTERVAL = 0.05
+
+
+def lock_path(path: typing.Union[str, pathlib.Path]) -> pathlib.Path:
+    """
+    Get the location of the lock file belonging to a checkpoint.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The (fully formatted) path of the checkpoint.
+
+    Returns
+    -------
+    lock_path : pathlib.Path
+        The path of the lock file, which lives next to the checkpoint.
+    """
+    return pathlib.Path(str(path) + LOCK_SUFFIX)
+
+
+class CheckpointLock:
+    """
+    An exclusive lock on a checkpoint, shared by every thread and process on the machine (or
+    on any machine, for filesystems whose locks are honored across machines). The lock is an OS
+    file lock (``flock``, or ``msvcrt.locking`` on Windows) on a lock file next to the checkpoint
+    (``[path].lock``), so it is released automatically if the process holding it dies.
+    Lock files are left in place once released, since removing them would let two processes
+    lock different files for the same checkpoint.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The (fully formatted) path of the checkpoint.
+    """
+    def __init__(self, path: typing.Union[str, pathlib.Path]):
+        self.path = lock_path(path)
+        self._file_descriptor = None  # type: typing.Optional[int]
+
+    @property
+    def locked(self) -> bool:
+        """
+        Whether the lock is currently held by this object.
+        """
+        return self._file_descriptor is not None
+
+    def acquire(self, timeout: float = None) -> bool:
+        """
+        Acquire the lock, waiting until whoever holds it releases it.
+
+        Parameters
+        ----------
+        timeout : float or None
+            The maximum time to wait, in seconds. If ``None``, waits for as long as it takes.
+
+        Returns
+        -------
+        acquired : bool
+            Whether the lock was acquired before the timeout.
+        """
+        if self.locked:
+            raise RuntimeError(f"{self.path} is already locked by this object")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if timeout is None and os.name != "nt":
+            # Without a timeout, let the OS wake us as soon as the lock is free rather than polling
+            file_descriptor = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(file_descriptor, fcntl.LOCK_EX)
+            except BaseException:
+                os.close(file_descriptor)
+                raise
+            self._file_descriptor = file_descriptor
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            file_descriptor = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                _lock_file(file_descriptor)
+            except OSError:
+                os.close(file_descriptor)
+            else:
+                self._file_descriptor = file_descriptor
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(_POLL_INTERVAL)
+
+    def release(self):
+        """
+        Release the lock, if it is held.
+        """
+        if not self.locked:
+            return
+        file_descriptor, self._file_descriptor = self._file_descriptor, None
+        try:
+            _unlock_file(file_descriptor)
+        finally:
+            os.close(file_descriptor)
+
+    def __enter__(self) -> "CheckpointLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def _lock_file(file_descriptor: int):
+    # Raises OSError if the file is already locked
+    if os.name == "nt":
+        msvcrt.locking(file_descriptor, msvcrt.LK_NBLCK, 1)
+    else:
+        fcntl.flock(file_descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+def _unlock_file(file_descriptor: int):
+    if os.name == "nt":
+        msvcrt.locking(file_descriptor, msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(file_descriptor, fcntl.LOCK_UN)
@@ -0,0 +1,64 @@
+import json
+import os
+import pathlib
+import threading
+import typing
+
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def manifest_path(path: typing.Union[str, pathlib.Path]) -> pathlib.Path:
+    """
+    Get the location of the sidecar manifest belonging to a checkpoint.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The (fully formatted) path of the checkpoint.
+
+    Returns
+    -------
+    manifest_path : pathlib.Path
+        The path of the manifest, which lives next to the checkpoint.
+    """
+    return pathlib.Path(str(path) + MANIFEST_SUFFIX)
+
+
+def read_manifest(path: typing.Union[str, pathlib.Path]) -> typing.Dict[str, typing.Any]:
+    """
+    Read the sidecar manifest of a checkpoint.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The (fully formatted) path of the checkpoint.
+
+    Returns
+    -------
+    manifest : dict
+        The contents of the manifest, or an empty dictionary if there is no manifest.
+    """
+    try:
+        with open(manifest_path(path), "r") as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return {}
+
+
+def write_manifest(path: typing.Union[str, pathlib.Path], manifest: typing.Dict[str, typing.Any]):
+    """
+    Write the sidecar manifest of a checkpoint. The manifest is written to a temporary
+    file first and then moved into place, so readers never see a partial manifest.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The (fully formatted) path of the checkpoint.
+    manifest : dict
+        JSON-serializable contents of the manifest.
+    """
+    final_path = manifest_path(path)
+    temporary_path = final_path.with_name(f".{final_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(temporary_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file)
+    os.replace(temporary_path, final_path)
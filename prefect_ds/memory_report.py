@@ -0,0 +1,167 @@
+import time
+import typing
+
+from prefect.core.task import Task
+
+from prefect_ds.result_store import ResultEvent
+
+
+class MemoryEvent(typing.NamedTuple):
+    """
+    A change in the task results held in memory during a flow run.
+
+    Attributes
+    ----------
+    kind : str
+        What happened to the result: ``"result"`` (a task finished with the result in memory),
+        ``"load"`` (a lazily-loaded result was read), ``"purge"`` or ``"spill"``.
+    task : instance of prefect.core.task.Task
+        The task the result belongs to.
+    map_index : int or None
+        For children of mapped tasks, the index of the child.
+    size : int
+        The size of the result, in bytes.
+    resident_bytes : int
+        The total size of the results held in memory after the event.
+    elapsed : float
+        The number of seconds since the start of the flow run.
+    """
+    kind: str
+    task: Task
+    map_index: typing.Optional[int]
+    size: int
+    resident_bytes: int
+    elapsed: float
+
+
+class MemoryReport:
+    """
+    A record of the memory used by task results over the course of a flow run, as attached to
+    the final state of a flow run by ``DSFlowRunner`` (as ``state.memory_report``).
+
+    Attributes
+    ----------
+    result_sizes : dict
+        The size in bytes of the result of each task (summed over children, for mapped tasks)
+        that was held in memory at some point during the run.
+    events : list of MemoryEvent
+        Every change in the results held in memory, in order.
+    resident_bytes : int
+        The total size of the results currently held in memory.
+    peak_resident_bytes : int
+        The largest total size of the results held in memory at any point in the run.
+    peak_resident_sizes : dict
+        The size in bytes of the results of each task held in memory at the peak.
+    """
+    def __init__(self):
+        self._result_sizes = {}  # type: typing.Dict[typing.Tuple[Task, typing.Optional[int]], int]
+        self.events = []  # type: typing.List[MemoryEvent]
+        self.resident_bytes = 0
+        self.peak_resident_bytes = 0
+        self.peak_resident_sizes = {}  # type: typing.Dict[Task, int]
+        self._start_time = time.perf_counter()
+
+    @property
+    def result_sizes(self) -> typing.Dict[Task, int]:
+        result_sizes = {}
+        for (task, _), size in self._result_sizes.items():
+            result_sizes[task] = result_sizes.get(task, 0) + size
+        return result_sizes
+
+    @property
+    def purge_events(self) -> typing.List[MemoryEvent]:
+        """
+        The events recording results that were purged.
+        """
+        return [event for event in self.events if event.kind == "purge"]
+
+    @property
+    def freed_bytes(self) -> int:
+        """
+        The total number of bytes freed by purging results.
+        """
+        return sum(event.size for event in self.purge_events)
+
+    def record(self, kind: str, result_events: typing.Iterable[ResultEvent], resident_bytes: int):
+        """
+        Record a set of changes to the results held in memory.
+
+        Parameters
+        ----------
+        kind : str
+            The kind of change; see ``MemoryEvent``.
+        result_events : iterable of ResultEvent
+            The results that changed.
+        resident_bytes : int
+            The total size of the results held in memory after the changes.
+        """
+        self.resident_bytes = resident_bytes
+        elapsed = time.perf_counter() - self._start_time
+        for result_event in result_events:
+            if kind in ("result", "load"):
+                self._result_sizes[(result_event.task, result_event.map_index)] = result_event.size
+            self.events.append(MemoryEvent(
+                kind=kind,
+                task=result_event.task,
+                map_index=result_event.map_index,
+                size=result_event.size,
+                resident_bytes=resident_bytes,
+                elapsed=elapsed
+            ))
+
+    def update_peak(self, get_resident_sizes: typing.Callable[[], typing.Dict[Task, int]]):
+        """
+        Check whether the results currently held in memory are the largest so far, and
+        if so take a snapshot of them.
+
+        Parameters
+        ----------
+        get_resident_sizes : callable
+            A function returning the size of the results of each task currently in memory.
+            Only called if there is a new peak.
+        """
+        if self.resident_bytes > self.peak_resident_bytes:
+            self.peak_resident_bytes = self.resident_bytes
+            self.peak_resident_sizes = get_resident_sizes()
+
+    def get_largest_at_peak(self, num_tasks: int = 10) -> typing.List[typing.Tuple[Task, int]]:
+        """
+        Get the tasks whose results used the most memory at the peak.
+
+        Parameters
+        ----------
+        num_tasks : int
+            The maximum number of tasks to return.
+
+        Returns
+        -------
+        largest : list of (Task, int) tuples
+            The tasks and the sizes of their results, largest first.
+        """
+        largest = sorted(self.peak_resident_sizes.items(), key=lambda task_and_size: task_and_size[1], reverse=True)
+        return largest[:num_tasks]
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+        Convert the report into JSON-serializable form, with tasks represented by their names.
+
+        Returns
+        -------
+        report : dict
+            The report.
+        """
+        return {
+            "resident_bytes": self.resident_bytes,
+            "peak_resident_bytes": self.peak_resident_bytes,
+            "freed_bytes": self.freed_bytes,
+            "result_sizes": [
+                {"task": task.name, "size": size} for task, size in self.result_sizes.items()
+            ],
+            "peak_resident_sizes": [
+                {"task": task.name, "size": size}
+                for task, size in self.get_largest_at_peak(len(self.peak_resident_sizes))
+            ],
+            "events": [
+                dict(event._asdict(), task=event.task.name) for event in self.events
+            ],
+        }
@@ -1,31 +1,118 @@
-import pandas as pd
+import concurrent.futures
+import functools
 import pathlib
 import typing
 
-from prefect.engine.result_handlers.result_handler import ResultHandler
+from prefect_ds.cache import CheckpointCache
+from prefect_ds.chunks import Chunks, read_chunks, supports_chunks, write_chunks
+from prefect_ds.compaction import DtypeChanges, cast_columns, compact_dtypes
+from prefect_ds.compression import (
+    Compression, check_compression, choose_compression, get_codecs, read_compressed, write_compressed
+)
+from prefect_ds.file_result_handler import FileResultHandler, StaleCheckpointError, write_atomically
+from prefect_ds.formats import get_file_types, get_format
+from prefect_ds.manifest import write_manifest
+from prefect_ds.projection import Projection, apply_projection, get_read_columns
 
+if typing.TYPE_CHECKING:
+    import pandas as pd
 
-def _generate_pandas_io_methods() -> typing.Tuple[typing.Dict[str, typing.Callable], typing.Dict[str, str]]:
-    all_read_ops = [method for method in dir(pd) if method.lower().startswith("read_")]
-    all_write_ops = [method for method in dir(pd.DataFrame()) if method.lower().startswith("to_")]
-    read_suffixes = [method.lower().split("_")[1] for method in all_read_ops]
-    write_suffixes = [method.lower().split("_")[1] for method in all_write_ops]
 
-    read_io_ops = {
-        read_method.split("_")[1].lower(): getattr(pd, read_method)
-        for read_method in all_read_ops
-        if read_method.split("_")[1].lower() in write_suffixes
-    }
-    write_io_ops = {
-        write_method.split("_")[1].lower(): write_method
-        for write_method in all_write_ops
-        if write_method.split("_")[1].lower() in read_suffixes
-    }
+# File types whose writers can't store an index other than the default RangeIndex,
+# so partitions have to be written (and read back) without their index
+_DEFAULT_INDEX_FILE_TYPES = {"feather"}
 
-    return read_io_ops, write_io_ops
+# File types whose writers aren't safe to run from multiple threads at once
+_SERIAL_FILE_TYPES = {"hdf"}
 
+# File types whose writers add to an existing file by default (e.g. another key in an HDF5 store)
+# rather than replacing it, so they can't be written to a temporary file and moved into place
+_APPENDING_FILE_TYPES = {"hdf"}
 
-class PandasResultHandler(ResultHandler):
+# File types whose readers can read a subset of columns (via a ``columns`` argument)
+_COLUMN_FILE_TYPES = {"parquet", "feather"}
+
+# File types whose readers can skip rows that don't match a filter (via a ``filters`` argument)
+_FILTER_FILE_TYPES = {"parquet"}
+
+
+def _has_stored_index(parquet_path_string: str) -> bool:
+    # A RangeIndex is stored in parquet metadata as just its start, stop and step, so when rows
+    # are filtered out while reading, pyarrow can't tell which rows the remaining ones were and
+    # gives them a new index. Filters are only pushed down when the index is stored as data.
+    from pyarrow import parquet
+
+    try:
+        pandas_metadata = parquet.read_schema(parquet_path_string).pandas_metadata or {}
+    except (OSError, ValueError):
+        return False
+    return all(isinstance(index_column, str) for index_column in pandas_metadata.get("index_columns", []))
+
+
+def _write_memory_mappable_feather(result: "pd.DataFrame", path_string: str, **write_kwargs):
+    # Uncompressed, and in a single record batch, so every column is one contiguous buffer
+    # that can be used in place when the file is memory-mapped. Unlike ``DataFrame.to_feather``,
+    # any index is kept (stored as a column).
+    from pyarrow import Table, feather
+
+    write_kwargs = dict({"compression": "uncompressed", "chunksize": max(len(result), 1)}, **write_kwargs)
+    feather.write_feather(Table.from_pandas(result, preserve_index=None), path_string, **write_kwargs)
+
+
+# Options of PandasResultHandler that can't be used together
+_CONFLICTING_OPTIONS = [
+    ("memory_map", "num_partitions"),
+    ("memory_map", "compression"),
+    ("chunked", "num_partitions"),
+    ("chunked", "memory_map"),
+    ("chunked", "compression"),
+    ("chunked", "partition_key"),
+    ("chunked", "compact"),
+    ("partition_key", "locking"),
+]
+
+# Options of PandasResultHandler that can only be used with another option
+_REQUIRED_OPTIONS = {
+    "compression_level": "compression",
+    "restore_dtypes": "compact",
+}
+
+
+def _check_options(file_type: str, write_kwargs: dict, **options):
+    # Checks the options of a PandasResultHandler (and how they combine) up front, so a handler
+    # that can't work fails when it's created rather than when it first writes a result.
+    # An option is set if it's not None or False.
+    is_set = {name: value is not None and value is not False for name, value in options.items()}
+    if is_set["num_partitions"] and options["num_partitions"] < 1:
+        raise ValueError(f"num_partitions must be at least 1, got {options['num_partitions']}")
+    if is_set["memory_map"] and file_type.lower() != "feather":
+        raise ValueError(f"memory_map is only supported for feather files, not {file_type}")
+    if is_set["chunked"] and not supports_chunks(file_type):
+        raise ValueError(f"chunked is only supported for parquet, feather and csv files, not {file_type}")
+    for name, required_name in _REQUIRED_OPTIONS.items():
+        if is_set[name] and not is_set[required_name]:
+            raise ValueError(f"{name} requires {required_name}")
+    if options["compression"] == "auto" and is_set["compression_level"]:
+        raise ValueError("compression_level can't be combined with automatic compression")
+    conflicts = [
+        f"{name} can't be combined with {other_name}"
+        for name, other_name in _CONFLICTING_OPTIONS
+        if is_set[name] and is_set[other_name]
+    ]
+    if conflicts:
+        raise ValueError("Conflicting options: " + ", ".join(conflicts))
+    compression = options["compression"]
+    if compression is not None:
+        if "compression" in write_kwargs:
+            raise ValueError("Pass compression to PandasResultHandler rather than in write_kwargs")
+        if compression == "auto":
+            if not get_codecs(file_type):
+                raise ValueError(f"Compression is not supported for {file_type} files")
+        else:
+            check_compression(file_type, Compression(compression, options["compression_level"]))
+
+
+class PandasResultHandler(FileResultHandler):
     """
     Hook for storing and retrieving task results in Pandas DataFrames.
     Task results are written/read via the standard Pandas
@@ -35,7 +122,8 @@ class PandasResultHandler(ResultHandler):
     Parameters
     ----------
     path : str or pathlib.Path
-        Filepath to be read from or written to, including file name and extension.
+        Filepath to be read from or written to, including file name and extension, or a URL
+        (see ``local_cache_dir``).
     file_type : str
         The type of file to write to, e.g. "csv" or "parquet". Must match the name
         of the appropriate ``to_[FILETYPE]``/``read_[FILETYPE]`` method.
@@ -43,6 +131,99 @@ class PandasResultHandler(ResultHandler):
         If present, passed as **kwargs to the ``read_[FILETYPE]`` method.
     write_kwargs : dict or None
         If present, passed as **kwargs tot he ``to_[FILETYPE]`` method.
+    content_addressed : bool
+        If ``True``, ``prefect_ds.checkpoint_handler.checkpoint_handler`` computes a hash of
+        the task's source code and inputs for every run, and stores it in a sidecar manifest next
+        to the result (``[path].manifest.json``). A checkpoint is only reused when the stored hash
+        matches, so changes to upstream data or to the task itself trigger a rerun.
+    num_partitions : int or None
+        If present, results are split into (up to) this many chunks of rows, which are written
+        in parallel as separate files (``part-00000.[FILETYPE]``, ``part-00001.[FILETYPE]``, ...)
+        in a directory at ``path``, and read back in parallel and concatenated by ``read``.
+        This is most useful for formats like parquet and feather, whose writers release the GIL.
+        The list of partitions is stored in the manifest (``[path].manifest.json``), which is only
+        written once all of the partitions have been, so partially-written results are never read.
+    max_workers : int or None
+        The maximum number of threads used to write and read partitions. Defaults to the
+        ``concurrent.futures.ThreadPoolExecutor`` default. Partitions of file types whose writers
+        aren't thread-safe (HDF5) are always written one at a time.
+    async_write : bool
+        If ``True``, ``prefect_ds.checkpoint_handler.checkpoint_handler`` hands results to a pool
+        of background threads to be written (see ``prefect_ds.background_writer``), so that
+        downstream tasks can start without waiting for the write. Writes are always atomic, so
+        a checkpoint is either complete or absent. Results must not be modified in place by
+        downstream tasks while they are being written.
+    memory_map : bool
+        If ``True`` (feather files only), results are written uncompressed as a single Arrow
+        record batch, and read by memory-mapping the file: numeric columns without missing values
+        are used directly from the mapped file rather than copied, so processes reading the same
+        checkpoint share it through the OS page cache, and only the pages of the columns
+        selected with ``read_kwargs={"columns": [...]}`` are ever read from disk. Arrays backed
+        by the file are read-only, so downstream tasks can't modify them in place. Other
+        ``write_kwargs`` are passed to ``pyarrow.feather.write_feather``.
+    compression : str or None
+        If present, the codec results are compressed with (see ``prefect_ds.compression``):
+        one of ``"snappy"``, ``"gzip"``, ``"brotli"``, ``"lz4"`` or ``"zstd"`` for parquet files,
+        ``"lz4"`` or ``"zstd"`` for feather files (written with ``pyarrow.feather.write_feather``,
+        keeping any index), and ``"gzip"``, ``"bz2"``, ``"brotli"``, ``"lz4"`` or ``"zstd"`` for csv
+        and json files, which are written through a compressed stream. If ``"auto"``, the first
+        rows of each result are written to memory with every codec (and a few levels of each),
+        and the one that would write the whole result fastest, counting both the time spent
+        compressing and the time spent writing the compressed bytes, is used. The codec used is
+        stored in the manifest (``[path].manifest.json``), so ``read`` needs no configuration.
+    compression_level : int or None
+        If present, the level of the codec given by ``compression``, for the codecs whose level
+        can be set (gzip, brotli and zstd for parquet files, zstd for feather files).
+    locking : bool
+        If ``True``, ``prefect_ds.checkpoint_handler.checkpoint_handler`` locks a missing checkpoint
+        while computing and writing it, so concurrent flow runs (in other threads or processes)
+        that need the same checkpoint wait for it to be written and then read it, rather than
+        all computing it (see ``prefect_ds.locking``).
+    lock_timeout : float or None
+        The maximum time, in seconds, to wait for a checkpoint that another run is computing
+        before running the task anyway. If ``None``, waits for as long as it takes.
+    cache : prefect_ds.cache.CheckpointCache or None
+        If present, ``prefect_ds.checkpoint_handler.checkpoint_handler`` records each checkpoint
+        it writes or reuses (with its size, the task and flow that produced it, and when it was
+        last used) in this cache's index, which can remove the least recently (or least often)
+        used checkpoints to stay under a size quota, or prune them by age or flow.
+    chunked : bool
+        If ``True`` (parquet, feather and csv files only), results are streams of DataFrame chunks
+        (see ``prefect_ds.chunks.Chunks``, e.g. the chunks yielded by a task): ``write`` writes each
+        chunk as it arrives (as a parquet row group, a feather record batch, or rows appended to a
+        csv file), and ``read`` returns a ``Chunks`` that reads the chunks back one at a time, so
+        only one chunk is ever in memory. A single DataFrame is written as one chunk. For parquet
+        and feather files, ``write_kwargs`` are passed to ``pyarrow.parquet.ParquetWriter`` and
+        ``pyarrow.ipc.new_file``, and csv files are read ``read_kwargs["chunksize"]`` rows at a time.
+    partition_key : str or None
+        If present, ``prefect_ds.checkpoint_handler.checkpoint_handler`` computes results
+        incrementally (see ``prefect_ds.incremental``): the task's DataFrame inputs with a
+        ``partition_key`` column are split by its values, each partition of the result is
+        checkpointed separately (``path`` must contain a ``{partition_key}`` template, which is
+        filled in with the partition's value), and on a rerun the task is only given the rows of the
+        partitions that don't have a checkpoint yet (or, if ``content_addressed`` is set, whose
+        input rows have changed). The task's result must have a ``partition_key`` column too.
+        Partitions are always written in the task's thread, even with ``async_write``.
+    compact : bool
+        If ``True`` (not with ``chunked``), results are compacted before they are written (see
+        ``prefect_ds.compaction.compact_dtypes``): integer columns are downcast to the smallest
+        dtype that holds their values, float columns to float32 where that's exact, and string
+        columns with few distinct values become categoricals (dictionary-encoded by parquet and
+        feather; kept as strings in HDF5 files, which can't store them). The original and the
+        compacted dtypes are stored in the manifest (``[path].manifest.json``), and ``read`` returns
+        the compacted dtypes (reapplying them for file types that don't store dtypes, like csv),
+        so downstream tasks that read the checkpoint use less memory. Arithmetic on downcast
+        columns happens in the smaller dtype, so it can overflow.
+    restore_dtypes : bool
+        If ``True`` (with ``compact`` only), ``read`` casts compacted columns back to their original
+        dtypes, so the round trip is lossless while the checkpoint on disk stays compact.
+    local_cache_dir : str or pathlib.Path or None
+        If ``path`` is a URL like ``"s3://bucket/output.parquet"``, the directory results are read
+        and written through (see ``prefect_ds.file_result_handler.FileResultHandler``): a result is
+        downloaded once, and read from local disk until it's replaced remotely. Large results are
+        best written with ``num_partitions``, so their partitions are uploaded in parallel.
+    storage_options : dict or None
+        If ``path`` is a URL, passed to the ``fsspec`` file system for its protocol (e.g. credentials).
 
     .. note::
         Because the filepath is fully specified, when using this handler in a ``map``
@@ -53,53 +234,305 @@ class PandasResultHandler(ResultHandler):
         supplying a ``file_type`` like ``"output_{sample_name}.csv"`` will fill in the
         values of that argument for each iteration of the map.
     """
-    _READ_OPS_MAPPING, _WRITE_OPS_MAPPING = _generate_pandas_io_methods()
-    assert set(_READ_OPS_MAPPING.keys()) == set(_WRITE_OPS_MAPPING.keys())
+    # Tells prefect_ds.projection that ``read`` accepts ``columns`` and ``filters``
+    supports_projection = True
 
     def __init__(
             self,
             path: typing.Union[str, pathlib.Path],
             file_type: str,
             read_kwargs: dict = None,
-            write_kwargs: dict = None
+            write_kwargs: dict = None,
+            content_addressed: bool = False,
+            num_partitions: int = None,
+            max_workers: int = None,
+            async_write: bool = False,
+            memory_map: bool = False,
+            compression: str = None,
+            compression_level: int = None,
+            locking: bool = False,
+            lock_timeout: float = None,
+            cache: CheckpointCache = None,
+            chunked: bool = False,
+            partition_key: str = None,
+            compact: bool = False,
+            restore_dtypes: bool = False,
+            local_cache_dir: typing.Union[str, pathlib.Path] = None,
+            storage_options: dict = None
     ):
-        self.path = pathlib.Path(path)
         self.file_type = file_type
 
-        if self.file_type.lower() not in self._READ_OPS_MAPPING:
+        if self.file_type.lower() not in get_file_types():
             raise ValueError(
                 f"{self.file_type} not available. "
-                f"Known file extensions are {list(self._READ_OPS_MAPPING.keys())}"
+                f"Known file extensions are {get_file_types()}"
             )
         self.read_kwargs = read_kwargs if read_kwargs is not None else {}
         self.write_kwargs = write_kwargs if write_kwargs is not None else {}
-        super().__init__()
+        _check_options(
+            self.file_type,
+            self.write_kwargs,
+            num_partitions=num_partitions,
+            memory_map=memory_map,
+            compression=compression,
+            compression_level=compression_level,
+            locking=locking,
+            chunked=chunked,
+            partition_key=partition_key,
+            compact=compact,
+            restore_dtypes=restore_dtypes
+        )
+        self.num_partitions = num_partitions
+        self.memory_map = memory_map
+        self.compression = compression
+        self.compression_level = compression_level
+        self.chunked = chunked
+        self.partition_key = partition_key
+        self.compact = compact
+        self.restore_dtypes = restore_dtypes
+        super().__init__(
+            path,
+            content_addressed=content_addressed,
+            async_write=async_write,
+            max_workers=max_workers,
+            locking=locking,
+            lock_timeout=lock_timeout,
+            cache=cache,
+            local_cache_dir=local_cache_dir,
+            storage_options=storage_options
+        )
+        if partition_key is not None and partition_key not in self.template_fields:
+            raise ValueError(f"path must contain a {{{partition_key}}} template to be partitioned by {partition_key}")
 
-    def read(self, *, input_mapping=None) -> pd.DataFrame:
+    def read(
+            self,
+            *,
+            input_mapping=None,
+            checkpoint_key: str = None,
+            columns: typing.List[str] = None,
+            filters: typing.List = None
+    ) -> typing.Union["pd.DataFrame", Chunks]:
         """
-        Read a result from the specified ``path`` using the appropriate ``read_[FILETYPE]`` method.
+        Read a result from the specified ``path`` using the appropriate ``read_[FILETYPE]`` method
+        (or, if ``chunked`` is set, get a ``Chunks`` that reads it a chunk at a time).
 
         Parameters
         ----------
         input_mapping : dict
             If present, passed to ``path.format()`` to set the final filename. This is necessary
             for mapped tasks, to prevent the same file from being read from for each map sub-step.
+        checkpoint_key : str or None
+            If present, the result is only read if the manifest next to it was written with
+            the same key.
+        columns : list of str or None
+            If present, only these columns are returned. For parquet and feather files (including
+            memory-mapped ones), only these columns (and any used in ``filters``) are read.
+        filters : list or None
+            If present, only the rows matching these filters are returned (see
+            ``prefect_ds.projection.Projection`` for the format). For parquet files the filters are
+            passed to ``pyarrow``, so row groups that don't match are skipped; for other file
+            types the rows are filtered after reading.
+
+        Raises
+        ------
+        StaleCheckpointError
+            If ``checkpoint_key`` is given and does not match the key in the manifest.
         """
 
-        input_mapping = {} if input_mapping is None else input_mapping
-        path_string = str(self.path).format(**input_mapping)
+        path_string = self._format_path(input_mapping)
+        manifest = self._read_checked_manifest(path_string, checkpoint_key)
+        self._fetch_result(path_string)
+        projection = Projection(columns=columns, filters=filters)
+        if self.chunked:
+            return Chunks(functools.partial(self._read_chunks, path_string, projection))
+        if self.num_partitions is not None and manifest.get("partitions"):
+            read_kwargs = self._get_read_kwargs(projection, str(pathlib.Path(path_string) / manifest["partitions"][0]))
+        else:
+            read_kwargs = self._get_read_kwargs(projection, path_string)
+        compression = Compression(**manifest["compression"]) if self.compression is not None else None
         self.logger.debug("Starting to read result from {}...".format(path_string))
-        data = self._READ_OPS_MAPPING[self.file_type.lower()](
-            path_string,
-            **self.read_kwargs
-        )
+        if self.num_partitions is not None:
+            data = self._read_partitions(path_string, manifest, read_kwargs, compression)
+        elif self.memory_map:
+            data = self._read_memory_mapped(path_string, read_kwargs.get("columns"))
+        else:
+            data = self._read_file(path_string, read_kwargs, compression)
+        if projection != Projection():
+            data = apply_projection(data, projection)
+        if self.compact:
+            dtype_changes = DtypeChanges(**manifest["dtypes"])
+            data = cast_columns(data, dtype_changes.original if self.restore_dtypes else dtype_changes.compacted)
         self.logger.debug("Finished reading result from {}...".format(path_string))
         return data
 
-    def write(self, result: pd.DataFrame, input_mapping=None):
-        input_mapping = {} if input_mapping is None else input_mapping
-        path_string = str(self.path).format(**input_mapping)
+    def write(self, result: typing.Union["pd.DataFrame", Chunks], input_mapping=None, checkpoint_key: str = None):
+        """
+        Write a result to the specified ``path`` using the appropriate ``to_[FILETYPE]`` method.
+        The result is written to a temporary file which is then moved to ``path``, so readers
+        never see a partially-written result (except for HDF5, which is written in place so that
+        other keys in the same store are kept).
+
+        Parameters
+        ----------
+        result : pandas.DataFrame or prefect_ds.chunks.Chunks
+            The result to write. Chunks can only be written if ``chunked`` is set.
+        input_mapping : dict
+            If present, passed to ``path.format()`` to set the final filename.
+        checkpoint_key : str or None
+            If present, stored in a manifest next to the result after the result has been written.
+        """
+        if isinstance(result, Chunks) and not self.chunked:
+            raise TypeError("Chunks can only be written by a PandasResultHandler created with chunked=True")
+        path_string = self._format_path(input_mapping)
         self.logger.debug("Starting to write result to {}...".format(path_string))
-        write_function = getattr(result, self._WRITE_OPS_MAPPING[self.file_type.lower()])
-        write_function(path_string, **self.write_kwargs)
+        self._start_write(path_string)
+        manifest = {}
+        if self.compact:
+            result, dtype_changes = compact_dtypes(result, categories=self.file_type.lower() != "hdf")
+            manifest["dtypes"] = dict(dtype_changes._asdict())
+        compression = self._get_compression(result)
+        if compression is not None:
+            manifest["compression"] = dict(compression._asdict())
+        if self.chunked:
+            chunks = result if isinstance(result, Chunks) else [result]
+            write_atomically(
+                path_string,
+                functools.partial(write_chunks, chunks, file_type=self.file_type, **self.write_kwargs)
+            )
+        elif self.num_partitions is not None:
+            manifest["partitions"] = self._write_partitions(result, path_string, compression)
+        else:
+            self._write_file(result, path_string, compression)
+        if checkpoint_key is not None:
+            manifest["checkpoint_key"] = checkpoint_key
+        if manifest:
+            write_manifest(path_string, manifest)
+        self._publish_result(path_string)
         self.logger.debug("Finished writing result to {}...".format(path_string))
+
+    @property
+    def _requires_manifest(self) -> bool:
+        return self.num_partitions is not None or self.compression is not None or self.compact
+
+    def _is_complete(self, manifest: typing.Dict[str, typing.Any]) -> bool:
+        if self.num_partitions is not None and "partitions" not in manifest:
+            return False
+        if self.compression is not None and "compression" not in manifest:
+            return False
+        if self.compact and "dtypes" not in manifest:
+            return False
+        return True
+
+    def _get_compression(self, result: "pd.DataFrame") -> typing.Optional[Compression]:
+        if self.compression is None:
+            return None
+        if self.compression == "auto":
+            compression = choose_compression(result, self.file_type, **self.write_kwargs)
+            self.logger.debug(f"Chose {compression.codec} (level {compression.level}) compression")
+            return compression
+        return Compression(self.compression, self.compression_level)
+
+    def _write_partitions(
+            self, result: "pd.DataFrame", path_string: str, compression: typing.Optional[Compression]
+    ) -> typing.List[str]:
+        directory = pathlib.Path(path_string)
+        directory.mkdir(parents=True, exist_ok=True)
+        for old_partition in directory.glob(f"part-*.{self.file_type.lower()}"):
+            old_partition.unlink()
+
+        num_partitions = max(min(self.num_partitions, len(result)), 1)
+        boundaries = [len(result) * partition // num_partitions for partition in range(num_partitions + 1)]
+        partition_names = [f"part-{partition:05d}.{self.file_type.lower()}" for partition in range(num_partitions)]
+
+        def write_partition(partition):
+            chunk = result.iloc[boundaries[partition]:boundaries[partition + 1]]
+            if self.file_type.lower() in _DEFAULT_INDEX_FILE_TYPES:
+                chunk = chunk.reset_index(drop=True)
+            self._write_file(chunk, str(directory / partition_names[partition]), compression)
+
+        self._map_partitions(write_partition, range(num_partitions))
+        return partition_names
+
+    def _write_file(self, result: "pd.DataFrame", path_string: str, compression: typing.Optional[Compression]):
+        if self.memory_map:
+            write_function = functools.partial(_write_memory_mappable_feather, result, **self.write_kwargs)
+        elif compression is not None:
+            write_function = functools.partial(
+                write_compressed, result, file_type=self.file_type, compression=compression, **self.write_kwargs
+            )
+        else:
+            write_function = functools.partial(get_format(self.file_type).write, result, **self.write_kwargs)
+        if self.file_type.lower() in _APPENDING_FILE_TYPES:
+            write_function(path_string)
+        else:
+            write_atomically(path_string, write_function)
+
+    def _get_read_kwargs(self, projection: Projection, file_path_string: str) -> typing.Dict[str, typing.Any]:
+        read_kwargs = dict(self.read_kwargs)
+        read_columns = get_read_columns(projection)
+        if read_columns is not None and self.file_type.lower() in _COLUMN_FILE_TYPES:
+            read_kwargs["columns"] = read_columns
+        if (
+                projection.filters
+                and self.file_type.lower() in _FILTER_FILE_TYPES
+                and _has_stored_index(file_path_string)
+        ):
+            read_kwargs["filters"] = projection.filters
+        return read_kwargs
+
+    def _read_memory_mapped(self, path_string: str, columns: typing.Optional[typing.List[str]]) -> "pd.DataFrame":
+        from pyarrow import ipc, memory_map
+
+        with memory_map(path_string) as source:
+            table = ipc.open_file(source).read_all()
+        if columns is not None:
+            # Columns that aren't selected are never touched, so their pages are never read
+            index_columns = [
+                index_column for index_column in (table.schema.pandas_metadata or {}).get("index_columns", [])
+                if isinstance(index_column, str)  # RangeIndexes are stored as metadata rather than columns
+            ]
+            table = table.select(list(columns) + index_columns)
+        # With one block per column, columns that don't need converting (numeric data without
+        # nulls) are views of the mapped file rather than copies
+        return table.to_pandas(split_blocks=True)
+
+    def _read_file(
+            self,
+            path_string: str,
+            read_kwargs: typing.Dict[str, typing.Any],
+            compression: typing.Optional[Compression]
+    ) -> "pd.DataFrame":
+        if compression is not None:
+            return read_compressed(path_string, self.file_type, compression, **read_kwargs)
+        return get_format(self.file_type).read(path_string, **read_kwargs)
+
+    def _read_chunks(self, path_string: str, projection: Projection) -> typing.Iterator["pd.DataFrame"]:
+        read_kwargs = dict(self.read_kwargs)
+        read_columns = get_read_columns(projection)
+        if read_columns is not None:
+            read_kwargs["columns"] = read_columns
+        for chunk in read_chunks(path_string, self.file_type, **read_kwargs):
+            yield apply_projection(chunk, projection) if projection != Projection() else chunk
+
+    def _read_partitions(
+            self,
+            path_string: str,
+            manifest: typing.Dict[str, typing.Any],
+            read_kwargs: typing.Dict[str, typing.Any],
+            compression: typing.Optional[Compression]
+    ) -> "pd.DataFrame":
+        chunks = self._map_partitions(
+            lambda partition_name: self._read_file(
+                str(pathlib.Path(path_string) / partition_name), read_kwargs, compression
+            ),
+            manifest["partitions"]
+        )
+        import pandas as pd
+
+        return pd.concat(chunks, ignore_index=self.file_type.lower() in _DEFAULT_INDEX_FILE_TYPES)
+
+    def _map_partitions(self, function: typing.Callable, partitions: typing.Iterable) -> typing.List[typing.Any]:
+        if self.file_type.lower() in _SERIAL_FILE_TYPES:
+            return [function(partition) for partition in partitions]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(function, partitions))
@@ -0,0 +1,315 @@
+import concurrent.futures
+import contextlib
+import inspect
+import multiprocessing
+import os
+import threading
+import typing
+import weakref
+
+import cloudpickle
+import prefect
+from prefect.core.task import Parameter
+from prefect.engine.executors.base import Executor
+
+from prefect_ds.shared_memory import DEFAULT_DIRECTORY, HAS_PICKLE_PROTOCOL_5, SharedObject, attach, release, share
+
+
+class ProcessExecutor(Executor):
+    """
+    An executor that runs tasks in a pool of worker processes, so that CPU-bound tasks in
+    independent branches of a flow run in parallel instead of contending for the GIL.
+
+    Task results aren't pickled and sent back and forth between processes. Instead, the data of
+    each result (e.g. the columns of a DataFrame) is written once to shared memory (see
+    ``prefect_ds.shared_memory``), and every process that needs it, including the worker processes
+    running downstream tasks, maps it into memory without copying it. The shared memory of a result
+    is released once the flow runner drops it, which ``DSFlowRunner`` does as soon as all of the
+    result's downstream tasks have run.
+
+    Everything else (task runners, state handlers, checkpointing) runs in threads of the main
+    process. Parameters are run in the main process, as are tasks if ``max_workers`` is 0. Task
+    results must be picklable, so tasks can't stream chunks (see ``prefect_ds.chunks``), and
+    timeouts are soft: a task that times out fails, but keeps running in its worker process.
+
+    Use it like any other executor: ``DSFlowRunner(flow).run(executor=ProcessExecutor())``.
+
+    Parameters
+    ----------
+    max_workers : int or None
+        The number of worker processes. Defaults to the number of CPUs.
+    max_threads : int or None
+        The number of tasks that can be running (or waiting for their upstream tasks) at once in
+        the main process. Defaults to four times ``max_workers``.
+    shared_dir : str, pathlib.Path or None
+        The directory to put shared results in. Defaults to ``/dev/shm`` where there is one, and
+        the system temporary directory elsewhere (where shared results are backed by disk).
+    mp_context : multiprocessing context or None
+        The context used to start the worker processes. Defaults to ``"spawn"``, as forking a process
+        with running threads isn't safe.
+    """
+    def __init__(
+            self,
+            max_workers: int = None,
+            max_threads: int = None,
+            shared_dir: typing.Union[str, os.PathLike] = None,
+            mp_context: multiprocessing.context.BaseContext = None
+    ) -> None:
+        if not HAS_PICKLE_PROTOCOL_5:
+            raise RuntimeError(
+                "ProcessExecutor needs pickle protocol 5: use Python 3.8 or later, or install pickle5"
+            )
+        self.max_workers = max_workers if max_workers is not None else os.cpu_count()
+        self.max_threads = max_threads if max_threads is not None else 4 * max(self.max_workers, 1)
+        self.shared_dir = shared_dir if shared_dir is not None else DEFAULT_DIRECTORY
+        self.mp_context = mp_context if mp_context is not None else multiprocessing.get_context("spawn")
+        self._processes = None
+        self._threads = None
+        self._map_threads = None
+        # The shared objects holding the data of values in this process, by id
+        self._shared = {}  # type: typing.Dict[int, typing.Tuple[weakref.ref, SharedObject]]
+        self._lock = threading.Lock()
+        super().__init__()
+
+    @contextlib.contextmanager
+    def start(self) -> typing.Iterator[None]:
+        """
+        Start the worker processes (and the threads of the main process), and shut them down
+        once every task has finished.
+        """
+        self._threads = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_threads, thread_name_prefix="prefect_ds_task"
+        )
+        # Mapped tasks wait for their children, so the children get threads of their own
+        self._map_threads = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_threads, thread_name_prefix="prefect_ds_mapped_task"
+        )
+        if self.max_workers > 0:
+            self._processes = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=self.mp_context
+            )
+        try:
+            yield
+        finally:
+            self._threads.shutdown(wait=True)
+            self._map_threads.shutdown(wait=True)
+            if self._processes is not None:
+                self._processes.shutdown(wait=True)
+            self._processes = self._threads = self._map_threads = None
+
+    def submit(self, fn: typing.Callable, *args: typing.Any, **kwargs: typing.Any) -> concurrent.futures.Future:
+        """
+        Run a function (e.g. ``FlowRunner.run_task``) in a thread of the main process, once the
+        futures among its arguments have finished.
+
+        Parameters
+        ----------
+        fn : callable
+            The function.
+        *args, **kwargs
+            Its arguments, which may contain futures returned by ``submit`` and ``map``.
+
+        Returns
+        -------
+        future : concurrent.futures.Future
+            The future result of the function.
+        """
+        return self._threads.submit(_call_when_ready, fn, args, kwargs)
+
+    def map(self, fn: typing.Callable, *args: typing.Any) -> typing.List[concurrent.futures.Future]:
+        """
+        Run a function (e.g. to run the children of a mapped task) over its iterable arguments,
+        in threads of the main process.
+
+        Parameters
+        ----------
+        fn : callable
+            The function.
+        *args
+            The iterables to map over.
+
+        Returns
+        -------
+        futures : list of concurrent.futures.Future
+            The future result of each call.
+        """
+        return [self._map_threads.submit(_call_when_ready, fn, call_args, {}) for call_args in zip(*args)]
+
+    def wait(self, futures: typing.Any) -> typing.Any:
+        """
+        Wait for futures to finish.
+
+        Parameters
+        ----------
+        futures : object
+            A future, or a list, tuple, set or dict of them.
+
+        Returns
+        -------
+        results : object
+            The same, with every future replaced by its result.
+        """
+        return _resolve(futures)
+
+    def timeout_handler(
+            self, fn: typing.Callable, *args: typing.Any, timeout: int = None, **kwargs: typing.Any
+    ) -> typing.Any:
+        """
+        Run a task's ``run`` method in a worker process. Called by the task runner in place of
+        ``prefect.utilities.executors.timeout_handler``.
+
+        Parameters
+        ----------
+        fn : callable
+            The task's ``run`` method.
+        *args, **kwargs
+            Its arguments: the task's inputs.
+        timeout : int or None
+            How long to wait for the task to finish, in seconds.
+
+        Returns
+        -------
+        result : object
+            The task's result, read from shared memory.
+
+        Raises
+        ------
+        TimeoutError
+            If the task takes longer than ``timeout``.
+        """
+        if self._processes is None or isinstance(getattr(fn, "__self__", None), Parameter):
+            return super().timeout_handler(fn, *args, timeout=timeout, **kwargs)
+        # Inputs shared just for this call, which are released once it has finished
+        temporary_paths = []
+        try:
+            future = self._processes.submit(
+                _run_in_worker,
+                _dumps_call(fn, prefect.context.to_dict()),
+                [self._to_worker(value, temporary_paths) for value in args],
+                {name: self._to_worker(value, temporary_paths) for name, value in kwargs.items()},
+                str(self.shared_dir)
+            )
+            try:
+                kind, result = future.result(timeout=timeout)
+            except concurrent.futures.TimeoutError:
+                # The worker keeps running, and its result is released whenever it's done
+                future.add_done_callback(_release_abandoned_result)
+                raise TimeoutError(f"Task did not finish within {timeout} seconds")
+            except Exception as error:
+                # The worker's traceback is in the error's cause. Where tblib is installed (e.g.
+                # with distributed), the error also has a traceback unpickled in the pool's
+                # management thread, whose frames would keep that thread alive past shutdown.
+                raise error.with_traceback(None)
+        finally:
+            for path_string in temporary_paths:
+                release(path_string)
+        if kind == "value":
+            return result
+        value = attach(result)
+        if not self._track(value, result):
+            # The mapping lasts as long as the value does
+            release(result.path)
+        return value
+
+    def _to_worker(self, value, temporary_paths):
+        # Share a task input, unless it's already shared (or has no data worth sharing). The items
+        # of lists, tuples and dicts (e.g. the results of a mapped task) are shared one by one, so
+        # the ones that are already shared don't get copied.
+        if type(value) in (list, tuple):
+            return type(value).__name__, [self._to_worker(item, temporary_paths) for item in value]
+        if type(value) is dict:
+            return "dict", {key: self._to_worker(item, temporary_paths) for key, item in value.items()}
+        with self._lock:
+            reference, shared = self._shared.get(id(value), (None, None))
+        if reference is not None and reference() is value:
+            return "shared", shared
+        shared = share(value, self.shared_dir)
+        if shared is None:
+            return "value", value
+        if not self._track(value, shared):
+            temporary_paths.append(shared.path)
+        return "shared", shared
+
+    def _track(self, value, shared) -> bool:
+        # Keep the shared object while the value is alive, so downstream tasks can reuse it,
+        # and release it once the value has been dropped (e.g. purged by DSFlowRunner). Returns
+        # whether the value could be tracked, which needs a weak reference to it.
+        try:
+            reference = weakref.ref(value)
+        except TypeError:
+            return False
+        key = id(value)
+        with self._lock:
+            self._shared[key] = (reference, shared)
+        weakref.finalize(value, self._untrack, key, shared.path)
+        return True
+
+    def _untrack(self, key, path_string):
+        with self._lock:
+            if key in self._shared and self._shared[key][1].path == path_string:
+                del self._shared[key]
+        release(path_string)
+
+
+def _release_abandoned_result(future: concurrent.futures.Future):
+    # The result of a task that timed out, which nothing will ever attach to
+    if future.cancelled() or future.exception() is not None:
+        return
+    kind, result = future.result()
+    if kind == "shared":
+        release(result.path)
+
+
+def _call_when_ready(fn, args, kwargs):
+    return fn(*_resolve(list(args)), **_resolve(kwargs))
+
+
+def _resolve(value):
+    if isinstance(value, concurrent.futures.Future):
+        return value.result()
+    if isinstance(value, dict):
+        return {key: _resolve(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return type(value)(_resolve(item) for item in value)
+    return value
+
+
+def _dumps_call(fn, context):
+    # The task's run method, and the context it runs in. Context values that can't be
+    # pickled (like open connections) are left out.
+    try:
+        return cloudpickle.dumps((fn, context))
+    except Exception:
+        picklable_context = {}
+        for key, value in context.items():
+            with contextlib.suppress(Exception):
+                cloudpickle.dumps(value)
+                picklable_context[key] = value
+        return cloudpickle.dumps((fn, picklable_context))
+
+
+def _run_in_worker(call, args, kwargs, shared_dir):
+    fn, context = cloudpickle.loads(call)
+    args = [_from_main(value) for value in args]
+    kwargs = {name: _from_main(value) for name, value in kwargs.items()}
+    with prefect.context(context):
+        result = fn(*args, **kwargs)
+    if inspect.isgenerator(result):
+        raise TypeError("Tasks run by ProcessExecutor can't yield chunks")
+    shared = share(result, shared_dir)
+    if shared is None:
+        return "value", result
+    return "shared", shared
+
+
+def _from_main(value):
+    kind, value = value
+    if kind == "shared":
+        return attach(value)
+    if kind == "list":
+        return [_from_main(item) for item in value]
+    if kind == "tuple":
+        return tuple(_from_main(item) for item in value)
+    if kind == "dict":
+        return {key: _from_main(item) for key, item in value.items()}
+    return value
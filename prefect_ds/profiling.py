@@ -0,0 +1,457 @@
+import contextlib
+import cProfile
+import glob
+import json
+import os
+import pathlib
+import pstats
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+import typing
+
+from prefect.core.task import Task
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# The number of lines with the most allocated memory kept for tasks traced with tracemalloc
+_NUM_ALLOCATION_LINES = 10
+
+# Thread-local storage of the span of the task being run in each thread
+_local = threading.local()
+
+
+class TaskProfile(typing.NamedTuple):
+    """
+    Where the time (and memory) went while running one task of a flow run. For mapped tasks,
+    covers all of the children.
+
+    Attributes
+    ----------
+    task : instance of prefect.core.task.Task
+        The task.
+    start : float
+        When the task started, in seconds since the start of the flow run.
+    wall_time : float
+        How long the task took to run, in seconds, including reading and writing checkpoints.
+    cpu_time : float
+        The CPU time used by the process (in every thread) while the task ran, in seconds.
+    wait_time : float
+        How long the task waited to start after its last upstream task finished, in seconds.
+    read_time : float
+        The time spent reading checkpoints (and spilled results) of upstream tasks, in seconds.
+    read_bytes : int
+        The size of the checkpoints read, in bytes.
+    write_time : float
+        The time spent writing the task's checkpoints, in seconds. Includes writes done by
+        background threads (see ``prefect_ds.background_writer``), which don't add to ``wall_time``.
+    write_bytes : int
+        The size of the checkpoints written, in bytes.
+    peak_rss_delta : int or None
+        How much the peak resident memory of the process grew while the task ran, in bytes
+        (``None`` where it can't be measured, e.g. on Windows).
+    cache_hits : int
+        The number of the task's checkpoints that were reused.
+    cache_misses : int
+        The number of the task's checkpoints that had to be computed.
+    traced_peak : int or None
+        For tasks traced with tracemalloc, the peak memory allocated by Python while the task ran.
+    """
+    task: Task
+    start: float
+    wall_time: float
+    cpu_time: float
+    wait_time: float
+    read_time: float
+    read_bytes: int
+    write_time: float
+    write_bytes: int
+    peak_rss_delta: typing.Optional[int]
+    cache_hits: int
+    cache_misses: int
+    traced_peak: typing.Optional[int]
+
+
+class IOEvent(typing.NamedTuple):
+    """
+    A checkpoint read or write.
+
+    Attributes
+    ----------
+    kind : str
+        ``"read"`` or ``"write"``.
+    task : instance of prefect.core.task.Task
+        The task running when the checkpoint was read, or whose checkpoint was written.
+    start : float
+        When the read or write started, in seconds since the start of the flow run.
+    duration : float
+        How long it took, in seconds.
+    size : int or None
+        The size of the checkpoint in bytes, if known.
+    thread : int
+        The identifier of the thread it happened in.
+    """
+    kind: str
+    task: Task
+    start: float
+    duration: float
+    size: typing.Optional[int]
+    thread: int
+
+
+class _TaskSpan:
+    """
+    The measurements of a task that is being (or has been) run. Reads and writes can be added
+    from any thread, including after the task has finished, for checkpoints written in the background.
+    """
+    def __init__(self, report: "ProfileReport", task: Task, start: float, wait_time: float):
+        self.report = report
+        self.task = task
+        self.start = start
+        self.wait_time = wait_time
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.read_time = 0.0
+        self.read_bytes = 0
+        self.write_time = 0.0
+        self.write_bytes = 0
+        self.peak_rss_delta = None  # type: typing.Optional[int]
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.traced_peak = None  # type: typing.Optional[int]
+        self.thread = threading.get_ident()
+        self._lock = threading.Lock()
+
+    def record_io(self, kind: str, start: float, duration: float, size: typing.Optional[int]):
+        with self._lock:
+            if kind == "read":
+                self.read_time += duration
+                self.read_bytes += size or 0
+            else:
+                self.write_time += duration
+                self.write_bytes += size or 0
+        self.report._add_io_event(IOEvent(
+            kind=kind,
+            task=self.task,
+            start=start - self.report._start_time,
+            duration=duration,
+            size=size,
+            thread=threading.get_ident()
+        ))
+
+    def to_profile(self) -> TaskProfile:
+        with self._lock:
+            return TaskProfile(
+                task=self.task,
+                start=self.start,
+                wall_time=self.wall_time,
+                cpu_time=self.cpu_time,
+                wait_time=self.wait_time,
+                read_time=self.read_time,
+                read_bytes=self.read_bytes,
+                write_time=self.write_time,
+                write_bytes=self.write_bytes,
+                peak_rss_delta=self.peak_rss_delta,
+                cache_hits=self.cache_hits,
+                cache_misses=self.cache_misses,
+                traced_peak=self.traced_peak
+            )
+
+
+class ProfileReport:
+    """
+    A record of where the time went in a flow run, as attached to the final state of a flow run
+    by ``DSFlowRunner`` (as ``state.profile_report``) when run with ``profile=True``.
+
+    Parameters
+    ----------
+    profile_tasks : iterable of str
+        The names of the tasks to additionally run under ``cProfile`` and ``tracemalloc``.
+
+    Attributes
+    ----------
+    task_stats : dict
+        The ``pstats.Stats`` of each task run under ``cProfile``, by task.
+    allocations : dict
+        The lines of code that allocated the most memory (as strings) in each task traced
+        with ``tracemalloc``, by task.
+    """
+    def __init__(self, profile_tasks: typing.Iterable[str] = ()):
+        self.profile_tasks = set(profile_tasks)
+        self.task_stats = {}  # type: typing.Dict[Task, pstats.Stats]
+        self.allocations = {}  # type: typing.Dict[Task, typing.List[str]]
+        self._spans = []  # type: typing.List[_TaskSpan]
+        self._io_events = []  # type: typing.List[IOEvent]
+        self._end_times = {}  # type: typing.Dict[Task, float]
+        self._upstream_tasks = {}  # type: typing.Dict[Task, typing.Set[Task]]
+        self._lock = threading.Lock()
+        self._start_time = time.perf_counter()
+
+    @property
+    def tasks(self) -> typing.List[TaskProfile]:
+        """
+        The profile of every task that has been run, in the order they started.
+        """
+        return [span.to_profile() for span in self._spans]
+
+    @property
+    def io_events(self) -> typing.List[IOEvent]:
+        """
+        Every checkpoint read and write, in the order they finished.
+        """
+        with self._lock:
+            return list(self._io_events)
+
+    @contextlib.contextmanager
+    def profile_task(self, task: Task, upstream_tasks: typing.Iterable[Task] = ()):
+        """
+        Measure a task while it runs. While it's running, ``record_read``, ``record_write`` and
+        ``record_cache_lookup`` add to its measurements (in the same thread).
+
+        Parameters
+        ----------
+        task : instance of prefect.core.task.Task
+            The task.
+        upstream_tasks : iterable of Task
+            The task's upstream tasks, used to measure how long it waited for them and to find
+            the critical path.
+        """
+        upstream_tasks = set(upstream_tasks)
+        start = time.perf_counter()
+        upstream_ends = [self._end_times[upstream_task] for upstream_task in upstream_tasks if upstream_task in self._end_times]
+        wait_time = max(start - max(upstream_ends), 0.0) if upstream_ends else 0.0
+        span = _TaskSpan(self, task, start - self._start_time, wait_time)
+        with self._lock:
+            self._spans.append(span)
+            self._upstream_tasks[task] = upstream_tasks
+
+        profiler = cProfile.Profile() if task.name in self.profile_tasks else None
+        start_tracing = task.name in self.profile_tasks and not tracemalloc.is_tracing()
+        if start_tracing:
+            tracemalloc.start()
+        start_rss = _get_peak_rss()
+        start_cpu = time.process_time()
+        previous_span, _local.span = getattr(_local, "span", None), span
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield span
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self.task_stats[task] = pstats.Stats(profiler)
+            _local.span = previous_span
+            end = time.perf_counter()
+            span.cpu_time = time.process_time() - start_cpu
+            span.wall_time = end - start
+            end_rss = _get_peak_rss()
+            if start_rss is not None and end_rss is not None:
+                span.peak_rss_delta = end_rss - start_rss
+            if task.name in self.profile_tasks and tracemalloc.is_tracing():
+                span.traced_peak = tracemalloc.get_traced_memory()[1]
+                self.allocations[task] = [
+                    str(statistic)
+                    for statistic in tracemalloc.take_snapshot().statistics("lineno")[:_NUM_ALLOCATION_LINES]
+                ]
+                if start_tracing:
+                    tracemalloc.stop()
+            with self._lock:
+                self._end_times[task] = end
+
+    def critical_path(self) -> typing.List[TaskProfile]:
+        """
+        Find the chain of tasks that determined how long the flow run took: starting from the
+        task that finished last, repeatedly step back to the upstream task that finished last.
+
+        Returns
+        -------
+        path : list of TaskProfile
+            The tasks on the critical path, in the order they ran.
+        """
+        profiles = {profile.task: profile for profile in self.tasks}
+        if not profiles:
+            return []
+        task = max(self._end_times, key=self._end_times.get)
+        path = []
+        while task is not None:
+            path.append(profiles[task])
+            upstream_tasks = [upstream_task for upstream_task in self._upstream_tasks[task] if upstream_task in self._end_times]
+            task = max(upstream_tasks, key=self._end_times.get) if upstream_tasks else None
+        return path[::-1]
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+        Convert the report into JSON-serializable form, with tasks represented by their names.
+
+        Returns
+        -------
+        report : dict
+            The report.
+        """
+        return {
+            "tasks": [dict(profile._asdict(), task=profile.task.name) for profile in self.tasks],
+            "io_events": [dict(event._asdict(), task=event.task.name) for event in self.io_events],
+            "critical_path": [profile.task.name for profile in self.critical_path()],
+            "allocations": {task.name: lines for task, lines in self.allocations.items()},
+        }
+
+    def to_chrome_trace(self) -> typing.Dict[str, typing.Any]:
+        """
+        Convert the report into the Chrome trace event format, which can be opened in
+        ``chrome://tracing`` or https://ui.perfetto.dev. Each task is a span (with its
+        measurements as arguments) on the thread it ran in, and each checkpoint read and write
+        a span on the thread it happened in.
+
+        Returns
+        -------
+        trace : dict
+            The trace, ready to be written as JSON.
+        """
+        process_id = os.getpid()
+        events = []
+        for span, profile in zip(self._spans, self.tasks):
+            events.append({
+                "name": profile.task.name, "cat": "task", "ph": "X", "pid": process_id, "tid": span.thread,
+                "ts": profile.start * 1e6, "dur": profile.wall_time * 1e6,
+                "args": {key: value for key, value in profile._asdict().items() if key not in ("task", "start")}
+            })
+        for event in self.io_events:
+            events.append({
+                "name": f"{event.kind} {event.task.name}", "cat": "checkpoint", "ph": "X", "pid": process_id,
+                "tid": event.thread, "ts": event.start * 1e6, "dur": event.duration * 1e6, "args": {"size": event.size}
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_trace(self, path: typing.Union[str, pathlib.Path]):
+        """
+        Write the report as a Chrome trace (see ``to_chrome_trace``). The ``cProfile`` stats of
+        any profiled tasks are written next to it, replacing the suffix of ``path`` with
+        ``.[task name].prof``.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            The path of the trace file.
+        """
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as trace_file:
+            json.dump(self.to_chrome_trace(), trace_file)
+        for task, stats in self.task_stats.items():
+            stats.dump_stats(str(path.with_suffix(f".{task.name}.prof")))
+
+    def _add_io_event(self, event: IOEvent):
+        with self._lock:
+            self._io_events.append(event)
+
+
+def current_span() -> typing.Optional[_TaskSpan]:
+    """
+    Get the measurements of the task being run in this thread, if it's being profiled, so they
+    can be added to from another thread (e.g. by a background write).
+
+    Returns
+    -------
+    span : object or None
+        The measurements, to pass to ``record_write``.
+    """
+    return getattr(_local, "span", None)
+
+
+def record_read(start: float, get_size: typing.Callable[[], typing.Optional[int]]):
+    """
+    Record that a checkpoint was read by the task being run in this thread, if it's being profiled.
+
+    Parameters
+    ----------
+    start : float
+        When the read started (from ``time.perf_counter``); it's taken to have just finished.
+    get_size : callable
+        A function returning the size of the checkpoint in bytes (or ``None`` if not known),
+        only called if the task is being profiled.
+    """
+    span = current_span()
+    if span is not None:
+        span.record_io("read", start, time.perf_counter() - start, get_size())
+
+
+def record_write(span: typing.Optional[_TaskSpan], start: float, get_size: typing.Callable[[], typing.Optional[int]]):
+    """
+    Record that a task's checkpoint was written, if the task is being profiled.
+
+    Parameters
+    ----------
+    span : object or None
+        The task's measurements, from ``current_span``.
+    start : float
+        When the write started (from ``time.perf_counter``); it's taken to have just finished.
+    get_size : callable
+        A function returning the size of the checkpoint in bytes (or ``None`` if not known),
+        only called if the task is being profiled.
+    """
+    if span is not None:
+        span.record_io("write", start, time.perf_counter() - start, get_size())
+
+
+def record_cache_lookup(hits: int, misses: int):
+    """
+    Record how many checkpoints of the task being run in this thread were reused and how many
+    have to be computed, if it's being profiled.
+
+    Parameters
+    ----------
+    hits : int
+        The number of checkpoints found.
+    misses : int
+        The number of checkpoints not found.
+    """
+    span = current_span()
+    if span is not None:
+        with span._lock:
+            span.cache_hits += hits
+            span.cache_misses += misses
+
+
+def read_task_runtimes(profile_dir: typing.Union[str, pathlib.Path], flow_name: str) -> typing.Dict[str, float]:
+    """
+    Read how long the tasks of a flow took to compute in previous runs, from the Chrome traces
+    ``DSFlowRunner`` writes to its ``profile_dir``.
+
+    Parameters
+    ----------
+    profile_dir : str or pathlib.Path
+        The directory the traces were written to.
+    flow_name : str
+        The name of the flow.
+
+    Returns
+    -------
+    runtimes : dict
+        The median wall time in seconds of each task, by task name, over the runs in which none
+        of its checkpoints were reused (so it was computed in full).
+    """
+    wall_times = {}  # type: typing.Dict[str, typing.List[float]]
+    for trace_path in pathlib.Path(profile_dir).glob(f"{glob.escape(flow_name)}-*.trace.json"):
+        try:
+            with open(trace_path, "r") as trace_file:
+                events = json.load(trace_file)["traceEvents"]
+        except (OSError, ValueError, KeyError):
+            # Still being written, or not a trace
+            continue
+        for event in events:
+            if event.get("cat") == "task" and event["args"].get("cache_hits") == 0:
+                wall_times.setdefault(event["name"], []).append(event["args"]["wall_time"])
+    return {name: statistics.median(times) for name, times in wall_times.items()}
+
+
+def _get_peak_rss() -> typing.Optional[int]:
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, and in kilobytes elsewhere
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
@@ -0,0 +1,218 @@
+import copy
+import functools
+import inspect
+import operator
+import typing
+
+from prefect.core.task import Task
+from prefect.engine.result import Result
+
+from prefect_ds.chunks import Chunks
+from prefect_ds.result import LazyResult
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+_FILTER_OPERATORS = {
+    "=": operator.eq,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda column, values: column.isin(values),
+    "not in": lambda column, values: ~column.isin(values),
+}
+
+
+class Projection(typing.NamedTuple):
+    """
+    The part of a DataFrame input a task actually needs.
+
+    Can be used directly as the annotation of a task argument (e.g.
+    ``def my_task(data: Projection(columns=["a", "b"]))``), or attached to a task with
+    ``project_input``.
+
+    Attributes
+    ----------
+    columns : list of str or None
+        The columns the task uses. If ``None``, all columns are used.
+    filters : list or None
+        The rows the task uses, in the same format as the ``filters`` argument of
+        ``pyarrow.parquet.read_table``: a list of ``(column, operator, value)`` tuples that
+        must all be true, or a list of such lists, any one of which must be true. Supported
+        operators are ``=``, ``==``, ``!=``, ``<``, ``<=``, ``>``, ``>=``, ``in`` and ``not in``.
+        If ``None``, all rows are used.
+    """
+    columns: typing.Optional[typing.List[str]] = None
+    filters: typing.Optional[typing.List] = None
+
+
+def project_input(
+        task: Task,
+        input_name: str,
+        columns: typing.List[str] = None,
+        filters: typing.List = None
+) -> Task:
+    """
+    Declare that a task only needs some of the columns and/or rows of one of its DataFrame inputs.
+    When the task is run with ``DSTaskRunner``, checkpointed inputs are then read with only those
+    columns and rows (see ``PandasResultHandler.read``), and inputs already in memory are
+    cut down to match, so the task sees the same data either way.
+
+    Parameters
+    ----------
+    task : instance of prefect.core.task.Task
+        The task.
+    input_name : str
+        The name of the task argument.
+    columns : list of str or None
+        The columns the task uses; see ``Projection``.
+    filters : list or None
+        The rows the task uses; see ``Projection``.
+
+    Returns
+    -------
+    task : instance of prefect.core.task.Task
+        The same task, for chaining.
+    """
+    if not hasattr(task, "input_projections"):
+        task.input_projections = {}
+    task.input_projections[input_name] = Projection(columns=columns, filters=filters)
+    return task
+
+
+def get_input_projections(task: Task) -> typing.Dict[str, Projection]:
+    """
+    Get the projections declared for the inputs of a task, either as annotations
+    of the task's arguments or with ``project_input``.
+
+    Parameters
+    ----------
+    task : instance of prefect.core.task.Task
+        The task.
+
+    Returns
+    -------
+    projections : dict
+        The projection of each input that has one.
+    """
+    projections = {
+        input_name: parameter.annotation
+        for input_name, parameter in inspect.signature(task.run).parameters.items()
+        if isinstance(parameter.annotation, Projection)
+    }
+    projections.update(getattr(task, "input_projections", {}))
+    return projections
+
+
+def project_result(result: Result, projection: Projection) -> Result:
+    """
+    Apply a projection to a task input. Lazily-loaded results whose handler supports projection
+    (i.e. has ``supports_projection`` set) are not loaded; instead they are replaced by a result
+    that only reads the projected data. DataFrames already in memory are projected in memory,
+    and streams of chunks (``prefect_ds.chunks.Chunks``) a chunk at a time. Other results are
+    returned unchanged.
+
+    Parameters
+    ----------
+    result : instance of prefect.engine.result.Result
+        The input.
+    projection : Projection
+        The part of the input the task needs.
+
+    Returns
+    -------
+    result : instance of prefect.engine.result.Result
+        The projected input.
+    """
+    if (
+            isinstance(result, LazyResult)
+            and not result.is_loaded
+            and getattr(result.result_handler, "supports_projection", False)
+    ):
+        # Copied, rather than rebuilt, so subclasses (e.g. prefect_ds.incremental.PartitionedResult) keep their type
+        projected = copy.copy(result)
+        projected.read_kwargs = dict(result.read_kwargs, columns=projection.columns, filters=projection.filters)
+        return projected
+    import pandas as pd
+
+    if isinstance(result.value, pd.DataFrame):
+        return Result(apply_projection(result.value, projection), result_handler=result.result_handler)
+    if isinstance(result.value, Chunks):
+        return Result(
+            result.value.map(functools.partial(apply_projection, projection=projection)),
+            result_handler=result.result_handler
+        )
+    return result
+
+
+def get_read_columns(projection: Projection) -> typing.Optional[typing.List[str]]:
+    """
+    Get the columns that need to be read to apply a projection: the projected columns,
+    plus any columns used in its filters.
+
+    Parameters
+    ----------
+    projection : Projection
+        The projection.
+
+    Returns
+    -------
+    columns : list of str or None
+        The columns to read, or ``None`` if all columns are needed.
+    """
+    if projection.columns is None:
+        return None
+    read_columns = list(projection.columns)
+    for conjunction in _get_conjunctions(projection.filters):
+        for column, _, _ in conjunction:
+            if column not in read_columns:
+                read_columns.append(column)
+    return read_columns
+
+
+def apply_projection(data: "pd.DataFrame", projection: Projection) -> "pd.DataFrame":
+    """
+    Select the rows and columns of a DataFrame described by a projection.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        The data. Must contain the projected columns, and any columns used in the filters.
+    projection : Projection
+        The projection.
+
+    Returns
+    -------
+    projected_data : pandas.DataFrame
+        The projected data.
+    """
+    import pandas as pd
+
+    conjunctions = _get_conjunctions(projection.filters)
+    if conjunctions:
+        mask = pd.Series(False, index=data.index)
+        for conjunction in conjunctions:
+            conjunction_mask = pd.Series(True, index=data.index)
+            for column, operator_name, value in conjunction:
+                if operator_name not in _FILTER_OPERATORS:
+                    raise ValueError(
+                        f"Unknown filter operator {operator_name}. "
+                        f"Known operators are {list(_FILTER_OPERATORS.keys())}"
+                    )
+                conjunction_mask &= _FILTER_OPERATORS[operator_name](data[column], value)
+            mask |= conjunction_mask
+        data = data[mask]
+    if projection.columns is not None:
+        data = data[list(projection.columns)]
+    return data
+
+
+def _get_conjunctions(filters: typing.Optional[typing.List]) -> typing.List[typing.List[typing.Tuple]]:
+    if not filters:
+        return []
+    if isinstance(filters[0], tuple):
+        return [filters]
+    return filters
@@ -0,0 +1,138 @@
+import collections
+import typing
+
+from prefect.core.flow import Flow
+from prefect.core.task import Task
+from prefect.engine.result_handlers import ResultHandler
+from prefect.tasks.core.constants import Constant
+
+from prefect_ds.checkpoint_handler import _checkpoint_exists, _record_access, checkpoint_handler
+from prefect_ds.result import LazyResult
+
+
+class CheckpointPlan(typing.NamedTuple):
+    """
+    Which tasks of a flow have to run, worked out from the checkpoints on disk before the flow
+    is run (see ``plan_checkpoints``).
+
+    Attributes
+    ----------
+    cached : dict
+        The (not yet read) results of the tasks whose checkpoints were found, by task.
+    loaded : set of Task
+        The tasks in ``cached`` whose results are used by tasks that run, and so may be read.
+    skipped : set of Task
+        The tasks without a checkpoint whose results are only used by tasks in ``cached``, which
+        don't need to run.
+    to_run : set of Task
+        The remaining tasks, which are run as usual.
+    """
+    cached: typing.Dict[Task, LazyResult]
+    loaded: typing.Set[Task]
+    skipped: typing.Set[Task]
+    to_run: typing.Set[Task]
+
+
+def plan_checkpoints(
+        flow: Flow,
+        targets: typing.Iterable[Task],
+        state_handlers: typing.Iterable[typing.Callable] = ()
+) -> CheckpointPlan:
+    """
+    Work out which tasks of a flow have to run, without running any of them, by looking for their
+    checkpoints up front.
+
+    Only checkpoints that can be found without the results of upstream tasks are looked for, if
+    the flow is run with ``prefect_ds.checkpoint_handler.checkpoint_handler``: those of tasks that
+    aren't mapped, and whose result handler has a path without templates and no ``partition_key``.
+    If the result handler is ``content_addressed``, the task's inputs must also be constants or
+    the results of tasks whose checkpoints were found with a checkpoint key, so the key can be
+    computed before the run. Any other task is assumed to have to run, and is left to
+    ``checkpoint_handler``.
+
+    A task without a checkpoint only has to run if it is one of ``targets``, or if a task that has
+    to run uses its result. So the tasks that only feed tasks whose checkpoints were found don't
+    run at all, and of the checkpoints found, only those used by tasks that run may be read.
+
+    Parameters
+    ----------
+    flow : instance of prefect.core.flow.Flow
+        The flow.
+    targets : iterable of Task
+        The tasks whose states are wanted, e.g. the flow's terminal and reference tasks.
+    state_handlers : iterable of callables
+        The state handlers the task runners are created with.
+
+    Returns
+    -------
+    plan : CheckpointPlan
+        The plan.
+    """
+    sorted_tasks = flow.sorted_tasks()
+    upstream_edges = collections.defaultdict(list)
+    downstream_tasks = collections.defaultdict(set)
+    for edge in flow.edges:
+        upstream_edges[edge.downstream_task].append(edge)
+        downstream_tasks[edge.upstream_task].add(edge.downstream_task)
+
+    uses_checkpoint_handler = checkpoint_handler in state_handlers
+
+    cached = {}
+    for task in sorted_tasks:
+        result_handler = task.result_handler
+        if not (uses_checkpoint_handler and _has_fixed_path(result_handler)):
+            continue
+        if any(edge.mapped for edge in upstream_edges[task]):
+            continue
+        checkpoint_key = None
+        if getattr(result_handler, "content_addressed", False):
+            checkpoint_key = _get_checkpoint_key(task, upstream_edges[task], flow.constants[task], cached)
+            if checkpoint_key is None:
+                continue
+        if _checkpoint_exists(result_handler, {}, checkpoint_key):
+            _record_access(result_handler, [{}])
+            cached[task] = LazyResult(result_handler=result_handler, checkpoint_key=checkpoint_key)
+
+    targets = set(targets)
+    to_run = set()
+    for task in reversed(sorted_tasks):
+        if task not in cached and (task in targets or not downstream_tasks[task].isdisjoint(to_run)):
+            to_run.add(task)
+    return CheckpointPlan(
+        cached=cached,
+        loaded={task for task in cached if not downstream_tasks[task].isdisjoint(to_run)},
+        skipped=set(sorted_tasks) - set(cached) - to_run,
+        to_run=to_run
+    )
+
+
+def _has_fixed_path(result_handler: typing.Optional[ResultHandler]) -> bool:
+    # Whether a checkpoint can be looked for without any of the task's inputs
+    template_fields = getattr(result_handler, "template_fields", None)
+    return (
+        hasattr(result_handler, "exists")
+        and template_fields is not None
+        and not template_fields
+        and getattr(result_handler, "partition_key", None) is None
+    )
+
+
+def _get_checkpoint_key(task, upstream_edges, constants, cached) -> typing.Optional[str]:
+    # The key checkpoint_handler would compute when the task runs, if it can be computed without
+    # running (or reading the results of) any upstream tasks; None otherwise
+    input_fingerprints = dict(constants)
+    for edge in upstream_edges:
+        if edge.key is None:
+            # Not an input, so not part of the key
+            continue
+        upstream_task = edge.upstream_task
+        if upstream_task in cached and cached[upstream_task].checkpoint_key is not None:
+            input_fingerprints[edge.key] = {"checkpoint_key": cached[upstream_task].checkpoint_key}
+        elif isinstance(upstream_task, Constant):
+            input_fingerprints[edge.key] = upstream_task.value
+        else:
+            return None
+    # Imported here so that flows that don't use content addressing don't pay for importing pandas
+    from prefect_ds.hashing import compute_checkpoint_key
+
+    return compute_checkpoint_key(task, input_fingerprints)
@@ -0,0 +1,573 @@
+import concurrent.futures
+import contextlib
+import os
+import pathlib
+import posixpath
+import re
+import shutil
+import threading
+import typing
+
+# Where the local copies of remote checkpoints are kept, unless a handler is given a local_cache_dir
+DEFAULT_LOCAL_CACHE_DIR = pathlib.Path.home() / ".cache" / "prefect_ds"
+
+# Remote files larger than this are downloaded in parts of this size, in parallel
+DEFAULT_PART_SIZE = 16 * 2 ** 20
+
+# The version of the remote file each local copy was fetched from (or published as) is stored in a
+# hidden sidecar next to the copy, so a copy is only used while the remote file is unchanged
+_VERSION_PREFIX = "."
+_VERSION_SUFFIX = ".remote-version"
+
+# How often a file that keeps changing while it's downloaded is downloaded again before giving up
+_MAX_FETCH_ATTEMPTS = 3
+
+_URL_PATTERN = re.compile(r"^([a-zA-Z][a-zA-Z0-9+.-]*)://(.*)$")
+
+# The fields of fsspec's file info that identify a version of a file, in order of preference
+_FSSPEC_VERSION_FIELDS = ("ETag", "etag", "md5Hash", "generation", "mtime", "LastModified", "last_modified", "created")
+
+
+class RemoteFile(typing.NamedTuple):
+    """
+    A file in remote storage.
+
+    Attributes
+    ----------
+    size : int
+        The size of the file, in bytes.
+    version : str
+        Identifies the contents of the file (e.g. its ETag, or its modification time): it changes
+        whenever the file is replaced.
+    """
+    size: int
+    version: str
+
+
+class Storage:
+    """
+    Base class for the remote storage backends of ``prefect_ds.file_result_handler.FileResultHandler``.
+    Paths are ``/``-separated and don't include the protocol, e.g. ``"bucket/checkpoints/data.parquet"``
+    for ``"s3://bucket/checkpoints/data.parquet"``. Directories are just the common prefix of the
+    files in them, as in object stores.
+    """
+    def info(self, path: str) -> typing.Optional[RemoteFile]:
+        """
+        Get a file's size and version.
+
+        Parameters
+        ----------
+        path : str
+            The path of the file.
+
+        Returns
+        -------
+        file : RemoteFile or None
+            The file, or ``None`` if there is no file at ``path`` (including if it's a directory).
+        """
+        raise NotImplementedError
+
+    def list(self, path: str) -> typing.Dict[str, RemoteFile]:
+        """
+        Get all of the files in a directory, including those in its subdirectories.
+
+        Parameters
+        ----------
+        path : str
+            The path of the directory.
+
+        Returns
+        -------
+        files : dict
+            The files, by their ``/``-separated path relative to ``path`` (empty if there is no
+            directory at ``path``).
+        """
+        raise NotImplementedError
+
+    def listdir(self, path: str) -> typing.Set[str]:
+        """
+        Get the names of the files and directories directly in a directory.
+
+        Parameters
+        ----------
+        path : str
+            The path of the directory.
+
+        Returns
+        -------
+        names : set of str
+            The names (empty if there is no directory at ``path``).
+        """
+        raise NotImplementedError
+
+    def read_range(self, path: str, start: int, end: int) -> bytes:
+        """
+        Read part of a file.
+
+        Parameters
+        ----------
+        path : str
+            The path of the file.
+        start : int
+            The offset of the first byte to read.
+        end : int
+            The offset after the last byte to read.
+
+        Returns
+        -------
+        data : bytes
+            The bytes from ``start`` up to ``end``.
+        """
+        raise NotImplementedError
+
+    def put_file(self, local_path: str, path: str):
+        """
+        Upload a local file, replacing the file at ``path`` (if any) in a single step, so readers
+        see either the old file or the new one.
+
+        Parameters
+        ----------
+        local_path : str
+            The local file.
+        path : str
+            The path to upload it to.
+        """
+        raise NotImplementedError
+
+    def delete(self, path: str):
+        """
+        Delete a file, if it exists.
+
+        Parameters
+        ----------
+        path : str
+            The path of the file.
+        """
+        raise NotImplementedError
+
+
+class LocalStorage(Storage):
+    """
+    A stand-in for remote storage that keeps its files in a local directory (e.g. for tests, or for
+    a network file system shared between workers). A file's version is its modification time and size.
+
+    Parameters
+    ----------
+    root : str or pathlib.Path
+        The directory the paths are relative to.
+    """
+    def __init__(self, root: typing.Union[str, pathlib.Path]):
+        self.root = pathlib.Path(root)
+
+    def info(self, path: str) -> typing.Optional[RemoteFile]:
+        try:
+            stat_result = os.stat(self._local_path(path))
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        if not os.path.isfile(self._local_path(path)):
+            return None
+        return RemoteFile(size=stat_result.st_size, version=f"{stat_result.st_mtime_ns}-{stat_result.st_size}")
+
+    def list(self, path: str) -> typing.Dict[str, RemoteFile]:
+        directory = self._local_path(path)
+        files = {}
+        for parent, _, file_names in os.walk(directory):
+            for file_name in file_names:
+                relative_path = pathlib.Path(parent, file_name).relative_to(directory).as_posix()
+                remote_file = self.info(posixpath.join(path, relative_path))
+                if remote_file is not None:
+                    files[relative_path] = remote_file
+        return files
+
+    def listdir(self, path: str) -> typing.Set[str]:
+        try:
+            return set(os.listdir(self._local_path(path)))
+        except (FileNotFoundError, NotADirectoryError):
+            return set()
+
+    def read_range(self, path: str, start: int, end: int) -> bytes:
+        with open(self._local_path(path), "rb") as remote_file:
+            remote_file.seek(start)
+            return remote_file.read(end - start)
+
+    def put_file(self, local_path: str, path: str):
+        destination = self._local_path(path)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = destination.with_name(f".tmp.{os.getpid()}.{threading.get_ident()}.{destination.name}")
+        try:
+            shutil.copyfile(local_path, temporary_path)
+            os.replace(temporary_path, destination)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temporary_path)
+            raise
+
+    def delete(self, path: str):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._local_path(path))
+
+    def _local_path(self, path: str) -> pathlib.Path:
+        return self.root / path
+
+
+class FsspecStorage(Storage):
+    """
+    Remote storage accessed through an ``fsspec`` file system, e.g. ``s3`` (with ``s3fs``) or
+    ``gcs`` (with ``gcsfs``). A file's version is its ETag (or its equivalent, e.g. the generation of
+    a GCS object), or else its modification time, together with its size. Large files are uploaded
+    by the file system's own multipart upload.
+
+    Parameters
+    ----------
+    protocol : str
+        The ``fsspec`` protocol, e.g. ``"s3"``.
+    storage_options : dict or None
+        If present, passed as **kwargs to ``fsspec.filesystem`` (e.g. credentials).
+    """
+    def __init__(self, protocol: str, storage_options: dict = None):
+        self.protocol = protocol
+        self.storage_options = storage_options if storage_options is not None else {}
+        self._file_system = None
+
+    @property
+    def file_system(self):
+        """
+        The ``fsspec`` file system, created the first time it's used.
+        """
+        if self._file_system is None:
+            try:
+                import fsspec
+            except ImportError as error:
+                raise ImportError(
+                    f"fsspec is required to store checkpoints at {self.protocol}:// URLs"
+                ) from error
+            self._file_system = fsspec.filesystem(self.protocol, **self.storage_options)
+        return self._file_system
+
+    def info(self, path: str) -> typing.Optional[RemoteFile]:
+        try:
+            file_info = self.file_system.info(path)
+        except FileNotFoundError:
+            return None
+        if file_info.get("type") != "file":
+            return None
+        return _get_remote_file(file_info)
+
+    def list(self, path: str) -> typing.Dict[str, RemoteFile]:
+        prefix = self.file_system._strip_protocol(path).rstrip("/")
+        try:
+            found = self.file_system.find(path, detail=True)
+        except FileNotFoundError:
+            return {}
+        return {
+            posixpath.relpath(name, prefix): _get_remote_file(file_info)
+            for name, file_info in found.items()
+            if file_info.get("type") == "file" and name.startswith(prefix + "/")
+        }
+
+    def listdir(self, path: str) -> typing.Set[str]:
+        try:
+            names = self.file_system.ls(path, detail=False)
+        except (FileNotFoundError, NotADirectoryError):
+            return set()
+        return {posixpath.basename(name.rstrip("/")) for name in names}
+
+    def read_range(self, path: str, start: int, end: int) -> bytes:
+        return self.file_system.cat_file(path, start=start, end=end)
+
+    def put_file(self, local_path: str, path: str):
+        self.file_system.put_file(local_path, path)
+
+    def delete(self, path: str):
+        with contextlib.suppress(FileNotFoundError):
+            self.file_system.rm_file(path)
+
+
+_STORAGES = {}  # type: typing.Dict[str, Storage]
+
+
+def register_storage(protocol: str, storage: Storage):
+    """
+    Use a storage backend for the URLs with a protocol, instead of the ``fsspec`` file system for
+    that protocol, e.g. ``register_storage("s3", LocalStorage("/mnt/shared"))`` in tests.
+
+    Parameters
+    ----------
+    protocol : str
+        The protocol, e.g. ``"s3"``.
+    storage : Storage
+        The backend.
+    """
+    _STORAGES[protocol] = storage
+
+
+def get_storage(protocol: str, storage_options: dict = None) -> Storage:
+    """
+    Get the storage backend for the URLs with a protocol: the one registered with
+    ``register_storage``, if there is one, or else an ``FsspecStorage``.
+
+    Parameters
+    ----------
+    protocol : str
+        The protocol, e.g. ``"s3"``.
+    storage_options : dict or None
+        If present, passed to ``FsspecStorage``.
+
+    Returns
+    -------
+    storage : Storage
+        The backend.
+    """
+    if protocol in _STORAGES:
+        return _STORAGES[protocol]
+    return FsspecStorage(protocol, storage_options)
+
+
+def split_url(path_string: str) -> typing.Tuple[typing.Optional[str], str]:
+    """
+    Split a URL like ``"s3://bucket/data.parquet"`` into its protocol and path.
+
+    Parameters
+    ----------
+    path_string : str
+        The URL, or a local path.
+
+    Returns
+    -------
+    protocol : str or None
+        The protocol, or ``None`` for a local path.
+    path : str
+        The rest of the URL (or the local path, unchanged).
+    """
+    match = _URL_PATTERN.match(path_string)
+    if match is None:
+        return None, path_string
+    return match.group(1), match.group(2)
+
+
+def fetch(
+        storage: Storage,
+        path: str,
+        local_path: str,
+        max_workers: int = None,
+        part_size: int = DEFAULT_PART_SIZE
+) -> bool:
+    """
+    Make sure there is an up-to-date local copy of a remote file, or of all of the files in a
+    remote directory. Only files whose local copies are missing or were fetched from a different
+    version of the remote file are downloaded: a remote file is fetched once, and later reads are
+    served from local disk until it's replaced. Files are downloaded in parallel threads, as are
+    the parts of files larger than ``part_size``, and each is moved into place once complete.
+
+    Parameters
+    ----------
+    storage : Storage
+        The remote storage.
+    path : str
+        The remote path of the file or directory.
+    local_path : str
+        The path of the local copy.
+    max_workers : int or None
+        The maximum number of threads used to download files and parts. Defaults to the
+        ``concurrent.futures.ThreadPoolExecutor`` default.
+    part_size : int
+        The size, in bytes, of the parts large files are downloaded in.
+
+    Returns
+    -------
+    found : bool
+        Whether there is a remote file (or directory) at ``path``. If there isn't, the local copy of
+        the file (if any) is removed, so it can't be used by mistake.
+    """
+    remote_file = storage.info(path)
+    if remote_file is not None:
+        files = {"": remote_file}
+    else:
+        files = storage.list(path)
+    if not files:
+        if os.path.isfile(local_path):
+            _remove_local_copy(local_path)
+        return False
+
+    def fetch_file(relative_path):
+        _fetch_file(
+            storage,
+            posixpath.join(path, relative_path) if relative_path else path,
+            os.path.join(local_path, *relative_path.split("/")) if relative_path else local_path,
+            files[relative_path],
+            executor,
+            part_size
+        )
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Files are fetched in their own pool, so their parts can't be starved of threads
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as file_executor:
+            list(file_executor.map(fetch_file, files))
+    return True
+
+
+def publish(storage: Storage, local_path: str, path: str, max_workers: int = None):
+    """
+    Upload a local file, or all of the files in a local directory (except hidden ones), in
+    parallel threads. The local copies are recorded as up to date, so ``fetch`` doesn't download
+    them again. Remote files in the directory that are no longer in the local directory (e.g. the
+    parts of a result that has been rewritten with fewer partitions) are then deleted, so they
+    aren't fetched along with it.
+
+    Parameters
+    ----------
+    storage : Storage
+        The remote storage.
+    local_path : str
+        The local file or directory.
+    path : str
+        The remote path to upload it to.
+    max_workers : int or None
+        The maximum number of threads used to upload files. Defaults to the
+        ``concurrent.futures.ThreadPoolExecutor`` default.
+    """
+    if os.path.isdir(local_path):
+        relative_paths = [
+            pathlib.Path(parent, file_name).relative_to(local_path).as_posix()
+            for parent, _, file_names in os.walk(local_path)
+            for file_name in file_names
+            if not file_name.startswith(".")
+        ]
+    else:
+        relative_paths = [""]
+
+    def publish_file(relative_path):
+        local_file_path = os.path.join(local_path, *relative_path.split("/")) if relative_path else local_path
+        remote_path = posixpath.join(path, relative_path) if relative_path else path
+        remove_version(local_file_path)
+        storage.put_file(local_file_path, remote_path)
+        remote_file = storage.info(remote_path)
+        if remote_file is not None:
+            _write_version(local_file_path, remote_file.version)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(publish_file, relative_paths))
+        if os.path.isdir(local_path):
+            published = set(relative_paths)
+            orphaned = [
+                posixpath.join(path, relative_path) for relative_path in storage.list(path)
+                # Hidden files may be uploads in progress
+                if relative_path not in published and not posixpath.basename(relative_path).startswith(".")
+            ]
+            list(executor.map(storage.delete, orphaned))
+
+
+def get_remote_size(storage: Storage, path: str) -> int:
+    """
+    Get the size of a remote file, or the total size of the files in a remote directory.
+
+    Parameters
+    ----------
+    storage : Storage
+        The remote storage.
+    path : str
+        The remote path of the file or directory.
+
+    Returns
+    -------
+    size : int
+        The size in bytes, or 0 if there is nothing at ``path``.
+    """
+    remote_file = storage.info(path)
+    if remote_file is not None:
+        return remote_file.size
+    return sum(remote_file.size for remote_file in storage.list(path).values())
+
+
+def _fetch_file(
+        storage: Storage,
+        path: str,
+        local_path: str,
+        remote_file: RemoteFile,
+        executor: concurrent.futures.Executor,
+        part_size: int
+):
+    for _ in range(_MAX_FETCH_ATTEMPTS):
+        if _read_version(local_path) == remote_file.version and os.path.isfile(local_path):
+            return
+        directory, file_name = os.path.split(local_path)
+        os.makedirs(directory or ".", exist_ok=True)
+        temporary_path = os.path.join(directory, f".tmp.{os.getpid()}.{threading.get_ident()}.{file_name}")
+        try:
+            with open(temporary_path, "wb") as local_file:
+                local_file.truncate(remote_file.size)
+            starts = range(0, remote_file.size, part_size)
+            list(executor.map(
+                lambda start: _fetch_part(storage, path, temporary_path, start, min(start + part_size, remote_file.size)),
+                starts
+            ))
+            # The parts are only consistent if the file wasn't replaced while they were downloaded
+            fetched_file = storage.info(path)
+            if fetched_file == remote_file:
+                remove_version(local_path)
+                os.replace(temporary_path, local_path)
+                _write_version(local_path, remote_file.version)
+                return
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temporary_path)
+        if fetched_file is None:
+            raise FileNotFoundError(f"{path} was removed while it was being fetched")
+        remote_file = fetched_file
+    raise OSError(f"{path} kept changing while it was being fetched")
+
+
+def _fetch_part(storage: Storage, path: str, local_path: str, start: int, end: int):
+    data = storage.read_range(path, start, end)
+    if len(data) != end - start:
+        raise OSError(f"Expected {end - start} bytes from {path} at offset {start}, got {len(data)}")
+    with open(local_path, "r+b") as local_file:
+        local_file.seek(start)
+        local_file.write(data)
+
+
+def _get_remote_file(file_info: typing.Dict[str, typing.Any]) -> RemoteFile:
+    size = file_info.get("size") or 0
+    for field in _FSSPEC_VERSION_FIELDS:
+        if file_info.get(field) is not None:
+            return RemoteFile(size=size, version=f"{file_info[field]}-{size}")
+    return RemoteFile(size=size, version=str(size))
+
+
+def _version_path(local_path: str) -> str:
+    directory, file_name = os.path.split(local_path)
+    return os.path.join(directory, f"{_VERSION_PREFIX}{file_name}{_VERSION_SUFFIX}")
+
+
+def _read_version(local_path: str) -> typing.Optional[str]:
+    try:
+        with open(_version_path(local_path), "r") as version_file:
+            return version_file.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write_version(local_path: str, version: str):
+    version_path = _version_path(local_path)
+    temporary_path = f"{version_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary_path, "w") as version_file:
+        version_file.write(version)
+    os.replace(temporary_path, version_path)
+
+
+def remove_version(local_path: str):
+    """
+    Forget which remote version a local copy was fetched from, e.g. before the copy is replaced
+    by a new result, so it isn't taken for a copy of the remote file until it has been published.
+
+    Parameters
+    ----------
+    local_path : str
+        The path of the local copy.
+    """
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(_version_path(local_path))
+
+
+def _remove_local_copy(local_path: str):
+    remove_version(local_path)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(local_path)
@@ -1,8 +1,11 @@
-from typing import Any
+import time
+from typing import Any, Dict, Optional
 
-from prefect.engine.result import SafeResult
+from prefect.engine.result import Result, SafeResult
 from prefect.engine.result_handlers import ResultHandler
 
+from prefect_ds.profiling import record_read
+
 
 class PurgedResultType(SafeResult):
     """
@@ -36,3 +39,74 @@ class PurgedResultType(SafeResult):
 
 
 PurgedResult = PurgedResultType()
+
+
+class LazyResult(Result):
+    """
+    A `Result` whose value is only read from disk, using the ``read`` method of its result handler,
+    the first time it is accessed. Results that are never accessed (e.g. because they are purged
+    by `DSFlowRunner` before any downstream task needs them) are never read at all.
+
+    Args:
+        - result_handler (ResultHandler): a prefect_ds result handler, whose ``read`` method
+            accepts the ``input_mapping`` and ``checkpoint_key`` keyword arguments
+        - input_mapping (dict, optional): the inputs used to fill in the templated path of
+            the result handler
+        - checkpoint_key (str, optional): the checkpoint key the result was written with
+        - read_kwargs (dict, optional): additional keyword arguments for ``read``, e.g. the
+            ``columns`` and ``filters`` of a projection (see ``prefect_ds.projection``)
+    """
+
+    def __init__(
+        self,
+        result_handler: ResultHandler,
+        input_mapping: Dict[str, Any] = None,
+        checkpoint_key: str = None,
+        read_kwargs: Dict[str, Any] = None
+    ) -> None:
+        super().__init__(value=None, result_handler=result_handler)
+        # set after super().__init__(), as setting the value marks the result as loaded
+        self._is_loaded = False
+        self.input_mapping = input_mapping if input_mapping is not None else {}
+        self.checkpoint_key = checkpoint_key
+        self.read_kwargs = read_kwargs if read_kwargs is not None else {}
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._is_loaded
+
+    @property
+    def value(self) -> Any:
+        if not self._is_loaded:
+            start = time.perf_counter()
+            self.value = self._read()
+            record_read(start, self._get_size)
+        return self._value
+
+    @value.setter
+    def value(self, value: Any) -> None:
+        self._value = value
+        self._is_loaded = True
+
+    def _read(self) -> Any:
+        return self.result_handler.read(
+            input_mapping=self.input_mapping, checkpoint_key=self.checkpoint_key, **self.read_kwargs
+        )
+
+    def _get_size(self) -> Optional[int]:
+        # The size on disk of what was read, for profiling
+        if not hasattr(self.result_handler, "checkpoint_size"):
+            return None
+        return self.result_handler.checkpoint_size(input_mapping=self.input_mapping)
+
+    def unload(self) -> None:
+        """
+        Drop the loaded value from memory; it will be read from disk again on next access.
+        """
+        self._value = None
+        self._is_loaded = False
+
+    def __repr__(self) -> str:
+        if not self._is_loaded:
+            return "<LazyResult: not loaded>"
+        return super().__repr__()
@@ -0,0 +1,301 @@
+import contextlib
+import os
+import pathlib
+import pickle
+import shutil
+import tempfile
+import typing
+import uuid
+
+from prefect.core.task import Task
+from prefect.engine.result import NoResult, Result
+from prefect.engine.result_handlers import ResultHandler
+from prefect.engine.state import State
+
+from prefect_ds.result import LazyResult
+
+
+class SpillFileHandler(ResultHandler):
+    """
+    A result handler for a single result spilled to a scratch file by a ``SpillingResultStore``.
+    Results are stored with the highest available pickle protocol, which writes the memory of
+    pandas and numpy objects out as raw binary buffers.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The scratch file to write to and read from.
+    """
+    def __init__(self, path: typing.Union[str, pathlib.Path]):
+        self.path = pathlib.Path(path)
+        super().__init__()
+
+    def read(self, *, input_mapping=None, checkpoint_key: str = None) -> typing.Any:
+        with open(self.path, "rb") as spill_file:
+            return pickle.load(spill_file)
+
+    def write(self, result: typing.Any, input_mapping=None, checkpoint_key: str = None):
+        with open(self.path, "wb") as spill_file:
+            pickle.dump(result, spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def remove(self):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path)
+
+
+class _StoredResult:
+    """
+    Bookkeeping for a single result (of a task, or of one child of a mapped task) in the store.
+    """
+    __slots__ = ("state", "parent_state", "map_index", "size", "is_counted", "spill_handler")
+
+    def __init__(self, state: State, parent_state: typing.Optional[State], map_index: typing.Optional[int]):
+        self.state = state
+        self.parent_state = parent_state
+        self.map_index = map_index
+        self.size = None
+        # Whether the result is included in the store's count of resident bytes
+        self.is_counted = False
+        self.spill_handler = None
+
+    @property
+    def is_resident(self) -> bool:
+        result = self.state._result
+        if isinstance(result, LazyResult):
+            return result.is_loaded
+        return isinstance(result, Result)
+
+    def get_size(self) -> int:
+        if self.size is None:
+            # Imported here so that importing the flow runner doesn't import pandas
+            from prefect_ds.sizing import get_size
+
+            self.size = get_size(self.state._result.value)
+        return self.size
+
+
+class ResultEvent(typing.NamedTuple):
+    """
+    A change in the results held in memory by a ``SpillingResultStore``.
+    """
+    task: Task
+    map_index: typing.Optional[int]
+    size: int
+
+
+class SpillingResultStore:
+    """
+    Keeps track of the task results held in memory during a flow run, and when they use more
+    than ``memory_limit`` bytes spills the ones that will be needed furthest in the future
+    to a scratch directory. Spilled results are replaced by ``LazyResult`` objects, so they are
+    transparently read back in if a downstream task needs them.
+
+    Results that were lazily loaded from a checkpoint are never spilled: they're simply unloaded,
+    since they can be read from the checkpoint again.
+
+    Parameters
+    ----------
+    memory_limit : int or None
+        The maximum number of bytes of task results to keep in memory. If ``None``, results
+        are only tracked, and never spilled.
+    spill_dir : str, pathlib.Path, or None
+        The directory in which to create the scratch directory for spilled results. If not
+        present, the system default temporary directory is used.
+    """
+    def __init__(self, memory_limit: typing.Optional[int], spill_dir: typing.Union[str, pathlib.Path] = None):
+        self.memory_limit = memory_limit
+        self.spill_dir = spill_dir
+        self._scratch_dir = None
+        self._stored_results = {}  # type: typing.Dict[Task, typing.List[_StoredResult]]
+        self._resident_bytes = 0
+
+    @property
+    def resident_bytes(self) -> int:
+        """
+        The total size of the results in the store that were held in memory the last time
+        they were added, refreshed or evicted.
+        """
+        return self._resident_bytes
+
+    def get_resident_sizes(self) -> typing.Dict[Task, int]:
+        """
+        Get the number of bytes of results held in memory for each task.
+
+        Returns
+        -------
+        resident_sizes : dict
+            The number of resident bytes for each task with results in memory.
+        """
+        resident_sizes = {}
+        for task, stored_results in self._stored_results.items():
+            size = sum(stored_result.size for stored_result in stored_results if stored_result.is_counted)
+            if size > 0:
+                resident_sizes[task] = size
+        return resident_sizes
+
+    def add(self, task: Task, state: State) -> typing.List[ResultEvent]:
+        """
+        Start tracking the result(s) of a task. For mapped tasks, the results of each child
+        are tracked separately.
+
+        Parameters
+        ----------
+        task : instance of prefect.core.task.Task
+            The task.
+        state : instance of prefect.engine.state.State
+            The final state of the task.
+
+        Returns
+        -------
+        added : list of ResultEvent
+            The size of each of the results of the task that are held in memory.
+        """
+        self.discard(task)
+        if state.is_mapped():
+            self._stored_results[task] = [
+                _StoredResult(mapped_state, parent_state=state, map_index=map_index)
+                for map_index, mapped_state in enumerate(state.map_states)
+            ]
+        else:
+            self._stored_results[task] = [_StoredResult(state, parent_state=None, map_index=None)]
+        return self.refresh(task)
+
+    def refresh(self, task: Task) -> typing.List[ResultEvent]:
+        """
+        Update the count of resident bytes for results of a task that have been loaded
+        (or unloaded) since they were added, e.g. because a downstream task read them.
+
+        Parameters
+        ----------
+        task : instance of prefect.core.task.Task
+            The task.
+
+        Returns
+        -------
+        loaded : list of ResultEvent
+            The results of the task that have been newly loaded into memory.
+        """
+        loaded = []
+        for stored_result in self._stored_results.get(task, []):
+            is_resident = stored_result.is_resident
+            if is_resident and not stored_result.is_counted:
+                self._resident_bytes += stored_result.get_size()
+                loaded.append(ResultEvent(task, stored_result.map_index, stored_result.size))
+            elif stored_result.is_counted and not is_resident:
+                self._resident_bytes -= stored_result.size
+            stored_result.is_counted = is_resident
+        return loaded
+
+    def discard(self, task: Task) -> typing.List[ResultEvent]:
+        """
+        Stop tracking the result(s) of a task, removing any of its spill files.
+
+        Parameters
+        ----------
+        task : instance of prefect.core.task.Task
+            The task.
+
+        Returns
+        -------
+        discarded : list of ResultEvent
+            The discarded results, with the number of bytes of memory freed by discarding them.
+        """
+        discarded = []
+        for stored_result in self._stored_results.pop(task, []):
+            freed_bytes = stored_result.size if stored_result.is_counted else 0
+            self._resident_bytes -= freed_bytes
+            discarded.append(ResultEvent(task, stored_result.map_index, freed_bytes))
+            if stored_result.spill_handler is not None:
+                stored_result.spill_handler.remove()
+        return discarded
+
+    def enforce_limit(self, get_next_use: typing.Callable[[Task], float]) -> typing.List[ResultEvent]:
+        """
+        Spill (or unload) results until the resident results fit in ``memory_limit``.
+
+        Parameters
+        ----------
+        get_next_use : callable
+            A function returning, for a task, how far in the future its result is next
+            needed (e.g. the position in the run order of its first remaining downstream task).
+            Results needed furthest in the future are evicted first, and larger results are
+            evicted before smaller ones needed at the same time.
+
+        Returns
+        -------
+        evicted : list of ResultEvent
+            The results that were spilled or unloaded.
+        """
+        if self.memory_limit is None or self._resident_bytes <= self.memory_limit:
+            return []
+
+        for task in self._stored_results:
+            self.refresh(task)
+        resident_results = [
+            (task, stored_result)
+            for task, stored_results in self._stored_results.items()
+            for stored_result in stored_results
+            if stored_result.is_counted
+        ]
+        next_uses = {task: get_next_use(task) for task, _ in resident_results}
+        resident_results.sort(
+            key=lambda task_and_result: (next_uses[task_and_result[0]], task_and_result[1].size),
+            reverse=True
+        )
+        evicted = []
+        for task, stored_result in resident_results:
+            if self._resident_bytes <= self.memory_limit:
+                break
+            self._evict(stored_result)
+            stored_result.is_counted = False
+            self._resident_bytes -= stored_result.size
+            evicted.append(ResultEvent(task, stored_result.map_index, stored_result.size))
+        return evicted
+
+    def materialize(self, task: Task):
+        """
+        Read any spilled results of a task back into memory, replacing them with
+        regular ``Result`` objects, so they no longer depend on the scratch directory.
+
+        Parameters
+        ----------
+        task : instance of prefect.core.task.Task
+            The task.
+        """
+        for stored_result in self._stored_results.get(task, []):
+            if stored_result.spill_handler is not None:
+                lazy_result = stored_result.state._result
+                stored_result.state._result = Result(lazy_result.value, result_handler=None)
+                stored_result.spill_handler.remove()
+                stored_result.spill_handler = None
+
+    def cleanup(self):
+        """
+        Stop tracking all results and remove the scratch directory.
+        """
+        self._stored_results = {}
+        self._resident_bytes = 0
+        if self._scratch_dir is not None:
+            shutil.rmtree(self._scratch_dir, ignore_errors=True)
+            self._scratch_dir = None
+
+    def _evict(self, stored_result: _StoredResult):
+        result = stored_result.state._result
+        if isinstance(result, LazyResult):
+            result.unload()
+            return
+
+        if self._scratch_dir is None:
+            self._scratch_dir = pathlib.Path(tempfile.mkdtemp(prefix="prefect_ds_spill_", dir=self.spill_dir))
+        spill_handler = SpillFileHandler(self._scratch_dir / f"{uuid.uuid4().hex}.pkl")
+        spill_handler.write(result.value)
+        spilled_result = LazyResult(
+            result_handler=spill_handler,
+            checkpoint_key=getattr(result, "checkpoint_key", None)
+        )
+        stored_result.state._result = spilled_result
+        stored_result.spill_handler = spill_handler
+        if stored_result.parent_state is not None:
+            # The flow runner gathers the results of mapped children into the parent's result
+            # before every task that reduces over them, so that copy can be dropped
+            stored_result.parent_state._result = NoResult
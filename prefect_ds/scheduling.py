@@ -0,0 +1,157 @@
+import collections
+import heapq
+import statistics
+import typing
+
+from prefect.core.flow import Flow
+from prefect.core.task import Task
+
+# The size assumed for every task result when there's nothing to estimate sizes from
+_DEFAULT_SIZE = 1
+
+
+def estimate_result_sizes(
+        flow: Flow, known_sizes: typing.Mapping[typing.Union[Task, str], int] = None
+) -> typing.Dict[Task, int]:
+    """
+    Estimate the size of the result of every task in a flow.
+
+    Parameters
+    ----------
+    flow : instance of prefect.core.flow.Flow
+        The flow.
+    known_sizes : dict or None
+        Sizes in bytes that are already known, by task or task name: for instance the
+        ``result_sizes`` of the ``memory_report`` of a previous run.
+
+    Returns
+    -------
+    sizes : dict
+        The estimated size in bytes of each task's result. Tasks that aren't in ``known_sizes``
+        are estimated from the size of their checkpoint on disk, if they have a result handler with a
+        ``checkpoint_size`` method and a path that doesn't depend on their inputs. Any remaining
+        tasks are assumed to be of the median estimated size (or all the same size, if nothing
+        could be estimated).
+    """
+    known_sizes = known_sizes or {}
+    sizes = {}
+    for task in flow.tasks:
+        if task in known_sizes:
+            sizes[task] = known_sizes[task]
+        elif task.name in known_sizes:
+            sizes[task] = known_sizes[task.name]
+        else:
+            checkpoint_size = _get_checkpoint_size(task)
+            if checkpoint_size:
+                sizes[task] = checkpoint_size
+    default_size = statistics.median(sizes.values()) if sizes else _DEFAULT_SIZE
+    return {task: sizes.get(task, default_size) for task in flow.tasks}
+
+
+def memory_aware_order(flow: Flow, sizes: typing.Mapping[Task, int]) -> typing.List[Task]:
+    """
+    Find an order to run the tasks of a flow in that keeps the peak size of the results held in
+    memory low, assuming (as ``prefect_ds.flow_runner.DSFlowRunner`` does) that a result is purged
+    as soon as all of its downstream tasks have run.
+
+    Tasks are picked greedily from those whose upstream tasks have all run: first the task that
+    frees the most memory, counting the results it is the last downstream task of in full and
+    those that other tasks still need in proportion to how many of them this task is, minus the
+    size of its own result. So the consumers of big results are run early, and tasks that create
+    big results are put off until they're needed. Ties are broken by the flow's own topological
+    order.
+
+    Parameters
+    ----------
+    flow : instance of prefect.core.flow.Flow
+        The flow.
+    sizes : dict
+        The (estimated) size in bytes of each task's result, e.g. from ``estimate_result_sizes``.
+
+    Returns
+    -------
+    order : list of Task
+        Every task in the flow, in a valid topological order.
+    """
+    default_positions = {task: position for position, task in enumerate(flow.sorted_tasks())}
+    upstream_tasks = collections.defaultdict(set)
+    downstream_tasks = collections.defaultdict(set)
+    for edge in flow.edges:
+        upstream_tasks[edge.downstream_task].add(edge.upstream_task)
+        downstream_tasks[edge.upstream_task].add(edge.downstream_task)
+    # The number of downstream tasks of each task that haven't been scheduled yet
+    pending_consumers = {task: len(downstream_tasks[task]) for task in flow.tasks}
+    num_unscheduled_upstream = {task: len(upstream_tasks[task]) for task in flow.tasks}
+
+    def get_priority(task):
+        freed = sum(sizes[upstream_task] / pending_consumers[upstream_task] for upstream_task in upstream_tasks[task])
+        allocated = sizes[task] if downstream_tasks[task] else 0
+        return (allocated - freed, default_positions[task])
+
+    # A heap of ready tasks, whose priorities are recomputed (and pushed again) when the number of
+    # pending consumers of one of their upstream tasks changes
+    ready = [(get_priority(task), task) for task in flow.tasks if num_unscheduled_upstream[task] == 0]
+    heapq.heapify(ready)
+    order = []
+    scheduled = set()
+    while ready:
+        priority, task = heapq.heappop(ready)
+        if task in scheduled or priority != get_priority(task):
+            continue
+        order.append(task)
+        scheduled.add(task)
+        stale = set()
+        for upstream_task in upstream_tasks[task]:
+            pending_consumers[upstream_task] -= 1
+            stale.update(
+                sibling for sibling in downstream_tasks[upstream_task]
+                if sibling not in scheduled and num_unscheduled_upstream[sibling] == 0
+            )
+        for downstream_task in downstream_tasks[task]:
+            num_unscheduled_upstream[downstream_task] -= 1
+            if num_unscheduled_upstream[downstream_task] == 0:
+                stale.add(downstream_task)
+        for ready_task in stale:
+            heapq.heappush(ready, (get_priority(ready_task), ready_task))
+    return order
+
+
+def get_peak_result_size(flow: Flow, order: typing.Sequence[Task], sizes: typing.Mapping[Task, int]) -> int:
+    """
+    Work out the peak size of the results held in memory when the tasks of a flow are run in a
+    given order and every result is purged as soon as all of its downstream tasks have run.
+
+    Parameters
+    ----------
+    flow : instance of prefect.core.flow.Flow
+        The flow.
+    order : list of Task
+        The order the tasks are run in.
+    sizes : dict
+        The (estimated) size in bytes of each task's result.
+
+    Returns
+    -------
+    peak : int
+        The peak total size of the results held in memory, in bytes.
+    """
+    pending_consumers = collections.Counter(edge.upstream_task for edge in flow.edges)
+    upstream_tasks = collections.defaultdict(list)
+    for edge in flow.edges:
+        upstream_tasks[edge.downstream_task].append(edge.upstream_task)
+    resident = peak = 0
+    for task in order:
+        resident += sizes[task]
+        peak = max(peak, resident)
+        for upstream_task in upstream_tasks[task]:
+            pending_consumers[upstream_task] -= 1
+            if pending_consumers[upstream_task] == 0:
+                resident -= sizes[upstream_task]
+    return peak
+
+
+def _get_checkpoint_size(task: Task) -> typing.Optional[int]:
+    result_handler = task.result_handler
+    if not hasattr(result_handler, "checkpoint_size") or result_handler.template_fields:
+        return None
+    return result_handler.checkpoint_size()
@@ -0,0 +1,155 @@
+import functools
+import pathlib
+import typing
+
+from prefect_ds.cache import CheckpointCache
+from prefect_ds.file_result_handler import FileResultHandler, write_atomically
+from prefect_ds.manifest import write_manifest
+from prefect_ds.serializers import PickleSerializer, find_serializer, get_serializer
+
+
+class SerializerResultHandler(FileResultHandler):
+    """
+    Hook for storing and retrieving task results of any type. Each result is written by a
+    serializer chosen for its type (see ``prefect_ds.serializers``): NumPy arrays with
+    ``numpy.save``, Arrow tables and DataFrames as Arrow IPC files, and anything else with
+    pickle protocol 5, with large buffers such as array data written out-of-band. The name of
+    the serializer is stored in a sidecar manifest (``[path].manifest.json``), which is written
+    after the result, so ``read`` needs no configuration and partially-written results are
+    never read.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        Filepath to be read from or written to, including file name. Like ``PandasResultHandler``,
+        may contain ``str.format`` templates with the names of task arguments, e.g.
+        ``"model_{sample_name}.bin"``, so each iteration of a map gets its own file.
+    serializer : str or None
+        If present, the name of the serializer to write every result with, rather than choosing
+        one by type.
+    content_addressed : bool
+        If ``True``, ``prefect_ds.checkpoint_handler.checkpoint_handler`` computes a hash of
+        the task's source code and inputs for every run, and a checkpoint is only reused when
+        the hash stored in its manifest matches.
+    async_write : bool
+        If ``True``, ``prefect_ds.checkpoint_handler.checkpoint_handler`` hands results to a pool
+        of background threads to be written (see ``prefect_ds.background_writer``).
+    memory_map : bool
+        If ``True``, results are read by memory-mapping their files, so large arrays are used
+        directly from the mapped file (read-only) rather than copied into memory.
+    max_workers : int or None
+        The maximum number of threads used to check for many checkpoints at once.
+    locking : bool
+        If ``True``, concurrent flow runs that need the same missing checkpoint compute it only
+        once, as with ``PandasResultHandler``.
+    lock_timeout : float or None
+        The maximum time, in seconds, to wait for a checkpoint that another run is computing.
+    cache : prefect_ds.cache.CheckpointCache or None
+        If present, checkpoints are recorded in this cache's index, as with ``PandasResultHandler``.
+    local_cache_dir : str or pathlib.Path or None
+        If ``path`` is a URL, the directory results are read and written through, as with
+        ``PandasResultHandler``.
+    storage_options : dict or None
+        If ``path`` is a URL, passed to the ``fsspec`` file system for its protocol.
+    """
+    def __init__(
+            self,
+            path: typing.Union[str, pathlib.Path],
+            serializer: str = None,
+            content_addressed: bool = False,
+            async_write: bool = False,
+            memory_map: bool = False,
+            max_workers: int = None,
+            locking: bool = False,
+            lock_timeout: float = None,
+            cache: CheckpointCache = None,
+            local_cache_dir: typing.Union[str, pathlib.Path] = None,
+            storage_options: dict = None
+    ):
+        if serializer is not None:
+            get_serializer(serializer)  # fail early if the serializer doesn't exist
+        self.serializer = serializer
+        self.memory_map = memory_map
+        super().__init__(
+            path,
+            content_addressed=content_addressed,
+            async_write=async_write,
+            max_workers=max_workers,
+            locking=locking,
+            lock_timeout=lock_timeout,
+            cache=cache,
+            local_cache_dir=local_cache_dir,
+            storage_options=storage_options
+        )
+
+    def read(self, *, input_mapping=None, checkpoint_key: str = None) -> typing.Any:
+        """
+        Read a result from the specified ``path``, with the serializer it was written with.
+
+        Parameters
+        ----------
+        input_mapping : dict
+            If present, passed to ``path.format()`` to set the final filename.
+        checkpoint_key : str or None
+            If present, the result is only read if the manifest next to it was written with
+            the same key.
+
+        Raises
+        ------
+        StaleCheckpointError
+            If ``checkpoint_key`` is given and does not match the key in the manifest.
+        FileNotFoundError
+            If there is no result, or no manifest for it.
+        """
+        path_string = self._format_path(input_mapping)
+        manifest = self._read_checked_manifest(path_string, checkpoint_key)
+        self._fetch_result(path_string)
+        self.logger.debug("Starting to read result from {}...".format(path_string))
+        data = get_serializer(manifest["serializer"]).read(path_string, memory_map=self.memory_map)
+        self.logger.debug("Finished reading result from {}...".format(path_string))
+        return data
+
+    def write(self, result: typing.Any, input_mapping=None, checkpoint_key: str = None):
+        """
+        Write a result to the specified ``path``, via a temporary file so readers never see a
+        partially-written result. If the serializer chosen for the result's type can't write
+        it (e.g. a DataFrame with columns of mixed types, which Arrow can't store), it is
+        pickled instead.
+
+        Parameters
+        ----------
+        result : object
+            The result to write.
+        input_mapping : dict
+            If present, passed to ``path.format()`` to set the final filename.
+        checkpoint_key : str or None
+            If present, stored in the manifest.
+        """
+        path_string = self._format_path(input_mapping)
+        self.logger.debug("Starting to write result to {}...".format(path_string))
+        self._start_write(path_string)
+        if self.serializer is not None:
+            serializer = get_serializer(self.serializer)
+        else:
+            serializer = find_serializer(result)
+        try:
+            write_atomically(path_string, functools.partial(serializer.write, result))
+        except (TypeError, ValueError):
+            if self.serializer is not None or serializer.name == PickleSerializer.name:
+                raise
+            self.logger.debug(f"Could not write result with {serializer.name}, pickling it instead")
+            serializer = get_serializer(PickleSerializer.name)
+            write_atomically(path_string, functools.partial(serializer.write, result))
+        manifest = {"serializer": serializer.name}
+        if checkpoint_key is not None:
+            manifest["checkpoint_key"] = checkpoint_key
+        write_manifest(path_string, manifest)
+        self._publish_result(path_string)
+        self.logger.debug("Finished writing result to {}...".format(path_string))
+
+    @property
+    def _requires_manifest(self) -> bool:
+        return True
+
+    def _is_complete(self, manifest: typing.Dict[str, typing.Any]) -> bool:
+        return "serializer" in manifest
@@ -0,0 +1,317 @@
+import functools
+import importlib.util
+import mmap
+import struct
+import sys
+import typing
+
+if sys.version_info >= (3, 8):
+    import pickle
+else:
+    try:
+        import pickle5 as pickle
+    except ImportError:
+        import pickle
+
+# Out-of-band buffers are written at offsets that are a multiple of this, so arrays
+# read back from them (e.g. from a memory-mapped file) are suitably aligned
+_ALIGNMENT = 64
+
+_PICKLE_MAGIC = b"PDSPKL\x00\x01"
+
+
+class Serializer:
+    """
+    How to write one kind of result to a single file and read it back. Subclasses set ``name``,
+    which is stored in the manifest next to each result so it can be read without configuration,
+    and implement ``can_serialize``, ``write`` and ``read``.
+    """
+    name = None  # type: str
+
+    def can_serialize(self, value: typing.Any) -> bool:
+        """
+        Check whether a result can be written by this serializer. Must not import any
+        libraries that haven't been imported already.
+
+        Parameters
+        ----------
+        value : object
+            The result.
+
+        Returns
+        -------
+        can_serialize : bool
+            Whether ``write`` can write the result.
+        """
+        raise NotImplementedError
+
+    def write(self, value: typing.Any, path_string: str):
+        """
+        Write a result to a file.
+
+        Parameters
+        ----------
+        value : object
+            The result.
+        path_string : str
+            The path of the file.
+        """
+        raise NotImplementedError
+
+    def read(self, path_string: str, memory_map: bool = False) -> typing.Any:
+        """
+        Read a result from a file.
+
+        Parameters
+        ----------
+        path_string : str
+            The path of the file.
+        memory_map : bool
+            If ``True``, the file should be memory-mapped, and the result should use the mapped
+            data in place (read-only) wherever possible rather than copying it.
+
+        Returns
+        -------
+        value : object
+            The result.
+        """
+        raise NotImplementedError
+
+
+class NumpySerializer(Serializer):
+    """
+    Writes NumPy arrays (other than arrays of Python objects) in the ``.npy`` format, with
+    ``numpy.save``. Memory-mapped reads use ``numpy.load(mmap_mode="r")``.
+    """
+    name = "numpy"
+
+    def can_serialize(self, value: typing.Any) -> bool:
+        numpy = sys.modules.get("numpy")
+        return numpy is not None and isinstance(value, numpy.ndarray) and not value.dtype.hasobject
+
+    def write(self, value: typing.Any, path_string: str):
+        import numpy as np
+
+        # Through a file object, as np.save adds ``.npy`` to paths that don't end with it
+        with open(path_string, "wb") as output_file:
+            np.save(output_file, value, allow_pickle=False)
+
+    def read(self, path_string: str, memory_map: bool = False) -> typing.Any:
+        import numpy as np
+
+        return np.load(path_string, mmap_mode="r" if memory_map else None, allow_pickle=False)
+
+
+class ArrowSerializer(Serializer):
+    """
+    Writes ``pyarrow.Table`` results as Arrow IPC files. Memory-mapped reads use the column
+    buffers in the mapped file directly.
+    """
+    name = "arrow"
+
+    def can_serialize(self, value: typing.Any) -> bool:
+        pyarrow = sys.modules.get("pyarrow")
+        return pyarrow is not None and isinstance(value, pyarrow.Table)
+
+    def write(self, value: typing.Any, path_string: str):
+        _write_arrow_table(value, path_string)
+
+    def read(self, path_string: str, memory_map: bool = False) -> typing.Any:
+        return _read_arrow_table(path_string, memory_map)
+
+
+class DataFrameSerializer(Serializer):
+    """
+    Writes ``pandas.DataFrame`` results (with string column names) as Arrow IPC files, keeping
+    their index. Memory-mapped reads convert each column separately, so numeric columns without
+    missing values are used from the mapped file rather than copied. Requires ``pyarrow``.
+    """
+    name = "dataframe"
+
+    def can_serialize(self, value: typing.Any) -> bool:
+        pandas = sys.modules.get("pandas")
+        return (
+            pandas is not None
+            and isinstance(value, pandas.DataFrame)
+            and not isinstance(value.columns, pandas.MultiIndex)
+            and all(isinstance(column, str) for column in value.columns)
+            and _is_importable("pyarrow")
+        )
+
+    def write(self, value: typing.Any, path_string: str):
+        import pyarrow as pa
+
+        # preserve_index=None stores a RangeIndex as metadata and any other index as columns
+        _write_arrow_table(pa.Table.from_pandas(value, preserve_index=None), path_string)
+
+    def read(self, path_string: str, memory_map: bool = False) -> typing.Any:
+        return _read_arrow_table(path_string, memory_map).to_pandas(split_blocks=memory_map)
+
+
+class PickleSerializer(Serializer):
+    """
+    Writes any picklable result with pickle protocol 5 (on Python 3.8+, or with the ``pickle5``
+    backport), storing large contiguous buffers, like the data of NumPy arrays (including those
+    inside DataFrames, sparse matrices, fitted models, dicts of frames, ...), out-of-band: they
+    are written straight from memory after the pickle stream rather than copied into it, and read
+    back into (or, memory-mapped, used directly from) the file's own buffer.
+
+    The file contains a header (the number of out-of-band buffers, the length of the pickle
+    stream and the length of each buffer), the pickle stream, and then each buffer, each starting
+    at a multiple of 64 bytes.
+    """
+    name = "pickle"
+
+    def can_serialize(self, value: typing.Any) -> bool:
+        return True
+
+    def write(self, value: typing.Any, path_string: str):
+        buffers = []
+
+        def buffer_callback(buffer: "pickle.PickleBuffer") -> bool:
+            # Returning a true value keeps a buffer in-band, which is required for buffers
+            # that aren't contiguous (and so can't be written out as they are)
+            try:
+                buffer.raw()
+            except BufferError:
+                return True
+            buffers.append(buffer)
+            return False
+
+        if pickle.HIGHEST_PROTOCOL >= 5:
+            pickled = pickle.dumps(value, protocol=5, buffer_callback=buffer_callback)
+        else:
+            pickled = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        raw_buffers = [buffer.raw() for buffer in buffers]
+        header = _PICKLE_MAGIC + struct.pack(
+            f"<QQ{len(raw_buffers)}Q", len(raw_buffers), len(pickled), *(raw.nbytes for raw in raw_buffers)
+        )
+        with open(path_string, "wb") as output_file:
+            output_file.write(header)
+            output_file.write(pickled)
+            position = len(header) + len(pickled)
+            for raw in raw_buffers:
+                padding = -position % _ALIGNMENT
+                output_file.write(b"\x00" * padding)
+                output_file.write(raw)
+                position += padding + raw.nbytes
+
+    def read(self, path_string: str, memory_map: bool = False) -> typing.Any:
+        with open(path_string, "rb") as input_file:
+            if memory_map:
+                data = memoryview(mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ))
+            else:
+                data = bytearray(input_file.seek(0, 2))
+                input_file.seek(0)
+                input_file.readinto(data)
+                data = memoryview(data)
+        if bytes(data[:len(_PICKLE_MAGIC)]) != _PICKLE_MAGIC:
+            raise ValueError(f"{path_string} was not written by {type(self).__name__}")
+        position = len(_PICKLE_MAGIC)
+        num_buffers, pickle_length = struct.unpack_from("<QQ", data, position)
+        position += struct.calcsize("<QQ")
+        buffer_lengths = struct.unpack_from(f"<{num_buffers}Q", data, position)
+        position += struct.calcsize(f"<{num_buffers}Q")
+        pickled = data[position:position + pickle_length]
+        position += pickle_length
+        buffers = []
+        for buffer_length in buffer_lengths:
+            position += -position % _ALIGNMENT
+            buffers.append(data[position:position + buffer_length])
+            position += buffer_length
+        if num_buffers:
+            return pickle.loads(pickled, buffers=buffers)
+        return pickle.loads(pickled)
+
+
+# In order of precedence; the pickle serializer can write anything, so it comes last
+_SERIALIZERS = [
+    NumpySerializer(),
+    ArrowSerializer(),
+    DataFrameSerializer(),
+    PickleSerializer(),
+]  # type: typing.List[Serializer]
+
+
+def register_serializer(serializer: Serializer):
+    """
+    Add a serializer that ``SerializerResultHandler`` can use, or replace an existing one with
+    the same name. Registered serializers take precedence over the built-in ones.
+
+    Parameters
+    ----------
+    serializer : Serializer
+        The serializer.
+    """
+    _SERIALIZERS[:] = [existing for existing in _SERIALIZERS if existing.name != serializer.name]
+    _SERIALIZERS.insert(0, serializer)
+
+
+def get_serializer(name: str) -> Serializer:
+    """
+    Get a serializer by name.
+
+    Parameters
+    ----------
+    name : str
+        The name of the serializer.
+
+    Returns
+    -------
+    serializer : Serializer
+        The serializer.
+
+    Raises
+    ------
+    ValueError
+        If there is no serializer with that name.
+    """
+    for serializer in _SERIALIZERS:
+        if serializer.name == name:
+            return serializer
+    raise ValueError(
+        f"{name} not available. Known serializers are {[serializer.name for serializer in _SERIALIZERS]}"
+    )
+
+
+def find_serializer(value: typing.Any) -> Serializer:
+    """
+    Get the serializer to use for a result: the first one (in order of precedence)
+    that can write it.
+
+    Parameters
+    ----------
+    value : object
+        The result.
+
+    Returns
+    -------
+    serializer : Serializer
+        The serializer.
+    """
+    for serializer in _SERIALIZERS:
+        if serializer.can_serialize(value):
+            return serializer
+    return get_serializer(PickleSerializer.name)
+
+
+@functools.lru_cache(maxsize=None)
+def _is_importable(module_name: str) -> bool:
+    return importlib.util.find_spec(module_name) is not None
+
+
+def _write_arrow_table(table, path_string: str):
+    import pyarrow as pa
+
+    # Uncompressed, and (where the table is in one chunk) a single record batch, so
+    # every column is one contiguous buffer that can be used in place when memory-mapped
+    with pa.OSFile(path_string, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+
+
+def _read_arrow_table(path_string: str, memory_map: bool):
+    import pyarrow as pa
+
+    with (pa.memory_map(path_string) if memory_map else pa.OSFile(path_string)) as source:
+        return pa.ipc.open_file(source).read_all()
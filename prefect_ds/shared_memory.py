@@ -0,0 +1,144 @@
+import contextlib
+import mmap
+import os
+import pathlib
+import sys
+import tempfile
+import typing
+import uuid
+
+if sys.version_info >= (3, 8):
+    import pickle
+else:
+    try:
+        import pickle5 as pickle
+    except ImportError:
+        import pickle
+
+# Where shared objects are written, if not specified: a RAM-backed filesystem where there is one
+DEFAULT_DIRECTORY = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+# Buffers are aligned so that arrays read from them are aligned for any dtype (and for SIMD)
+_ALIGNMENT = 64
+
+_PREFIX = "prefect_ds-"
+
+# Whether objects can be shared, which needs pickle protocol 5 (Python 3.8+, or the pickle5 backport)
+HAS_PICKLE_PROTOCOL_5 = pickle.HIGHEST_PROTOCOL >= 5
+
+
+class SharedObject(typing.NamedTuple):
+    """
+    A reference to an object whose data is held in shared memory, which any process on the same
+    machine can read without copying it.
+
+    The object is pickled (with pickle protocol 5), with the buffers of its arrays (e.g. the
+    columns of a DataFrame) kept out of the pickle and written to a file in a RAM-backed directory.
+    Reading the object back maps the file into memory, so the arrays of every process that reads it
+    share the same memory.
+
+    Attributes
+    ----------
+    path : str
+        The path of the file holding the buffers.
+    header : bytes
+        The pickled object, without its buffers.
+    buffer_spans : list of (int, int)
+        The offset and length in bytes of each buffer in the file.
+    """
+    path: str
+    header: bytes
+    buffer_spans: typing.List[typing.Tuple[int, int]]
+
+    @property
+    def size(self) -> int:
+        """
+        The total size in bytes of the shared buffers.
+        """
+        return sum(length for _, length in self.buffer_spans)
+
+
+def share(value: typing.Any, directory: typing.Union[str, pathlib.Path] = None) -> typing.Optional[SharedObject]:
+    """
+    Put the data of an object into shared memory.
+
+    Parameters
+    ----------
+    value : object
+        The object. Its arrays must support pickle protocol 5 (e.g. numpy arrays, and so
+        pandas objects).
+    directory : str, pathlib.Path or None
+        The directory to write the buffers to, by default ``/dev/shm`` (or the system temporary
+        directory, where there is no ``/dev/shm``).
+
+    Returns
+    -------
+    shared : SharedObject or None
+        The reference to the shared object, or ``None`` if it has no buffers to share (e.g. it's
+        a number or a string), in which case it's cheapest to pickle it as usual.
+    """
+    buffers = []
+
+    def keep_out_of_band(buffer):
+        try:
+            buffers.append(buffer.raw())
+        except BufferError:
+            # Not contiguous, so it has to be copied into the pickle
+            return True
+        return False
+    header = pickle.dumps(value, protocol=5, buffer_callback=keep_out_of_band)
+    if not buffers:
+        return None
+
+    path_string = os.path.join(directory or DEFAULT_DIRECTORY, f"{_PREFIX}{uuid.uuid4().hex}")
+    buffer_spans = []
+    offset = 0
+    with open(path_string, "wb") as shared_file:
+        for buffer in buffers:
+            padding = -offset % _ALIGNMENT
+            shared_file.write(b"\0" * padding)
+            offset += padding
+            shared_file.write(buffer)
+            buffer_spans.append((offset, buffer.nbytes))
+            offset += buffer.nbytes
+    return SharedObject(path=path_string, header=header, buffer_spans=buffer_spans)
+
+
+def attach(shared: SharedObject) -> typing.Any:
+    """
+    Read an object from shared memory, without copying its data.
+
+    The file is mapped copy-on-write, so the object's arrays can be modified without affecting
+    anyone else's copy. The mapping lasts as long as the arrays do, even if the file is removed
+    (with ``release``) in the meantime.
+
+    Parameters
+    ----------
+    shared : SharedObject
+        The reference to the object.
+
+    Returns
+    -------
+    value : object
+        The object.
+    """
+    with open(shared.path, "rb") as shared_file:
+        if os.fstat(shared_file.fileno()).st_size == 0:
+            # Only empty buffers, which can't be mapped
+            return pickle.loads(shared.header, buffers=[bytearray(0) for _ in shared.buffer_spans])
+        memory = memoryview(mmap.mmap(shared_file.fileno(), 0, access=mmap.ACCESS_COPY))
+    return pickle.loads(shared.header, buffers=[memory[offset:offset + length] for offset, length in shared.buffer_spans])
+
+
+def release(path_string: str):
+    """
+    Remove the file of a shared object. Its memory is freed once every process that mapped it has
+    dropped the object.
+
+    Parameters
+    ----------
+    path_string : str
+        The ``path`` of the shared object.
+    """
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path_string)
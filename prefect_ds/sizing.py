@@ -0,0 +1,57 @@
+import sys
+import typing
+
+import numpy as np
+import pandas as pd
+
+_SIZERS = {}  # type: typing.Dict[type, typing.Callable[[typing.Any], int]]
+
+
+def register_sizer(value_type: type, sizer: typing.Callable[[typing.Any], int]):
+    """
+    Register a function that computes the size of task results of a given type (and its subclasses),
+    for types that ``get_size`` can't measure accurately on its own.
+
+    Parameters
+    ----------
+    value_type : type
+        The type of result the sizer applies to.
+    sizer : callable
+        A function taking a result and returning the number of bytes of memory it uses.
+    """
+    _SIZERS[value_type] = sizer
+
+
+def get_size(value: typing.Any) -> int:
+    """
+    Estimate the number of bytes of memory used by a task result.
+
+    Pandas objects are measured with ``memory_usage(deep=True)``, numpy arrays with ``nbytes``,
+    and lists, tuples, sets and dicts recursively. Other types can be measured by registering
+    a sizer with ``register_sizer``; anything else falls back to ``sys.getsizeof``, which does
+    not account for memory referenced by the object.
+
+    Parameters
+    ----------
+    value : object
+        The task result.
+
+    Returns
+    -------
+    size : int
+        The estimated size of the result, in bytes.
+    """
+    for value_type in type(value).__mro__:
+        if value_type in _SIZERS:
+            return int(_SIZERS[value_type](value))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(get_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(get_size(key) + get_size(item) for key, item in value.items())
+    return sys.getsizeof(value)
+
+
+register_sizer(pd.DataFrame, lambda value: value.memory_usage(index=True, deep=True).sum())
+register_sizer(pd.Series, lambda value: value.memory_usage(index=True, deep=True))
+register_sizer(pd.Index, lambda value: value.memory_usage(deep=True))
+register_sizer(np.ndarray, lambda value: value.nbytes)
@@ -1,10 +1,46 @@
+import inspect
+import threading
+
 from prefect.core import Edge
+from prefect.engine.result import Result
 from prefect.engine.state import State
 from prefect.engine.task_runner import TaskRunner
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Optional
+
+from prefect_ds.chunks import Chunks
+from prefect_ds.incremental import restrict_inputs
+from prefect_ds.projection import get_input_projections, project_result
+
+
+def _thread_local_attribute(name: str) -> property:
+    # The children of a mapped task are all run by the same task runner, at the same time if the
+    # executor runs them in threads, so what the runner keeps about a run is kept per thread.
+    # Threads that haven't set it see None, never the value of another thread's run.
+    def get(self):
+        return getattr(self._thread_local, name, None)
+
+    def set(self, value):
+        setattr(self._thread_local, name, value)
+    return property(get, set)
 
 
 class DSTaskRunner(TaskRunner):
+    # The states of the upstream tasks of the current run
+    upstream_states = _thread_local_attribute("upstream_states")
+    # The lock held on the task's checkpoint while it's being computed and written,
+    # if its result handler has ``locking`` set (see prefect_ds.checkpoint_handler)
+    checkpoint_lock = _thread_local_attribute("checkpoint_lock")
+    # The content-addressed key of the task's checkpoint, computed once before the task runs and
+    # reused to write its result (see prefect_ds.checkpoint_handler)
+    checkpoint_key = _thread_local_attribute("checkpoint_key")
+    # Which partitions of an incremental task's result have to be computed, if its result
+    # handler has a ``partition_key`` (see prefect_ds.incremental)
+    partition_plan = _thread_local_attribute("partition_plan")
+
+    def __init__(self, *args, **kwargs):
+        self._thread_local = threading.local()
+        super().__init__(*args, **kwargs)
+
     def run(
         self,
         state: State = None,
@@ -16,4 +52,43 @@ class DSTaskRunner(TaskRunner):
         See the documentation for ``prefect.engine.task_runner.TaskRunner.run()``.
         """
         self.upstream_states = upstream_states
+        self.checkpoint_lock = None
+        self.checkpoint_key = None
+        self.partition_plan = None
         return super().run(state=state, upstream_states=upstream_states, context=context, executor=executor)
+
+    def call_runner_target_handlers(self, old_state: State, new_state: State) -> State:
+        """
+        Same as ``prefect.engine.task_runner.TaskRunner.call_runner_target_handlers()``, but first
+        wraps a generator returned by the task in ``prefect_ds.chunks.Chunks``, so that it is passed
+        on to downstream tasks (and to ``checkpoint_handler``) as a stream of chunks.
+        """
+        if old_state.is_running() and new_state.is_successful() and inspect.isgenerator(new_state._result.value):
+            new_state._result.value = Chunks(new_state._result.value)
+        return super().call_runner_target_handlers(old_state, new_state)
+
+    def get_task_run_state(
+        self,
+        state: State,
+        inputs: Dict[str, Result],
+        timeout_handler: Optional[Callable] = None,
+    ) -> State:
+        """
+        Same as ``prefect.engine.task_runner.TaskRunner.get_task_run_state()``, but if only some
+        partitions of an incremental task's result have to be computed, only passes the rows of
+        those partitions to the task (see ``prefect_ds.incremental``).
+        """
+        if self.partition_plan is not None:
+            inputs = restrict_inputs(inputs, self.partition_plan)
+        return super().get_task_run_state(state, inputs=inputs, timeout_handler=timeout_handler)
+
+    def get_task_inputs(self, state: State, upstream_states: Dict[Edge, State]) -> Dict[str, Result]:
+        """
+        Same as ``prefect.engine.task_runner.TaskRunner.get_task_inputs()``, but applies any
+        projections declared for the task's inputs (see ``prefect_ds.projection``).
+        """
+        task_inputs = super().get_task_inputs(state=state, upstream_states=upstream_states)
+        for input_name, projection in get_input_projections(self.task).items():
+            if input_name in task_inputs:
+                task_inputs[input_name] = project_result(task_inputs[input_name], projection)
+        return task_inputs
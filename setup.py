@@ -20,11 +20,20 @@ CLASSIFIERS = [
 ]
 INSTALL_REQUIRES = [
     'prefect >= 0.9.0, <= 0.9.2',
-    'pandas >= 0.25.3, <= 0.25.3'
+    'pandas >= 0.25.3, <= 0.25.3',
+    'numpy >= 1.13.3'
 ]
 
 EXTRAS_REQUIRE = {
-    "dev": ["pytest >= 5.3.2, <= 5.3.2", "pytest-cov >= 2.8.1, <= 2.8.1"]
+    "dev": ["pytest >= 5.3.2, <= 5.3.2", "pytest-cov >= 2.8.1, <= 2.8.1"],
+    # Arrow IPC files for DataFrames and Arrow tables, and pickle protocol 5 before Python 3.8
+    "serializers": ["pyarrow >= 4.0.0", 'pickle5 >= 0.0.10; python_version < "3.8"'],
+    # Parquet and feather files, compression, chunked and memory-mapped results
+    "parquet": ["pyarrow >= 4.0.0"],
+    # ProcessExecutor, and pickle protocol 5 before Python 3.8
+    "process": ["cloudpickle >= 0.6.0", 'pickle5 >= 0.0.10; python_version < "3.8"'],
+    # Checkpoints at URLs (plus s3fs, gcsfs, ... for the protocols used)
+    "remote": ["fsspec >= 2021.4.0"]
     }
 
 
@@ -0,0 +1,95 @@
+import concurrent.futures
+import gc
+import threading
+import time
+import weakref
+
+import pytest
+
+from prefect_ds import background_writer as bw
+
+
+class TestBackgroundWriter:
+
+    def test_flush_waits_for_writes(self):
+        writer = bw.BackgroundWriter(max_workers=2)
+        written = []
+        for value in range(5):
+            writer.submit(written.append, value)
+        assert writer.flush() == []
+        assert sorted(written) == list(range(5))
+
+    def test_flush_returns_errors_once(self):
+        writer = bw.BackgroundWriter()
+
+        def fail():
+            raise OSError("disk full")
+        writer.submit(fail)
+        errors = writer.flush()
+        assert len(errors) == 1
+        assert isinstance(errors[0], OSError)
+        assert writer.flush() == []
+
+    def test_submit_blocks_when_too_many_writes_pending(self):
+        writer = bw.BackgroundWriter(max_workers=1, max_pending=1)
+        release = threading.Event()
+        writer.submit(release.wait)
+        submitted = threading.Event()
+
+        def submit_second():
+            writer.submit(lambda: None)
+            submitted.set()
+        thread = threading.Thread(target=submit_second)
+        thread.start()
+        assert not submitted.wait(0.1)
+        release.set()
+        assert submitted.wait(5)
+        thread.join()
+        assert writer.flush() == []
+
+
+    def test_finished_writes_are_forgotten(self):
+        writer = bw.BackgroundWriter()
+        done = threading.Event()
+        future = writer.submit(done.set)
+        done.wait(5)
+        concurrent.futures.wait([future])
+        future_reference = weakref.ref(future)
+        del future
+        # The write is dropped by a callback, which can run just after the future is done
+        for _ in range(50):
+            gc.collect()
+            if future_reference() is None:
+                break
+            time.sleep(0.01)
+        assert future_reference() is None
+
+
+class TestWriteBatch:
+
+    def test_only_waits_for_its_own_writes(self):
+        writer = bw.BackgroundWriter()
+        release = threading.Event()
+        other_write = writer.submit(release.wait)
+        batch = bw.WriteBatch()
+
+        def fail():
+            raise OSError("disk full")
+        batch.add(writer.submit(fail))
+        errors = writer.flush(batch)
+        assert [str(error) for error in errors] == ["disk full"]
+        assert not other_write.done()
+        release.set()
+        # The error was reported by the batch, so isn't reported again
+        assert writer.flush() == []
+
+
+def test_flush_background_writes_raises_first_error(monkeypatch):
+    writer = bw.BackgroundWriter()
+    monkeypatch.setattr(bw, "_BACKGROUND_WRITER", writer)
+
+    def fail():
+        raise OSError("disk full")
+    writer.submit(fail)
+    with pytest.raises(OSError):
+        bw.flush_background_writes()
@@ -0,0 +1,215 @@
+import os
+
+import pandas as pd
+import pytest
+
+from prefect import Flow, task
+from prefect.engine.flow_runner import FlowRunner
+
+from prefect_ds import cache as dscache
+from prefect_ds.cache import CheckpointCache
+from prefect_ds.checkpoint_handler import checkpoint_handler
+from prefect_ds.pandas_result_handler import PandasResultHandler
+from prefect_ds.task_runner import DSTaskRunner
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(dscache.time, "time", lambda: now[0])
+    return now
+
+
+def _write_checkpoint(cache, path, size, **kwargs):
+    path.write_bytes(b"x" * size)
+    cache.record_write(str(path), **kwargs)
+
+
+class TestIndex:
+
+    def test_records_writes_and_accesses(self, tmp_path, clock):
+        cache = CheckpointCache(tmp_path)
+        _write_checkpoint(cache, tmp_path / "one.csv", 10, task="one", flow="flow")
+        clock[0] += 5
+        cache.record_access([str(tmp_path / "one.csv"), str(tmp_path / "one.csv")])
+
+        assert cache.entries() == [dscache.CacheEntry(
+            path=str(tmp_path / "one.csv"), size=10, task="one", flow="flow",
+            created=1000.0, last_access=1005.0, access_count=2
+        )]
+        assert cache.total_size() == 10
+
+    def test_size_includes_partitions_and_manifest(self, tmp_path):
+        cache = CheckpointCache(tmp_path)
+        handler = PandasResultHandler(tmp_path / "data", "csv", num_partitions=2)
+        handler.write(pd.DataFrame({"one": range(10)}))
+        cache.record_write(str(tmp_path / "data"))
+        expected_size = sum(
+            os.path.getsize(path) for path in list((tmp_path / "data").iterdir()) + [tmp_path / "data.manifest.json"]
+        )
+        assert cache.total_size() == expected_size
+
+    def test_ignores_truncated_lines(self, tmp_path):
+        cache = CheckpointCache(tmp_path)
+        _write_checkpoint(cache, tmp_path / "one.csv", 10)
+        with open(cache.index_path, "a") as index_file:
+            index_file.write('{"event": "acc')
+        assert len(cache.entries()) == 1
+
+    def test_rejects_unknown_policy(self, tmp_path):
+        with pytest.raises(ValueError):
+            CheckpointCache(tmp_path, policy="fifo")
+
+
+class TestEviction:
+
+    def test_quota_evicts_least_recently_used(self, tmp_path, clock):
+        cache = CheckpointCache(tmp_path, max_bytes=25)
+        for name in ["one", "two"]:
+            _write_checkpoint(cache, tmp_path / name, 10)
+            clock[0] += 1
+        cache.record_access([str(tmp_path / "one")])
+        clock[0] += 1
+        _write_checkpoint(cache, tmp_path / "three", 10)
+
+        assert not (tmp_path / "two").exists()
+        assert [entry.path for entry in cache.entries()] == [str(tmp_path / "one"), str(tmp_path / "three")]
+
+    def test_lfu_evicts_least_often_used(self, tmp_path, clock):
+        cache = CheckpointCache(tmp_path, policy="lfu")
+        for name in ["one", "two"]:
+            _write_checkpoint(cache, tmp_path / name, 10)
+            clock[0] += 1
+        cache.record_access([str(tmp_path / "one")] * 2)
+        clock[0] += 1
+        cache.record_access([str(tmp_path / "two")])
+
+        removed = cache.enforce_quota(max_bytes=10)
+        assert [entry.path for entry in removed] == [str(tmp_path / "two")]
+
+    def test_eviction_keeps_lock_files(self, tmp_path, clock):
+        cache = CheckpointCache(tmp_path, max_bytes=15)
+        _write_checkpoint(cache, tmp_path / "one", 10)
+        (tmp_path / "one.lock").touch()
+        clock[0] += 1
+        _write_checkpoint(cache, tmp_path / "two", 10)
+        assert not (tmp_path / "one").exists()
+        assert (tmp_path / "one.lock").exists()
+
+    def test_never_evicts_new_checkpoint(self, tmp_path):
+        cache = CheckpointCache(tmp_path, max_bytes=5)
+        _write_checkpoint(cache, tmp_path / "one", 10)
+        assert (tmp_path / "one").exists()
+
+    def test_compaction_keeps_history(self, tmp_path, clock):
+        cache = CheckpointCache(tmp_path)
+        _write_checkpoint(cache, tmp_path / "one", 10)
+        _write_checkpoint(cache, tmp_path / "two", 10)
+        clock[0] += 1
+        cache.record_access([str(tmp_path / "two")])
+        entries_before = cache.entries()
+        cache.prune(flow="other")
+        assert cache.entries() == entries_before
+        assert len(cache.index_path.read_text().splitlines()) == 2
+
+    def test_forgets_checkpoints_removed_elsewhere(self, tmp_path):
+        cache = CheckpointCache(tmp_path)
+        _write_checkpoint(cache, tmp_path / "one", 10)
+        os.remove(tmp_path / "one")
+        assert cache.enforce_quota(max_bytes=0) == []
+        assert cache.entries() == []
+
+
+class TestPrune:
+
+    def test_prunes_by_age_and_flow(self, tmp_path, clock):
+        cache = CheckpointCache(tmp_path)
+        _write_checkpoint(cache, tmp_path / "old_a", 1, flow="a")
+        _write_checkpoint(cache, tmp_path / "old_b", 1, flow="b")
+        clock[0] += 100
+        _write_checkpoint(cache, tmp_path / "new_a", 1, flow="a")
+
+        assert [entry.path for entry in cache.prune(older_than=50, dry_run=True)] == [
+            str(tmp_path / "old_a"), str(tmp_path / "old_b")
+        ]
+        assert (tmp_path / "old_a").exists()
+        removed = cache.prune(older_than=50, flow="a")
+        assert [entry.path for entry in removed] == [str(tmp_path / "old_a")]
+        assert not (tmp_path / "old_a").exists()
+        assert [entry.path for entry in cache.entries()] == [str(tmp_path / "old_b"), str(tmp_path / "new_a")]
+
+    def test_removes_manifest_and_partitions(self, tmp_path):
+        cache = CheckpointCache(tmp_path)
+        handler = PandasResultHandler(tmp_path / "data", "csv", num_partitions=2, cache=cache)
+        handler.write(pd.DataFrame({"one": range(10)}), checkpoint_key="abc")
+        handler.record_write(flow="a")
+        cache.prune(flow="a")
+        assert not (tmp_path / "data").exists()
+        assert not (tmp_path / "data.manifest.json").exists()
+
+
+def test_cli(tmp_path, clock, capsys):
+    cache = CheckpointCache(tmp_path)
+    _write_checkpoint(cache, tmp_path / "one", 10, task="make_one", flow="a")
+    _write_checkpoint(cache, tmp_path / "two", 10, task="make_two", flow="b")
+
+    dscache.main([str(tmp_path), "--list", "--max-bytes", "10", "--dry-run"])
+    output = capsys.readouterr().out.splitlines()
+    assert output[0].split("\t")[:4] == [str(tmp_path / "one"), "10", "make_one", "a"]
+    assert output[2] == f"Would remove {tmp_path / 'one'} (10 bytes)"
+
+    dscache.main([str(tmp_path), "--flow", "b"])
+    assert capsys.readouterr().out.strip() == f"Removed {tmp_path / 'two'} (10 bytes)"
+    assert (tmp_path / "one").exists()
+    assert not (tmp_path / "two").exists()
+
+
+def test_checkpoint_handler_records_writes_and_hits(tmp_path):
+    cache = CheckpointCache(tmp_path)
+
+    @task(result_handler=PandasResultHandler(tmp_path / "test_{offset}.csv", "csv", cache=cache))
+    def generate_data(offset):
+        return pd.DataFrame({"one": [1, 2, 3]}) + offset
+
+    with Flow("test_flow") as flow:
+        generate_data.map([0, 1])
+
+    for _ in range(2):
+        FlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(task_runner_state_handlers=[checkpoint_handler])
+
+    entries = sorted(cache.entries())
+    assert [(entry.path, entry.flow, entry.access_count) for entry in entries] == [
+        (str(tmp_path / "test_0.csv"), "test_flow", 1),
+        (str(tmp_path / "test_1.csv"), "test_flow", 1),
+    ]
+    assert all(entry.task.startswith("generate_data") for entry in entries)
+
+
+def test_quota_keeps_checkpoints_the_run_has_hit(tmp_path):
+    cache = CheckpointCache(tmp_path, max_bytes=30, policy="lfu")
+
+    def make_handler(name):
+        return PandasResultHandler(tmp_path / f"{name}.csv", "csv", cache=cache)
+
+    @task()
+    def create(offset):
+        return pd.DataFrame({"one": range(10)}) + offset
+
+    @task()
+    def combine(first, second):
+        return pd.concat([first, second], ignore_index=True)
+
+    with Flow("test_flow") as flow:
+        first = create(0, task_args={"result_handler": make_handler("a")})
+        second = create(1, task_args={"result_handler": make_handler("b")})
+        combined = combine(first, second, task_args={"result_handler": make_handler("c")})
+    make_handler("a").write(pd.DataFrame({"one": range(10)}))
+    cache.record_write(str(tmp_path / "a.csv"))
+
+    state = FlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(
+        return_tasks=[combined], task_runner_state_handlers=[checkpoint_handler]
+    )
+    assert state.is_successful()
+    assert len(state.result[combined].result) == 20
+    # Over quota, but everything was used by the run
+    assert cache.total_size() > 30 and (tmp_path / "a.csv").exists()
@@ -1,16 +1,26 @@
 import pandas as pd
 import pytest
+import threading
 
 from prefect.core.edge import Edge
 from prefect.core.task import Task
+from prefect.engine.result import Result
+from prefect import Flow, task
+from prefect.engine.flow_runner import FlowRunner
 from prefect.engine.state import State, Failed, Pending, Running, Success
 from prefect.engine.task_runner import TaskRunner
 from prefect.engine.result_handlers.local_result_handler import LocalResultHandler
 
 import prefect_ds.checkpoint_handler as dsh
 
+from prefect_ds import background_writer
+from prefect_ds.background_writer import BackgroundWriter
+from prefect_ds.chunks import Chunks
+from prefect_ds.locking import CheckpointLock
+
 from prefect_ds.task_runner import DSTaskRunner
 from prefect_ds.pandas_result_handler import PandasResultHandler
+from prefect_ds.result import LazyResult
 
 
 class TestCheckPointHandler:
@@ -95,8 +105,46 @@ class TestCheckPointHandler:
         assert new_state.is_successful()
         pd.testing.assert_frame_equal(expected_result, new_state.result)
 
+    def test_does_not_read_checkpointed_file_until_result_is_used(self, tmp_path, monkeypatch):
+        result_handler = PandasResultHandler(tmp_path / "dummy.csv", "csv")
+        task = Task(name="Task", result_handler=result_handler)
+        pd.DataFrame({"one": [1, 2, 3]}).to_csv(tmp_path / "dummy.csv", index=False)
+        task_runner = DSTaskRunner(task)
+        task_runner.upstream_states = {}
 
+        def fail_read(*args, **kwargs):
+            raise AssertionError("read should not be called")
+        monkeypatch.setattr(result_handler, "read", fail_read)
+        new_state = dsh.checkpoint_handler(task_runner, Pending(), Running())
 
+        assert new_state.is_successful()
+        assert isinstance(new_state._result, LazyResult)
+        assert not new_state._result.is_loaded
+
+    def test_async_write_happens_in_background(self, tmp_path, monkeypatch):
+        writer = BackgroundWriter(max_workers=1)
+        monkeypatch.setattr(background_writer, "_BACKGROUND_WRITER", writer)
+        result_handler = PandasResultHandler(
+            tmp_path / "dummy_{id}.csv",
+            "csv",
+            write_kwargs={"index": False},
+            async_write=True
+        )
+        task = Task(name="Task", result_handler=result_handler)
+        expected_result = pd.DataFrame({"one": [1, 2, 3], "two": [4, 5, 6]})
+        task_runner = DSTaskRunner(task)
+        task_runner.upstream_states = {Edge(Task(name="id"), task, key="id"): Success(result=1)}
+        release = threading.Event()
+        writer.submit(release.wait) # Occupy the writer until the handler has returned
+
+        try:
+            new_state = dsh.checkpoint_handler(task_runner, Running(), Success(result=expected_result))
+            assert new_state.is_successful()
+            assert not (tmp_path / "dummy_1.csv").exists()
+        finally:
+            release.set()
+        assert writer.flush() == []
+        pd.testing.assert_frame_equal(expected_result, pd.read_csv(tmp_path / "dummy_1.csv"))
 
     def test_does_not_write_checkpoint_file_to_disk_on_failure(self, tmp_path):
         result_handler = PandasResultHandler(
@@ -116,6 +164,169 @@ class TestCheckPointHandler:
         with pytest.raises(IOError):
             pd.read_csv(tmp_path / "dummy.csv")
 
+    def test_content_addressed_checkpoint_is_only_reused_for_same_inputs(self, tmp_path):
+        result_handler = PandasResultHandler(
+            tmp_path / "dummy.csv",
+            "csv",
+            write_kwargs={"index": False},
+            content_addressed=True
+        )
+        task = Task(name="Task", result_handler=result_handler)
+        upstream_task = Task(name="upstream_task")
+        edge = Edge(upstream_task, task, key="input_data")
+        input_data = pd.DataFrame({"one": [1, 2, 3]})
+        expected_result = pd.DataFrame({"one": [1, 2, 3], "two": [4, 5, 6]})
+
+        task_runner = DSTaskRunner(task)
+        task_runner.upstream_states = {edge: Success(result=input_data)}
+        dsh.checkpoint_handler(task_runner, Running(), Success(result=expected_result))
+
+        new_state = dsh.checkpoint_handler(task_runner, Pending(), Running())
+        assert new_state.is_successful()
+        pd.testing.assert_frame_equal(expected_result, new_state.result)
+
+        task_runner.upstream_states = {edge: Success(result=input_data * 2)}
+        new_state = dsh.checkpoint_handler(task_runner, Pending(), Running())
+        assert new_state.is_running()
+
+    def test_content_addressed_key_is_computed_once(self, tmp_path, monkeypatch):
+        from prefect_ds import hashing
+
+        keys = []
+        compute_checkpoint_key = hashing.compute_checkpoint_key
+
+        def counting_compute_checkpoint_key(*args, **kwargs):
+            keys.append(compute_checkpoint_key(*args, **kwargs))
+            return keys[-1]
+        monkeypatch.setattr(hashing, "compute_checkpoint_key", counting_compute_checkpoint_key)
+        result_handler = PandasResultHandler(tmp_path / "dummy.csv", "csv", content_addressed=True)
+        task = Task(name="Task", result_handler=result_handler)
+        edge = Edge(Task(name="upstream_task"), task, key="input_data")
+        task_runner = DSTaskRunner(task)
+        task_runner.upstream_states = {edge: Success(result=pd.DataFrame({"one": [1, 2, 3]}))}
+
+        assert dsh.checkpoint_handler(task_runner, Pending(), Running()).is_running()
+        new_state = dsh.checkpoint_handler(task_runner, Running(), Success(result=pd.DataFrame({"two": [4]})))
+        assert len(keys) == 1
+        assert new_state._result.checkpoint_key == keys[0]
+        assert task_runner.checkpoint_key is None
+
+
+    def test_chunked_results_are_replaced_by_checkpoint(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        result_handler = PandasResultHandler(tmp_path / "dummy.parquet", "parquet", chunked=True, async_write=True)
+        task = Task(name="Task", result_handler=result_handler)
+        task_runner = DSTaskRunner(task)
+        task_runner.upstream_states = {}
+        chunks = Chunks(pd.DataFrame({"one": [number]}) for number in range(3))
+
+        new_state = dsh.checkpoint_handler(task_runner, Running(), Success(result=chunks))
+
+        # Written synchronously, even with async_write, as the chunks can only be read once
+        assert isinstance(new_state._result, LazyResult)
+        assert new_state.result.concat()["one"].tolist() == [0, 1, 2]
+
+    def test_chunks_require_chunked_result_handler(self, tmp_path):
+        result_handler = PandasResultHandler(tmp_path / "dummy.parquet", "parquet")
+        task = Task(name="Task", result_handler=result_handler)
+        task_runner = DSTaskRunner(task)
+        task_runner.upstream_states = {}
+
+        with pytest.raises(TypeError):
+            dsh.checkpoint_handler(task_runner, Running(), Success(result=Chunks([pd.DataFrame({"one": [1]})])))
+
+
+class TestLocking:
+    def _make_task_runner(self, tmp_path, **handler_kwargs):
+        result_handler = PandasResultHandler(
+            tmp_path / "dummy.csv", "csv", write_kwargs={"index": False}, locking=True, **handler_kwargs
+        )
+        task_runner = DSTaskRunner(Task(name="Task", result_handler=result_handler))
+        task_runner.upstream_states = {}
+        return task_runner
+
+    def test_lock_is_held_until_result_is_written(self, tmp_path):
+        task_runner = self._make_task_runner(tmp_path)
+        other_lock = CheckpointLock(tmp_path / "dummy.csv")
+
+        assert dsh.checkpoint_handler(task_runner, Pending(), Running()).is_running()
+        assert not other_lock.acquire(timeout=0)
+        dsh.checkpoint_handler(task_runner, Running(), Success(result=pd.DataFrame({"one": [1]})))
+        assert other_lock.acquire(timeout=0)
+        other_lock.release()
+
+    def test_lock_is_released_on_failure(self, tmp_path):
+        task_runner = self._make_task_runner(tmp_path)
+        other_lock = CheckpointLock(tmp_path / "dummy.csv")
+
+        dsh.checkpoint_handler(task_runner, Pending(), Running())
+        dsh.checkpoint_handler(task_runner, Running(), Failed())
+        assert other_lock.acquire(timeout=0)
+        other_lock.release()
+        assert not (tmp_path / "dummy.csv").exists()
+
+    def test_waits_for_other_run_and_loads_its_result(self, tmp_path):
+        task_runner = self._make_task_runner(tmp_path)
+        other_lock = CheckpointLock(tmp_path / "dummy.csv")
+        other_lock.acquire()
+        new_states = []
+
+        def wait_for_checkpoint():
+            # What the task runner keeps about a run is per thread
+            task_runner.upstream_states = {}
+            new_states.append(dsh.checkpoint_handler(task_runner, Pending(), Running()))
+        waiter = threading.Thread(target=wait_for_checkpoint)
+        waiter.start()
+        try:
+            waiter.join(timeout=0.2)
+            assert waiter.is_alive()
+            expected_result = pd.DataFrame({"one": [1, 2, 3]})
+            task_runner.task.result_handler.write(expected_result)
+        finally:
+            other_lock.release()
+        waiter.join()
+
+        assert new_states[0].is_successful()
+        pd.testing.assert_frame_equal(expected_result, new_states[0].result)
+
+    def test_runs_anyway_after_timeout(self, tmp_path):
+        task_runner = self._make_task_runner(tmp_path, lock_timeout=0.05)
+        with CheckpointLock(tmp_path / "dummy.csv"):
+            assert dsh.checkpoint_handler(task_runner, Pending(), Running()).is_running()
+        assert task_runner.checkpoint_lock is None
+
+
+def test_concurrent_flow_runs_compute_checkpoint_once(tmp_path):
+    run_count = []
+
+    @task(result_handler=PandasResultHandler(
+        tmp_path / "slow.csv", "csv", write_kwargs={"index": False}, locking=True
+    ))
+    def slow():
+        run_count.append(1)
+        threading.Event().wait(0.2)
+        return pd.DataFrame({"one": [1, 2, 3]})
+
+    with Flow("test") as flow:
+        data = slow()
+
+    flow_states = []
+
+    def run_flow():
+        flow_states.append(FlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(
+            task_runner_state_handlers=[dsh.checkpoint_handler],
+            return_tasks=[data]
+        ))
+    runs = [threading.Thread(target=run_flow) for _ in range(3)]
+    for run in runs:
+        run.start()
+    for run in runs:
+        run.join()
+
+    assert len(run_count) == 1
+    for flow_state in flow_states:
+        pd.testing.assert_frame_equal(pd.DataFrame({"one": [1, 2, 3]}), flow_state.result[data].result)
+
 
 class TestCreateInputMapping:
     def test_returns_empty_dict_when_no_upstream_states_given(self):
@@ -134,3 +345,21 @@ class TestCreateInputMapping:
         }
         mapping = dsh._create_input_mapping(upstream_states)
         assert mapping == {"var_1": 1, "var_2": 2}
+
+    def test_only_looks_up_values_that_are_used(self):
+        class ExplodingResult(Result):
+            @property
+            def value(self):
+                raise AssertionError("value should not be accessed")
+
+            @value.setter
+            def value(self, value):
+                pass
+
+        downstream_task = Task(name="downstream_task")
+        upstream_states = {
+            Edge(Task(name="upstream_task_1"), downstream_task, key="var_1"): State(result=1),
+            Edge(Task(name="upstream_task_2"), downstream_task, key="var_2"): State(result=ExplodingResult(None))
+        }
+        mapping = dsh._create_input_mapping(upstream_states)
+        assert "output_{var_1}.csv".format_map(mapping) == "output_1.csv"
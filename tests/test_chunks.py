@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+from prefect_ds import chunks as ch
+
+
+def _make_chunks():
+    return [
+        pd.DataFrame({"one": range(start, start + 5), "two": list("abcde")}, index=range(start, start + 5))
+        for start in [0, 5, 10]
+    ]
+
+
+class TestChunks:
+
+    def test_generators_can_only_be_iterated_once(self):
+        chunks = ch.Chunks(chunk for chunk in _make_chunks())
+        assert not chunks.reiterable
+        assert len(list(chunks)) == 3
+        with pytest.raises(RuntimeError):
+            iter(chunks)
+
+    def test_factories_can_be_iterated_repeatedly(self):
+        chunks = ch.Chunks(_make_chunks)
+        assert chunks.reiterable
+        assert len(list(chunks)) == len(list(chunks)) == 3
+
+    def test_map_is_lazy(self):
+        calls = []
+
+        def double(chunk):
+            calls.append(len(chunk))
+            return chunk[["one"]] * 2
+        mapped = ch.Chunks(_make_chunks).map(double)
+        assert calls == []
+        assert mapped.reiterable
+        assert mapped.concat()["one"].tolist() == [value * 2 for value in range(15)]
+        assert calls == [5, 5, 5]
+
+    def test_concat(self):
+        pd.testing.assert_frame_equal(pd.concat(_make_chunks()), ch.Chunks(_make_chunks()).concat())
+
+
+class TestReadWriteChunks:
+
+    @pytest.mark.parametrize("file_type", ["parquet", "feather"])
+    def test_round_trip_keeps_chunks_and_index(self, tmp_path, file_type):
+        pytest.importorskip("pyarrow")
+        path_string = str(tmp_path / f"test.{file_type}")
+        ch.write_chunks(iter(_make_chunks()), path_string, file_type)
+        read = list(ch.read_chunks(path_string, file_type))
+        assert len(read) == 3
+        for expected, actual in zip(_make_chunks(), read):
+            pd.testing.assert_frame_equal(expected, actual, check_index_type=False)
+
+    @pytest.mark.parametrize("file_type", ["parquet", "feather"])
+    def test_reads_columns(self, tmp_path, file_type):
+        pytest.importorskip("pyarrow")
+        path_string = str(tmp_path / f"test.{file_type}")
+        ch.write_chunks(_make_chunks(), path_string, file_type)
+        read = pd.concat(ch.read_chunks(path_string, file_type, columns=["one"]))
+        assert list(read.columns) == ["one"]
+        assert read.index.tolist() == list(range(15))
+
+    def test_csv_round_trip(self, tmp_path):
+        path_string = str(tmp_path / "test.csv")
+        ch.write_chunks(_make_chunks(), path_string, "csv", index=False)
+        read = list(ch.read_chunks(path_string, "csv", chunksize=4))
+        assert [len(chunk) for chunk in read] == [4, 4, 4, 3]
+        pd.testing.assert_frame_equal(
+            pd.concat(_make_chunks(), ignore_index=True), pd.concat(read, ignore_index=True)
+        )
+
+    def test_categories_can_differ_between_chunks(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        path_string = str(tmp_path / "test.parquet")
+        chunks = [pd.DataFrame({"one": pd.Categorical(values)}) for values in [["a"], ["b", "c"]]]
+        ch.write_chunks(chunks, path_string, "parquet")
+        read = pd.concat(chunk.astype(str) for chunk in ch.read_chunks(path_string, "parquet"))
+        assert read["one"].tolist() == ["a", "b", "c"]
+
+    @pytest.mark.parametrize("file_type", ["parquet", "feather", "csv"])
+    def test_no_chunks(self, tmp_path, file_type):
+        if file_type != "csv":
+            pytest.importorskip("pyarrow")
+        path_string = str(tmp_path / f"test.{file_type}")
+        ch.write_chunks([], path_string, file_type)
+        assert list(ch.read_chunks(path_string, file_type)) == []
+
+    def test_rejects_unsupported_file_types(self, tmp_path):
+        assert not ch.supports_chunks("json")
+        with pytest.raises(ValueError):
+            ch.write_chunks(_make_chunks(), str(tmp_path / "test.json"), "json")
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from prefect_ds.compaction import cast_columns, compact_dtypes
+from prefect_ds.pandas_result_handler import PandasResultHandler
+
+
+def make_data():
+    return pd.DataFrame({
+        "small": np.arange(100, dtype="int64"),
+        "large": np.arange(100, dtype="int64") * 100_000,
+        "halves": np.arange(100) / 2,
+        "tenths": np.arange(100) / 10,
+        "label": ["abc", "def", None, "ghi"] * 25,
+        "name": [f"name_{i}" for i in range(100)],
+    })
+
+
+def test_compact_dtypes_only_changes_columns_it_can_store_exactly():
+    data = make_data()
+    compacted, changes = compact_dtypes(data)
+    assert dict(changes.compacted) == {"small": "int8", "large": "int32", "halves": "float32", "label": "category"}
+    assert dict(changes.original) == {"small": "int64", "large": "int64", "halves": "float64", "label": "object"}
+    # Neither tenths (not exact as float32) nor name (too many distinct values) are changed
+    assert compacted["tenths"].dtype == "float64" and compacted["name"].dtype == "object"
+    assert compacted.memory_usage(deep=True).sum() < data.memory_usage(deep=True).sum()
+    assert data["small"].dtype == "int64"
+    pd.testing.assert_frame_equal(cast_columns(compacted, changes.original), data)
+
+
+def test_compact_dtypes_leaves_int8_and_float32_columns_alone():
+    data = pd.DataFrame({"one": np.array([1, 2], dtype="int8"), "two": np.array([0.5, 1], dtype="float32")})
+    compacted, changes = compact_dtypes(data)
+    assert compacted is data and changes.original == []
+
+
+@pytest.mark.parametrize("file_type", ["parquet", "feather", "csv"])
+def test_compact_round_trip(tmp_path, file_type):
+    if file_type != "csv":
+        pytest.importorskip("pyarrow")
+    data = make_data()
+    kwargs = {"write_kwargs": {"index": False}} if file_type == "csv" else {}
+    PandasResultHandler(tmp_path / f"data.{file_type}", file_type, compact=True, **kwargs).write(data)
+
+    read = PandasResultHandler(tmp_path / f"data.{file_type}", file_type, compact=True).read()
+    assert read["small"].dtype == "int8" and read["label"].dtype == "category"
+    assert read["label"].tolist()[:3] == ["abc", "def", np.nan]
+
+    restored = PandasResultHandler(tmp_path / f"data.{file_type}", file_type, compact=True, restore_dtypes=True).read()
+    pd.testing.assert_frame_equal(restored, data)
+    projected = PandasResultHandler(tmp_path / f"data.{file_type}", file_type, compact=True).read(columns=["large"])
+    assert projected["large"].dtype == "int32"
+
+
+def test_compact_requires_manifest(tmp_path):
+    pytest.importorskip("pyarrow")
+    PandasResultHandler(tmp_path / "data.parquet", "parquet").write(make_data())
+    result_handler = PandasResultHandler(tmp_path / "data.parquet", "parquet", compact=True)
+    assert not result_handler.exists()
+    with pytest.raises(FileNotFoundError):
+        result_handler.read()
+
+
+def test_compact_options_are_checked():
+    with pytest.raises(ValueError, match="requires compact"):
+        PandasResultHandler("data.parquet", "parquet", restore_dtypes=True)
+    with pytest.raises(ValueError, match="chunked"):
+        PandasResultHandler("data.parquet", "parquet", compact=True, chunked=True)
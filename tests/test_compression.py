@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from prefect_ds import compression
+
+
+def test_choose_compression_favors_size_on_slow_disks():
+    pa = pytest.importorskip("pyarrow")
+    data = pd.DataFrame({"one": [1, 2, 3] * 10000, "two": ["abc", "def", "ghi"] * 10000})
+    sizes = {}
+    for candidate in [compression.Compression("uncompressed"), compression.Compression("zstd", 9)]:
+        sink = pa.BufferOutputStream()
+        compression.write_compressed(data, sink, "parquet", candidate)
+        sizes[candidate.codec] = len(sink.getvalue())
+    chosen = compression.choose_compression(data, "parquet", disk_bandwidth=1)
+    sink = pa.BufferOutputStream()
+    compression.write_compressed(data, sink, "parquet", chosen)
+    assert len(sink.getvalue()) <= sizes["zstd"] < sizes["uncompressed"]
+
+
+def test_choose_compression_samples_first_rows(monkeypatch):
+    pytest.importorskip("pyarrow")
+    sampled_lengths = []
+    original_write_compressed = compression.write_compressed
+
+    def tracking_write_compressed(data, *args, **kwargs):
+        sampled_lengths.append(len(data))
+        return original_write_compressed(data, *args, **kwargs)
+    monkeypatch.setattr(compression, "write_compressed", tracking_write_compressed)
+    monkeypatch.setattr(compression, "_SAMPLE_ROWS", 10)
+
+    compression.choose_compression(pd.DataFrame({"one": range(100)}), "csv", index=False)
+    assert set(sampled_lengths) == {10}
+
+
+@pytest.mark.parametrize("file_type", ["csv", "json"])
+def test_stream_round_trip(tmp_path, file_type):
+    pytest.importorskip("pyarrow")
+    data = pd.DataFrame({"one": range(100)})
+    path_string = str(tmp_path / f"test.{file_type}")
+    write_kwargs = {"index": False} if file_type == "csv" else {"orient": "records"}
+    read_kwargs = {} if file_type == "csv" else {"orient": "records"}
+    compression.write_compressed(data, path_string, file_type, compression.Compression("lz4"), **write_kwargs)
+    pd.testing.assert_frame_equal(
+        data, compression.read_compressed(path_string, file_type, compression.Compression("lz4"), **read_kwargs)
+    )
+
+
+def test_get_codecs():
+    assert compression.get_codecs("FEATHER") == ["lz4", "zstd"]
+    assert compression.get_codecs("pickle") == []
@@ -0,0 +1,121 @@
+import pandas as pd
+import pytest
+from prefect import Flow, task
+
+from prefect_ds.checkpoint_handler import checkpoint_handler
+from prefect_ds.dry_run import dry_run
+from prefect_ds.flow_runner import DSFlowRunner
+from prefect_ds.pandas_result_handler import PandasResultHandler
+from prefect_ds.task_runner import DSTaskRunner
+
+runs = []
+
+
+@task()
+def list_offsets(num_offsets):
+    return list(range(num_offsets))
+
+
+@task()
+def create_data(offset):
+    runs.append("create_data")
+    return pd.DataFrame({"one": [1, 2, 3]}) + offset
+
+
+@task()
+def merge_data(data_list):
+    runs.append("merge_data")
+    return pd.concat(data_list, ignore_index=True)
+
+
+@task()
+def summarize(data):
+    runs.append("summarize")
+    return data.sum().to_frame("total")
+
+
+def make_flow(directory, data_path="data_{offset}.csv"):
+    with Flow("test") as flow:
+        offsets = list_offsets(3)
+        data = create_data.map(offsets, task_args={
+            "result_handler": PandasResultHandler(directory / data_path, "csv")
+        })
+        merged = merge_data(data, task_args={
+            "result_handler": PandasResultHandler(directory / "merged.parquet", "parquet")
+        })
+        summarize(merged, task_args={
+            "result_handler": PandasResultHandler(directory / "summary.parquet", "parquet", content_addressed=True)
+        })
+    return flow
+
+
+def get_statuses(report):
+    return [(check.task.name, check.map_index, check.status) for check in report.checks]
+
+
+def test_dry_run_fills_in_paths_of_mapped_children(tmp_path):
+    flow = make_flow(tmp_path)
+    result_handler = PandasResultHandler(tmp_path / "data_{offset}.csv", "csv")
+    result_handler.write(pd.DataFrame({"one": [1]}), input_mapping={"offset": 1})
+    runs.clear()
+
+    report = dry_run(flow, DSTaskRunner, state_handlers=[checkpoint_handler])
+    assert runs == []
+    assert get_statuses(report) == [
+        ("list_offsets", None, "no checkpoint"),
+        ("create_data", 0, "miss"), ("create_data", 1, "hit"), ("create_data", 2, "miss"),
+        ("merge_data", None, "miss"),
+        ("summarize", None, "unknown"),
+    ]
+    assert report.hits[0].path == str(tmp_path / "data_1.csv")
+    assert report.hits[0].size > 0
+    # The hit is read, to merge it with the children that are computed
+    assert report.read_bytes == report.hits[0].size
+
+
+def test_dry_run_reports_reused_and_stale_checkpoints(tmp_path):
+    pytest.importorskip("pyarrow")
+    flow = make_flow(tmp_path)
+    state = DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner, profile_dir=tmp_path / "traces").run(
+        task_runner_state_handlers=[checkpoint_handler]
+    )
+    assert state.is_successful()
+    runs.clear()
+
+    state = DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner, dry_run=True, profile_dir=tmp_path / "traces").run(
+        task_runner_state_handlers=[checkpoint_handler]
+    )
+    assert state.is_successful() and runs == []
+    report = state.dry_run_report
+    assert {check.status for check in report.checks if check.task.name != "list_offsets"} == {"hit"}
+    assert report.read_bytes == 0
+    # Only the task without a checkpoint would be computed
+    assert [plan.task.name for plan in report.task_plans() if plan.expected_runtime] == ["list_offsets"]
+
+    # Replacing merge_data's checkpoint makes summarize's stale
+    PandasResultHandler(tmp_path / "merged.parquet", "parquet").write(pd.DataFrame({"one": [1]}))
+    report = dry_run(flow, DSTaskRunner, state_handlers=[checkpoint_handler])
+    assert get_statuses(report)[-1] == ("summarize", None, "miss")
+    assert report.misses[0].reason == "The checkpoint is stale or incomplete"
+    (tmp_path / "summary.parquet").unlink()
+    (tmp_path / "merged.parquet").unlink()
+    state = DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner, dry_run=True, profile_dir=tmp_path / "traces").run(
+        task_runner_state_handlers=[checkpoint_handler]
+    )
+    plans = {plan.task.name: plan for plan in state.dry_run_report.task_plans()}
+    assert plans["merge_data"].status == "miss"
+    # Runtimes are known from the profiled run
+    assert plans["merge_data"].expected_runtime > 0
+    assert plans["create_data"].read_bytes > 0
+    assert "merge_data\tmiss" in state.dry_run_report.format()
+
+
+def test_dry_run_fails_for_invalid_paths(tmp_path):
+    flow = make_flow(tmp_path, data_path="data_{ofset}.csv")
+    state = DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner, dry_run=True).run(
+        task_runner_state_handlers=[checkpoint_handler]
+    )
+    assert state.is_failed()
+    invalid = state.dry_run_report.invalid
+    assert [check.map_index for check in invalid] == [0, 1, 2]
+    assert "ofset" in invalid[0].reason
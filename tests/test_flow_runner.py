@@ -1,10 +1,21 @@
+import gc
+import json
+import math
 import pandas as pd
 import pathlib
 import pytest
+import time
+import weakref
 from prefect import Flow, Parameter, task
+from prefect.engine.state import Success
 
+from prefect_ds import background_writer
+from prefect_ds.checkpoint_handler import checkpoint_handler
 from prefect_ds.flow_runner import DSFlowRunner
+from prefect_ds.pandas_result_handler import PandasResultHandler
 from prefect_ds.result import PurgedResult
+from prefect_ds.sizing import get_size
+from prefect_ds.task_runner import DSTaskRunner
 
 THIS_DIR = pathlib.Path(__file__).parent.absolute()
 
@@ -118,3 +129,289 @@ def test_purges_properly_when_upstream_has_multiple_downstream():
     pd.testing.assert_frame_equal(expected_result_1, state.result[modified_data_1].result)
     pd.testing.assert_frame_equal(expected_result_2, state.result[modified_data_2].result)
     assert state.result[initial_data]._result is PurgedResult
+
+
+def test_purged_results_are_freed():
+    results = []
+
+    @task()
+    def create_tracked_data():
+        data = pd.DataFrame({"one": [1, 2, 3]})
+        results.append(weakref.ref(data))
+        return data
+
+    with Flow("test") as flow:
+        initial_data = create_tracked_data()
+        modified_data = modify_data(initial_data)
+        modify_data(modified_data)
+
+    state = DSFlowRunner(flow=flow).run(return_tasks=flow.tasks)
+    gc.collect()
+    assert state.result[initial_data]._result is PurgedResult
+    assert results[0]() is None
+
+
+def test_spills_results_over_memory_limit(tmp_path):
+    with Flow("test") as flow:
+        initial_data = create_data()
+        modified_data_1 = modify_data(initial_data)
+        modified_data_2 = modify_data(modified_data_1)
+        merged_data = merge_two_dataframes(initial_data, modified_data_2)
+
+    state = DSFlowRunner(flow=flow, memory_limit=0, spill_dir=tmp_path).run(return_tasks=flow.tasks)
+    expected_result = pd.DataFrame({
+        "one": [1, 2, 3, 4, 8, 12],
+        "two": [4, 5, 6, 16, 20, 24]
+    })
+    pd.testing.assert_frame_equal(expected_result, state.result[merged_data].result)
+    assert state.result[initial_data]._result is PurgedResult
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spills_mapped_results_over_memory_limit(tmp_path):
+    with Flow("test") as flow:
+        offsets = create_offsets(3)
+        initial_data = create_data.map(offsets)
+        modified_data = modify_data.map(initial_data)
+        merged_data = merge_data(modified_data)
+    state = DSFlowRunner(flow=flow, memory_limit=0, spill_dir=tmp_path).run(return_tasks=flow.tasks)
+    expected_result = pd.DataFrame({
+        "one": [2, 4, 6, 4, 6, 8, 6, 8, 10],
+        "two": [8, 10, 12, 10, 12, 14, 12, 14, 16]
+    })
+    pd.testing.assert_frame_equal(expected_result, state.result[merged_data].result)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_purges_when_other_downstream_task_succeeded_in_earlier_run():
+    with Flow("test") as flow:
+        initial_data = create_data()
+        modified_data_1 = modify_data(initial_data)
+        modified_data_2 = modify_data(initial_data)
+
+    state = DSFlowRunner(flow=flow).run(
+        task_states={modified_data_2: Success(result=pd.DataFrame())},
+        return_tasks=flow.tasks
+    )
+    assert state.result[initial_data]._result is PurgedResult
+
+
+def test_get_next_use_uses_run_order():
+    with Flow("test") as flow:
+        initial_data = create_data()
+        modified_data_1 = modify_data(initial_data)
+        modified_data_2 = modify_data(modified_data_1)
+        merged_data = merge_two_dataframes(initial_data, modified_data_2)
+
+    runner = DSFlowRunner(flow=flow)
+    runner._build_dependency_index({})
+    positions = runner._task_positions
+    assert runner._get_next_use(initial_data, initial_data) == positions[modified_data_1]
+    assert runner._get_next_use(initial_data, modified_data_1) == positions[merged_data]
+    assert runner._get_next_use(initial_data, merged_data) == math.inf
+
+
+def test_memory_report_records_sizes_and_purges():
+    with Flow("test") as flow:
+        offsets = create_offsets(2)
+        initial_data = create_data.map(offsets)
+        merged_data = merge_data(initial_data)
+
+    state = DSFlowRunner(flow=flow, track_memory=True).run(return_tasks=flow.tasks)
+    report = state.memory_report
+    data_size = get_size(create_data.run())
+    merged_size = get_size(pd.concat([create_data.run(), create_data.run()], ignore_index=True))
+
+    assert report.result_sizes[initial_data] == 2 * data_size
+    assert report.result_sizes[merged_data] == merged_size
+    assert [(event.task, event.map_index, event.size) for event in report.purge_events] == [
+        (offsets, None, get_size([0, 1])),
+        (initial_data, 0, data_size),
+        (initial_data, 1, data_size)
+    ]
+    assert report.freed_bytes == get_size([0, 1]) + 2 * data_size
+    assert report.resident_bytes == merged_size
+    assert report.peak_resident_bytes == 2 * data_size + merged_size
+    assert report.get_largest_at_peak(1) == [(initial_data, 2 * data_size)]
+    json.dumps(report.to_dict())
+
+
+def test_memory_report_is_not_attached_by_default():
+    with Flow("test") as flow:
+        create_data()
+    state = DSFlowRunner(flow=flow).run()
+    assert not hasattr(state, "memory_report")
+
+
+def test_waits_for_background_writes(tmp_path, monkeypatch):
+    writer = background_writer.BackgroundWriter()
+    monkeypatch.setattr(background_writer, "_BACKGROUND_WRITER", writer)
+    result_handler = PandasResultHandler(tmp_path / "data.csv", "csv", async_write=True)
+    writes = []
+
+    def slow_write(*args, **kwargs):
+        time.sleep(0.2)
+        writes.append(args)
+    monkeypatch.setattr(result_handler, "write", slow_write)
+
+    with Flow("test") as flow:
+        create_data(task_args={"result_handler": result_handler})
+    state = DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(
+        task_runner_state_handlers=[checkpoint_handler]
+    )
+    assert state.is_successful()
+    assert len(writes) == 1
+
+
+def test_fails_run_when_background_write_fails(tmp_path, monkeypatch):
+    writer = background_writer.BackgroundWriter()
+    monkeypatch.setattr(background_writer, "_BACKGROUND_WRITER", writer)
+    result_handler = PandasResultHandler(tmp_path / "data.csv", "csv", async_write=True)
+
+    def failing_write(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(result_handler, "write", failing_write)
+
+    with Flow("test") as flow:
+        create_data(task_args={"result_handler": result_handler})
+    state = DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(
+        task_runner_state_handlers=[checkpoint_handler]
+    )
+    assert state.is_failed()
+
+
+def test_ignores_background_writes_of_other_runs(tmp_path, monkeypatch):
+    writer = background_writer.BackgroundWriter()
+    monkeypatch.setattr(background_writer, "_BACKGROUND_WRITER", writer)
+
+    def failing_write():
+        raise OSError("disk full")
+    # A write that fails outside of the run, e.g. in a concurrent run of another flow
+    writer.submit(failing_write)
+
+    with Flow("test") as flow:
+        create_data(task_args={"result_handler": PandasResultHandler(tmp_path / "data.csv", "csv", async_write=True)})
+    state = DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(
+        task_runner_state_handlers=[checkpoint_handler]
+    )
+    assert state.is_successful()
+    assert (tmp_path / "data.csv").exists()
+    with pytest.raises(OSError, match="disk full"):
+        background_writer.flush_background_writes()
+
+
+def test_profile_report_records_checkpoints(tmp_path):
+    pytest.importorskip("pyarrow")
+    result_handler = PandasResultHandler(tmp_path / "data.parquet", "parquet")
+    with Flow("test") as flow:
+        initial_data = create_data(task_args={"result_handler": result_handler})
+        modified_data = modify_data(initial_data)
+
+    def run():
+        return DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner, profile_dir=tmp_path / "traces").run(
+            task_runner_state_handlers=[checkpoint_handler]
+        )
+    first, second = run().profile_report, run().profile_report
+    checkpoint_size = result_handler.checkpoint_size()
+
+    profiles = {profile.task: profile for profile in first.tasks}
+    assert (profiles[initial_data].cache_misses, profiles[initial_data].write_bytes) == (1, checkpoint_size)
+    assert profiles[modified_data].read_bytes == 0
+    profiles = {profile.task: profile for profile in second.tasks}
+    assert (profiles[initial_data].cache_hits, profiles[initial_data].write_bytes) == (1, 0)
+    assert profiles[modified_data].read_bytes == checkpoint_size
+    assert [profile.task for profile in second.critical_path()] == [initial_data, modified_data]
+    assert len(list((tmp_path / "traces").glob("test-*.trace.json"))) == 2
+
+
+def test_profile_report_is_not_attached_by_default():
+    with Flow("test") as flow:
+        create_data()
+    state = DSFlowRunner(flow=flow).run()
+    assert not hasattr(state, "profile_report")
+
+
+def test_memory_aware_order_lowers_peak():
+    @task()
+    def load(offset):
+        return pd.DataFrame({"value": range(offset, offset + 100000)})
+
+    @task()
+    def summarize(data):
+        return data["value"].sum()
+
+    @task()
+    def total(first, second, third, fourth):
+        return first + second + third + fourth
+
+    with Flow("test") as flow:
+        loads = [load(offset) for offset in range(2)]
+        summaries = [summarize(data) for data in loads for _ in range(2)]
+        result = total(*summaries)
+    # Load everything first, which the default order may or may not do
+    default_order = loads + summaries + [result]
+    flow.sorted_tasks = lambda root_tasks=None: default_order
+
+    default_peak = DSFlowRunner(flow=flow, track_memory=True).run().memory_report.peak_resident_bytes
+    runner = DSFlowRunner(flow=flow, track_memory=True, memory_aware_order=True)
+    state = runner.run()
+    assert state.is_successful()
+    assert state.memory_report.peak_resident_bytes < default_peak
+    assert flow.sorted_tasks() == default_order
+    # Later runs use the sizes recorded by earlier ones
+    assert runner.run().memory_report.peak_resident_bytes == state.memory_report.peak_resident_bytes
+
+
+def test_memory_aware_order_leaves_flow_alone():
+    replaced = []
+
+    @task()
+    def check_flow():
+        # Other runs of the flow could be using it at the same time
+        replaced.append("sorted_tasks" in vars(flow))
+
+    with Flow("test") as flow:
+        check_flow()
+        check_flow()
+    assert DSFlowRunner(flow=flow, memory_aware_order=True).run().is_successful()
+    assert replaced == [False, False]
+
+
+def test_prune_cached_runs_only_stale_tasks(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    runs = []
+
+    @task()
+    def record(data, name):
+        runs.append(name)
+        return data + 1
+
+    reads = []
+    handlers = {
+        name: PandasResultHandler(tmp_path / f"{name}.parquet", "parquet")
+        for name in ["clean", "features"]
+    }
+    for name, result_handler in handlers.items():
+        read = result_handler.read
+        monkeypatch.setattr(result_handler, "read", lambda *args, name=name, read=read, **kwargs: (
+            reads.append(name), read(*args, **kwargs)
+        )[1])
+    with Flow("test") as flow:
+        initial_data = create_data()
+        clean = record(initial_data, "clean", task_args={"result_handler": handlers["clean"]})
+        features = record(clean, "features", task_args={"result_handler": handlers["features"]})
+        report = record(features, "report")
+
+    def run():
+        return DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner, prune_cached=True, track_memory=True).run(
+            return_tasks=[report], task_runner_state_handlers=[checkpoint_handler]
+        )
+    first = run()
+    assert runs == ["clean", "features", "report"] and reads == []
+
+    runs.clear()
+    second = run()
+    # Only the last task runs, and only the checkpoint it needs is read
+    assert runs == ["report"] and reads == ["features"]
+    pd.testing.assert_frame_equal(first.result[report].result, second.result[report].result)
+    assert second.memory_report.result_sizes[features] > 0
@@ -0,0 +1,28 @@
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from prefect_ds import formats
+
+
+def test_resolves_pandas_formats_on_first_use(monkeypatch):
+    monkeypatch.setattr(formats, "_FORMATS", dict(formats._FORMATS, csv=("read_csv", "to_csv")))
+    csv_format = formats.get_format("CSV")
+    assert csv_format.read is pd.read_csv
+    assert formats.get_format("csv") is csv_format
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        formats.get_format("xyz")
+
+
+def test_importing_prefect_ds_does_not_import_pandas():
+    code = (
+        "import sys; import prefect_ds.pandas_result_handler; import prefect_ds.checkpoint_handler; "
+        "import prefect_ds.flow_runner; import prefect_ds.serializer_result_handler; print('pandas' in sys.modules)"
+    )
+    output = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE, check=True).stdout
+    assert output.decode().strip() == "False"
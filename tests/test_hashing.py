@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from prefect import task
+from prefect.core.task import Task
+
+from prefect_ds import hashing
+from prefect_ds.chunks import Chunks
+
+
+class TestHashObject:
+    def test_equal_dataframes_have_equal_hashes(self):
+        data_1 = pd.DataFrame({"one": [1, 2, 3], "two": ["a", "b", "c"]})
+        data_2 = pd.DataFrame({"one": [1, 2, 3], "two": ["a", "b", "c"]})
+        assert hashing.hash_object(data_1) == hashing.hash_object(data_2)
+
+    def test_changed_values_change_hash(self):
+        data = pd.DataFrame({"one": [1, 2, 3], "two": ["a", "b", "c"]})
+        changed_numeric = data.copy()
+        changed_numeric.loc[1, "one"] = 5
+        changed_object = data.copy()
+        changed_object.loc[1, "two"] = "z"
+        hashes = {
+            hashing.hash_object(data),
+            hashing.hash_object(changed_numeric),
+            hashing.hash_object(changed_object)
+        }
+        assert len(hashes) == 3
+
+    def test_metadata_changes_hash(self):
+        data = pd.DataFrame({"one": [1, 2, 3], "two": [4, 5, 6]})
+        renamed = data.rename(columns={"two": "three"})
+        reindexed = data.set_index(pd.Index([3, 4, 5]))
+        retyped = data.astype({"two": "float64"})
+        hashes = {
+            hashing.hash_object(data),
+            hashing.hash_object(renamed),
+            hashing.hash_object(reindexed),
+            hashing.hash_object(retyped)
+        }
+        assert len(hashes) == 4
+
+    def test_works_with_non_contiguous_arrays(self):
+        array = np.arange(20).reshape(4, 5)
+        assert hashing.hash_object(array[:, 1]) == hashing.hash_object(np.array([1, 6, 11, 16]))
+
+    def test_works_with_containers_and_scalars(self):
+        assert hashing.hash_object({"b": [1, 2], "a": None}) == hashing.hash_object({"a": None, "b": [1, 2]})
+        assert hashing.hash_object([1, 2]) != hashing.hash_object((1, 2))
+        assert hashing.hash_object(1) != hashing.hash_object("1")
+
+
+    def test_hashes_reiterable_chunks_by_content(self):
+        def make_chunks(last_value):
+            return [pd.DataFrame({"one": [1, 2]}), pd.DataFrame({"one": [3, last_value]})]
+        assert (
+            hashing.hash_object(Chunks(lambda: iter(make_chunks(4))))
+            == hashing.hash_object(Chunks(lambda: iter(make_chunks(4))))
+            != hashing.hash_object(Chunks(lambda: iter(make_chunks(5))))
+        )
+
+    def test_rejects_single_pass_chunks(self):
+        with pytest.raises(TypeError):
+            hashing.hash_object(Chunks(iter([pd.DataFrame({"one": [1]})])))
+
+
+class TestComputeCheckpointKey:
+    def test_depends_on_inputs(self):
+        test_task = Task(name="Task")
+        key_1 = hashing.compute_checkpoint_key(test_task, {"data": pd.DataFrame({"one": [1, 2]})})
+        key_2 = hashing.compute_checkpoint_key(test_task, {"data": pd.DataFrame({"one": [1, 3]})})
+        assert key_1 != key_2
+
+    def test_depends_on_task_source(self):
+        @task
+        def task_1(value):
+            return value
+
+        @task
+        def task_2(value):
+            return value + 1
+
+        assert (
+            hashing.compute_checkpoint_key(task_1, {"value": 1}) !=
+            hashing.compute_checkpoint_key(task_2, {"value": 1})
+        )
+
+    def test_ignores_edges_without_keys(self):
+        test_task = Task(name="Task")
+        assert (
+            hashing.compute_checkpoint_key(test_task, {"value": 1, None: 2}) ==
+            hashing.compute_checkpoint_key(test_task, {"value": 1})
+        )
@@ -0,0 +1,149 @@
+import pandas as pd
+import pytest
+
+from prefect import Flow, task
+from prefect.engine.result import Result
+
+from prefect_ds import incremental
+from prefect_ds.checkpoint_handler import checkpoint_handler
+from prefect_ds.flow_runner import DSFlowRunner
+from prefect_ds.pandas_result_handler import PandasResultHandler
+from prefect_ds.projection import Projection, project_result
+from prefect_ds.task_runner import DSTaskRunner
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame({"day": [2, 1, 2, 3], "value": [1, 2, 3, 4]})
+
+
+def test_get_partitioned_inputs(data):
+    inputs = {"data": data, "other": pd.DataFrame({"value": [1]}), "number": 1, None: data}
+    assert incremental.get_partitioned_inputs(inputs, "day") == ["data"]
+
+
+def test_get_partition_values(data):
+    assert incremental.get_partition_values(data, "day") == [1, 2, 3]
+    dates = pd.DataFrame({"day": pd.to_datetime(["2020-01-02", "2020-01-01", "2020-01-02"])})
+    assert incremental.get_partition_values(dates, "day") == [pd.Timestamp("2020-01-01"), pd.Timestamp("2020-01-02")]
+
+
+def test_null_partitions_are_rejected():
+    data = pd.DataFrame({"day": [1, None, 2], "value": [1, 2, 3]})
+    with pytest.raises(ValueError, match="1 rows have a null day"):
+        incremental.get_partition_values(data, "day")
+    with pytest.raises(ValueError, match="null day"):
+        list(incremental.split_partitions(data, "day"))
+
+
+def test_split_partitions(data):
+    partitions = dict(incremental.split_partitions(data, "day"))
+    assert list(partitions) == [1, 2, 3]
+    assert partitions[2]["value"].tolist() == [1, 3]
+
+
+def test_restrict_inputs(data):
+    plan = incremental.PartitionPlan("day", ["data"], [1, 2, 3], [None] * 3, [2, 3])
+    inputs = {"data": Result(data), "number": Result(1)}
+    restricted = incremental.restrict_inputs(inputs, plan)
+    assert restricted["data"].value["value"].tolist() == [1, 3, 4]
+    assert restricted["number"] is inputs["number"]
+    assert inputs["data"].value is data
+
+
+def test_partitioned_result_reads_lazily(tmp_path, data, monkeypatch):
+    pytest.importorskip("pyarrow")
+    handler = PandasResultHandler(tmp_path / "{name}_{day}.parquet", "parquet", partition_key="day")
+    for day, rows in incremental.split_partitions(data, "day"):
+        handler.write(rows, input_mapping={"name": "test", "day": day})
+    reads = []
+    original_read = PandasResultHandler.read
+
+    def tracking_read(self, **kwargs):
+        reads.append(kwargs["input_mapping"]["day"])
+        return original_read(self, **kwargs)
+    monkeypatch.setattr(PandasResultHandler, "read", tracking_read)
+
+    result = incremental.PartitionedResult(handler, "day", [1, 3], [None, None], input_mapping={"name": "test"})
+    projected = project_result(result, Projection(columns=["value"]))
+    assert isinstance(projected, incremental.PartitionedResult)
+    assert reads == []
+    assert result.value["value"].tolist() == [2, 4]
+    assert reads == [1, 3]
+    assert list(projected.value.columns) == ["value"]
+
+
+class TestIncrementalFlow:
+
+    @staticmethod
+    def make_flow(tmp_path, source, computed, **handler_kwargs):
+        @task()
+        def load():
+            return source[0]
+
+        @task(result_handler=PandasResultHandler(
+            tmp_path / "doubled_{day}.csv", "csv", write_kwargs={"index": False}, partition_key="day", **handler_kwargs
+        ))
+        def double(data):
+            computed.append(sorted(data["day"].unique().tolist()))
+            return data.assign(value=data["value"] * 2)
+
+        with Flow("test") as flow:
+            doubled = double(load())
+        return flow, doubled
+
+    @staticmethod
+    def run(flow, doubled):
+        flow_state = DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(
+            task_runner_state_handlers=[checkpoint_handler],
+            return_tasks=[doubled]
+        )
+        assert flow_state.is_successful()
+        return flow_state.result[doubled]
+
+    def test_only_new_partitions_are_computed(self, tmp_path):
+        source, computed = [pd.DataFrame({"day": [1, 1, 2], "value": [1, 2, 3]})], []
+        flow, doubled = self.make_flow(tmp_path, source, computed)
+
+        assert self.run(flow, doubled).result["value"].tolist() == [2, 4, 6]
+        state = self.run(flow, doubled)
+        assert state.message == "Task loaded from disk."
+        assert isinstance(state._result, incremental.PartitionedResult)
+
+        source[0] = pd.DataFrame({"day": [1, 1, 2, 3], "value": [1, 2, 3, 4]})
+        assert self.run(flow, doubled).result["value"].tolist() == [2, 4, 6, 8]
+        assert computed == [[1, 2], [3]]
+        assert sorted(path.name for path in tmp_path.glob("doubled_*.csv")) == [
+            "doubled_1.csv", "doubled_2.csv", "doubled_3.csv"
+        ]
+
+    def test_changed_partitions_are_recomputed_when_content_addressed(self, tmp_path):
+        source, computed = [pd.DataFrame({"day": [1, 2], "value": [1, 2]})], []
+        flow, doubled = self.make_flow(tmp_path, source, computed, content_addressed=True)
+
+        self.run(flow, doubled)
+        source[0] = pd.DataFrame({"day": [1, 2], "value": [1, 5]})
+        assert self.run(flow, doubled).result["value"].tolist() == [2, 10]
+        assert computed == [[1, 2], [2]]
+
+    def test_result_needs_partition_column(self, tmp_path):
+        @task(result_handler=PandasResultHandler(tmp_path / "out_{day}.csv", "csv", partition_key="day"))
+        def summarize(data):
+            return data[["value"]]
+
+        with Flow("test") as flow:
+            summary = summarize(pd.DataFrame({"day": [1], "value": [1]}))
+        flow_state = DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(
+            task_runner_state_handlers=[checkpoint_handler],
+            return_tasks=[summary]
+        )
+        assert flow_state.result[summary].is_failed()
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"path": "out.csv", "partition_key": "day"},
+    {"path": "out_{day}.csv", "partition_key": "day", "locking": True},
+])
+def test_handler_rejects_unsupported_options(kwargs):
+    with pytest.raises(ValueError):
+        PandasResultHandler(file_type="csv", **kwargs)
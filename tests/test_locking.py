@@ -0,0 +1,47 @@
+import subprocess
+import sys
+
+import pytest
+
+from prefect_ds.locking import CheckpointLock, lock_path
+
+
+def test_lock_path():
+    assert str(lock_path("a/b.csv")) == "a/b.csv.lock"
+
+
+def test_lock_is_exclusive(tmp_path):
+    first_lock = CheckpointLock(tmp_path / "dir" / "test.csv")
+    second_lock = CheckpointLock(tmp_path / "dir" / "test.csv")
+    assert first_lock.acquire(timeout=0)
+    assert first_lock.locked
+    assert not second_lock.acquire(timeout=0.1)
+    first_lock.release()
+    assert not first_lock.locked
+    with second_lock:
+        assert second_lock.locked
+    assert not second_lock.locked
+
+
+def test_cannot_acquire_twice(tmp_path):
+    with CheckpointLock(tmp_path / "test.csv") as lock:
+        with pytest.raises(RuntimeError):
+            lock.acquire()
+
+
+def test_lock_is_shared_across_processes_and_released_when_holder_dies(tmp_path):
+    code = (
+        "import sys, time; from prefect_ds.locking import CheckpointLock; "
+        f"lock = CheckpointLock({str(tmp_path / 'test.csv')!r}); lock.acquire(); "
+        "print('locked', flush=True); time.sleep(60)"
+    )
+    holder = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE)
+    try:
+        assert holder.stdout.readline().strip() == b"locked"
+        assert not CheckpointLock(tmp_path / "test.csv").acquire(timeout=0.1)
+    finally:
+        holder.kill()
+        holder.wait()
+    lock = CheckpointLock(tmp_path / "test.csv")
+    assert lock.acquire(timeout=5)
+    lock.release()
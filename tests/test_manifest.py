@@ -0,0 +1,15 @@
+from prefect_ds import manifest
+
+
+def test_manifest_lives_next_to_checkpoint(tmp_path):
+    assert manifest.manifest_path(tmp_path / "data.csv") == tmp_path / "data.csv.manifest.json"
+
+
+def test_read_returns_empty_dict_when_no_manifest(tmp_path):
+    assert manifest.read_manifest(tmp_path / "data.csv") == {}
+
+
+def test_write_then_read_round_trips(tmp_path):
+    manifest.write_manifest(tmp_path / "data.csv", {"checkpoint_key": "abc"})
+    assert manifest.read_manifest(tmp_path / "data.csv") == {"checkpoint_key": "abc"}
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["data.csv.manifest.json"]
@@ -0,0 +1,49 @@
+import json
+
+from prefect.core.task import Task
+
+from prefect_ds.memory_report import MemoryReport
+from prefect_ds.result_store import ResultEvent
+
+
+def test_records_sizes_and_events():
+    task_1, task_2 = Task(name="one"), Task(name="two")
+    report = MemoryReport()
+    report.record("result", [ResultEvent(task_1, 0, 10), ResultEvent(task_1, 1, 20)], resident_bytes=30)
+    report.record("load", [ResultEvent(task_2, None, 5)], resident_bytes=35)
+    report.record("purge", [ResultEvent(task_1, 0, 10), ResultEvent(task_1, 1, 20)], resident_bytes=5)
+
+    assert report.result_sizes == {task_1: 30, task_2: 5}
+    assert [event.kind for event in report.events] == ["result", "result", "load", "purge", "purge"]
+    assert [event.map_index for event in report.purge_events] == [0, 1]
+    assert report.freed_bytes == 30
+    assert report.resident_bytes == 5
+
+
+def test_only_snapshots_new_peaks():
+    task_1, task_2 = Task(name="one"), Task(name="two")
+    report = MemoryReport()
+    report.record("result", [ResultEvent(task_1, None, 10)], resident_bytes=10)
+    report.update_peak(lambda: {task_1: 10})
+    report.record("result", [ResultEvent(task_2, None, 5)], resident_bytes=15)
+    report.update_peak(lambda: {task_1: 10, task_2: 5})
+    report.record("purge", [ResultEvent(task_1, None, 10)], resident_bytes=5)
+
+    def fail():
+        raise AssertionError("should not snapshot when below peak")
+    report.update_peak(fail)
+
+    assert report.peak_resident_bytes == 15
+    assert report.get_largest_at_peak() == [(task_1, 10), (task_2, 5)]
+    assert report.get_largest_at_peak(1) == [(task_1, 10)]
+
+
+def test_to_dict_is_json_serializable():
+    task = Task(name="one")
+    report = MemoryReport()
+    report.record("result", [ResultEvent(task, None, 10)], resident_bytes=10)
+    report.update_peak(lambda: {task: 10})
+    report_dict = json.loads(json.dumps(report.to_dict()))
+    assert report_dict["peak_resident_sizes"] == [{"task": "one", "size": 10}]
+    assert report_dict["events"][0]["task"] == "one"
+    assert report_dict["events"][0]["kind"] == "result"
@@ -1,7 +1,11 @@
 import pandas as pd
 import pathlib
+import pytest
 
+from prefect_ds import file_result_handler, formats
 from prefect_ds import pandas_result_handler as prh
+from prefect_ds.chunks import Chunks
+from prefect_ds.manifest import read_manifest
 
 
 class TestInit:
@@ -14,6 +18,105 @@ class TestInit:
         assert handler_string.path == handler_path.path
 
 
+    def test_rejects_unknown_file_types(self):
+        with pytest.raises(ValueError):
+            prh.PandasResultHandler("a/b/c/d.xyz", "xyz")
+
+    @pytest.mark.parametrize("kwargs, message", [
+        ({"memory_map": True, "num_partitions": 2}, "memory_map can't be combined with num_partitions"),
+        ({"chunked": True, "compact": True}, "chunked can't be combined with compact"),
+        ({"partition_key": "day", "locking": True}, "partition_key can't be combined with locking"),
+    ])
+    def test_names_conflicting_options(self, kwargs, message):
+        with pytest.raises(ValueError, match=message):
+            prh.PandasResultHandler("a/b/c/{day}.feather", "feather", **kwargs)
+
+    def test_names_every_conflict(self):
+        with pytest.raises(ValueError) as error:
+            prh.PandasResultHandler("a/b/c/d.feather", "feather", chunked=True, memory_map=True, compression="zstd")
+        assert "memory_map can't be combined with compression" in str(error.value)
+        assert "chunked can't be combined with memory_map" in str(error.value)
+        assert "chunked can't be combined with compression" in str(error.value)
+
+    def test_uses_registered_formats(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(formats, "_FORMATS", dict(formats._FORMATS))
+
+        def write_lines(data, path, **kwargs):
+            pathlib.Path(path).write_text("\n".join(str(value) for value in data["one"]))
+
+        def read_lines(path, **kwargs):
+            return pd.DataFrame({"one": [int(value) for value in pathlib.Path(path).read_text().split("\n")]})
+        formats.register_format("Lines", read_lines, write_lines)
+
+        handler = prh.PandasResultHandler(tmp_path / "test.txt", "lines")
+        data = pd.DataFrame({"one": [1, 2, 3]})
+        handler.write(data)
+        assert (tmp_path / "test.txt").read_text() == "1\n2\n3"
+        pd.testing.assert_frame_equal(data, handler.read())
+
+class TestTemplateFields:
+
+    def test_finds_all_fields(self):
+        handler = prh.PandasResultHandler("a/{first}/{second.attr}_{third[0]}.csv", "csv")
+        assert handler.template_fields == {"first", "second", "third"}
+
+    def test_empty_when_no_templates(self):
+        handler = prh.PandasResultHandler("a/b.csv", "csv")
+        assert handler.template_fields == set()
+
+
+class TestExists:
+
+    def test_false_when_file_missing(self, tmp_path):
+        handler = prh.PandasResultHandler(tmp_path / "test_{id}.csv", "csv")
+        assert handler.exists(input_mapping={"id": 1}) is False
+
+    def test_true_when_file_present(self, tmp_path):
+        handler = prh.PandasResultHandler(tmp_path / "test_{id}.csv", "csv")
+        handler.write(pd.DataFrame({"one": [1, 2, 3]}), input_mapping={"id": 1})
+        assert handler.exists(input_mapping={"id": 1}) is True
+        assert handler.exists(input_mapping={"id": 2}) is False
+
+    def test_checks_manifest_when_key_given(self, tmp_path):
+        handler = prh.PandasResultHandler(tmp_path / "test.csv", "csv")
+        handler.write(pd.DataFrame({"one": [1, 2, 3]}), checkpoint_key="abc")
+        assert handler.exists(checkpoint_key="abc") is True
+        assert handler.exists(checkpoint_key="def") is False
+
+
+class TestExistsMany:
+
+    def test_matches_exists(self, tmp_path):
+        handler = prh.PandasResultHandler(tmp_path / "{directory}" / "test_{id}.csv", "csv")
+        (tmp_path / "a").mkdir()
+        handler.write(pd.DataFrame({"one": [1]}), input_mapping={"directory": "a", "id": 1})
+        handler.write(pd.DataFrame({"one": [1]}), input_mapping={"directory": "a", "id": 3})
+        input_mappings = [
+            {"directory": "a", "id": 1}, {"directory": "a", "id": 2},
+            {"directory": "a", "id": 3}, {"directory": "b", "id": 1}
+        ]
+        assert handler.exists_many(input_mappings) == [True, False, True, False]
+
+    def test_lists_each_directory_once(self, tmp_path, monkeypatch):
+        handler = prh.PandasResultHandler(tmp_path / "test_{id}.csv", "csv")
+        handler.write(pd.DataFrame({"one": [1]}), input_mapping={"id": 1})
+        listed = []
+        original_listdir = file_result_handler.os.listdir
+
+        def tracking_listdir(path):
+            listed.append(path)
+            return original_listdir(path)
+        monkeypatch.setattr(file_result_handler.os, "listdir", tracking_listdir)
+
+        assert handler.exists_many([{"id": index} for index in range(1, 101)]) == [True] + [False] * 99
+        assert listed == [str(tmp_path)]
+
+    def test_checks_manifests(self, tmp_path):
+        handler = prh.PandasResultHandler(tmp_path / "test_{id}.csv", "csv")
+        handler.write(pd.DataFrame({"one": [1]}), input_mapping={"id": 1}, checkpoint_key="abc")
+        handler.write(pd.DataFrame({"one": [1]}), input_mapping={"id": 2}, checkpoint_key="abc")
+        assert handler.exists_many([{"id": 1}, {"id": 2}, {"id": 3}], ["abc", "def", "abc"]) == [True, False, False]
+
 class TestReadWrite:
 
     def test_read_write_works_csv(self, tmp_path):
@@ -51,3 +154,297 @@ class TestReadWrite:
         handler.write(data)
         read_data = handler.read()
         pd.testing.assert_frame_equal(data, read_data)
+
+
+    def test_failed_write_keeps_previous_file(self, tmp_path):
+        filename = tmp_path / "test.csv"
+        handler = prh.PandasResultHandler(filename, "csv", write_kwargs={"index": False})
+        data = pd.DataFrame({"one": [1, 2, 3]})
+        handler.write(data)
+
+        class Unwritable(pd.DataFrame):
+            def to_csv(self, path, **kwargs):
+                with open(path, "w") as partial_file:
+                    partial_file.write("one\n4\n")
+                raise OSError("disk full")
+        with pytest.raises(OSError):
+            handler.write(Unwritable({"one": [4, 5, 6]}))
+
+        pd.testing.assert_frame_equal(data, handler.read())
+        assert [path.name for path in tmp_path.iterdir()] == ["test.csv"]
+
+class TestProjection:
+
+    @pytest.mark.parametrize("file_type", ["parquet", "feather", "csv"])
+    def test_reads_projected_data(self, tmp_path, file_type):
+        if file_type != "csv":
+            pytest.importorskip("pyarrow")
+        handler = prh.PandasResultHandler(
+            tmp_path / "test", file_type, write_kwargs={"index": False} if file_type == "csv" else {}
+        )
+        data = pd.DataFrame({"one": range(6), "two": list("abcabc")})
+        handler.write(data)
+        projected = handler.read(columns=["one"], filters=[("two", "==", "b")])
+        pd.testing.assert_frame_equal(data.loc[[1, 4], ["one"]], projected)
+
+    def test_pushes_filters_to_parquet_with_stored_index(self, tmp_path, monkeypatch):
+        pytest.importorskip("pyarrow")
+        handler = prh.PandasResultHandler(tmp_path / "test.parquet", "parquet")
+        data = pd.DataFrame({"one": range(6), "two": list("abcabc")}, index=list("uvwxyz"))
+        handler.write(data)
+        read_kwargs = []
+        original_format = formats.get_format("parquet")
+
+        def tracking_read_parquet(path, **kwargs):
+            read_kwargs.append(kwargs)
+            return original_format.read(path, **kwargs)
+        monkeypatch.setitem(formats._FORMATS, "parquet", original_format._replace(read=tracking_read_parquet))
+
+        projected = handler.read(columns=["one"], filters=[("two", "==", "b")])
+        pd.testing.assert_frame_equal(data.loc[["v", "y"], ["one"]], projected)
+        assert read_kwargs == [{"columns": ["one", "two"], "filters": [("two", "==", "b")]}]
+
+class TestCheckpointKey:
+
+    def test_write_stores_key_in_manifest(self, tmp_path):
+        filename = tmp_path / "test.csv"
+        handler = prh.PandasResultHandler(filename, "csv", write_kwargs={"index": False})
+
+        handler.write(pd.DataFrame({"one": [1, 2, 3]}), checkpoint_key="abc")
+        assert read_manifest(filename) == {"checkpoint_key": "abc"}
+
+    def test_read_requires_matching_key(self, tmp_path):
+        filename = tmp_path / "test.csv"
+        handler = prh.PandasResultHandler(filename, "csv", write_kwargs={"index": False})
+        data = pd.DataFrame({"one": [1, 2, 3]})
+        handler.write(data, checkpoint_key="abc")
+
+        pd.testing.assert_frame_equal(data, handler.read(checkpoint_key="abc"))
+        with pytest.raises(prh.StaleCheckpointError):
+            handler.read(checkpoint_key="def")
+
+    def test_read_without_manifest_is_stale(self, tmp_path):
+        filename = tmp_path / "test.csv"
+        handler = prh.PandasResultHandler(filename, "csv", write_kwargs={"index": False})
+        handler.write(pd.DataFrame({"one": [1, 2, 3]}))
+
+        with pytest.raises(FileNotFoundError):
+            handler.read(checkpoint_key="abc")
+
+
+class TestPartitioned:
+
+    @pytest.mark.parametrize("file_type", ["parquet", "feather"])
+    def test_round_trip(self, tmp_path, file_type):
+        pytest.importorskip("pyarrow")
+        handler = prh.PandasResultHandler(tmp_path / "test", file_type, num_partitions=3)
+        data = pd.DataFrame({"one": range(10), "two": [str(value) for value in range(10)]})
+        handler.write(data)
+
+        assert sorted(path.name for path in (tmp_path / "test").iterdir()) == [
+            f"part-0000{partition}.{file_type}" for partition in range(3)
+        ]
+        pd.testing.assert_frame_equal(data, handler.read())
+
+    def test_round_trip_hdf(self, tmp_path):
+        pytest.importorskip("tables")
+        handler = prh.PandasResultHandler(tmp_path / "test", "hdf", num_partitions=2, write_kwargs={"key": "data"})
+        data = pd.DataFrame({"one": range(10)}, index=range(10, 20))
+        handler.write(data)
+        pd.testing.assert_frame_equal(data, handler.read())
+
+    def test_keeps_index(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        handler = prh.PandasResultHandler(tmp_path / "test", "parquet", num_partitions=2)
+        data = pd.DataFrame({"one": range(5)}, index=list("abcde"))
+        handler.write(data)
+        pd.testing.assert_frame_equal(data, handler.read())
+
+    def test_more_partitions_than_rows(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        handler = prh.PandasResultHandler(tmp_path / "test", "parquet", num_partitions=8)
+        handler.write(pd.DataFrame({"one": [1, 2]}))
+        assert read_manifest(tmp_path / "test")["partitions"] == ["part-00000.parquet", "part-00001.parquet"]
+
+    def test_rewrite_removes_old_partitions(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        data = pd.DataFrame({"one": range(10)})
+        prh.PandasResultHandler(tmp_path / "test", "parquet", num_partitions=4).write(data)
+        handler = prh.PandasResultHandler(tmp_path / "test", "parquet", num_partitions=2)
+        handler.write(data)
+        assert len(list((tmp_path / "test").iterdir())) == 2
+        pd.testing.assert_frame_equal(data, handler.read())
+
+    def test_incomplete_write_does_not_exist(self, tmp_path):
+        handler = prh.PandasResultHandler(tmp_path / "test", "parquet", num_partitions=2)
+        (tmp_path / "test").mkdir()
+        assert handler.exists() is False
+        with pytest.raises(FileNotFoundError):
+            handler.read()
+
+    def test_manifest_has_partitions_and_key(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        handler = prh.PandasResultHandler(tmp_path / "test", "parquet", num_partitions=2)
+        handler.write(pd.DataFrame({"one": range(4)}), checkpoint_key="abc")
+        assert read_manifest(tmp_path / "test") == {
+            "partitions": ["part-00000.parquet", "part-00001.parquet"],
+            "checkpoint_key": "abc"
+        }
+        assert handler.exists(checkpoint_key="abc") is True
+        assert handler.exists(checkpoint_key="def") is False
+
+    def test_rejects_zero_partitions(self):
+        with pytest.raises(ValueError):
+            prh.PandasResultHandler("test", "parquet", num_partitions=0)
+
+
+class TestMemoryMap:
+
+    def test_round_trip_keeps_index(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        handler = prh.PandasResultHandler(tmp_path / "test.feather", "feather", memory_map=True)
+        data = pd.DataFrame({"one": [1.0, 2.0, 3.0], "two": ["a", "b", "c"]}, index=[10, 20, 30])
+        handler.write(data)
+        pd.testing.assert_frame_equal(data, handler.read())
+
+    def test_numeric_columns_are_not_copied(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        handler = prh.PandasResultHandler(tmp_path / "test.feather", "feather", memory_map=True)
+        handler.write(pd.DataFrame({"one": range(1000), "two": [0.5] * 1000}))
+        data = handler.read()
+        # Arrays backed by the mapped file are read-only views, rather than fresh copies
+        assert not data["one"].values.flags.writeable
+        assert not data["two"].values.flags.writeable
+        assert data["one"].sum() == sum(range(1000))
+
+    def test_projects_columns(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        data = pd.DataFrame({"one": [1, 2, 3], "two": [4, 5, 6]}, index=list("abc"))
+        prh.PandasResultHandler(tmp_path / "test.feather", "feather", memory_map=True).write(data)
+        handler = prh.PandasResultHandler(
+            tmp_path / "test.feather", "feather", memory_map=True, read_kwargs={"columns": ["two"]}
+        )
+        pd.testing.assert_frame_equal(data[["two"]], handler.read())
+
+    def test_only_supports_feather(self):
+        with pytest.raises(ValueError):
+            prh.PandasResultHandler("test.csv", "csv", memory_map=True)
+        with pytest.raises(ValueError):
+            prh.PandasResultHandler("test", "feather", memory_map=True, num_partitions=2)
+
+
+class TestCompression:
+
+    @pytest.mark.parametrize("file_type,codec,write_kwargs", [
+        ("parquet", "zstd", {}),
+        ("feather", "lz4", {}),
+        ("csv", "zstd", {"index": False}),
+        ("json", "gzip", {}),
+    ])
+    def test_round_trip(self, tmp_path, file_type, codec, write_kwargs):
+        pytest.importorskip("pyarrow")
+        handler = prh.PandasResultHandler(
+            tmp_path / f"test.{file_type}", file_type, write_kwargs=write_kwargs, compression=codec
+        )
+        data = pd.DataFrame({"one": [1, 2, 3] * 100, "two": ["a", "b", "c"] * 100})
+        handler.write(data)
+        assert read_manifest(tmp_path / f"test.{file_type}") == {"compression": {"codec": codec, "level": None}}
+        pd.testing.assert_frame_equal(data, handler.read())
+
+    def test_csv_is_compressed(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        handler = prh.PandasResultHandler(tmp_path / "test.csv", "csv", compression="gzip")
+        handler.write(pd.DataFrame({"one": range(1000)}))
+        assert (tmp_path / "test.csv").read_bytes()[:2] == b"\x1f\x8b"
+
+    def test_auto_records_choice(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        handler = prh.PandasResultHandler(tmp_path / "test.parquet", "parquet", compression="auto")
+        data = pd.DataFrame({"one": [1, 2, 3] * 1000})
+        handler.write(data, checkpoint_key="abc")
+        manifest = read_manifest(tmp_path / "test.parquet")
+        assert manifest["checkpoint_key"] == "abc"
+        assert manifest["compression"]["codec"] in ["uncompressed", "snappy", "gzip", "brotli", "lz4", "zstd"]
+        pd.testing.assert_frame_equal(data, handler.read(checkpoint_key="abc"))
+
+    def test_partitioned(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        handler = prh.PandasResultHandler(tmp_path / "test", "parquet", num_partitions=2, compression="zstd",
+                                          compression_level=9)
+        data = pd.DataFrame({"one": range(10)})
+        handler.write(data)
+        pd.testing.assert_frame_equal(data, handler.read())
+
+    def test_results_without_manifests_are_not_read(self, tmp_path):
+        pd.DataFrame({"one": [1]}).to_csv(tmp_path / "test.csv")
+        handler = prh.PandasResultHandler(tmp_path / "test.csv", "csv", compression="zstd")
+        assert not handler.exists()
+        with pytest.raises(FileNotFoundError):
+            handler.read()
+
+    @pytest.mark.parametrize("kwargs", [
+        {"file_type": "pickle", "compression": "zstd"},
+        {"file_type": "feather", "compression": "snappy"},
+        {"file_type": "csv", "compression": "zstd", "compression_level": 3},
+        {"file_type": "parquet", "compression": "auto", "compression_level": 3},
+        {"file_type": "parquet", "compression_level": 3},
+        {"file_type": "feather", "compression": "zstd", "memory_map": True},
+        {"file_type": "parquet", "compression": "zstd", "write_kwargs": {"compression": "gzip"}},
+    ])
+    def test_rejects_unsupported_options(self, kwargs):
+        with pytest.raises(ValueError):
+            prh.PandasResultHandler("test", **kwargs)
+
+
+class TestChunked:
+
+    @pytest.mark.parametrize("file_type", ["parquet", "feather", "csv"])
+    def test_round_trip(self, tmp_path, file_type):
+        if file_type != "csv":
+            pytest.importorskip("pyarrow")
+        handler = prh.PandasResultHandler(
+            tmp_path / f"test.{file_type}", file_type, write_kwargs={"index": False} if file_type == "csv" else {},
+            read_kwargs={"chunksize": 2} if file_type == "csv" else {}, chunked=True
+        )
+        data = [pd.DataFrame({"one": [1, 2]}), pd.DataFrame({"one": [3, 4]})]
+        handler.write(Chunks(iter(data)))
+        chunks = handler.read()
+        assert isinstance(chunks, Chunks)
+        for _ in range(2):
+            read = list(chunks)
+            assert len(read) == 2
+            pd.testing.assert_frame_equal(
+                pd.concat(data, ignore_index=True), pd.concat(read, ignore_index=True), check_index_type=False
+            )
+
+    def test_writes_dataframes_as_one_chunk(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        handler = prh.PandasResultHandler(tmp_path / "test.parquet", "parquet", chunked=True)
+        data = pd.DataFrame({"one": range(5)})
+        handler.write(data)
+        read = list(handler.read())
+        assert len(read) == 1
+        pd.testing.assert_frame_equal(data, read[0], check_index_type=False)
+
+    def test_projects_each_chunk(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        handler = prh.PandasResultHandler(tmp_path / "test.parquet", "parquet", chunked=True)
+        handler.write(Chunks([pd.DataFrame({"one": [1, 2], "two": ["a", "b"]}, index=[0, 1]),
+                              pd.DataFrame({"one": [3, 4], "two": ["a", "b"]}, index=[2, 3])]))
+        read = handler.read(columns=["one"], filters=[("two", "==", "b")]).concat()
+        pd.testing.assert_frame_equal(pd.DataFrame({"one": [2, 4]}, index=[1, 3]), read, check_index_type=False)
+
+    def test_unchunked_handlers_reject_chunks(self, tmp_path):
+        handler = prh.PandasResultHandler(tmp_path / "test.parquet", "parquet")
+        with pytest.raises(TypeError):
+            handler.write(Chunks([pd.DataFrame({"one": [1]})]))
+
+    @pytest.mark.parametrize("kwargs", [
+        {"file_type": "json"},
+        {"file_type": "parquet", "num_partitions": 2},
+        {"file_type": "feather", "memory_map": True},
+        {"file_type": "parquet", "compression": "zstd"},
+    ])
+    def test_rejects_unsupported_options(self, kwargs):
+        with pytest.raises(ValueError):
+            prh.PandasResultHandler("test", chunked=True, **kwargs)
@@ -0,0 +1,121 @@
+import gc
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from prefect import Flow, Parameter, task, unmapped
+
+from prefect_ds.checkpoint_handler import checkpoint_handler
+from prefect_ds.flow_runner import DSFlowRunner
+from prefect_ds.pandas_result_handler import PandasResultHandler
+from prefect_ds.process_executor import ProcessExecutor
+from prefect_ds.shared_memory import HAS_PICKLE_PROTOCOL_5
+from prefect_ds.task_runner import DSTaskRunner
+
+pytestmark = pytest.mark.skipif(not HAS_PICKLE_PROTOCOL_5, reason="needs Python 3.8 or pickle5")
+
+
+@task()
+def make_data(offset):
+    return pd.DataFrame({"value": np.arange(100000) + offset, "pid": os.getpid()})
+
+
+@task()
+def slow_double(data):
+    time.sleep(1)
+    return data.assign(value=data["value"] * 2, pid=os.getpid())
+
+
+@task()
+def list_shared(data, shared_dir):
+    return sorted(path.name for path in shared_dir.iterdir())
+
+
+@task()
+def total(frames):
+    return int(sum(frame["value"].sum() for frame in frames)), {pid for frame in frames for pid in frame["pid"]}
+
+
+@task()
+def add(number, other):
+    return number + other
+
+
+def run(flow, tmp_path, return_tasks, **run_kwargs):
+    state = DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(
+        executor=ProcessExecutor(max_workers=2, shared_dir=tmp_path / "shared"),
+        return_tasks=return_tasks,
+        **run_kwargs
+    )
+    assert state.is_successful()
+    return state
+
+
+def test_runs_independent_tasks_in_parallel(tmp_path):
+    (tmp_path / "shared").mkdir()
+    with Flow("test") as flow:
+        offset = Parameter("offset")
+        result = total([slow_double(make_data(offset)), slow_double(make_data(offset))])
+    start = time.perf_counter()
+    state = run(flow, tmp_path, [result], parameters={"offset": 1})
+    value, pids = state.result[result].result
+    assert value == 2 * 2 * (sum(range(100000)) + 100000)
+    assert len(pids) == 2 and os.getpid() not in pids
+    assert time.perf_counter() - start < 2 + 5  # the two slow tasks overlap, plus process startup
+    assert list((tmp_path / "shared").iterdir()) == []
+
+
+def test_purged_results_are_released(tmp_path):
+    (tmp_path / "shared").mkdir()
+    with Flow("test") as flow:
+        shared = list_shared(slow_double(slow_double(make_data(0))), tmp_path / "shared")
+    state = run(flow, tmp_path, [shared])
+    # Only the result of the task list_shared depends on is left when it runs
+    assert len(state.result[shared].result) == 1
+    assert list((tmp_path / "shared").iterdir()) == []
+
+
+def test_mapped_tasks_and_checkpoints(tmp_path):
+    pytest.importorskip("pyarrow")
+    (tmp_path / "shared").mkdir()
+    result_handler = PandasResultHandler(tmp_path / "data_{offset}.parquet", "parquet")
+    with Flow("test") as flow:
+        data = make_data.map([0, 1, 2], task_args={"result_handler": result_handler})
+        result = total(data)
+        added = add.map([1, 2], unmapped(10))
+    for _ in range(2):
+        state = run(flow, tmp_path, [result, added], task_runner_state_handlers=[checkpoint_handler])
+        assert state.result[result].result[0] == 3 * sum(range(100000)) + 3 * 100000
+        assert state.result[added].result == [11, 12]
+    assert len(list(tmp_path.glob("data_*.parquet"))) == 3
+
+
+def test_timeout(tmp_path):
+    (tmp_path / "shared").mkdir()
+    with Flow("test") as flow:
+        doubled = slow_double(make_data(0), task_args={"timeout": 0.1})
+    state = DSFlowRunner(flow=flow).run(
+        executor=ProcessExecutor(max_workers=1, shared_dir=tmp_path / "shared"), return_tasks=[doubled]
+    )
+    assert state.result[doubled].is_failed()
+    assert isinstance(state.result[doubled].result, TimeoutError)
+    # Once the timed out task's input is dropped, nothing is left behind, including the result the
+    # worker shared when it finished anyway
+    del state
+    gc.collect()
+    assert list((tmp_path / "shared").iterdir()) == []
+
+
+def test_generators_are_rejected(tmp_path):
+    @task()
+    def stream():
+        yield pd.DataFrame({"value": [1]})
+
+    with Flow("test") as flow:
+        chunks = stream()
+    state = DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(
+        executor=ProcessExecutor(max_workers=1, shared_dir=tmp_path), return_tasks=[chunks]
+    )
+    assert state.result[chunks].is_failed()
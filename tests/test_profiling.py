@@ -0,0 +1,106 @@
+import json
+import pstats
+import threading
+import time
+
+from prefect.core.task import Task
+
+from prefect_ds import profiling
+
+
+def test_measures_tasks_and_io():
+    upstream, downstream = Task(name="one"), Task(name="two")
+    report = profiling.ProfileReport()
+    with report.profile_task(upstream):
+        profiling.record_cache_lookup(hits=0, misses=1)
+        span = profiling.current_span()
+        time.sleep(0.01)
+    # e.g. a background write that finishes after the task
+    profiling.record_write(span, time.perf_counter(), lambda: 100)
+    with report.profile_task(downstream, [upstream]):
+        profiling.record_read(time.perf_counter(), lambda: 50)
+    assert profiling.current_span() is None
+
+    one, two = report.tasks
+    assert one.wall_time >= 0.01
+    assert (one.cache_hits, one.cache_misses) == (0, 1)
+    assert (one.write_bytes, one.read_bytes) == (100, 0)
+    assert (two.write_bytes, two.read_bytes) == (0, 50)
+    assert two.start >= one.start + one.wall_time
+    assert [(event.kind, event.task) for event in report.io_events] == [("write", upstream), ("read", downstream)]
+
+
+def test_records_nothing_outside_tasks():
+    sizes = []
+    profiling.record_read(time.perf_counter(), lambda: sizes.append(1))
+    profiling.record_cache_lookup(hits=1, misses=0)
+    assert sizes == []
+
+
+def test_spans_are_per_thread():
+    task_1, task_2 = Task(name="one"), Task(name="two")
+    report = profiling.ProfileReport()
+    started = threading.Barrier(2)
+
+    def run(task):
+        with report.profile_task(task):
+            started.wait()
+            profiling.record_cache_lookup(hits=1 if task is task_1 else 0, misses=1 if task is task_2 else 0)
+    threads = [threading.Thread(target=run, args=(task,)) for task in [task_1, task_2]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    profiles = {profile.task: profile for profile in report.tasks}
+    assert (profiles[task_1].cache_hits, profiles[task_1].cache_misses) == (1, 0)
+    assert (profiles[task_2].cache_hits, profiles[task_2].cache_misses) == (0, 1)
+
+
+def test_critical_path_follows_latest_upstream():
+    load, fast, slow, merge, other = (Task(name=name) for name in ["load", "fast", "slow", "merge", "other"])
+    report = profiling.ProfileReport()
+    with report.profile_task(load):
+        pass
+    with report.profile_task(other):
+        pass
+    with report.profile_task(fast, [load]):
+        pass
+    with report.profile_task(slow, [load]):
+        time.sleep(0.01)
+    with report.profile_task(merge, [slow, fast]):
+        pass
+    assert [profile.task for profile in report.critical_path()] == [load, slow, merge]
+    assert report.critical_path()[-1].wait_time >= 0
+
+
+def test_captures_chosen_tasks():
+    task_1, task_2 = Task(name="one"), Task(name="two")
+    report = profiling.ProfileReport(profile_tasks=["two"])
+    with report.profile_task(task_1):
+        pass
+    with report.profile_task(task_2):
+        [bytearray(1000) for _ in range(100)]
+    assert list(report.task_stats) == [task_2]
+    assert isinstance(report.task_stats[task_2], pstats.Stats)
+    assert list(report.allocations) == [task_2]
+    one, two = report.tasks
+    assert one.traced_peak is None
+    assert two.traced_peak >= 100 * 1000
+
+
+def test_writes_chrome_trace(tmp_path):
+    task = Task(name="one")
+    report = profiling.ProfileReport(profile_tasks=["one"])
+    with report.profile_task(task):
+        profiling.record_read(time.perf_counter(), lambda: 10)
+    report.write_trace(tmp_path / "traces" / "run.trace.json")
+
+    with open(tmp_path / "traces" / "run.trace.json") as trace_file:
+        trace = json.load(trace_file)
+    task_event, read_event = trace["traceEvents"]
+    assert (task_event["name"], task_event["cat"], task_event["ph"]) == ("one", "task", "X")
+    assert task_event["args"]["read_bytes"] == 10
+    assert (read_event["name"], read_event["cat"]) == ("read one", "checkpoint")
+    assert read_event["ts"] >= task_event["ts"]
+    assert (tmp_path / "traces" / "run.trace.one.prof").exists()
+    json.dumps(report.to_dict())
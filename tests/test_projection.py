@@ -0,0 +1,91 @@
+import pandas as pd
+import pytest
+
+from prefect import task
+from prefect.core.task import Task
+from prefect.engine.result import Result
+
+from prefect_ds import projection as pj
+from prefect_ds.chunks import Chunks
+from prefect_ds.pandas_result_handler import PandasResultHandler
+from prefect_ds.result import LazyResult
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame({"one": range(6), "two": list("abcabc"), "three": range(6, 12)}, index=list("uvwxyz"))
+
+
+class TestApplyProjection:
+
+    def test_selects_columns(self, data):
+        pd.testing.assert_frame_equal(data[["three", "one"]], pj.apply_projection(data, pj.Projection(["three", "one"])))
+
+    def test_filters_rows_keeping_index(self, data):
+        projected = pj.apply_projection(data, pj.Projection(["one"], [("two", "==", "b"), ("one", ">", 1)]))
+        pd.testing.assert_frame_equal(data.loc[["y"], ["one"]], projected)
+
+    def test_filters_are_disjunctions_of_conjunctions(self, data):
+        projected = pj.apply_projection(data, pj.Projection(filters=[[("two", "in", ["a"])], [("one", ">=", 5)]]))
+        pd.testing.assert_frame_equal(data.loc[["u", "x", "z"]], projected)
+
+    def test_rejects_unknown_operators(self, data):
+        with pytest.raises(ValueError):
+            pj.apply_projection(data, pj.Projection(filters=[("one", "~", 1)]))
+
+
+def test_read_columns_include_filter_columns():
+    projection = pj.Projection(["one"], [("two", "==", "b"), ("one", ">", 1)])
+    assert pj.get_read_columns(projection) == ["one", "two"]
+    assert pj.get_read_columns(pj.Projection(filters=[("two", "==", "b")])) is None
+
+
+class TestGetInputProjections:
+
+    def test_reads_annotations(self):
+        @task
+        def annotated(data: pj.Projection(columns=["one"]), other: int):
+            return data
+
+        assert pj.get_input_projections(annotated) == {"data": pj.Projection(columns=["one"])}
+
+    def test_project_input_overrides_annotations(self):
+        @task
+        def annotated(data: pj.Projection(columns=["one"])):
+            return data
+
+        assert pj.project_input(annotated, "data", columns=["two"]) is annotated
+        assert pj.get_input_projections(annotated) == {"data": pj.Projection(columns=["two"])}
+
+    def test_empty_by_default(self):
+        assert pj.get_input_projections(Task()) == {}
+
+
+class TestProjectResult:
+
+    def test_projects_lazy_results_without_loading(self, tmp_path, data):
+        pytest.importorskip("pyarrow")
+        handler = PandasResultHandler(tmp_path / "data.parquet", "parquet")
+        handler.write(data)
+        result = LazyResult(handler)
+        projection = pj.Projection(["one"], [("two", "==", "b")])
+
+        projected = pj.project_result(result, projection)
+        assert not result.is_loaded
+        assert isinstance(projected, LazyResult)
+        pd.testing.assert_frame_equal(pj.apply_projection(data, projection), projected.value)
+
+    def test_projects_results_in_memory(self, data):
+        projection = pj.Projection(["one"], [("two", "==", "b")])
+        projected = pj.project_result(Result(data), projection)
+        pd.testing.assert_frame_equal(pj.apply_projection(data, projection), projected.value)
+
+    def test_projects_chunks_in_memory(self, data):
+        projection = pj.Projection(["one"], [("two", "==", "b")])
+        projected = pj.project_result(Result(Chunks(iter([data, data]))), projection)
+        for chunk in projected.value:
+            pd.testing.assert_frame_equal(pj.apply_projection(data, projection), chunk)
+
+    def test_leaves_other_results_alone(self):
+        result = Result([1, 2, 3])
+        assert pj.project_result(result, pj.Projection(["one"])) is result
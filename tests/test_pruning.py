@@ -0,0 +1,89 @@
+import pandas as pd
+import pytest
+from prefect import Flow, task
+from prefect.core.task import Task
+
+from prefect_ds.checkpoint_handler import checkpoint_handler
+from prefect_ds.flow_runner import DSFlowRunner
+from prefect_ds.pandas_result_handler import PandasResultHandler
+from prefect_ds.pruning import plan_checkpoints
+from prefect_ds.task_runner import DSTaskRunner
+
+
+def write_checkpoint(result_handler):
+    result_handler.write(pd.DataFrame({"one": [1, 2, 3]}))
+
+
+def test_plan_skips_tasks_only_needed_by_cached_tasks(tmp_path):
+    flow = Flow("test")
+    extract, load, clean, features, report = (
+        Task(name="extract"),
+        Task(name="load", result_handler=PandasResultHandler(tmp_path / "load.csv", "csv")),
+        Task(name="clean", result_handler=PandasResultHandler(tmp_path / "clean.csv", "csv")),
+        Task(name="features", result_handler=PandasResultHandler(tmp_path / "features.csv", "csv")),
+        Task(name="report")
+    )
+    flow.chain(extract, load, clean, features, report)
+    write_checkpoint(load.result_handler)
+    write_checkpoint(clean.result_handler)
+
+    plan = plan_checkpoints(flow, targets=[report], state_handlers=[checkpoint_handler])
+    assert set(plan.cached) == {load, clean}
+    assert plan.loaded == {clean}
+    assert plan.skipped == {extract}
+    assert plan.to_run == {features, report}
+    assert not plan.cached[clean].is_loaded
+
+
+def test_plan_only_looks_for_checkpoints_it_can_find_up_front(tmp_path):
+    flow = Flow("test")
+    name, templated, other_handler = (
+        Task(name="name"),
+        Task(name="templated", result_handler=PandasResultHandler(tmp_path / "{name}.csv", "csv")),
+        Task(name="other_handler", result_handler=PandasResultHandler(tmp_path / "data.csv", "csv"))
+    )
+    flow.add_edge(name, templated, key="name")
+    flow.add_edge(templated, other_handler, key="data")
+    write_checkpoint(PandasResultHandler(tmp_path / "data.csv", "csv"))
+
+    # Without checkpoint_handler, nothing is looked for
+    plan = plan_checkpoints(flow, targets=[other_handler])
+    assert plan.cached == {} and plan.to_run == flow.tasks
+    # The templated path depends on an input, so only the fixed one is looked for
+    plan = plan_checkpoints(flow, targets=[other_handler], state_handlers=[checkpoint_handler])
+    assert set(plan.cached) == {other_handler}
+    assert plan.skipped == {name, templated}
+
+
+@task()
+def make_data(rows):
+    return pd.DataFrame({"one": list(range(rows))})
+
+
+@task()
+def double(data):
+    return data * 2
+
+
+def test_plan_computes_content_addressed_keys(tmp_path):
+    pytest.importorskip("pyarrow")
+    def make_flow(rows):
+        with Flow("test") as flow:
+            data = make_data(rows, task_args={
+                "result_handler": PandasResultHandler(tmp_path / "data.parquet", "parquet", content_addressed=True)
+            })
+            double(data, task_args={
+                "result_handler": PandasResultHandler(tmp_path / "doubled.parquet", "parquet", content_addressed=True)
+            })
+        return flow
+    flow = make_flow(3)
+    state = DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(task_runner_state_handlers=[checkpoint_handler])
+    assert state.is_successful()
+
+    plan = plan_checkpoints(flow, targets=flow.terminal_tasks(), state_handlers=[checkpoint_handler])
+    assert set(plan.cached) == flow.tasks
+    # Different inputs mean different keys, so the checkpoints are stale
+    flow = make_flow(4)
+    plan = plan_checkpoints(flow, targets=flow.terminal_tasks(), state_handlers=[checkpoint_handler])
+    assert plan.cached == {}
+    assert plan.to_run == flow.tasks
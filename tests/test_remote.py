@@ -0,0 +1,164 @@
+import os
+import uuid
+
+import pandas as pd
+import pytest
+from prefect import Flow, task
+from prefect.engine import FlowRunner
+
+from prefect_ds import remote
+from prefect_ds.checkpoint_handler import checkpoint_handler
+from prefect_ds.pandas_result_handler import PandasResultHandler
+from prefect_ds.serializer_result_handler import SerializerResultHandler
+from prefect_ds.task_runner import DSTaskRunner
+
+
+class CountingStorage(remote.LocalStorage):
+    def __init__(self, root):
+        super().__init__(root)
+        self.reads = []
+
+    def read_range(self, path, start, end):
+        self.reads.append((path, start, end))
+        return super().read_range(path, start, end)
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = CountingStorage(tmp_path / "bucket")
+    monkeypatch.setitem(remote._STORAGES, "test", storage)
+    return storage
+
+
+def test_split_url():
+    assert remote.split_url("s3://bucket/data.parquet") == ("s3", "bucket/data.parquet")
+    assert remote.split_url("/tmp/data.parquet") == (None, "/tmp/data.parquet")
+
+
+def test_fetch_downloads_each_version_once(tmp_path):
+    storage = CountingStorage(tmp_path / "bucket")
+    (tmp_path / "upload.bin").write_bytes(os.urandom(1000))
+    remote.publish(storage, str(tmp_path / "upload.bin"), "checkpoints/data.bin")
+
+    local_path = str(tmp_path / "worker" / "data.bin")
+    assert remote.fetch(storage, "checkpoints/data.bin", local_path, part_size=300)
+    # Downloaded in (parallel) parts
+    assert sorted(start for _, start, _ in storage.reads) == [0, 300, 600, 900]
+    assert open(local_path, "rb").read() == (tmp_path / "upload.bin").read_bytes()
+    storage.reads.clear()
+    assert remote.fetch(storage, "checkpoints/data.bin", local_path)
+    assert storage.reads == []
+
+    (tmp_path / "upload.bin").write_bytes(b"replaced")
+    remote.publish(storage, str(tmp_path / "upload.bin"), "checkpoints/data.bin")
+    assert remote.fetch(storage, "checkpoints/data.bin", local_path)
+    assert open(local_path, "rb").read() == b"replaced"
+
+    storage.delete("checkpoints/data.bin")
+    assert not remote.fetch(storage, "checkpoints/data.bin", local_path)
+    assert not os.path.exists(local_path)
+
+
+def test_handler_shares_checkpoints_between_local_caches(tmp_path, storage):
+    pytest.importorskip("pyarrow")
+    data = pd.DataFrame({"one": range(100)})
+    writer = PandasResultHandler(
+        "test://checkpoints/data_{name}.parquet", "parquet", local_cache_dir=tmp_path / "writer", num_partitions=3
+    )
+    writer.write(data, input_mapping={"name": "a"}, checkpoint_key="key")
+    assert sorted(storage.list("checkpoints")) == [
+        "data_a.parquet.manifest.json",
+        "data_a.parquet/part-00000.parquet", "data_a.parquet/part-00001.parquet", "data_a.parquet/part-00002.parquet"
+    ]
+    # The writer's local copy is up to date, so it's read without downloading anything
+    pd.testing.assert_frame_equal(writer.read(input_mapping={"name": "a"}, checkpoint_key="key"), data)
+    assert storage.reads == []
+
+    reader = PandasResultHandler(
+        "test://checkpoints/data_{name}.parquet", "parquet", local_cache_dir=tmp_path / "reader", num_partitions=3
+    )
+    assert reader.checkpoint_path(input_mapping={"name": "a"}) == "test://checkpoints/data_a.parquet"
+    assert reader.exists(input_mapping={"name": "a"}, checkpoint_key="key")
+    assert not reader.exists(input_mapping={"name": "a"}, checkpoint_key="other")
+    assert reader.exists_many([{"name": "a"}, {"name": "b"}]) == [True, False]
+    assert reader.checkpoint_size(input_mapping={"name": "a"}) > 0
+    pd.testing.assert_frame_equal(reader.read(input_mapping={"name": "a"}, checkpoint_key="key"), data)
+    assert (tmp_path / "reader" / "test" / "checkpoints" / "data_a.parquet").is_dir()
+    num_reads = len(storage.reads)
+    reader.read(input_mapping={"name": "a"}, checkpoint_key="key")
+    assert len(storage.reads) == num_reads
+
+    with pytest.raises(FileNotFoundError):
+        reader.read(input_mapping={"name": "b"})
+
+
+def test_rewritten_result_removes_orphaned_parts(tmp_path, storage):
+    pytest.importorskip("pyarrow")
+    for num_partitions, num_rows in [(3, 100), (2, 10)]:
+        PandasResultHandler(
+            "test://data.parquet", "parquet", local_cache_dir=tmp_path / "writer", num_partitions=num_partitions
+        ).write(pd.DataFrame({"one": range(num_rows)}))
+    assert sorted(storage.list("data.parquet")) == ["part-00000.parquet", "part-00001.parquet"]
+
+    reader = PandasResultHandler("test://data.parquet", "parquet", local_cache_dir=tmp_path / "reader")
+    assert reader.read()["one"].tolist() == list(range(10))
+    assert sorted(os.listdir(tmp_path / "reader" / "test" / "data.parquet")) == [
+        ".part-00000.parquet.remote-version", ".part-00001.parquet.remote-version",
+        "part-00000.parquet", "part-00001.parquet"
+    ]
+
+
+def test_serializer_handler_reads_remote_results(tmp_path, storage):
+    SerializerResultHandler("test://model.bin", local_cache_dir=tmp_path / "writer").write({"weights": [1, 2]})
+    reader = SerializerResultHandler("test://model.bin", local_cache_dir=tmp_path / "reader")
+    assert reader.read() == {"weights": [1, 2]}
+
+
+def test_url_options_require_url():
+    with pytest.raises(ValueError, match="URL"):
+        PandasResultHandler("data.parquet", "parquet", local_cache_dir="cache")
+
+
+runs = []
+
+
+@task()
+def compute_totals():
+    runs.append("compute_totals")
+    return pd.DataFrame({"total": [1, 2, 3]})
+
+
+def test_cold_worker_reuses_remote_checkpoint(tmp_path, storage):
+    for worker in ["one", "two"]:
+        with Flow("test") as flow:
+            totals = compute_totals(task_args={"result_handler": PandasResultHandler(
+                "test://checkpoints/totals.csv", "csv", write_kwargs={"index": False}, local_cache_dir=tmp_path / worker
+            )})
+        state = FlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(
+            return_tasks=[totals], task_runner_state_handlers=[checkpoint_handler]
+        )
+        assert state.is_successful()
+        assert state.result[totals].result["total"].tolist() == [1, 2, 3]
+    assert runs == ["compute_totals"]
+    assert storage.reads
+
+
+def test_fsspec_storage():
+    pytest.importorskip("fsspec")
+    storage = remote.FsspecStorage("memory")
+    prefix = f"prefect_ds_test_{uuid.uuid4().hex}"
+    try:
+        with storage.file_system.open(f"{prefix}/dir/data.bin", "wb") as remote_file:
+            remote_file.write(b"0123456789")
+        assert storage.info(f"{prefix}/dir/data.bin").size == 10
+        assert storage.info(f"{prefix}/dir") is None
+        assert storage.info(f"{prefix}/missing.bin") is None
+        assert list(storage.list(prefix)) == ["dir/data.bin"]
+        assert storage.listdir(prefix) == {"dir"}
+        assert storage.read_range(f"{prefix}/dir/data.bin", 2, 5) == b"234"
+        storage.delete(f"{prefix}/dir/data.bin")
+        storage.delete(f"{prefix}/dir/data.bin")
+        assert storage.list(prefix) == {}
+    finally:
+        if storage.file_system.exists(prefix):
+            storage.file_system.rm(prefix, recursive=True)
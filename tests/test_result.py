@@ -5,7 +5,7 @@ import pytest
 
 from prefect.engine.result import Result, SafeResult
 
-from prefect_ds.result import PurgedResult, PurgedResultType
+from prefect_ds.result import LazyResult, PurgedResult, PurgedResultType
 from prefect.engine.result_handlers import ResultHandler
 
 
@@ -77,3 +77,55 @@ class TestToResult:
 )
 def test_everything_is_pickleable_after_init(obj):
     assert cloudpickle.loads(cloudpickle.dumps(obj)) == obj
+
+
+class CountingResultHandler(ResultHandler):
+    def __init__(self):
+        self.read_calls = []
+        super().__init__()
+
+    def read(self, *, input_mapping=None, checkpoint_key=None):
+        self.read_calls.append((input_mapping, checkpoint_key))
+        return 42
+
+
+class TestLazyResult:
+    def test_does_not_read_until_value_is_accessed(self):
+        handler = CountingResultHandler()
+        result = LazyResult(handler, input_mapping={"id": 1}, checkpoint_key="abc")
+        assert handler.read_calls == []
+        assert not result.is_loaded
+        assert repr(result) == "<LazyResult: not loaded>"
+
+        assert result.value == 42
+        assert result.is_loaded
+        assert handler.read_calls == [({"id": 1}, "abc")]
+
+    def test_only_reads_once(self):
+        handler = CountingResultHandler()
+        result = LazyResult(handler)
+        assert result.value == 42
+        assert result.value == 42
+        assert len(handler.read_calls) == 1
+
+    def test_unload_forces_reread(self):
+        handler = CountingResultHandler()
+        result = LazyResult(handler)
+        assert result.value == 42
+        result.unload()
+        assert not result.is_loaded
+        assert result.value == 42
+        assert len(handler.read_calls) == 2
+
+    def test_value_can_be_set(self):
+        handler = CountingResultHandler()
+        result = LazyResult(handler)
+        result.value = 5
+        assert result.value == 5
+        assert handler.read_calls == []
+
+    def test_to_result_does_not_load(self):
+        handler = CountingResultHandler()
+        result = LazyResult(handler)
+        assert result.to_result() is result
+        assert handler.read_calls == []
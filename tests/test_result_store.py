@@ -0,0 +1,129 @@
+import math
+
+import pandas as pd
+import pytest
+
+from prefect.core.task import Task
+from prefect.engine.result import NoResult, Result
+from prefect.engine.result_handlers import ResultHandler
+from prefect.engine.state import Mapped, Success
+
+from prefect_ds.result import LazyResult
+from prefect_ds.result_store import ResultEvent, SpillFileHandler, SpillingResultStore
+from prefect_ds.sizing import get_size
+
+
+def make_data(offset=0):
+    return pd.DataFrame({"one": [1, 2, 3], "two": [4, 5, 6]}) + offset
+
+
+class StaticResultHandler(ResultHandler):
+    def read(self, *, input_mapping=None, checkpoint_key=None):
+        return make_data()
+
+
+class TestSpillFileHandler:
+    def test_round_trips_and_removes(self, tmp_path):
+        handler = SpillFileHandler(tmp_path / "spill.pkl")
+        handler.write(make_data())
+        pd.testing.assert_frame_equal(make_data(), handler.read())
+        handler.remove()
+        assert not (tmp_path / "spill.pkl").exists()
+        handler.remove()
+
+
+class TestSpillingResultStore:
+    def test_does_nothing_under_limit(self, tmp_path):
+        store = SpillingResultStore(10 * get_size(make_data()), spill_dir=tmp_path)
+        state = Success(result=make_data())
+        store.add(Task(), state)
+        store.enforce_limit(lambda task: 1)
+        assert type(state._result) is Result
+        assert list(tmp_path.iterdir()) == []
+
+    def test_spills_result_needed_furthest_in_future(self, tmp_path):
+        store = SpillingResultStore(get_size(make_data()), spill_dir=tmp_path)
+        needed_soon, needed_later = Task(name="soon"), Task(name="later")
+        soon_state, later_state = Success(result=make_data(1)), Success(result=make_data(2))
+        store.add(needed_soon, soon_state)
+        store.add(needed_later, later_state)
+        store.enforce_limit(lambda task: {needed_soon: 1, needed_later: 5}[task])
+
+        assert type(soon_state._result) is Result
+        assert isinstance(later_state._result, LazyResult)
+        assert not later_state._result.is_loaded
+        assert store.resident_bytes == get_size(make_data())
+        pd.testing.assert_frame_equal(make_data(2), later_state.result)
+
+    def test_reloaded_results_are_unloaded_again(self, tmp_path):
+        store = SpillingResultStore(0, spill_dir=tmp_path)
+        task = Task()
+        state = Success(result=make_data())
+        store.add(task, state)
+        store.enforce_limit(lambda task: math.inf)
+        spilled_result = state._result
+        assert state.result is not None
+        assert spilled_result.is_loaded
+        assert store.resident_bytes == 0
+
+        loaded = store.refresh(task)
+        assert loaded == [ResultEvent(task, None, get_size(make_data()))]
+        assert store.resident_bytes == get_size(make_data())
+        store.enforce_limit(lambda task: math.inf)
+        assert state._result is spilled_result
+        assert not spilled_result.is_loaded
+
+    def test_unloads_checkpointed_results_instead_of_spilling(self, tmp_path):
+        store = SpillingResultStore(0, spill_dir=tmp_path)
+        lazy_result = LazyResult(StaticResultHandler())
+        lazy_result.value
+        state = Success(result=lazy_result)
+        store.add(Task(), state)
+        store.enforce_limit(lambda task: math.inf)
+        assert state._result is lazy_result
+        assert not lazy_result.is_loaded
+        assert list(tmp_path.iterdir()) == []
+
+    def test_spills_mapped_children(self, tmp_path):
+        store = SpillingResultStore(0, spill_dir=tmp_path)
+        map_states = [Success(result=make_data(i)) for i in range(2)]
+        state = Mapped(map_states=map_states, result=[make_data(0), make_data(1)])
+        store.add(Task(), state)
+        store.enforce_limit(lambda task: math.inf)
+        assert all(isinstance(map_state._result, LazyResult) for map_state in map_states)
+        assert state._result == NoResult
+        pd.testing.assert_frame_equal(make_data(1), map_states[1].result)
+
+    def test_materialize_and_cleanup(self, tmp_path):
+        store = SpillingResultStore(0, spill_dir=tmp_path)
+        task = Task()
+        state = Success(result=make_data())
+        store.add(task, state)
+        store.enforce_limit(lambda task: math.inf)
+        store.materialize(task)
+        assert type(state._result) is Result
+        store.cleanup()
+        assert list(tmp_path.iterdir()) == []
+        pd.testing.assert_frame_equal(make_data(), state.result)
+
+    def test_discard_removes_spill_files(self, tmp_path):
+        store = SpillingResultStore(0, spill_dir=tmp_path)
+        task = Task()
+        store.add(task, Success(result=make_data()))
+        store.enforce_limit(lambda task: math.inf)
+        scratch_dir, = tmp_path.iterdir()
+        assert len(list(scratch_dir.iterdir())) == 1
+        discarded = store.discard(task)
+        assert discarded == [ResultEvent(task, None, 0)]
+        assert list(scratch_dir.iterdir()) == []
+        assert store.resident_bytes == 0
+
+    def test_tracks_without_limit(self, tmp_path):
+        store = SpillingResultStore(None, spill_dir=tmp_path)
+        task = Task()
+        added = store.add(task, Success(result=make_data()))
+        assert added == [ResultEvent(task, None, get_size(make_data()))]
+        assert store.enforce_limit(lambda task: math.inf) == []
+        assert store.get_resident_sizes() == {task: get_size(make_data())}
+        assert store.discard(task) == added
+        assert store.resident_bytes == 0
@@ -0,0 +1,78 @@
+import pandas as pd
+from prefect import Flow
+from prefect.core.task import Task
+
+from prefect_ds import scheduling
+from prefect_ds.pandas_result_handler import PandasResultHandler
+
+
+def make_wide_flow():
+    # Two big loads, each with two small features computed from it, merged at the end
+    flow = Flow("test")
+    loads = [Task(name=f"load_{number}") for number in range(2)]
+    features = {load: [Task(name=f"feature_{load.name}_{number}") for number in range(2)] for load in loads}
+    merge = Task(name="merge")
+    for load in loads:
+        for feature in features[load]:
+            flow.add_edge(load, feature)
+            flow.add_edge(feature, merge)
+    sizes = {task: 1 for task in flow.tasks}
+    sizes.update({load: 100 for load in loads})
+    return flow, loads, features, merge, sizes
+
+
+def is_topological(flow, order):
+    positions = {task: position for position, task in enumerate(order)}
+    return set(order) == flow.tasks and all(
+        positions[edge.upstream_task] < positions[edge.downstream_task] for edge in flow.edges
+    )
+
+
+def test_memory_aware_order_runs_consumers_of_big_results_first():
+    flow, loads, features, merge, sizes = make_wide_flow()
+    order = scheduling.memory_aware_order(flow, sizes)
+    assert is_topological(flow, order)
+    # Each load's features run before the next load
+    first_load = order[0]
+    assert set(order[1:3]) == set(features[first_load])
+    assert order[-1] is merge
+    assert scheduling.get_peak_result_size(flow, order, sizes) == 104
+    all_loads_first = loads + [feature for load in loads for feature in features[load]] + [merge]
+    assert scheduling.get_peak_result_size(flow, all_loads_first, sizes) == 202
+
+
+def test_memory_aware_order_is_topological_for_chains():
+    flow = Flow("test")
+    tasks = [Task(name=str(number)) for number in range(5)]
+    for upstream_task, downstream_task in zip(tasks, tasks[1:]):
+        flow.add_edge(upstream_task, downstream_task)
+    flow.add_edge(tasks[0], tasks[4])
+    order = scheduling.memory_aware_order(flow, {task: 1 for task in tasks})
+    assert order == tasks
+
+
+def test_estimate_result_sizes(tmp_path):
+    flow = Flow("test")
+    known, by_name, checkpointed, templated, unknown = (
+        Task(name="known"),
+        Task(name="by_name"),
+        Task(name="checkpointed", result_handler=PandasResultHandler(tmp_path / "data.csv", "csv")),
+        Task(name="templated", result_handler=PandasResultHandler(tmp_path / "{x}.csv", "csv")),
+        Task(name="unknown")
+    )
+    for task in [known, by_name, checkpointed, templated, unknown]:
+        flow.add_task(task)
+    checkpointed.result_handler.write(pd.DataFrame({"one": range(100)}))
+    checkpoint_size = checkpointed.result_handler.checkpoint_size()
+
+    sizes = scheduling.estimate_result_sizes(flow, {known: 10, "by_name": 20})
+    assert sizes[known] == 10
+    assert sizes[by_name] == 20
+    assert sizes[checkpointed] == checkpoint_size
+    assert sizes[templated] == sizes[unknown] == 20
+
+
+def test_estimate_result_sizes_without_information():
+    flow = Flow("test")
+    flow.add_task(Task(name="one"))
+    assert list(scheduling.estimate_result_sizes(flow).values()) == [1]
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from prefect import Flow, task
+from prefect.engine.flow_runner import FlowRunner
+
+from prefect_ds.checkpoint_handler import checkpoint_handler
+from prefect_ds.file_result_handler import StaleCheckpointError
+from prefect_ds.manifest import read_manifest
+from prefect_ds.serializer_result_handler import SerializerResultHandler
+from prefect_ds.task_runner import DSTaskRunner
+
+
+class TestInit:
+
+    def test_unknown_serializer(self, tmp_path):
+        with pytest.raises(ValueError):
+            SerializerResultHandler(tmp_path / "test.bin", serializer="xyz")
+
+
+class TestReadWrite:
+
+    @pytest.mark.parametrize("data,serializer_name", [
+        (np.arange(10), "numpy"),
+        (pd.DataFrame({"one": [1, 2], "two": ["a", "b"]}), "dataframe"),
+        ({"frames": [pd.DataFrame({"one": [1]})], "array": np.ones(5)}, "pickle"),
+    ])
+    def test_round_trips_by_type(self, tmp_path, data, serializer_name):
+        if serializer_name == "dataframe":
+            pytest.importorskip("pyarrow")
+        handler = SerializerResultHandler(tmp_path / "test_{name}.bin")
+        handler.write(data, input_mapping={"name": "a"})
+        assert read_manifest(tmp_path / "test_a.bin") == {"serializer": serializer_name}
+        read_data = handler.read(input_mapping={"name": "a"})
+        if serializer_name == "pickle":
+            pd.testing.assert_frame_equal(data["frames"][0], read_data["frames"][0])
+            np.testing.assert_array_equal(data["array"], read_data["array"])
+        elif serializer_name == "numpy":
+            np.testing.assert_array_equal(data, read_data)
+        else:
+            pd.testing.assert_frame_equal(data, read_data)
+
+    def test_forced_serializer(self, tmp_path):
+        handler = SerializerResultHandler(tmp_path / "test.bin", serializer="pickle")
+        handler.write(np.arange(3))
+        assert read_manifest(tmp_path / "test.bin") == {"serializer": "pickle"}
+        np.testing.assert_array_equal(np.arange(3), handler.read())
+
+    def test_falls_back_to_pickle(self, tmp_path):
+        data = pd.DataFrame({"mixed": [1, "a"]})
+        handler = SerializerResultHandler(tmp_path / "test.bin")
+        handler.write(data)
+        assert read_manifest(tmp_path / "test.bin") == {"serializer": "pickle"}
+        pd.testing.assert_frame_equal(data, handler.read())
+
+    def test_memory_map(self, tmp_path):
+        handler = SerializerResultHandler(tmp_path / "test.npy", memory_map=True)
+        handler.write(np.arange(10))
+        read_data = handler.read()
+        np.testing.assert_array_equal(np.arange(10), read_data)
+        assert not read_data.flags.writeable
+
+    def test_results_without_manifests_are_not_read(self, tmp_path):
+        handler = SerializerResultHandler(tmp_path / "test.npy")
+        np.save(tmp_path / "test.npy", np.arange(3))
+        assert not handler.exists()
+        with pytest.raises(FileNotFoundError):
+            handler.read()
+
+    def test_checkpoint_key(self, tmp_path):
+        handler = SerializerResultHandler(tmp_path / "test.npy")
+        handler.write(np.arange(3), checkpoint_key="abc")
+        assert handler.exists(checkpoint_key="abc")
+        assert handler.exists_many([{}], ["def"]) == [False]
+        with pytest.raises(StaleCheckpointError):
+            handler.read(checkpoint_key="def")
+
+
+def test_works_with_checkpoint_handler(tmp_path):
+    run_offsets = []
+
+    @task()
+    def generate_list():
+        return [0, 1]
+
+    @task(result_handler=SerializerResultHandler(tmp_path / "test_{offset}.bin"))
+    def generate_data(offset):
+        run_offsets.append(offset)
+        return np.arange(3) + offset
+
+    with Flow("test") as flow:
+        data = generate_data.map(generate_list())
+
+    SerializerResultHandler(tmp_path / "test_{offset}.bin").write(np.zeros(3), input_mapping={"offset": 0})
+    flow_state = FlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(
+        task_runner_state_handlers=[checkpoint_handler],
+        return_tasks=[data]
+    )
+
+    assert run_offsets == [1]
+    results = flow_state.result[data].result
+    np.testing.assert_array_equal(np.zeros(3), results[0])
+    np.testing.assert_array_equal(np.arange(1, 4), results[1])
+    np.testing.assert_array_equal(np.arange(1, 4), np.load(tmp_path / "test_1.bin"))
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from prefect_ds import serializers
+
+
+class TestFindSerializer:
+
+    @pytest.mark.parametrize("value,expected_name", [
+        (np.arange(3), "numpy"),
+        (np.array(["a", None], dtype=object), "pickle"),
+        (pd.DataFrame({"one": [1, 2]}), "dataframe"),
+        (pd.DataFrame({1: [1, 2]}), "pickle"),
+        ({"a": pd.DataFrame({"one": [1, 2]})}, "pickle"),
+    ])
+    def test_picks_by_type(self, value, expected_name):
+        if expected_name == "dataframe":
+            pytest.importorskip("pyarrow")
+        assert serializers.find_serializer(value).name == expected_name
+
+    def test_picks_arrow_for_tables(self):
+        pa = pytest.importorskip("pyarrow")
+        assert serializers.find_serializer(pa.table({"one": [1, 2]})).name == "arrow"
+
+    def test_registered_serializers_take_precedence(self, monkeypatch):
+        monkeypatch.setattr(serializers, "_SERIALIZERS", list(serializers._SERIALIZERS))
+
+        class ListSerializer(serializers.PickleSerializer):
+            name = "list"
+
+            def can_serialize(self, value):
+                return isinstance(value, list)
+
+        serializers.register_serializer(ListSerializer())
+        assert serializers.find_serializer([1]).name == "list"
+        assert serializers.get_serializer("list").name == "list"
+
+    def test_unknown_serializer(self):
+        with pytest.raises(ValueError):
+            serializers.get_serializer("xyz")
+
+
+class TestRoundTrip:
+
+    @pytest.mark.parametrize("memory_map", [False, True])
+    def test_numpy(self, tmp_path, memory_map):
+        data = np.arange(12, dtype=np.float32).reshape(3, 4)
+        serializers.NumpySerializer().write(data, str(tmp_path / "data.bin"))
+        assert not (tmp_path / "data.bin.npy").exists()
+        read_data = serializers.NumpySerializer().read(str(tmp_path / "data.bin"), memory_map=memory_map)
+        np.testing.assert_array_equal(data, read_data)
+        assert isinstance(read_data, np.memmap) == memory_map
+
+    @pytest.mark.parametrize("memory_map", [False, True])
+    def test_dataframe(self, tmp_path, memory_map):
+        pytest.importorskip("pyarrow")
+        data = pd.DataFrame({"one": [1.0, 2.0], "two": ["a", "b"]}, index=pd.Index([5, 7], name="key"))
+        serializers.DataFrameSerializer().write(data, str(tmp_path / "data.arrow"))
+        read_data = serializers.DataFrameSerializer().read(str(tmp_path / "data.arrow"), memory_map=memory_map)
+        pd.testing.assert_frame_equal(data, read_data)
+
+    def test_arrow(self, tmp_path):
+        pa = pytest.importorskip("pyarrow")
+        data = pa.table({"one": [1, 2], "two": ["a", "b"]})
+        serializers.ArrowSerializer().write(data, str(tmp_path / "data.arrow"))
+        assert serializers.ArrowSerializer().read(str(tmp_path / "data.arrow"), memory_map=True).equals(data)
+
+
+class TestPickleSerializer:
+
+    def test_arrays_are_written_out_of_band(self, tmp_path):
+        data = {"big": np.arange(1000, dtype=np.int64), "small": "text"}
+        serializers.PickleSerializer().write(data, str(tmp_path / "data.pkl"))
+        contents = (tmp_path / "data.pkl").read_bytes()
+        buffer_start = contents.index(data["big"].tobytes())
+        assert buffer_start % serializers._ALIGNMENT == 0
+
+        read_data = serializers.PickleSerializer().read(str(tmp_path / "data.pkl"))
+        np.testing.assert_array_equal(data["big"], read_data["big"])
+        assert read_data["small"] == "text"
+        assert read_data["big"].flags.writeable
+
+    def test_memory_mapped_arrays_use_the_file(self, tmp_path):
+        data = [np.arange(1000, dtype=np.float64), pd.DataFrame({"one": np.arange(10)})]
+        serializers.PickleSerializer().write(data, str(tmp_path / "data.pkl"))
+        read_data = serializers.PickleSerializer().read(str(tmp_path / "data.pkl"), memory_map=True)
+        np.testing.assert_array_equal(data[0], read_data[0])
+        pd.testing.assert_frame_equal(data[1], read_data[1])
+        assert not read_data[0].flags.writeable
+        assert not read_data[0].flags.owndata
+
+    def test_non_contiguous_arrays_are_written_in_band(self, tmp_path):
+        data = np.arange(20).reshape(4, 5)[:, ::2]
+        serializers.PickleSerializer().write(data, str(tmp_path / "data.pkl"))
+        np.testing.assert_array_equal(data, serializers.PickleSerializer().read(str(tmp_path / "data.pkl")))
+
+    def test_rejects_other_files(self, tmp_path):
+        (tmp_path / "data.pkl").write_bytes(b"not a pickle")
+        with pytest.raises(ValueError):
+            serializers.PickleSerializer().read(str(tmp_path / "data.pkl"))
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from prefect_ds import shared_memory
+
+pytestmark = pytest.mark.skipif(not shared_memory.HAS_PICKLE_PROTOCOL_5, reason="needs Python 3.8 or pickle5")
+
+
+def test_round_trip(tmp_path):
+    data = pd.DataFrame({"one": np.arange(1000), "two": np.linspace(0, 1, 1000), "three": ["a"] * 1000})
+    shared = shared_memory.share(data, tmp_path)
+    assert shared.size == 2 * 1000 * 8
+    pd.testing.assert_frame_equal(shared_memory.attach(shared), data)
+
+
+def test_arrays_are_mapped_copy_on_write(tmp_path):
+    shared = shared_memory.share(np.arange(1000), tmp_path)
+    first, second = shared_memory.attach(shared), shared_memory.attach(shared)
+    assert not first.flags.owndata
+    assert first.ctypes.data % 64 == 0
+    first += 1
+    assert second[0] == 0
+    assert shared_memory.attach(shared)[0] == 0
+
+
+def test_mapping_outlives_release(tmp_path):
+    shared = shared_memory.share(np.arange(1000), tmp_path)
+    array = shared_memory.attach(shared)
+    shared_memory.release(shared.path)
+    assert list(tmp_path.iterdir()) == []
+    assert array.sum() == sum(range(1000))
+    shared_memory.release(shared.path)
+
+
+def test_objects_without_buffers_are_not_shared(tmp_path):
+    assert shared_memory.share(1, tmp_path) is None
+    assert shared_memory.share(pd.DataFrame({"one": ["a"]}), tmp_path) is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_empty_arrays(tmp_path):
+    shared = shared_memory.share(pd.DataFrame({"one": np.array([], dtype=float)}), tmp_path)
+    assert shared_memory.attach(shared).empty
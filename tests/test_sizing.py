@@ -0,0 +1,37 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+from prefect_ds import sizing
+
+
+def test_measures_dataframes_deeply():
+    data = pd.DataFrame({"one": [1, 2, 3], "two": ["a" * 100, "b", "c"]})
+    assert sizing.get_size(data) == data.memory_usage(index=True, deep=True).sum()
+    assert sizing.get_size(data) > data.memory_usage(index=True, deep=False).sum()
+
+
+def test_measures_arrays():
+    assert sizing.get_size(np.zeros(100)) == 800
+
+
+def test_measures_containers_recursively():
+    array = np.zeros(100)
+    assert sizing.get_size([array, array]) == sys.getsizeof([array, array]) + 1600
+    assert sizing.get_size({"a": array}) == sys.getsizeof({"a": array}) + sys.getsizeof("a") + 800
+
+
+def test_uses_registered_sizers_for_type_and_subclasses():
+    class Model:
+        pass
+
+    class SubModel(Model):
+        pass
+
+    try:
+        sizing.register_sizer(Model, lambda value: 1234)
+        assert sizing.get_size(Model()) == 1234
+        assert sizing.get_size(SubModel()) == 1234
+    finally:
+        del sizing._SIZERS[Model]
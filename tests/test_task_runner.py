@@ -1,11 +1,16 @@
+import threading
+
 import pandas as pd
+import pytest
 
 from prefect import Flow, task
 from prefect.engine.flow_runner import FlowRunner
 
 
 from prefect_ds.checkpoint_handler import checkpoint_handler
+from prefect_ds.flow_runner import DSFlowRunner
 from prefect_ds.pandas_result_handler import PandasResultHandler
+from prefect_ds.projection import Projection
 from prefect_ds.task_runner import DSTaskRunner
 
 
@@ -43,4 +48,185 @@ def test_task_runner_works_in_normal_usage(tmp_path):
     for cached_data, flow_data in zip(mapped_data_from_cache, flow_state.result[data].result):
         pd.testing.assert_frame_equal(cached_data, flow_data)
 
-    pd.testing.assert_frame_equal(cached_broken_data, flow_state.result[only_works_from_cache].result)
\ No newline at end of file
+    pd.testing.assert_frame_equal(cached_broken_data, flow_state.result[only_works_from_cache].result)
+
+def test_unused_checkpoints_are_never_read(tmp_path, monkeypatch):
+    read_paths = []
+    original_read = PandasResultHandler.read
+
+    def tracking_read(self, **kwargs):
+        read_paths.append(self.path.name)
+        return original_read(self, **kwargs)
+    monkeypatch.setattr(PandasResultHandler, "read", tracking_read)
+
+    @task(result_handler=PandasResultHandler(tmp_path / "first.csv", "csv", write_kwargs={"index": False}))
+    def first():
+        return pd.DataFrame({"one": [1, 2, 3]})
+
+    @task(result_handler=PandasResultHandler(tmp_path / "second.csv", "csv", write_kwargs={"index": False}))
+    def second(data):
+        return data * 2
+
+    @task()
+    def third(data):
+        return data + 1
+
+    with Flow("test") as flow:
+        first_data = first()
+        second_data = second(first_data)
+        third_data = third(second_data)
+
+    pd.DataFrame({"one": [1, 2, 3]}).to_csv(tmp_path / "first.csv", index=False)
+    pd.DataFrame({"one": [2, 4, 6]}).to_csv(tmp_path / "second.csv", index=False)
+
+    flow_state = DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(
+        task_runner_state_handlers=[checkpoint_handler],
+        return_tasks=[third_data]
+    )
+
+    pd.testing.assert_frame_equal(pd.DataFrame({"one": [3, 5, 7]}), flow_state.result[third_data].result)
+    assert read_paths == ["second.csv"]
+
+
+def test_mapped_checkpoints_are_found_in_one_pass(tmp_path, monkeypatch):
+    def fail_exists(self, **kwargs):
+        raise AssertionError("children should not probe for their own checkpoints")
+    monkeypatch.setattr(PandasResultHandler, "exists", fail_exists)
+    run_offsets = []
+
+    @task()
+    def generate_list():
+        return [0, 1, 2]
+
+    @task(result_handler=PandasResultHandler(tmp_path / "test_{offset}.csv", "csv", write_kwargs={"index": False}))
+    def generate_data(offset):
+        run_offsets.append(offset)
+        return pd.DataFrame({"one": [1, 2, 3]}) + offset
+
+    with Flow("test") as flow:
+        data = generate_data.map(generate_list())
+
+    pd.DataFrame({"one": [0, 0, 0]}).to_csv(tmp_path / "test_0.csv", index=False)
+    pd.DataFrame({"one": [2, 2, 2]}).to_csv(tmp_path / "test_2.csv", index=False)
+
+    flow_state = FlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(
+        task_runner_state_handlers=[checkpoint_handler],
+        return_tasks=[data]
+    )
+
+    assert run_offsets == [1]
+    expected = [pd.DataFrame({"one": [value] * 3}) for value in [0, 2, 2]]
+    expected[1] = pd.DataFrame({"one": [2, 3, 4]})
+    for expected_data, flow_data in zip(expected, flow_state.result[data].result):
+        pd.testing.assert_frame_equal(expected_data, flow_data)
+    pd.testing.assert_frame_equal(expected[1], pd.read_csv(tmp_path / "test_1.csv"))
+
+
+def test_projected_inputs_are_read_with_pushdown(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow.parquet")
+    read_kwargs = []
+    original_read = PandasResultHandler.read
+
+    def tracking_read(self, **kwargs):
+        read_kwargs.append(kwargs)
+        return original_read(self, **kwargs)
+    monkeypatch.setattr(PandasResultHandler, "read", tracking_read)
+
+    @task(result_handler=PandasResultHandler(tmp_path / "wide.parquet", "parquet"))
+    def wide():
+        return pd.DataFrame({"one": range(4), "two": range(4, 8), "three": list("abab")})
+
+    @task()
+    def narrow(data: Projection(columns=["two"], filters=[("three", "==", "b")])):
+        return data
+
+    with Flow("test") as flow:
+        narrow_data = narrow(wide())
+
+    pd.DataFrame({"one": range(4), "two": range(4, 8), "three": list("abab")}).to_parquet(tmp_path / "wide.parquet")
+    flow_state = DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(
+        task_runner_state_handlers=[checkpoint_handler],
+        return_tasks=[narrow_data]
+    )
+
+    pd.testing.assert_frame_equal(
+        pd.DataFrame({"two": [5, 7]}, index=[1, 3]), flow_state.result[narrow_data].result
+    )
+    assert [(kwargs["columns"], kwargs["filters"]) for kwargs in read_kwargs] == [
+        (["two"], [("three", "==", "b")])
+    ]
+
+
+def test_chunks_stream_through_the_flow_one_at_a_time():
+    events = []
+
+    @task()
+    def load():
+        for number in range(3):
+            events.append(f"load {number}")
+            yield pd.DataFrame({"one": [number, number]})
+
+    @task()
+    def clean(chunks):
+        for chunk in chunks:
+            events.append(f"clean {chunk['one'].iloc[0]}")
+            yield chunk * 2
+
+    @task()
+    def aggregate(chunks):
+        total = 0
+        for chunk in chunks:
+            events.append(f"aggregate {chunk['one'].iloc[0]}")
+            total += chunk["one"].sum()
+        return total
+
+    with Flow("test") as flow:
+        total = aggregate(clean(load()))
+
+    flow_state = DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(return_tasks=[total])
+    assert flow_state.result[total].result == 12
+    assert events == [
+        "load 0", "clean 0", "aggregate 0", "load 1", "clean 1", "aggregate 2", "load 2", "clean 2", "aggregate 4"
+    ]
+
+
+def test_checkpointed_chunks_can_be_used_by_several_tasks(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    @task(result_handler=PandasResultHandler(tmp_path / "chunks.parquet", "parquet", chunked=True))
+    def load():
+        for number in range(3):
+            yield pd.DataFrame({"one": [number, number]})
+
+    @task()
+    def total(chunks):
+        return sum(chunk["one"].sum() for chunk in chunks)
+
+    @task()
+    def count(chunks):
+        return sum(len(chunk) for chunk in chunks)
+
+    with Flow("test") as flow:
+        chunks = load()
+        data_total = total(chunks)
+        data_count = count(chunks)
+
+    for message in ["Task run succeeded.", "Task loaded from disk."]:
+        flow_state = DSFlowRunner(flow=flow, task_runner_cls=DSTaskRunner).run(
+            task_runner_state_handlers=[checkpoint_handler],
+            return_tasks=[chunks, data_total, data_count]
+        )
+        assert flow_state.result[chunks].message == message
+        assert flow_state.result[data_total].result == 6
+        assert flow_state.result[data_count].result == 6
+    assert pq.ParquetFile(tmp_path / "chunks.parquet").num_row_groups == 3
+
+
+def test_run_state_is_kept_per_thread():
+    task_runner = DSTaskRunner(task(lambda: None))
+    task_runner.checkpoint_key = "key"
+    other_thread_keys = []
+    other_thread = threading.Thread(target=lambda: other_thread_keys.append(task_runner.checkpoint_key))
+    other_thread.start()
+    other_thread.join()
+    assert other_thread_keys == [None]
+    assert task_runner.checkpoint_key == "key"